@@ -1,13 +1,78 @@
 import decimal
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from app.amounts.currencies import ACCOUNT_CURRENCY, UnsupportedCurrencyError, minor_units
 
 
 def to_cents(amount_in_euros_str: str) -> int:
+    return to_minor_units(amount_str=amount_in_euros_str, currency=ACCOUNT_CURRENCY)
+
+
+def to_euros_str(amount_in_cents: int) -> str:
+    return to_amount_str(amount_minor=amount_in_cents, currency=ACCOUNT_CURRENCY)
+
+
+def to_minor_units(amount_str: str, currency: str) -> int:
+    """
+    Amount in the minor units of its currency (ISO 4217), e.g. "10.05" EUR -> 1005, "1000" JPY -> 1000.
+
+    Raises:
+        ValueError: invalid amount, or more decimal places than the currency has
+        UnsupportedCurrencyError: unknown currency
+    """
+    places = minor_units(currency)
     try:
-        amount_in_euros = decimal.Decimal(amount_in_euros_str)
+        amount = decimal.Decimal(amount_str)
     except Exception:
-        raise ValueError(f"Invalid amount: {amount_in_euros_str}")
-    rounded_amount_in_euros = amount_in_euros.quantize(decimal.Decimal("0.01"), rounding=decimal.ROUND_HALF_UP)
-    if amount_in_euros != rounded_amount_in_euros:
-        raise ValueError(f"More than 2 decimal places is not allowed: {amount_in_euros_str}")
-    amount_in_cents = rounded_amount_in_euros * 100
-    return int(amount_in_cents)
+        raise ValueError(f"Invalid amount: {amount_str}")
+    try:
+        rounded_amount = amount.quantize(decimal.Decimal(1).scaleb(-places), rounding=decimal.ROUND_HALF_UP)
+    except decimal.InvalidOperation:  # NaN, Infinity
+        raise ValueError(f"Invalid amount: {amount_str}")
+    if amount != rounded_amount:
+        raise ValueError(f"More than {places} decimal places is not allowed in {currency}: {amount_str}")
+    return int(rounded_amount.scaleb(places))
+
+
+def to_amount_str(amount_minor: int, currency: str) -> str:
+    return str(decimal.Decimal(amount_minor).scaleb(-minor_units(currency)))
+
+
+@dataclass(frozen=True)
+class FxRates:
+    """
+    Snapshot of the FX rates: units of the account currency per unit of each currency (e.g. USD: 0.92).
+
+    A bulk is converted against a single snapshot, whose version identifies the rates used.
+    """
+    version: int
+    rates: Dict[str, decimal.Decimal]
+
+    def _factor(self, currency: str) -> Tuple[int, int]:
+        """
+        (numerator, denominator) converting an amount in minor units of the currency to account cents.
+        """
+        rate = decimal.Decimal(1) if currency == ACCOUNT_CURRENCY else self.rates.get(currency)
+        if rate is None:
+            raise UnsupportedCurrencyError(f"No FX rate for {currency}")
+        return rate.scaleb(minor_units(ACCOUNT_CURRENCY) - minor_units(currency)).as_integer_ratio()
+
+    def to_account_cents(self, amounts: Sequence[int], currencies: Sequence[str]) -> List[int]:
+        """
+        Convert the amounts (in minor units of their currency) to cents of the account currency in one pass:
+        the rate of each distinct currency is looked up once, then each amount is an integer product and
+        division (rounded half up), without Decimal arithmetic per amount.
+
+        Raises:
+            UnsupportedCurrencyError: unknown currency, or no rate for one of the currencies
+        """
+        distinct_currencies = set(currencies)
+        if distinct_currencies <= {ACCOUNT_CURRENCY}:
+            return list(amounts)
+        factors = {currency: self._factor(currency) for currency in sorted(distinct_currencies)}
+        converted_amounts = []
+        for amount, currency in zip(amounts, currencies):
+            numerator, denominator = factors[currency]
+            converted_amounts.append((2 * amount * numerator + denominator) // (2 * denominator))
+        return converted_amounts
@@ -0,0 +1,40 @@
+from typing import Dict, FrozenSet
+
+
+# Currency of the bank accounts: balances, reserved funds and booked transactions
+ACCOUNT_CURRENCY = "EUR"
+
+# Active ISO 4217 currencies (funds, precious metals and testing codes excluded)
+CURRENCIES: FrozenSet[str] = frozenset("""
+    AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BOV BRL BSD BTN BWP BYN BZD
+    CAD CDF CHE CHF CHW CLF CLP CNY COP COU CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL
+    GHS GIP GMD GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD
+    KYD KZT LAK LBP LKR LRD LSL LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MXV MYR MZN NAD NGN NIO
+    NOK NPR NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SOS SRD
+    SSP STN SVC SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH UGX USD USN UYI UYU UYW UZS VED VES VND VUV
+    WST XAF XCD XCG XOF XPF YER ZAR ZMW ZWG
+""".split())
+
+# ISO 4217 minor units (decimal places) of the currencies that do not have 2
+_MINOR_UNITS: Dict[str, int] = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0, "RWF": 0,
+    "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "CLF": 4, "UYW": 4,
+}
+
+
+class UnsupportedCurrencyError(ValueError):
+    pass
+
+
+def minor_units(currency: str) -> int:
+    """
+    Number of decimal places of the amounts in the currency (e.g. 2 for EUR, 0 for JPY, 3 for KWD).
+
+    Raises:
+        UnsupportedCurrencyError: if the currency is not an active ISO 4217 currency
+    """
+    if currency not in CURRENCIES:
+        raise UnsupportedCurrencyError(f"Unsupported currency: {currency}")
+    return _MINOR_UNITS.get(currency, 2)
@@ -0,0 +1,60 @@
+import re
+import string
+
+
+# IBAN length per country (SWIFT IBAN registry)
+IBAN_LENGTHS = {
+    "AD": 24, "AE": 23, "AL": 28, "AT": 20, "AZ": 28, "BA": 20, "BE": 16, "BG": 22, "BH": 22, "BI": 27,
+    "BR": 29, "BY": 28, "CH": 21, "CR": 22, "CY": 28, "CZ": 24, "DE": 22, "DJ": 27, "DK": 18, "DO": 28,
+    "EE": 20, "EG": 29, "ES": 24, "FI": 18, "FK": 18, "FO": 18, "FR": 27, "GB": 22, "GE": 22, "GI": 23,
+    "GL": 18, "GR": 27, "GT": 28, "HN": 28, "HR": 21, "HU": 28, "IE": 22, "IL": 23, "IQ": 23, "IS": 26,
+    "IT": 27, "JO": 30, "KW": 30, "KZ": 20, "LB": 28, "LC": 32, "LI": 21, "LT": 20, "LU": 20, "LV": 21,
+    "LY": 25, "MC": 27, "MD": 24, "ME": 22, "MK": 19, "MN": 20, "MR": 27, "MT": 31, "MU": 30, "NI": 28,
+    "NL": 18, "NO": 15, "OM": 23, "PK": 24, "PL": 28, "PS": 29, "PT": 25, "QA": 29, "RO": 24, "RS": 22,
+    "RU": 33, "SA": 24, "SC": 31, "SD": 18, "SE": 24, "SI": 19, "SK": 24, "SM": 27, "SO": 23, "ST": 25,
+    "SV": 28, "TL": 23, "TN": 24, "TR": 26, "UA": 29, "VA": 22, "VG": 24, "XK": 20, "YE": 30,
+}
+
+_IBAN_FORMAT = re.compile(r"[A-Z]{2}[0-9]{2}[A-Z0-9]+")
+# institution (4 letters), country (2 letters), location (2), optional branch (3)
+_BIC_FORMAT = re.compile(r"[A-Z]{4}[A-Z]{2}[A-Z0-9]{2}(?:[A-Z0-9]{3})?")
+# ISO 13616 check digits: letters are replaced by 10..35
+_LETTERS_TO_DIGITS = str.maketrans({letter: str(value) for value, letter in enumerate(string.ascii_uppercase, 10)})
+
+
+def normalize_iban(iban: str) -> str:
+    """
+    Electronic format of an IBAN: without spaces, upper case.
+    """
+    return iban.replace(" ", "").upper()
+
+
+def validate_iban(iban: str):
+    """
+    Check the format, the length of the country and the mod-97 check digits of an IBAN.
+
+    Raises:
+        ValueError: invalid IBAN
+    """
+    normalized_iban = normalize_iban(iban)
+    if not _IBAN_FORMAT.fullmatch(normalized_iban):
+        raise ValueError(f"Invalid IBAN format: {iban}")
+    expected_length = IBAN_LENGTHS.get(normalized_iban[:2])
+    if expected_length is None:
+        raise ValueError(f"Unknown IBAN country: {iban}")
+    if len(normalized_iban) != expected_length:
+        raise ValueError(f"Invalid IBAN length (expected {expected_length} characters): {iban}")
+    rearranged_iban = normalized_iban[4:] + normalized_iban[:4]
+    if int(rearranged_iban.translate(_LETTERS_TO_DIGITS)) % 97 != 1:
+        raise ValueError(f"Invalid IBAN check digits: {iban}")
+
+
+def validate_bic(bic: str):
+    """
+    Check the format of a BIC (ISO 9362), 8 or 11 characters.
+
+    Raises:
+        ValueError: invalid BIC
+    """
+    if not _BIC_FORMAT.fullmatch(bic.strip().upper()):
+        raise ValueError(f"Invalid BIC format: {bic}")
@@ -0,0 +1,130 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+
+from app.settings import AppMode, Settings, configure_settings, get_settings
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the FastAPI application.
+
+    Only the routers of the application mode are imported (a worker does not import the public API),
+    and the logging, database engine and migrations are set up on startup rather than on import.
+    """
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        _on_startup(settings=settings)
+        yield
+        _on_shutdown(settings=settings)
+
+    from app.utils.responses import FastJSONResponse
+    app = FastAPI(  # https://fastapi.tiangolo.com/reference/fastapi/
+        title="Qonto Bulk Transfer API",
+        version="0.1.0",
+        default_response_class=FastJSONResponse,  # orjson rendering of the bodies returned as dicts
+        lifespan=lifespan
+    )
+    app.state.settings = settings
+    _add_middlewares(app=app)
+    _include_routers(app=app, settings=settings)
+    return app
+
+
+def _add_middlewares(app: FastAPI):
+    from app.utils.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)  # pass-through unless profiling is configured
+
+
+def _include_routers(app: FastAPI, settings: Settings):
+    if settings.mode == AppMode.API:
+        from app.routers import accounts, bulk_transfers
+        app.include_router(bulk_transfers.router, prefix="/transfers", tags=["Bulk Transfers"])
+        app.include_router(accounts.router, prefix="/accounts", tags=["Accounts"])
+
+    from app.routers import fake_broker
+    app.include_router(fake_broker.router, prefix="/internal/jobs", tags=["Fake Broker"])
+
+    from app.routers import metrics, profiles
+    app.include_router(metrics.router, tags=["Monitoring"])
+    app.include_router(profiles.router, prefix="/internal/profiles", tags=["Monitoring"])
+
+
+def _on_startup(settings: Settings):
+    configure_process(settings=settings)
+    if _runs_scheduled_bulks_dispatcher(settings):
+        from app.services.bulk_scheduler import BULK_DISPATCHER
+        BULK_DISPATCHER.start()
+
+
+def configure_process(settings: Settings):
+    """
+    Settings, logging, tracing, profiling, database and job queues of the process: on application startup,
+    and in the `python -m app.worker` processes.
+    """
+    from app.models import db
+    from app.utils.log_formatter import configure_logging, parse_logger_levels
+    from app.utils.profiling import configure_profiling
+    from app.utils.tracing import configure_tracing
+
+    configure_settings(settings)
+    configure_logging(
+        level=settings.log_level,
+        log_format=settings.log_format,
+        logger_levels=parse_logger_levels(settings.log_levels),
+        asynchronous=settings.log_async,
+        job_log_sample_rate=settings.job_log_sample_rate,
+        job_log_max_per_second=settings.job_log_max_per_second
+    )
+    configure_tracing(
+        spans_path=settings.trace_spans_path,
+        max_bytes=settings.trace_spans_max_bytes,
+        backup_count=settings.trace_spans_backup_count
+    )
+    configure_profiling(
+        profile_dir=settings.profile_dir,
+        sample_rate=settings.profile_sample_rate,
+        max_captures=settings.profile_max_captures
+    )
+    if settings.run_migrations_on_startup:
+        run_migrations(settings=settings)
+    if settings.shards_dir is not None:
+        db.configure_shards(shards_dir=settings.shards_dir, shard_count=settings.shard_count)
+    else:
+        db.configure_engine(database_path=settings.database_path)
+    if settings.job_queue_path is not None:
+        from app.routers import fake_broker
+        fake_broker.configure_job_queues(job_queue_path=settings.job_queue_path)
+
+
+def run_migrations(settings: Settings):
+    if settings.shards_dir is not None:
+        from app.migrations.shards import migrate_shards
+        migrate_shards(shards_dir=settings.shards_dir, shard_count=settings.shard_count)
+    else:
+        from app.migrations.simple_runner import run_all_migrations
+        run_all_migrations(database_path=settings.database_path)
+
+
+def _runs_scheduled_bulks_dispatcher(settings: Settings) -> bool:
+    return settings.mode == AppMode.API and settings.scheduled_bulks_dispatcher
+
+
+def _on_shutdown(settings: Settings):
+    if _runs_scheduled_bulks_dispatcher(settings):
+        from app.services.bulk_scheduler import BULK_DISPATCHER
+        BULK_DISPATCHER.stop()
+    shutdown_process()
+
+
+def shutdown_process():
+    """
+    Flush the spans and the queued log records.
+    """
+    from app.utils.log_formatter import shutdown_logging
+    from app.utils.tracing import shutdown_tracing
+    shutdown_tracing()
+    shutdown_logging()
@@ -1,17 +1,4 @@
-from fastapi import FastAPI
+from app.factory import create_app
 
-from app.migrations.simple_runner import run_all_migrations
-from app.routers import bulk_transfers, fake_broker
 
-app = FastAPI(  # https://fastapi.tiangolo.com/reference/fastapi/
-    title="Qonto Bulk Transfer API",
-    version="0.1.0"
-)
-
-app.include_router(bulk_transfers.router, prefix="/transfers", tags=["Bulk Transfers"])
-app.include_router(fake_broker.router, prefix="/internal/jobs", tags=["Fake Broker"])
-
-
-@app.on_event("startup")
-def on_startup():
-    run_all_migrations()
+app = create_app()
@@ -0,0 +1,4 @@
+-- Keyset pagination of an account transactions filtered by bulk request: (bank_account_id, bulk_request_uuid, id)
+-- as `id` is the rowid, it is implicitly part of the index.
+CREATE INDEX IF NOT EXISTS transactions_bank_account_id_bulk_request_uuid_idx
+    ON transactions (bank_account_id, bulk_request_uuid);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS bulk_manifests (
+    bulk_request_id INTEGER PRIMARY KEY,  -- bulk_requests.id
+    transfer_count INTEGER NOT NULL,
+    payload BLOB NOT NULL  -- zlib compressed packed credit transfers
+);
@@ -0,0 +1,19 @@
+-- Partial-success bulk requests: transfers are finalized one by one, failed ones can be retried
+ALTER TABLE bulk_requests ADD COLUMN partial_success BOOLEAN NOT NULL DEFAULT 0;
+ALTER TABLE bulk_requests ADD COLUMN failed_amount_cents INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS transfers (
+    transfer_uuid TEXT PRIMARY KEY,
+    bulk_request_id INTEGER NOT NULL,  -- bulk_requests.id
+    status TEXT NOT NULL DEFAULT 'PENDING',  -- PENDING, COMPLETED, FAILED
+    attempts INTEGER NOT NULL DEFAULT 1,
+    counterparty_name TEXT NOT NULL,
+    counterparty_iban TEXT NOT NULL,
+    counterparty_bic TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    amount_currency TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+
+-- Failed transfers of a bulk request to retry
+CREATE INDEX IF NOT EXISTS transfers_bulk_request_id_status_idx ON transfers (bulk_request_id, status);
@@ -0,0 +1,3 @@
+-- Optimistic concurrency: updates of accounts and bulk requests are compare-and-swap on their version
+ALTER TABLE bank_accounts ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE bulk_requests ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
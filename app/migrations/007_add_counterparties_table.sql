@@ -0,0 +1,47 @@
+-- Counterparties dictionary: a transaction references its counterparty instead of repeating its name, IBAN and BIC
+-- (payroll bulks are sent to the same employees every month)
+CREATE TABLE IF NOT EXISTS counterparties (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    iban TEXT NOT NULL,
+    bic TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS counterparties_iban_bic_name_idx ON counterparties (iban, bic, name);
+
+INSERT INTO counterparties (name, iban, bic)
+    SELECT counterparty_name, counterparty_iban, counterparty_bic
+    FROM transactions
+    GROUP BY counterparty_iban, counterparty_bic, counterparty_name
+    ORDER BY MIN(id);
+
+-- SQLite can not change the columns of a table in place: the table is rebuilt, the ids are kept
+CREATE TABLE transactions_with_counterparty_id (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transfer_uuid TEXT NOT NULL UNIQUE,
+    bulk_request_uuid TEXT NULL DEFAULT NULL,
+    counterparty_id INTEGER NOT NULL REFERENCES counterparties (id),
+    amount_cents INTEGER NOT NULL,
+    amount_currency TEXT NOT NULL,
+    bank_account_id INTEGER NOT NULL,
+    description TEXT NOT NULL
+);
+
+INSERT INTO transactions_with_counterparty_id
+    (id, transfer_uuid, bulk_request_uuid, counterparty_id, amount_cents, amount_currency, bank_account_id, description)
+    SELECT transactions.id, transfer_uuid, bulk_request_uuid, counterparties.id, amount_cents, amount_currency,
+           bank_account_id, description
+    FROM transactions
+    JOIN counterparties
+        ON counterparties.iban = transactions.counterparty_iban
+        AND counterparties.bic = transactions.counterparty_bic
+        AND counterparties.name = transactions.counterparty_name;
+
+DROP TABLE transactions;
+
+ALTER TABLE transactions_with_counterparty_id RENAME TO transactions;
+
+CREATE INDEX IF NOT EXISTS transactions_bank_account_id_idx ON transactions (bank_account_id);
+
+CREATE INDEX IF NOT EXISTS transactions_bank_account_id_bulk_request_uuid_idx
+    ON transactions (bank_account_id, bulk_request_uuid);
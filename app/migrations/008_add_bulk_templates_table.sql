@@ -0,0 +1,9 @@
+-- Bulk templates: the validated transfers of a recurring bulk (e.g. monthly payroll), executed by id
+CREATE TABLE IF NOT EXISTS bulk_templates (
+    template_uuid TEXT PRIMARY KEY,
+    bank_account_id INTEGER NOT NULL,
+    transfer_count INTEGER NOT NULL,
+    total_amount_cents INTEGER NOT NULL,
+    payload BLOB NOT NULL,  -- packed transfers, see app.services.bulk_templates
+    created_at TEXT NOT NULL
+);
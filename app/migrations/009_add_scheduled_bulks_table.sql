@@ -0,0 +1,16 @@
+-- Scheduled bulk transfers: validated bulk requests to execute at a given date (see app.services.bulk_scheduler)
+CREATE TABLE IF NOT EXISTS scheduled_bulks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_uuid TEXT NOT NULL UNIQUE,
+    bank_account_id INTEGER NOT NULL,
+    execute_at DATETIME NOT NULL,  -- UTC
+    status TEXT NOT NULL DEFAULT 'SCHEDULED',  -- SCHEDULED, RELEASED, FAILED, CANCELLED
+    partial_success BOOLEAN NOT NULL DEFAULT 0,
+    transfer_count INTEGER NOT NULL,
+    total_amount_cents INTEGER NOT NULL,
+    payload BLOB NOT NULL,  -- packed transfers, same layout as the bulk templates
+    created_at DATETIME NOT NULL
+);
+
+-- Next bulks to release in execution order: range scan of the SCHEDULED prefix only
+CREATE INDEX IF NOT EXISTS scheduled_bulks_status_execute_at_idx ON scheduled_bulks (status, execute_at, id);
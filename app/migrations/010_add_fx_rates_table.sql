@@ -0,0 +1,14 @@
+-- FX rates of the credit transfers currencies to the account currency (EUR), cached by app.services.fx_rates
+CREATE TABLE IF NOT EXISTS fx_rates (
+    currency TEXT PRIMARY KEY,  -- ISO 4217
+    rate TEXT NOT NULL,  -- EUR per unit of the currency, exact decimal
+    version INTEGER NOT NULL,  -- rates version of the last update, MAX(version) is the version of the table
+    updated_at TEXT NOT NULL
+);
+
+-- Reference rates of the development database, updated with `db.update_fx_rates`
+INSERT OR IGNORE INTO fx_rates (currency, rate, version, updated_at) VALUES
+    ('USD', '0.86', 1, '2026-10-01 00:00:00'),
+    ('GBP', '1.15', 1, '2026-10-01 00:00:00'),
+    ('CHF', '1.07', 1, '2026-10-01 00:00:00'),
+    ('JPY', '0.0057', 1, '2026-10-01 00:00:00');
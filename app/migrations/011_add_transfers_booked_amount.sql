@@ -0,0 +1,2 @@
+-- Amount of a transfer in cents of the account currency (reserved and debited), when paid in another currency
+ALTER TABLE transfers ADD COLUMN booked_amount_cents INTEGER;  -- amount_cents if NULL
@@ -0,0 +1,8 @@
+-- Directory of the sharded layout: shard of each bank account (see app.migrations.shards)
+CREATE TABLE IF NOT EXISTS account_shards (
+    bic TEXT NOT NULL,
+    iban TEXT NOT NULL,
+    bank_account_id INTEGER NOT NULL UNIQUE,
+    shard_id INTEGER NOT NULL,
+    PRIMARY KEY (bic, iban)
+);
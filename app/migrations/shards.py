@@ -0,0 +1,136 @@
+"""
+Sharded database layout: the bank accounts (with their bulk requests, transfers and transactions) are spread
+over several SQLite files, so the writes of different organizations do not serialize on one SQLite write lock.
+A small directory database maps the (bic, iban) of each account to its shard.
+
+The ids of the shard `k` are allocated from `k << SHARD_ID_SHIFT` (AUTOINCREMENT sequences): the shard of a
+bank account, bulk request or scheduled bulk is known from its id, so queued jobs carry no shard information.
+
+Usage:
+    python -m app.migrations.shards --shards-dir PATH --shard-count 4
+"""
+import argparse
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+from app.migrations.simple_runner import MIGRATIONS_DIR, run_all_migrations
+from app.utils.log_formatter import configure_logging, get_logger
+
+
+logger = get_logger("app.migrations.shards")  # not __name__: also run as __main__
+
+
+SHARD_ID_SHIFT = 40
+# Tables whose ids identify their shard
+SHARDED_ID_TABLES = ("bank_accounts", "bulk_requests", "transactions", "counterparties", "scheduled_bulks")
+DIRECTORY_MIGRATIONS_DIR = MIGRATIONS_DIR / "directory"
+DIRECTORY_FILE_NAME = "directory.sqlite"
+
+
+def shard_path(shards_dir: str, shard_id: int) -> str:
+    return str(Path(shards_dir) / f"shard-{shard_id:02d}.sqlite")
+
+
+def directory_path(shards_dir: str) -> str:
+    return str(Path(shards_dir) / DIRECTORY_FILE_NAME)
+
+
+def shard_of_id(row_id: int) -> int:
+    return row_id >> SHARD_ID_SHIFT
+
+
+def place_account(bic: str, iban: str, shard_count: int) -> int:
+    """
+    Shard of a new account (stable hash: the accounts of an organization are spread evenly).
+    """
+    return zlib.crc32(f"{bic}/{iban}".encode()) % shard_count
+
+
+def migrate_shards(shards_dir: str, shard_count: int):
+    """
+    Apply the pending migrations of the directory and of every shard, reserve the id range of each shard,
+    and register the accounts of the shards in the directory.
+
+    The rows seeded by the migrations (ACME account, its transactions and counterparties) are kept on the shard 0
+    only: on the other shards, they would be unreachable copies counted in the sums and exports of the shard.
+    """
+    Path(shards_dir).mkdir(parents=True, exist_ok=True)
+    run_all_migrations(database_path=directory_path(shards_dir), migrations_dir=DIRECTORY_MIGRATIONS_DIR)
+    for shard_id in range(shard_count):
+        path = shard_path(shards_dir, shard_id)
+        run_all_migrations(database_path=path)
+        _delete_seed_rows(database_path=path, shard_id=shard_id)
+        _reserve_id_range(database_path=path, shard_id=shard_id)
+        _register_accounts(shards_dir=shards_dir, database_path=path, shard_id=shard_id)
+
+
+def _delete_seed_rows(database_path: str, shard_id: int):
+    """
+    Delete the rows below the id range of the shard: seeded by the migrations, as no other row is allocated there.
+    """
+    first_id = shard_id << SHARD_ID_SHIFT
+    if first_id == 0:
+        return
+    conn = sqlite3.connect(database_path)
+    try:
+        with conn:
+            for table in SHARDED_ID_TABLES:
+                deleted = conn.execute(f"DELETE FROM {table} WHERE id < ?", (first_id,)).rowcount
+                if deleted:
+                    logger.info("Deleted %d seed rows of %s from shard %d", deleted, table, shard_id)
+    finally:
+        conn.close()
+
+
+def _reserve_id_range(database_path: str, shard_id: int):
+    first_id = shard_id << SHARD_ID_SHIFT
+    if first_id == 0:
+        return
+    conn = sqlite3.connect(database_path)
+    try:
+        with conn:
+            for table in SHARDED_ID_TABLES:
+                sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+                if sequence is None:
+                    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, first_id))
+                elif sequence[0] < first_id:
+                    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (first_id, table))
+    finally:
+        conn.close()
+
+
+def _register_accounts(shards_dir: str, database_path: str, shard_id: int):
+    conn = sqlite3.connect(database_path)
+    try:
+        accounts = conn.execute(
+            "SELECT bic, iban, id FROM bank_accounts WHERE id >= ? AND id < ?",
+            (shard_id << SHARD_ID_SHIFT, (shard_id + 1) << SHARD_ID_SHIFT)
+        ).fetchall()
+    finally:
+        conn.close()
+    conn = sqlite3.connect(directory_path(shards_dir))
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO account_shards (bic, iban, bank_account_id, shard_id) VALUES (?, ?, ?, ?)",
+                [(bic, iban, bank_account_id, shard_id) for bic, iban, bank_account_id in accounts]
+            )
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.migrations.shards", description=__doc__.strip())
+    parser.add_argument("--shards-dir", required=True, help="directory of the shard and directory databases")
+    parser.add_argument("--shard-count", type=int, required=True)
+    args = parser.parse_args(argv)
+    configure_logging(level="INFO", asynchronous=False)
+
+    migrate_shards(shards_dir=args.shards_dir, shard_count=args.shard_count)
+    print(f"{args.shard_count} shard(s) up to date in {args.shards_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,199 @@
+"""
+Light versioned migrations runner.
+
+Applied migrations are tracked in the `schema_migrations` table with the checksum of their script,
+so only pending `*.sql` scripts are run: startup is a cheap version check once the schema is up to date.
+
+Usage:
+    python -m app.migrations.simple_runner [upgrade|status|baseline] [--database PATH]
+"""
+import argparse
+import datetime
+import hashlib
 import sqlite3
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.settings import Settings
+from app.utils.log_formatter import configure_logging, get_logger
 
-import app.models.db
+
+logger = get_logger("app.migrations.simple_runner")  # not __name__: also run as __main__
 
 
 MIGRATIONS_DIR = Path(__file__).parent
+# Max time a starting worker waits for another one applying the migrations
+LOCK_TIMEOUT_SECONDS = 60
+
+CREATE_SCHEMA_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    path: Path
+    checksum: str
+
+    def statements(self) -> List[str]:
+        return split_statements(self.path.read_text())
+
+
+def discover_migrations(migrations_dir: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for sql_file in sorted(migrations_dir.glob("*.sql")):  # apply in order
+        version, _, _ = sql_file.stem.partition("_")
+        migrations.append(Migration(
+            version=version,
+            name=sql_file.stem,
+            path=sql_file,
+            checksum=hashlib.sha256(sql_file.read_bytes()).hexdigest()
+        ))
+    return migrations
+
+
+def split_statements(script: str) -> List[str]:
+    """
+    Split a SQL script into statements, as `executescript` would commit the ongoing transaction.
+    """
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                statements.append(statement.strip())
+            statement = ""
+    if statement.strip() and not _is_comment_only(statement):
+        raise MigrationError(f"Incomplete SQL statement: {statement.strip()}")
+    return statements
+
+
+def _is_comment_only(sql: str) -> bool:
+    return all(not line.strip() or line.strip().startswith("--") for line in sql.splitlines())
+
+
+def _connect(database_path: str) -> sqlite3.Connection:
+    # autocommit mode: transactions are explicitly managed by the runner
+    return sqlite3.connect(database_path, timeout=LOCK_TIMEOUT_SECONDS, isolation_level=None)
+
+
+def _applied_checksums(conn: sqlite3.Connection) -> Dict[str, str]:
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if not has_table:
+        return {}
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+
+def _pending(migrations: List[Migration], applied_checksums: Dict[str, str]) -> List[Migration]:
+    pending_migrations = []
+    for migration in migrations:
+        applied_checksum = applied_checksums.get(migration.version)
+        if applied_checksum is None:
+            pending_migrations.append(migration)
+        elif applied_checksum != migration.checksum:
+            raise MigrationError(
+                f"Migration {migration.name} was modified after being applied "
+                f"(checksum {applied_checksum} != {migration.checksum})"
+            )
+    return pending_migrations
+
+
+def _record(conn: sqlite3.Connection, migration: Migration):
+    conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (?, ?, ?, ?)",
+        (migration.version, migration.name, migration.checksum, datetime.datetime.now(datetime.UTC).isoformat())
+    )
+
+
+def pending_migrations(
+        database_path: Optional[str] = None, migrations_dir: Path = MIGRATIONS_DIR
+) -> List[Migration]:
+    conn = _connect(database_path or Settings.from_env().database_path)
+    try:
+        return _pending(discover_migrations(migrations_dir), _applied_checksums(conn))
+    finally:
+        conn.close()
+
+
+def run_all_migrations(
+        database_path: Optional[str] = None, migrations_dir: Path = MIGRATIONS_DIR, record_only: bool = False
+) -> List[Migration]:
+    """
+    Apply the pending migrations in a single transaction.
+
+    The write lock (`BEGIN IMMEDIATE`) is taken before checking again the applied versions,
+    so when several workers start together only the first one applies the migrations
+    and the others wait for it and then find nothing to do.
+
+    Args:
+        database_path: SQLite database file (default: `DATABASE_PATH` environment variable or default path)
+        migrations_dir: Directory of the `*.sql` migration scripts
+        record_only: Record the pending migrations as applied without running them (baseline)
+
+    Returns:
+        Applied migrations (empty when the schema is already up to date)
+    """
+    migrations = discover_migrations(migrations_dir)
+    conn = _connect(database_path or Settings.from_env().database_path)
+    try:
+        if not _pending(migrations, _applied_checksums(conn)):  # fast path without lock
+            return []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(CREATE_SCHEMA_MIGRATIONS_TABLE)
+            migrations_to_apply = _pending(migrations, _applied_checksums(conn))
+            for migration in migrations_to_apply:
+                logger.info(f"{'Recording' if record_only else 'Running'} migration: {migration.name}")
+                if not record_only:
+                    for statement in migration.statements():
+                        conn.execute(statement)
+                _record(conn, migration)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return migrations_to_apply
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.migrations.simple_runner", description=__doc__.strip())
+    parser.add_argument(
+        "command", nargs="?", default="upgrade", choices=["upgrade", "status", "baseline"],
+        help="upgrade: apply pending migrations, status: list pending migrations, "
+             "baseline: record pending migrations as applied without running them (existing database)"
+    )
+    parser.add_argument("--database", default=None, help="SQLite database path")
+    args = parser.parse_args(argv)
+    configure_logging(level="INFO", asynchronous=False)
 
+    if args.command == "status":
+        migrations = pending_migrations(database_path=args.database)
+        print(f"{len(migrations)} pending migration(s)")
+        for migration in migrations:
+            print(f"  {migration.name}")
+        return
 
-def run_sql_script(script_path: Path):
-    with sqlite3.connect(app.models.db.DATABASE_PATH) as conn:
-        script = Path(script_path).read_text()
-        conn.executescript(script)
+    migrations = run_all_migrations(database_path=args.database, record_only=args.command == "baseline")
+    print(f"{len(migrations)} migration(s) {'recorded' if args.command == 'baseline' else 'applied'}")
 
 
-def run_all_migrations():
-    for sql_file in sorted(MIGRATIONS_DIR.glob("*.sql")):  # apply in order
-        print(f"Running migration: {sql_file}")
-        run_sql_script(sql_file)
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from typing import List
+import datetime
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 from app.amounts.converters import to_cents
@@ -8,8 +9,9 @@ class CreditTransfer(BaseModel):
     amount: str = Field(..., min_length=1)
     currency: str = Field(..., min_length=3, max_length=3)
     counterparty_name: str = Field(..., min_length=1)
-    counterparty_bic: str = Field(..., min_length=1)  # todo check BIC length
-    counterparty_iban: str = Field(..., min_length=1)  # todo check IBAN length
+    # IBAN (mod-97) and BIC validated for the whole bulk, see app.services.counterparty_validation
+    counterparty_bic: str = Field(..., min_length=1)
+    counterparty_iban: str = Field(..., min_length=1)
     description: str = Field(..., min_length=10)
 
     model_config = {
@@ -25,6 +27,41 @@ class BulkTransferRequest(BaseModel):
     organization_bic: str = Field(..., min_length=1)  # todo check BIC length
     organization_iban: str = Field(..., min_length=1)  # todo check IBAN length
     credit_transfers: List[CreditTransfer]
+    # finalize the transfers one by one (failed ones can be retried) instead of all or nothing
+    partial_success: bool = False
+    # execution date (UTC if no timezone), executed right away if None or past
+    execute_at: Optional[datetime.datetime] = None
+
+    model_config = {
+        "extra": "forbid"
+    }
+
+
+class BulkTemplateRequest(BaseModel):
+    template_id: str  # UUID
+    organization_bic: str = Field(..., min_length=1)
+    organization_iban: str = Field(..., min_length=1)
+    credit_transfers: List[CreditTransfer]
+
+    model_config = {
+        "extra": "forbid"
+    }
+
+
+class TemplateLineOverride(BaseModel):
+    index: int = Field(..., ge=0)  # of the credit transfer in the template
+    amount: Optional[str] = Field(default=None, min_length=1)
+    description: Optional[str] = Field(default=None, min_length=10)
+
+    model_config = {
+        "extra": "forbid"
+    }
+
+
+class BulkTemplateExecutionRequest(BaseModel):
+    request_id: str
+    overrides: List[TemplateLineOverride] = []
+    partial_success: bool = False
 
     model_config = {
         "extra": "forbid"
@@ -38,6 +75,22 @@ class BulkTransferSuccessResponse(BaseModel):
     # status_url: str
 
 
+class BulkTransferScheduledResponse(BulkTransferSuccessResponse):
+    execute_at: datetime.datetime  # UTC
+
+
+class BulkTransferRetrySuccessResponse(BulkTransferSuccessResponse):
+    retried_transfers: int
+    retried_amount_cents: int
+
+
+class BulkTemplateSuccessResponse(BaseModel):
+    template_id: str  # UUID
+    message: str
+    transfer_count: int
+    total_amount_cents: int
+
+
 class ErrorDetails(BaseModel):
     reason: str  # todo Enum
     details: str
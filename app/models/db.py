@@ -1,30 +1,412 @@
 import datetime
+import decimal
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
-from typing import Optional, cast
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple, TypeVar, cast
 from uuid import UUID, uuid4
-from sqlalchemy import Select
-from sqlmodel import create_engine, SQLModel, Field, Column, DateTime, select, Session
+from sqlalchemy import Engine, Integer, Select, case, event, func, insert, literal, text, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import create_engine, SQLModel, Field, Column, DateTime, Relationship, select, Session
 
+from app.amounts.currencies import ACCOUNT_CURRENCY
+from app.migrations import shards
 from app.models.job import TransferJob
+from app.settings import Settings
+from app.utils import metrics, profiling
 from app.utils.log_formatter import get_logger
 
 
 logger = get_logger(__name__)
 
 
-DATABASE_PATH = "./qonto_accounts.sqlite"
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+DATABASE_PATH = Settings.from_env().database_path
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+_engine: Optional[Engine] = None
+_shards: Optional["ShardRouter"] = None  # sharded layout, see configure_shards
+
+# Optimistic concurrency: attempts of a transaction whose versioned rows were updated meanwhile
+TRANSACTION_MAX_ATTEMPTS = 3
+TRANSACTION_RETRY_BACKOFF_SECONDS = 0.005
+
+T = TypeVar("T")
+
+# Counterparty ids interned by the process: the recipients of recurring bulks (e.g. payroll) repeat every month
+INTERNED_COUNTERPARTIES_CACHE_SIZE = 100_000
+
+
+def _create_sqlite_engine(database_path: str) -> Engine:
+    return create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
+
+
+def configure_engine(database_path: Optional[str] = None) -> Engine:
+    """
+    (Re)create the database engine, called on application startup.
+    """
+    global DATABASE_PATH, _engine, _shards
+    if database_path is not None:
+        DATABASE_PATH = database_path
+    if _engine is not None:
+        _engine.dispose()
+    if _shards is not None:
+        _shards.dispose()
+        _shards = None
+    COUNTERPARTY_IDS.clear()  # ids of another database
+    _engine = _create_sqlite_engine(DATABASE_PATH)
+    return _engine
+
+
+def get_engine() -> Engine:
+    """
+    Engine created on first use rather than as an import side effect.
+    """
+    if _shards is not None:
+        raise RuntimeError("Sharded databases: sessions are bound to the engine of their shard, see route_session")
+    if _engine is None:
+        return configure_engine()
+    return _engine
+
+
+def __getattr__(name: str):
+    if name == "engine":  # lazy module attribute: `db.engine`
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def new_session() -> Session:
+    """
+    Session of the database, or in the sharded layout a session to route to a shard before its first statement
+    (see `route_session`).
+    """
+    return Session(bind=None if _shards is not None else get_engine())
 
 
 def get_session():
-    with Session(engine) as session:
+    with new_session() as session:
         yield session
 
 
+#--- Shards
+
+
+class ShardRouter:
+    """
+    Engines of the sharded layout (see app.migrations.shards): the shard of an account is looked up once
+    in the directory database (an account never moves), the shard of a row is known from its id.
+    """
+
+    def __init__(self, shards_dir: str, shard_count: int):
+        self.shards_dir = shards_dir
+        self.engines = [
+            _create_sqlite_engine(shards.shard_path(shards_dir, shard_id)) for shard_id in range(shard_count)
+        ]
+        # counterparty ids are allocated by each shard
+        self.counterparty_ids = [CounterpartyIds() for _ in range(shard_count)]
+        self._directory_engine = _create_sqlite_engine(shards.directory_path(shards_dir))
+        self._account_shards: Dict[Tuple[str, str], int] = {}
+
+    def shard_of_account(self, bic: str, iban: str) -> Optional[int]:
+        shard_id = self._account_shards.get((bic, iban))
+        if shard_id is None:
+            with self._directory_engine.connect() as connection:
+                shard_id = connection.execute(
+                    text("SELECT shard_id FROM account_shards WHERE bic = :bic AND iban = :iban"),
+                    {"bic": bic, "iban": iban}
+                ).scalar()
+            if shard_id is not None:
+                self._account_shards[(bic, iban)] = shard_id
+        return shard_id
+
+    def register_account(self, bank_account: "BankAccount", shard_id: int):
+        with self._directory_engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO account_shards (bic, iban, bank_account_id, shard_id) "
+                     "VALUES (:bic, :iban, :bank_account_id, :shard_id)"),
+                {"bic": bank_account.bic, "iban": bank_account.iban, "bank_account_id": bank_account.id,
+                 "shard_id": shard_id}
+            )
+        self._account_shards[(bank_account.bic, bank_account.iban)] = shard_id
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+        self._directory_engine.dispose()
+
+
+_SHARD_ID_KEY = "shard_id"
+
+
+def configure_shards(shards_dir: str, shard_count: int) -> ShardRouter:
+    """
+    Use the sharded layout (migrated by `app.migrations.shards.migrate_shards`) instead of a single database.
+    """
+    global _engine, _shards
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    if _shards is not None:
+        _shards.dispose()
+    COUNTERPARTY_IDS.clear()
+    _shards = ShardRouter(shards_dir=shards_dir, shard_count=shard_count)
+    return _shards
+
+
+def is_sharded() -> bool:
+    return _shards is not None
+
+
+def shard_engines() -> List[Engine]:
+    return _shards.engines if _shards is not None else [get_engine()]
+
+
+def route_session(session: Session, shard_id: int) -> Session:
+    """
+    Bind the session to the engine of the shard, before its first statement (no-op with a single database).
+    """
+    if _shards is None:
+        return session
+    engine = _shards.engines[shard_id]
+    if session.bind is not engine:
+        if session.in_transaction():
+            raise RuntimeError(f"Session already in a transaction on another shard than {shard_id}")
+        session.bind = engine
+        session.info[_SHARD_ID_KEY] = shard_id
+    return session
+
+
+def route_session_to_id(session: Session, row_id: int) -> Session:
+    """
+    Route the session to the shard of a bank account, bulk request or scheduled bulk id.
+    """
+    return route_session(session=session, shard_id=shards.shard_of_id(row_id))
+
+
+def route_session_to_account(session: Session, bic: str, iban: str) -> bool:
+    """
+    Returns:
+        False if the account is unknown to the directory (the session is not routed)
+    """
+    if _shards is None:
+        return True
+    shard_id = _shards.shard_of_account(bic=bic, iban=iban)
+    if shard_id is None:
+        return False
+    route_session(session=session, shard_id=shard_id)
+    return True
+
+
+def route_session_to_row(session: Session, find: Callable[[Session], Any]) -> bool:
+    """
+    Route the session to the shard where `find` returns a row, for the rows only known by their uuid
+    (each shard is queried in turn: the cancellation, retry and template execution requests only).
+
+    Returns:
+        False if no shard has the row (the session is not routed)
+    """
+    if _shards is None:
+        return True
+    for shard_id, engine in enumerate(_shards.engines):
+        with Session(engine) as shard_session, shard_session.begin():
+            if find(shard_session) is not None:
+                route_session(session=session, shard_id=shard_id)
+                return True
+    return False
+
+
+def session_for_id(row_id: int) -> Session:
+    """
+    New session on the database of a bank account, bulk request or scheduled bulk id.
+    """
+    if _shards is None:
+        return Session(get_engine())
+    return route_session_to_id(session=Session(), row_id=row_id)
+
+
+def session_shard_id(session: Session) -> int:
+    return session.info.get(_SHARD_ID_KEY, 0)
+
+
+def create_account(organization_name: str, bic: str, iban: str, balance_cents: int) -> "BankAccount":
+    """
+    Create a bank account, on the shard placed from its (bic, iban) in the sharded layout.
+    """
+    shard_id = shards.place_account(bic=bic, iban=iban, shard_count=len(_shards.engines)) if _shards else 0
+    with route_session(session=new_session(), shard_id=shard_id) as session:
+        with session.begin():
+            bank_account = BankAccount(
+                organization_name=organization_name, bic=bic, iban=iban, balance_cents=balance_cents
+            )
+            session.add(bank_account)
+        session.refresh(bank_account)
+        session.expunge(bank_account)
+    if _shards is not None:
+        _shards.register_account(bank_account=bank_account, shard_id=shard_id)
+    return bank_account
+
+
+_AFTER_COMMIT_CALLBACKS_KEY = "after_commit_callbacks"
+_AFTER_COMMIT_ERROR_KEY = "after_commit_error"
+
+
+class AfterCommitError(Exception):
+    """
+    A required after-commit callback failed: the transaction is committed, and the callback compensated
+    what it could not do (see call_after_commit).
+    """
+
+
+def call_after_commit(
+        session: Session, callback: Callable[[], Any], key: Optional[Hashable] = None, required: bool = False
+):
+    """
+    Call `callback` once the ongoing session transaction is committed (discarded on rollback).
+
+    Registering again a callback with the same `key` replaces the previous one (coalescing).
+
+    The failure of a callback is logged only, unless it is `required`: the callback compensates its effects
+    before raising (e.g. fails the bulk request whose jobs could not be queued), and the failure is raised
+    to the caller by `raise_after_commit_error` once the commit returned.
+    """
+    callbacks = session.info.setdefault(_AFTER_COMMIT_CALLBACKS_KEY, {})
+    callbacks[key if key is not None else id(callback)] = (callback, required)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session):
+    if session.in_nested_transaction():  # savepoint released: the transaction is still open
+        return
+    session.info.pop(_AFTER_COMMIT_ERROR_KEY, None)  # of a previous commit, not raised
+    callbacks = session.info.pop(_AFTER_COMMIT_CALLBACKS_KEY, None)
+    if not callbacks:
+        return
+    for callback, required in callbacks.values():
+        try:
+            callback()
+        except Exception as e:  # data is committed: the other callbacks still run, raising here breaks the session
+            logger.error(f"After commit callback {callback} failed: {e}")
+            if required:
+                session.info.setdefault(_AFTER_COMMIT_ERROR_KEY, AfterCommitError(str(e)))
+
+
+def raise_after_commit_error(session: Session):
+    """
+    Raises:
+        AfterCommitError: a required after-commit callback of the last committed transaction failed
+    """
+    error = session.info.pop(_AFTER_COMMIT_ERROR_KEY, None)
+    if error is not None:
+        raise error
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit_callbacks(session: Session):
+    if session.in_nested_transaction():  # rolled back to a savepoint, see `savepoint`
+        return
+    session.info.pop(_AFTER_COMMIT_CALLBACKS_KEY, None)
+
+
+@contextmanager
+def savepoint(session: Session) -> Iterator[None]:
+    """
+    Nested transaction (SAVEPOINT) of the ongoing transaction: on error, its changes and the after-commit
+    callbacks registered within are discarded, the enclosing transaction goes on.
+    """
+    callbacks = dict(session.info.get(_AFTER_COMMIT_CALLBACKS_KEY, {}))
+    try:
+        with session.begin_nested():
+            yield
+    except Exception:
+        session.info[_AFTER_COMMIT_CALLBACKS_KEY] = callbacks
+        raise
+
+
+class ConcurrentUpdateError(Exception):
+    """
+    A transaction kept conflicting with concurrent updates of the same rows.
+    """
+
+
+def run_transaction(
+        session: Session, work: Callable[[], T], operation: str, max_attempts: int = TRANSACTION_MAX_ATTEMPTS
+) -> T:
+    """
+    Run `work` in a transaction, and run it again from the start (at most `max_attempts` times) when
+    a compare-and-swap update fails: a versioned row (BankAccount, BulkRequest) was updated by another
+    transaction since it was read. The after-commit callbacks of a failed attempt are discarded.
+
+    Raises:
+        ConcurrentUpdateError: still conflicting after `max_attempts`
+        AfterCommitError: a required after-commit callback failed
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with session.begin():
+                result = work()
+        except StaleDataError as e:
+            logger.warning(f"{operation}: concurrent update detected (attempt {attempt}/{max_attempts}): {e}")
+            if attempt == max_attempts:
+                metrics.TRANSACTION_ATTEMPTS.labels(operation).observe(attempt)
+                raise ConcurrentUpdateError(f"{operation}: concurrent update after {attempt} attempts") from e
+            time.sleep(random.uniform(0, TRANSACTION_RETRY_BACKOFF_SECONDS * attempt))
+            continue
+        metrics.TRANSACTION_ATTEMPTS.labels(operation).observe(attempt)
+        raise_after_commit_error(session=session)
+        return result
+
+
+_TRANSACTION_STARTED_AT_KEY = "transaction_started_at"
+
+
+@event.listens_for(Session, "after_begin")
+def _record_transaction_start(session: Session, transaction, connection):
+    session.info.setdefault(_TRANSACTION_STARTED_AT_KEY, time.perf_counter())
+
+
+@event.listens_for(Session, "after_commit")
+def _observe_committed_transaction(session: Session):
+    _observe_transaction_duration(session=session, outcome="commit")
+
+
+@event.listens_for(Session, "after_rollback")
+def _observe_rolled_back_transaction(session: Session):
+    _observe_transaction_duration(session=session, outcome="rollback")
+
+
+def _observe_transaction_duration(session: Session, outcome: str):
+    if session.in_nested_transaction():  # end of a savepoint
+        return
+    started_at = session.info.pop(_TRANSACTION_STARTED_AT_KEY, None)
+    if started_at is not None:
+        metrics.DB_TRANSACTION_DURATION_SECONDS.labels(outcome).observe(time.perf_counter() - started_at)
+
+
+_STATEMENT_STARTED_AT_KEY = "statement_started_at"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if profiling.is_capturing():
+        conn.info.setdefault(_STATEMENT_STARTED_AT_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement_duration(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.get(_STATEMENT_STARTED_AT_KEY)
+    if started_at:
+        profiling.record_sql_statement(statement=statement, duration_seconds=time.perf_counter() - started_at.pop())
+
+
+_ACCOUNT_VERSION_COLUMN = Column("version", Integer, nullable=False)
+
+
 class BankAccount(SQLModel, table=True):
     __tablename__ = "bank_accounts"
+    # ORM updates are `UPDATE ... WHERE id = :id AND version = :read_version` (StaleDataError if no row matched)
+    __mapper_args__ = {"version_id_col": _ACCOUNT_VERSION_COLUMN}
 
     id: Optional[int] = Field(default=None, primary_key=True)
     organization_name: str = Field(nullable=False)
@@ -32,6 +414,19 @@ class BankAccount(SQLModel, table=True):
     bic: str = Field(nullable=False)
     balance_cents: int = Field(default=0, nullable=False)
     ongoing_transfer_cents: int = Field(default=0, nullable=False)
+    version: int = Field(default=1, sa_column=_ACCOUNT_VERSION_COLUMN)
+
+
+class Counterparty(SQLModel, table=True):
+    """
+    Dictionary of the counterparties: unique on (iban, bic, name), referenced by the transactions.
+    """
+    __tablename__ = "counterparties"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(nullable=False)
+    iban: str = Field(nullable=False)
+    bic: str = Field(nullable=False)
 
 
 class Transaction(SQLModel, table=True):
@@ -40,9 +435,9 @@ class Transaction(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     transfer_uuid: UUID = Field(default_factory=uuid4, index=True, unique=True)
     bulk_request_uuid: UUID
-    counterparty_name: str = Field(nullable=False)
-    counterparty_iban: str = Field(nullable=False)
-    counterparty_bic: str = Field(nullable=False)
+    counterparty_id: int = Field(foreign_key="counterparties.id", nullable=False)
+    # loaded in the same query as the transactions (many-to-one join)
+    counterparty: Optional[Counterparty] = Relationship(sa_relationship_kwargs={"lazy": "joined"})
     amount_cents: int = Field(nullable=False)
     amount_currency: str = Field(nullable=False)
     bank_account_id: int = Field(nullable=False)
@@ -56,11 +451,24 @@ class RequestStatus(str, Enum):
     """
     PENDING = "PENDING"
     COMPLETED = "COMPLETED"
+    # partial-success bulk request with both completed and failed transfers
+    PARTIALLY_COMPLETED = "PARTIALLY_COMPLETED"
     FAILED = "FAILED"
+    # cancelled by the customer before all its transfers were processed
+    CANCELLED = "CANCELLED"
+
+
+FINAL_REQUEST_STATUSES = (
+    RequestStatus.COMPLETED, RequestStatus.PARTIALLY_COMPLETED, RequestStatus.FAILED, RequestStatus.CANCELLED
+)
+
+
+_BULK_REQUEST_VERSION_COLUMN = Column("version", Integer, nullable=False)
 
 
 class BulkRequest(SQLModel, table=True):
     __tablename__ = "bulk_requests"
+    __mapper_args__ = {"version_id_col": _BULK_REQUEST_VERSION_COLUMN}
 
     id: Optional[int] = Field(default=None, primary_key=True)
     request_uuid: UUID = Field(default_factory=uuid4, index=True, unique=True)
@@ -68,6 +476,9 @@ class BulkRequest(SQLModel, table=True):
     status: RequestStatus = Field(default=RequestStatus.PENDING, nullable=False)
     total_amount_cents: int = Field(default=0, nullable=False)
     processed_amount_cents: int = Field(default=0, nullable=False)
+    # partial success: transfers are finalized one by one (see Transfer) instead of all or nothing
+    partial_success: bool = Field(default=False, nullable=False)
+    failed_amount_cents: int = Field(default=0, nullable=False)
     created_at: datetime.datetime = Field(
         default_factory=lambda: datetime.datetime.now(datetime.UTC),
         sa_column=Column(DateTime(timezone=True), nullable=False, server_default="CURRENT_TIMESTAMP")
@@ -76,6 +487,101 @@ class BulkRequest(SQLModel, table=True):
         default=None,
         sa_column=Column(DateTime(timezone=True), nullable=True)
     )
+    version: int = Field(default=1, sa_column=_BULK_REQUEST_VERSION_COLUMN)
+
+
+class Transfer(SQLModel, table=True):
+    """
+    Status of an individual transfer of a partial-success bulk request, with its details to retry it.
+    """
+    __tablename__ = "transfers"
+
+    transfer_uuid: UUID = Field(primary_key=True)
+    bulk_request_id: int = Field(nullable=False)
+    status: RequestStatus = Field(default=RequestStatus.PENDING, nullable=False)
+    attempts: int = Field(default=1, nullable=False)
+    counterparty_name: str = Field(nullable=False)
+    counterparty_iban: str = Field(nullable=False)
+    counterparty_bic: str = Field(nullable=False)
+    amount_cents: int = Field(nullable=False)
+    amount_currency: str = Field(nullable=False)
+    description: str = Field(nullable=False)
+    # in cents of the account currency, reserved and debited (amount_cents if None)
+    booked_amount_cents: Optional[int] = Field(default=None)
+
+
+class BulkManifest(SQLModel, table=True):
+    """
+    Validated credit transfers of a bulk request, stored once as a packed and compressed payload.
+    """
+    __tablename__ = "bulk_manifests"
+
+    bulk_request_id: int = Field(primary_key=True)
+    transfer_count: int = Field(nullable=False)
+    payload: bytes = Field(nullable=False)
+
+
+class BulkTemplate(SQLModel, table=True):
+    """
+    Validated credit transfers of a recurring bulk, stored once and executed as new bulk requests.
+    """
+    __tablename__ = "bulk_templates"
+
+    template_uuid: UUID = Field(primary_key=True)
+    bank_account_id: int = Field(nullable=False)
+    transfer_count: int = Field(nullable=False)
+    total_amount_cents: int = Field(nullable=False)
+    payload: bytes = Field(nullable=False)
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC),
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+
+class ScheduledBulkStatus(str, Enum):
+    SCHEDULED = "SCHEDULED"
+    # released as a bulk request on its execution date
+    RELEASED = "RELEASED"
+    # account unknown or balance insufficient on its execution date
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class ScheduledBulk(SQLModel, table=True):
+    """
+    Validated credit transfers of a bulk request to execute at a given date (UTC), packed as the bulk templates.
+    """
+    __tablename__ = "scheduled_bulks"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    request_uuid: UUID = Field(unique=True)
+    bank_account_id: int = Field(nullable=False)
+    execute_at: datetime.datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    status: ScheduledBulkStatus = Field(default=ScheduledBulkStatus.SCHEDULED, nullable=False)
+    partial_success: bool = Field(default=False, nullable=False)
+    transfer_count: int = Field(nullable=False)
+    total_amount_cents: int = Field(nullable=False)
+    payload: bytes = Field(nullable=False)
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC),
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+
+class FxRate(SQLModel, table=True):
+    """
+    FX rate of a currency to the account currency, see app.services.fx_rates.
+    """
+    __tablename__ = "fx_rates"
+
+    currency: str = Field(primary_key=True)
+    rate: str = Field(nullable=False)  # exact decimal
+    version: int = Field(nullable=False)
+    updated_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC),
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
 
 #--- Bank Account
 
@@ -95,9 +601,117 @@ def select_account_for_update_by_id(session: Session,bank_account_id: int) -> Op
     return session.exec(statement).first()
 
 
-def reserve_funds(session: Session, account: BankAccount, total_transfer_amounts: int):
-    account.ongoing_transfer_cents += total_transfer_amounts
-    session.add(account)
+def find_account_by_id(session: Session, bank_account_id: int) -> Optional[BankAccount]:
+    return session.get(BankAccount, bank_account_id)
+
+
+# Atomic counters: single `UPDATE ... RETURNING` statements computed by the database from the current row,
+# no SELECT (nor lock) of the row before, and the version is incremented so the concurrent
+# read-modify-write of the same row through the ORM fails (see run_transaction).
+
+
+def reserve_funds(session: Session, bank_account_id: int, amount_cents: int) -> bool:
+    """
+    Reserve the amount on the account if its balance covers it on top of the ongoing transfers
+    (check and reservation in the same statement).
+
+    Returns:
+        True if reserved, False if the balance is insufficient or the account unknown
+    """
+    statement = update(BankAccount).where(
+        BankAccount.id == bank_account_id,
+        BankAccount.ongoing_transfer_cents + amount_cents <= BankAccount.balance_cents
+    ).values(
+        ongoing_transfer_cents=BankAccount.ongoing_transfer_cents + amount_cents,
+        version=BankAccount.version + 1
+    ).returning(BankAccount.ongoing_transfer_cents)
+    return session.exec(statement).first() is not None
+
+
+def release_funds(session: Session, bank_account_id: int, released_cents: int, debited_cents: int = 0) -> bool:
+    """
+    Release a reserved amount from the ongoing transfers of the account, and debit the transferred amount
+    from its balance.
+
+    Returns:
+        False if the account is unknown
+    """
+    statement = update(BankAccount).where(BankAccount.id == bank_account_id).values(
+        ongoing_transfer_cents=BankAccount.ongoing_transfer_cents - released_cents,
+        balance_cents=BankAccount.balance_cents - debited_cents,
+        version=BankAccount.version + 1
+    ).returning(BankAccount.ongoing_transfer_cents)
+    return session.exec(statement).first() is not None
+
+
+#--- Counterparties
+
+
+CounterpartyKey = Tuple[str, str, str]  # (name, iban, bic)
+
+
+class CounterpartyIds:
+    """
+    LRU cache of the ids of the counterparties rows, so the transaction of a known counterparty
+    is inserted without looking up (nor upserting) its counterparty.
+    """
+
+    def __init__(self, max_size: int = INTERNED_COUNTERPARTIES_CACHE_SIZE):
+        self._max_size = max_size
+        self._ids: OrderedDict[CounterpartyKey, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CounterpartyKey) -> Optional[int]:
+        with self._lock:
+            counterparty_id = self._ids.get(key)
+            if counterparty_id is not None:
+                self._ids.move_to_end(key)
+            return counterparty_id
+
+    def put(self, key: CounterpartyKey, counterparty_id: int):
+        with self._lock:
+            self._ids[key] = counterparty_id
+            self._ids.move_to_end(key)
+            while len(self._ids) > self._max_size:
+                self._ids.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+COUNTERPARTY_IDS = CounterpartyIds()
+
+
+def intern_counterparty(session: Session, name: str, iban: str, bic: str) -> int:
+    """
+    Id of the counterparty, inserted if new: cached ids are used as is, otherwise one
+    `INSERT ... ON CONFLICT DO UPDATE ... RETURNING id` (no-op update) finds or creates the row.
+
+    The id is cached once the transaction is committed: the row of a rolled back insert does not exist.
+    """
+    key = (name, iban, bic)
+    counterparty_ids = COUNTERPARTY_IDS if _shards is None else _shards.counterparty_ids[session_shard_id(session)]
+    counterparty_id = counterparty_ids.get(key)
+    if counterparty_id is not None:
+        return counterparty_id
+
+    statement = (
+        sqlite_insert(Counterparty)
+        .values(name=name, iban=iban, bic=bic)
+        .on_conflict_do_update(index_elements=["iban", "bic", "name"], set_={"name": name})
+        .returning(Counterparty.id)
+    )
+    counterparty_id = session.exec(statement).scalar_one()
+    call_after_commit(
+        session,
+        lambda: counterparty_ids.put(key, counterparty_id),
+        key=("intern_counterparty", key)
+    )
+    return counterparty_id
 
 
 #--- Transactions
@@ -112,14 +726,18 @@ def find_transfer_transaction(session: Session, transfer_uuid: UUID) -> Optional
 def create_transfer_transaction(
         session: Session, transfer_job_data: TransferJob
 ) -> Transaction:
+    counterparty_id = intern_counterparty(
+        session=session,
+        name=transfer_job_data.counterparty_name,
+        iban=transfer_job_data.counterparty_iban,
+        bic=transfer_job_data.counterparty_bic
+    )
     transfer_transaction = Transaction(
         transfer_uuid=UUID(transfer_job_data.transfer_uuid),
         bulk_request_uuid=UUID(transfer_job_data.bulk_request_uuid),
-        counterparty_name=transfer_job_data.counterparty_name,
-        counterparty_iban=transfer_job_data.counterparty_iban,
-        counterparty_bic=transfer_job_data.counterparty_bic,
-        amount_cents=-transfer_job_data.amount_cents,
-        amount_currency=transfer_job_data.amount_currency,
+        counterparty_id=counterparty_id,
+        amount_cents=-transfer_job_data.booked_cents(),  # booked in the account currency
+        amount_currency=ACCOUNT_CURRENCY,
         bank_account_id=transfer_job_data.bank_account_id,
         description=transfer_job_data.description
     )
@@ -127,6 +745,65 @@ def create_transfer_transaction(
     return transfer_transaction
 
 
+def discard_transfer_transaction(session: Session, transfer_transaction: Transaction):
+    """
+    Remove the transaction of a failed transfer, so the transfer can be retried with the same transfer_uuid.
+    """
+    if transfer_transaction in session.new:  # not flushed yet
+        session.expunge(transfer_transaction)
+    else:
+        session.delete(transfer_transaction)
+
+
+def list_transactions(
+        session: Session,
+        bank_account_id: int,
+        after_id: Optional[int] = None,
+        limit: int = 100,
+        bulk_request_uuid: Optional[UUID] = None
+) -> List[Transaction]:
+    """
+    Keyset (seek) pagination on (bank_account_id, id): the page starts right after `after_id`
+    using the index, so the cost of a page does not depend on its position.
+    """
+    statement = select(Transaction).where(Transaction.bank_account_id == bank_account_id)
+    if bulk_request_uuid is not None:
+        statement = statement.where(Transaction.bulk_request_uuid == bulk_request_uuid)
+    if after_id is not None:
+        statement = statement.where(Transaction.id > after_id)
+    statement = statement.order_by(Transaction.id).limit(limit)
+    statement = cast(Select, statement)
+    return list(session.exec(statement).all())
+
+
+def iter_transactions(
+        session: Session,
+        bank_account_id: int,
+        bulk_request_uuid: Optional[UUID] = None,
+        chunk_size: int = 1000
+) -> Iterator[List[Transaction]]:
+    """
+    Iterate over all the transactions of an account in chunks of keyset-paginated short queries,
+    so memory is bounded by the chunk size and no read transaction is held between chunks.
+    """
+    after_id = None
+    while True:
+        transactions = list_transactions(
+            session=session,
+            bank_account_id=bank_account_id,
+            after_id=after_id,
+            limit=chunk_size,
+            bulk_request_uuid=bulk_request_uuid
+        )
+        if not transactions:
+            return
+        yield transactions
+        if len(transactions) < chunk_size:
+            return
+        after_id = transactions[-1].id
+        session.expunge_all()
+
+
 #--- Bulk Requests
 
 
@@ -137,13 +814,18 @@ def find_bulk_request(session: Session, bulk_request_uuid: UUID) -> Optional[Bul
 
 
 def create_bulk_request(
-        session: Session, bank_account_id: int, bulk_request_uuid: UUID, total_amounts_cents: int
+        session: Session,
+        bank_account_id: int,
+        bulk_request_uuid: UUID,
+        total_amounts_cents: int,
+        partial_success: bool = False
 ) -> BulkRequest:
     bulk_request = BulkRequest(
         request_uuid=bulk_request_uuid,
         bank_account_id=bank_account_id,
         total_amount_cents=total_amounts_cents,
         processed_amount_cents=0,
+        partial_success=partial_success,
         status=RequestStatus.PENDING,
         created_at=datetime.datetime.now(datetime.UTC)
     )
@@ -156,3 +838,286 @@ def select_bulk_request_for_update(session: Session, bulk_request_uuid: UUID):
     statement = cast(Select, statement)
     bulk_request = session.exec(statement).first()
     return bulk_request
+
+
+def add_bulk_request_progress(
+        session: Session,
+        bulk_request_uuid: UUID,
+        processed_amount_cents: int = 0,
+        failed_amount_cents: int = 0,
+        partial_success: Optional[bool] = None
+) -> Optional[BulkRequest]:
+    """
+    Add the amount of a completed (or failed) transfer to a bulk request that is not finalized yet, and finalize it
+    in the same statement when all its transfers are processed: COMPLETED, PARTIALLY_COMPLETED or FAILED
+    (no completed transfer). The statement that finalizes the bulk request is the only one to see it finalized.
+
+    Args:
+        partial_success: Only update a bulk request of this mode (any if None)
+
+    Returns:
+        Updated bulk request, None if unknown, already finalized or not of the `partial_success` mode
+    """
+    processed = BulkRequest.processed_amount_cents + processed_amount_cents
+    failed = BulkRequest.failed_amount_cents + failed_amount_cents
+    finalized = processed + failed >= BulkRequest.total_amount_cents
+    status_type = BulkRequest.__table__.c.status.type
+    final_status = case(
+        (failed == 0, literal(RequestStatus.COMPLETED, status_type)),
+        (processed == 0, literal(RequestStatus.FAILED, status_type)),
+        else_=literal(RequestStatus.PARTIALLY_COMPLETED, status_type)
+    )
+    statement = update(BulkRequest).where(
+        BulkRequest.request_uuid == bulk_request_uuid,
+        BulkRequest.status.not_in(FINAL_REQUEST_STATUSES)
+    )
+    if partial_success is not None:
+        statement = statement.where(BulkRequest.partial_success == partial_success)
+    statement = statement.values(
+        processed_amount_cents=processed,
+        failed_amount_cents=failed,
+        status=case((finalized, final_status), else_=BulkRequest.status),
+        completed_at=case((finalized, datetime.datetime.now(datetime.UTC)), else_=BulkRequest.completed_at),
+        version=BulkRequest.version + 1
+    ).returning(BulkRequest)
+    return session.exec(statement).scalars().first()
+
+
+def add_cancelled_bulk_request_progress(
+        session: Session, bulk_request_uuid: UUID, processed_amount_cents: int, partial_success: Optional[bool] = None
+) -> Optional[BulkRequest]:
+    """
+    Add the amount of a transfer completed after its bulk request was cancelled or failed (the status is unchanged).
+
+    Args:
+        partial_success: Only update a bulk request of this mode (any if None)
+
+    Returns:
+        Updated bulk request, None if unknown, neither cancelled nor failed, or not of the `partial_success` mode
+    """
+    statement = update(BulkRequest).where(
+        BulkRequest.request_uuid == bulk_request_uuid,
+        BulkRequest.status.in_((RequestStatus.CANCELLED, RequestStatus.FAILED))
+    )
+    if partial_success is not None:
+        statement = statement.where(BulkRequest.partial_success == partial_success)
+    statement = statement.values(
+        processed_amount_cents=BulkRequest.processed_amount_cents + processed_amount_cents,
+        version=BulkRequest.version + 1
+    ).returning(BulkRequest)
+    return session.exec(statement).scalars().first()
+
+
+#--- Transfers (partial-success bulk requests)
+
+
+def create_transfers(session: Session, transfers: List[dict]):
+    """
+    Insert the transfers of a bulk request in a single executemany statement.
+    """
+    if transfers:
+        session.exec(insert(Transfer), params=transfers)
+
+
+def list_transfers(session: Session, bulk_request_id: int, status: RequestStatus) -> List[Transfer]:
+    statement = select(Transfer).where(Transfer.bulk_request_id == bulk_request_id, Transfer.status == status)
+    statement = cast(Select, statement)
+    return list(session.exec(statement).all())
+
+
+def update_transfer_status(
+        session: Session, transfer_uuid: UUID, from_status: RequestStatus, to_status: RequestStatus
+) -> bool:
+    """
+    Compare-and-set of the status of a transfer, so a transfer outcome is applied once.
+
+    Returns:
+        True if the transfer was in `from_status` and is now in `to_status`
+    """
+    statement = update(Transfer).where(
+        Transfer.transfer_uuid == transfer_uuid, Transfer.status == from_status
+    ).values(status=to_status)
+    return session.exec(statement).rowcount == 1
+
+
+def cancel_pending_transfers(session: Session, bulk_request_id: int):
+    """
+    Set the PENDING transfers of a cancelled bulk request to CANCELLED: their late outcomes are ignored.
+    """
+    statement = update(Transfer).where(
+        Transfer.bulk_request_id == bulk_request_id, Transfer.status == RequestStatus.PENDING
+    ).values(status=RequestStatus.CANCELLED)
+    session.exec(statement)
+
+
+def retry_transfers(session: Session, bulk_request_id: int, transfer_uuids: List[UUID]):
+    """
+    Set the given failed transfers back to PENDING for a new attempt.
+    """
+    statement = update(Transfer).where(
+        Transfer.bulk_request_id == bulk_request_id,
+        Transfer.status == RequestStatus.FAILED,
+        Transfer.transfer_uuid.in_(transfer_uuids)
+    ).values(status=RequestStatus.PENDING, attempts=Transfer.attempts + 1)
+    session.exec(statement)
+
+
+#--- Bulk Manifests
+
+
+def create_bulk_manifest(session: Session, bulk_request_id: int, transfer_count: int, payload: bytes) -> BulkManifest:
+    bulk_manifest = BulkManifest(bulk_request_id=bulk_request_id, transfer_count=transfer_count, payload=payload)
+    session.add(bulk_manifest)
+    return bulk_manifest
+
+
+def find_bulk_manifest(session: Session, bulk_request_id: int) -> Optional[BulkManifest]:
+    return session.get(BulkManifest, bulk_request_id)
+
+
+#--- Bulk Templates
+
+
+def create_bulk_template(
+        session: Session,
+        template_uuid: UUID,
+        bank_account_id: int,
+        transfer_count: int,
+        total_amount_cents: int,
+        payload: bytes
+) -> BulkTemplate:
+    bulk_template = BulkTemplate(
+        template_uuid=template_uuid,
+        bank_account_id=bank_account_id,
+        transfer_count=transfer_count,
+        total_amount_cents=total_amount_cents,
+        payload=payload
+    )
+    session.add(bulk_template)
+    return bulk_template
+
+
+def find_bulk_template(session: Session, template_uuid: UUID) -> Optional[BulkTemplate]:
+    return session.get(BulkTemplate, template_uuid)
+
+
+#--- Scheduled Bulks
+
+
+def create_scheduled_bulk(
+        session: Session,
+        request_uuid: UUID,
+        bank_account_id: int,
+        execute_at: datetime.datetime,
+        partial_success: bool,
+        transfer_count: int,
+        total_amount_cents: int,
+        payload: bytes
+) -> ScheduledBulk:
+    """
+    Args:
+        execute_at: naive UTC datetime (SQLite stores the datetimes without their timezone)
+    """
+    scheduled_bulk = ScheduledBulk(
+        request_uuid=request_uuid,
+        bank_account_id=bank_account_id,
+        execute_at=execute_at,
+        partial_success=partial_success,
+        transfer_count=transfer_count,
+        total_amount_cents=total_amount_cents,
+        payload=payload
+    )
+    session.add(scheduled_bulk)
+    return scheduled_bulk
+
+
+def find_scheduled_bulk(session: Session, request_uuid: UUID) -> Optional[ScheduledBulk]:
+    statement = select(ScheduledBulk).where(ScheduledBulk.request_uuid == request_uuid)
+    statement = cast(Select, statement)
+    return session.exec(statement).first()
+
+
+def list_next_scheduled_bulks(
+        session: Session,
+        after: Optional[Tuple[datetime.datetime, int]],
+        limit: int
+) -> List[Tuple[datetime.datetime, int]]:
+    """
+    (execute_at, id) of the next scheduled bulks in execution order, after the `after` key if any
+    (keyset pagination over the `scheduled_bulks_status_execute_at_idx` index).
+    """
+    statement = select(ScheduledBulk.execute_at, ScheduledBulk.id).where(
+        ScheduledBulk.status == ScheduledBulkStatus.SCHEDULED
+    )
+    if after is not None:
+        statement = statement.where(tuple_(ScheduledBulk.execute_at, ScheduledBulk.id) > tuple_(*after))
+    statement = statement.order_by(ScheduledBulk.execute_at, ScheduledBulk.id).limit(limit)
+    return [(execute_at, scheduled_bulk_id) for execute_at, scheduled_bulk_id in session.exec(statement)]
+
+
+def claim_scheduled_bulks(session: Session, scheduled_bulk_ids: List[int]) -> List[ScheduledBulk]:
+    """
+    Mark the scheduled bulks as RELEASED, the ones released or cancelled meanwhile are skipped
+    (check and update in the same statement).
+    """
+    statement = update(ScheduledBulk).where(
+        ScheduledBulk.id.in_(scheduled_bulk_ids),
+        ScheduledBulk.status == ScheduledBulkStatus.SCHEDULED
+    ).values(status=ScheduledBulkStatus.RELEASED).returning(ScheduledBulk)
+    return sorted(
+        session.exec(statement).scalars(), key=lambda scheduled_bulk: (scheduled_bulk.execute_at, scheduled_bulk.id)
+    )
+
+
+def update_scheduled_bulk_status(
+        session: Session,
+        request_uuid: UUID,
+        status: ScheduledBulkStatus,
+        from_status: ScheduledBulkStatus
+) -> bool:
+    """
+    Returns:
+        False if the scheduled bulk is unknown or its status is not `from_status`
+    """
+    statement = update(ScheduledBulk).where(
+        ScheduledBulk.request_uuid == request_uuid,
+        ScheduledBulk.status == from_status
+    ).values(status=status).returning(ScheduledBulk.id)
+    return session.exec(statement).first() is not None
+
+
+#--- FX Rates
+
+
+def fx_rates_version(session: Session) -> int:
+    return session.exec(select(func.max(FxRate.version))).one() or 0
+
+
+def load_fx_rates(session: Session) -> Tuple[int, Dict[str, decimal.Decimal]]:
+    """
+    Returns:
+        Version of the FX rates table and the rate of each currency, read in the same transaction
+    """
+    rows = session.exec(select(FxRate.currency, FxRate.rate, FxRate.version)).all()
+    version = max((row_version for _, _, row_version in rows), default=0)
+    return version, {currency: decimal.Decimal(rate) for currency, rate, _ in rows}
+
+
+def update_fx_rates(session: Session, rates: Dict[str, decimal.Decimal]) -> int:
+    """
+    Insert or update the rates of the currencies as a new version of the table.
+
+    Returns:
+        New version of the FX rates table
+    """
+    version = fx_rates_version(session=session) + 1
+    updated_at = datetime.datetime.now(datetime.UTC)
+    statement = sqlite_insert(FxRate).values([
+        {"currency": currency, "rate": str(rate), "version": version, "updated_at": updated_at}
+        for currency, rate in rates.items()
+    ])
+    session.exec(statement.on_conflict_do_update(
+        index_elements=[FxRate.currency],
+        set_={"rate": statement.excluded.rate, "version": version, "updated_at": updated_at}
+    ))
+    return version
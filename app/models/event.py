@@ -0,0 +1,21 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+FINAL_BULK_STATUSES = ("COMPLETED", "PARTIALLY_COMPLETED", "FAILED", "CANCELLED")
+
+
+class BulkProgressEvent(BaseModel):
+    bulk_request_uuid: str
+    bank_account_id: int
+    status: str
+    total_amount_cents: int
+    processed_amount_cents: int
+    failed_amount_cents: int = 0
+    completed_at: Optional[str] = None
+
+    def is_final(self) -> bool:
+        return self.status in FINAL_BULK_STATUSES
+
+    def to_sse(self) -> str:
+        return f"event: bulk-progress\ndata: {self.model_dump_json()}\n\n"
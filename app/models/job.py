@@ -1,6 +1,16 @@
-from pydantic import BaseModel
+import sys
+import time
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
 
 from app.models.adapter import CreditTransfer
+from app.utils.tracing import TraceContext, trace_context
+
+
+TRACE_ID_PATTERN = r"^[0-9a-f]{32}$"
+SPAN_ID_PATTERN = r"^[0-9a-f]{16}$"
 
 
 class TransferJob(BaseModel):
@@ -10,13 +20,30 @@ class TransferJob(BaseModel):
     counterparty_name: str
     counterparty_iban: str
     counterparty_bic: str
-    amount_cents: int
+    amount_cents: int  # paid to the counterparty, in minor units of amount_currency
     amount_currency: str
     description: str
+    # amount in cents of the account currency, reserved, debited and booked (amount_cents if None)
+    booked_amount_cents: Optional[int] = None
+    # trace context: trace of the bulk request and span that queued the job (see app.utils.tracing)
+    trace_id: Optional[str] = Field(default=None, pattern=TRACE_ID_PATTERN)
+    parent_span_id: Optional[str] = Field(default=None, pattern=SPAN_ID_PATTERN)
+
+    def trace_context(self) -> Optional[TraceContext]:
+        return trace_context(trace_id=self.trace_id, span_id=self.parent_span_id)
+
+    def booked_cents(self) -> int:
+        return self.amount_cents if self.booked_amount_cents is None else self.booked_amount_cents
 
 
 def build_transfer_job(
-        bulk_request_uuid: str, transfer_uuid: str, bank_account_id: int, credit_transfer: CreditTransfer
+        bulk_request_uuid: str,
+        transfer_uuid: str,
+        bank_account_id: int,
+        credit_transfer: CreditTransfer,
+        amount_cents: Optional[int] = None,
+        booked_amount_cents: Optional[int] = None,
+        parent_trace_context: Optional[TraceContext] = None
 ) -> TransferJob:
     return TransferJob(
         transfer_uuid=transfer_uuid,
@@ -25,9 +52,12 @@ def build_transfer_job(
         counterparty_name=credit_transfer.counterparty_name,
         counterparty_iban=credit_transfer.counterparty_iban,
         counterparty_bic=credit_transfer.counterparty_bic,
-        amount_cents=credit_transfer.amount_to_cents(),
+        amount_cents=amount_cents if amount_cents is not None else credit_transfer.amount_to_cents(),
         amount_currency=credit_transfer.currency,
-        description=credit_transfer.description
+        description=credit_transfer.description,
+        booked_amount_cents=booked_amount_cents,
+        trace_id=parent_trace_context.trace_id if parent_trace_context else None,
+        parent_span_id=parent_trace_context.span_id if parent_trace_context else None
     )
 
 
@@ -36,3 +66,181 @@ class BulkJob(BaseModel):
     bank_account_id: int
     single_transferred_amount_cents: int
     success: bool
+    # transfer of the outcome, to update its status in partial-success bulk requests
+    transfer_uuid: Optional[str] = None
+    trace_id: Optional[str] = Field(default=None, pattern=TRACE_ID_PATTERN)
+    parent_span_id: Optional[str] = Field(default=None, pattern=SPAN_ID_PATTERN)
+
+    def trace_context(self) -> Optional[TraceContext]:
+        return trace_context(trace_id=self.trace_id, span_id=self.parent_span_id)
+
+
+class ManifestJob(BaseModel):
+    """
+    Queue all the transfers of a bulk manifest: one (bulk_request_id, index) reference per transfer.
+    """
+    bulk_request_id: int
+    transfer_count: int
+
+
+class PurgeBulkJob(BaseModel):
+    """
+    Drop the queued jobs of a cancelled bulk request (by uuid, or by id for the bulk manifest references).
+    """
+    bulk_request_uuid: str
+    bulk_request_id: int
+
+
+class QueuedTransferJob:
+    """
+    Compact in-queue representation of a TransferJob, materialized back only when consumed.
+
+    Both UUIDs are packed as 32 raw bytes instead of two 36-char strings, and the strings
+    repeated across jobs (counterparty, currency, description) are interned, so thousands of jobs
+    to the same payroll recipients share them.
+
+    `enqueued_at` (time.monotonic) is used to measure the time spent in queue,
+    and the trace context is packed as 24 raw bytes.
+    """
+    __slots__ = (
+        "uuids", "bank_account_id", "counterparty_name", "counterparty_iban", "counterparty_bic",
+        "amount_cents", "amount_currency", "description", "enqueued_at", "trace_context_bytes", "booked_amount_cents"
+    )
+
+    def __init__(
+            self, uuids: bytes, bank_account_id: int, counterparty_name: str, counterparty_iban: str,
+            counterparty_bic: str, amount_cents: int, amount_currency: str, description: str,
+            enqueued_at: Optional[float] = None, trace_context_bytes: Optional[bytes] = None,
+            booked_amount_cents: Optional[int] = None
+    ):
+        self.uuids = uuids
+        self.bank_account_id = bank_account_id
+        self.counterparty_name = counterparty_name
+        self.counterparty_iban = counterparty_iban
+        self.counterparty_bic = counterparty_bic
+        self.amount_cents = amount_cents
+        self.amount_currency = amount_currency
+        self.description = description
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.monotonic()
+        self.trace_context_bytes = trace_context_bytes
+        self.booked_amount_cents = booked_amount_cents
+
+    @classmethod
+    def from_transfer_job(cls, transfer_job: TransferJob) -> "QueuedTransferJob":
+        """
+        Raises:
+            ValueError: if transfer_uuid or bulk_request_uuid is not a UUID
+        """
+        return cls(
+            uuids=UUID(transfer_job.transfer_uuid).bytes + UUID(transfer_job.bulk_request_uuid).bytes,
+            bank_account_id=transfer_job.bank_account_id,
+            counterparty_name=sys.intern(transfer_job.counterparty_name),
+            counterparty_iban=sys.intern(transfer_job.counterparty_iban),
+            counterparty_bic=sys.intern(transfer_job.counterparty_bic),
+            amount_cents=transfer_job.amount_cents,
+            amount_currency=sys.intern(transfer_job.amount_currency),
+            description=sys.intern(transfer_job.description),
+            trace_context_bytes=_pack_trace_context(transfer_job.trace_context()),
+            booked_amount_cents=transfer_job.booked_amount_cents
+        )
+
+    @property
+    def transfer_uuid(self) -> str:
+        return str(UUID(bytes=self.uuids[:16]))
+
+    @property
+    def bulk_request_uuid(self) -> str:
+        return str(UUID(bytes=self.uuids[16:]))
+
+    def to_transfer_job(self) -> TransferJob:
+        # fields were validated when queued
+        parent_trace_context = _unpack_trace_context(self.trace_context_bytes)
+        return TransferJob.model_construct(
+            transfer_uuid=self.transfer_uuid,
+            bulk_request_uuid=self.bulk_request_uuid,
+            bank_account_id=self.bank_account_id,
+            counterparty_name=self.counterparty_name,
+            counterparty_iban=self.counterparty_iban,
+            counterparty_bic=self.counterparty_bic,
+            amount_cents=self.amount_cents,
+            amount_currency=self.amount_currency,
+            description=self.description,
+            booked_amount_cents=self.booked_amount_cents,
+            trace_id=parent_trace_context.trace_id if parent_trace_context else None,
+            parent_span_id=parent_trace_context.span_id if parent_trace_context else None
+        )
+
+
+class QueuedManifestTransfer:
+    """
+    In-queue reference to the transfer at `index` in the manifest of a bulk request,
+    resolved to a TransferJob when consumed (see app.services.bulk_manifest).
+    """
+    __slots__ = ("bulk_request_id", "index", "enqueued_at")
+
+    def __init__(self, bulk_request_id: int, index: int, enqueued_at: Optional[float] = None):
+        self.bulk_request_id = bulk_request_id
+        self.index = index
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.monotonic()
+
+
+class QueuedBulkJob:
+    """
+    Compact in-queue representation of a BulkJob.
+    """
+    __slots__ = (
+        "bulk_request_uuid_bytes", "bank_account_id", "single_transferred_amount_cents", "success", "enqueued_at",
+        "trace_context_bytes", "transfer_uuid_bytes"
+    )
+
+    def __init__(
+            self, bulk_request_uuid_bytes: bytes, bank_account_id: int, single_transferred_amount_cents: int,
+            success: bool, enqueued_at: Optional[float] = None, trace_context_bytes: Optional[bytes] = None,
+            transfer_uuid_bytes: Optional[bytes] = None
+    ):
+        self.bulk_request_uuid_bytes = bulk_request_uuid_bytes
+        self.bank_account_id = bank_account_id
+        self.single_transferred_amount_cents = single_transferred_amount_cents
+        self.success = success
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.monotonic()
+        self.trace_context_bytes = trace_context_bytes
+        self.transfer_uuid_bytes = transfer_uuid_bytes
+
+    @classmethod
+    def from_bulk_job(cls, bulk_job: BulkJob) -> "QueuedBulkJob":
+        """
+        Raises:
+            ValueError: if bulk_request_uuid or transfer_uuid is not a UUID
+        """
+        return cls(
+            bulk_request_uuid_bytes=UUID(bulk_job.bulk_request_uuid).bytes,
+            bank_account_id=bulk_job.bank_account_id,
+            single_transferred_amount_cents=bulk_job.single_transferred_amount_cents,
+            success=bulk_job.success,
+            trace_context_bytes=_pack_trace_context(bulk_job.trace_context()),
+            transfer_uuid_bytes=UUID(bulk_job.transfer_uuid).bytes if bulk_job.transfer_uuid else None
+        )
+
+    @property
+    def bulk_request_uuid(self) -> str:
+        return str(UUID(bytes=self.bulk_request_uuid_bytes))
+
+    def to_bulk_job(self) -> BulkJob:
+        parent_trace_context = _unpack_trace_context(self.trace_context_bytes)
+        return BulkJob.model_construct(
+            bulk_request_uuid=self.bulk_request_uuid,
+            bank_account_id=self.bank_account_id,
+            single_transferred_amount_cents=self.single_transferred_amount_cents,
+            success=self.success,
+            transfer_uuid=str(UUID(bytes=self.transfer_uuid_bytes)) if self.transfer_uuid_bytes else None,
+            trace_id=parent_trace_context.trace_id if parent_trace_context else None,
+            parent_span_id=parent_trace_context.span_id if parent_trace_context else None
+        )
+
+
+def _pack_trace_context(context: Optional[TraceContext]) -> Optional[bytes]:
+    return context.to_bytes() if context else None
+
+
+def _unpack_trace_context(data: Optional[bytes]) -> Optional[TraceContext]:
+    return TraceContext.from_bytes(data) if data else None
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Iterator, List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, status, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.models import db
+from app.models.db import get_session
+from app.utils.log_formatter import get_logger
+
+
+MAX_TRANSACTIONS_PER_PAGE = 1000
+EXPORT_CHUNK_SIZE = 1000
+
+TRANSACTION_EXPORT_FIELDS = [
+    "id", "transfer_uuid", "bulk_request_uuid", "counterparty_name", "counterparty_iban", "counterparty_bic",
+    "amount_cents", "amount_currency", "description"
+]
+
+
+logger = get_logger(__name__)
+
+
+router = APIRouter()
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+@router.get("/{bank_account_id}/transactions", status_code=status.HTTP_200_OK)
+def list_account_transactions(
+        bank_account_id: int,
+        after_id: Optional[int] = Query(default=None, ge=0, description="Cursor: `next_cursor` of the previous page"),
+        limit: int = Query(default=100, ge=1, le=MAX_TRANSACTIONS_PER_PAGE),
+        bulk_request_uuid: Optional[UUID] = None,
+        session: Session = Depends(get_session)
+):
+    """
+    List the transactions of an account, ordered by id, using keyset pagination.
+
+    Pass the returned `next_cursor` as `after_id` to get the next page (null when there is no next page).
+    """
+    _ensure_account_exists(session=session, bank_account_id=bank_account_id)
+    transactions = db.list_transactions(
+        session=session,
+        bank_account_id=bank_account_id,
+        after_id=after_id,
+        limit=limit + 1,  # one more to know whether there is a next page
+        bulk_request_uuid=bulk_request_uuid
+    )
+    page = transactions[:limit]
+    return {
+        "items": [_transaction_to_dict(transaction) for transaction in page],
+        "next_cursor": page[-1].id if len(transactions) > limit else None
+    }
+
+
+@router.get("/{bank_account_id}/transactions/export", response_class=StreamingResponse)
+def export_account_transactions(
+        bank_account_id: int,
+        export_format: ExportFormat = Query(default=ExportFormat.CSV, alias="format"),
+        bulk_request_uuid: Optional[UUID] = None,
+        session: Session = Depends(get_session)
+):
+    """
+    Export all the transactions of an account as a CSV or NDJSON stream.
+
+    Rows are read and written by chunks, so memory usage does not depend on the number of transactions.
+    """
+    _ensure_account_exists(session=session, bank_account_id=bank_account_id)
+    logger.info(f"account_id={bank_account_id} export transactions format={export_format.value}")
+
+    media_type = "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(
+            bank_account_id=bank_account_id, export_format=export_format, bulk_request_uuid=bulk_request_uuid
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="transactions-{bank_account_id}.{export_format.value}"'
+        }
+    )
+
+
+def _ensure_account_exists(session: Session, bank_account_id: int):
+    db.route_session_to_id(session=session, row_id=bank_account_id)
+    if not db.find_account_by_id(session=session, bank_account_id=bank_account_id):
+        raise HTTPException(status_code=404, detail=f"Account {bank_account_id} not found")
+
+
+def _transaction_to_dict(transaction: db.Transaction) -> dict:
+    return {
+        "id": transaction.id,
+        "transfer_uuid": str(transaction.transfer_uuid),
+        "bulk_request_uuid": str(transaction.bulk_request_uuid) if transaction.bulk_request_uuid else None,
+        "counterparty_name": transaction.counterparty.name,
+        "counterparty_iban": transaction.counterparty.iban,
+        "counterparty_bic": transaction.counterparty.bic,
+        "amount_cents": transaction.amount_cents,
+        "amount_currency": transaction.amount_currency,
+        "description": transaction.description
+    }
+
+
+def _export_rows(bank_account_id: int, export_format: ExportFormat, bulk_request_uuid: Optional[UUID]) -> Iterator[str]:
+    # the request session may be closed while streaming: the export uses its own session
+    with db.session_for_id(bank_account_id) as session:
+        if export_format == ExportFormat.CSV:
+            yield ",".join(TRANSACTION_EXPORT_FIELDS) + "\r\n"
+        for transactions in db.iter_transactions(
+                session=session,
+                bank_account_id=bank_account_id,
+                bulk_request_uuid=bulk_request_uuid,
+                chunk_size=EXPORT_CHUNK_SIZE
+        ):
+            rows = [_transaction_to_dict(transaction) for transaction in transactions]
+            yield _to_csv(rows) if export_format == ExportFormat.CSV else _to_ndjson(rows)
+
+
+def _to_csv(rows: List[dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=TRANSACTION_EXPORT_FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _to_ndjson(rows: List[dict]) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
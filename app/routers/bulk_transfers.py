@@ -1,18 +1,29 @@
-from fastapi import APIRouter, status, Depends
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi import APIRouter, status, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional, Tuple, Union
 from uuid import UUID
 from sqlmodel import Session
 
-from app.amounts.converters import to_cents
+from app.amounts.converters import to_minor_units
+from app.amounts.currencies import UnsupportedCurrencyError
 from app.models import adapter
 from app.models import db
 from app.models.db import get_session
-from app.services import bulk_request_service
+from app.services import (
+    bulk_progress, bulk_request_service, bulk_scheduler, bulk_templates, counterparty_validation, fx_rates
+)
+from app.utils import metrics, profiling, request_body, tracing
+from app.utils.locks import ACCOUNT_LOCKS
 from app.utils.log_formatter import get_logger
+from app.utils.responses import FastJSONResponse, ResponseShape, StaticBody
 
 
 MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST = 1000
+MAX_REPORTED_INVALID_COUNTERPARTIES = 10
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 logger = get_logger(__name__)
@@ -21,78 +32,685 @@ logger = get_logger(__name__)
 router = APIRouter()  # https://fastapi.tiangolo.com/reference/apirouter
 
 
+# the endpoints return their bodies rendered by these serializers, their `response_model` documents them
+_SUCCESS_RESPONSE = ResponseShape(adapter.BulkTransferSuccessResponse)
+_SCHEDULED_RESPONSE = ResponseShape(adapter.BulkTransferScheduledResponse)
+_RETRY_SUCCESS_RESPONSE = ResponseShape(adapter.BulkTransferRetrySuccessResponse)
+_TEMPLATE_SUCCESS_RESPONSE = ResponseShape(adapter.BulkTemplateSuccessResponse)
+_ERROR_RESPONSE = ResponseShape(adapter.BulkTransferErrorResponse)
+
+# details of the errors replied when the caller gives none: their bodies are rendered once per reason
+_STATIC_ERROR_DETAILS = {
+    'insufficient-account-balance': "Not enough funds",
+    'negative-or-null-amounts': "All amounts should be strictly greater than zero",
+    'invalid-amount': "All amounts should be numbers within the decimal places of their currency",
+    'unsupported-currency': "All currencies should be ISO 4217 currencies with a FX rate",
+    'unknown-account': "Your account should be active",
+    'too-many-transfers': f"Too many transfers requested (max={MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST})",
+    'invalid-request-id': "Invalid bulk request uuid",
+    'not-partial-success': "Only the partial-success bulk requests can be retried",
+    'bulk-request-in-progress': "The bulk request transfers are still being processed",
+    'concurrent-update': "The account was updated concurrently, please retry",
+    'no-failed-transfers': "The bulk request has no failed transfers",
+    'invalid-template-id': "Invalid bulk template uuid",
+    'transfers-not-queued': "The transfers could not be queued: the bulk request failed and its funds were released",
+}
+_STATIC_ERROR_BODIES = {
+    reason: StaticBody(
+        _ERROR_RESPONSE, message="Bulk transfer denied", error={"reason": reason, "details": error_details}
+    )
+    for reason, error_details in _STATIC_ERROR_DETAILS.items()
+}
+
+
+# the body of POST /transfers/bulk is decoded by `_bulk_transfer_request`: documented explicitly
+_BULK_TRANSFER_REQUEST_SCHEMA = adapter.BulkTransferRequest.model_json_schema(
+    ref_template="#/components/schemas/{model}"
+)
+_BULK_TRANSFER_REQUEST_SCHEMA.pop("$defs", None)  # CreditTransfer is a component (body of the templates)
+
+
+async def _bulk_transfer_request(request: Request) -> adapter.BulkTransferRequest:
+    """
+    Body of a bulk transfer request: JSON or MessagePack (`Content-Type`), optionally compressed
+    with gzip or zstd (`Content-Encoding`), decoded while it is received within size limits.
+    """
+    try:
+        body = await request_body.read_body(request)
+        return request_body.validate_body(
+            model=adapter.BulkTransferRequest, body=body, content_type=request.headers.get("content-type", "")
+        )
+    except request_body.RequestBodyError as e:
+        logger.error(f"Could not decode bulk transfer request body: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ValidationError as e:
+        raise RequestValidationError(
+            errors=[{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
 @router.post(
     "/bulk",
     status_code=status.HTTP_201_CREATED,
-    response_model=adapter.BulkTransferSuccessResponse,
+    response_model=Union[adapter.BulkTransferScheduledResponse, adapter.BulkTransferSuccessResponse],
     responses={
         400: {"model": adapter.BulkTransferErrorResponse, "description": "Bad Request"},
         404: {"model": adapter.BulkTransferErrorResponse, "description": "Organization or Account not found"},
+        413: {"description": "Request body too large"},
+        415: {"description": "Unsupported Content-Type or Content-Encoding"},
         422: {"model": adapter.BulkTransferErrorResponse, "description": "Bulk transfer denied"},
-    }
+        503: {"model": adapter.BulkTransferErrorResponse, "description": "Transfers could not be queued"},
+    },
+    openapi_extra={"requestBody": {"required": True, "content": {
+        media_type: {"schema": _BULK_TRANSFER_REQUEST_SCHEMA}
+        for media_type in (request_body.JSON_MEDIA_TYPE, request_body.MSGPACK_MEDIA_TYPES[0])
+    }}}
 )
-def create_bulk_transfer(request: adapter.BulkTransferRequest, session: Session = Depends(get_session)):
+@profiling.profiled("create_bulk_transfer")
+def create_bulk_transfer(
+        request: adapter.BulkTransferRequest = Depends(_bulk_transfer_request),
+        session: Session = Depends(get_session),
+        traceparent: Optional[str] = Header(default=None, alias=tracing.TRACEPARENT_HEADER)
+):
     """
     Create a bulk transfer request for multiple credit transfers.
 
     Accepts up to 1000 individual credit transfers and processes them asynchronously.
     Validates account balance, reserves funds, and queues individual transfers for processing.
 
+    The body is JSON or MessagePack (`Content-Type: application/msgpack`), and can be compressed
+    (`Content-Encoding: gzip` or `zstd`).
+
+    With a future `execute_at`, the validated bulk is stored and executed at that date (the funds are reserved
+    and the transfers queued then, a bulk whose balance is insufficient on that date is not executed).
+
     Note:
     - Individual transfer job queues a bulk request job when done to finalize the bulk transfer.
     - You can use internal endpoints to process queued jobs:
         - GET /internal/jobs/transfer (process individual transfers)
         - GET /internal/jobs/bulk (finalize bulk requests)
+    - The spans of the bulk request (see app.utils.tracing) are children of the W3C `traceparent` header if any.
     """
+    with tracing.start_span(
+            "POST /transfers/bulk",
+            parent=tracing.TraceContext.from_traceparent(traceparent),
+            attributes={"bulk_request_uuid": request.request_id, "transfer_count": len(request.credit_transfers)}
+    ):
+        return _committed_response(
+            session=session, bulk_id=request.request_id,
+            response=_create_bulk_transfer(request=request, session=session)
+        )
+
+
+def _create_bulk_transfer(request: adapter.BulkTransferRequest, session: Session):
     if not _validate_request_id(request_id=request.request_id):
         return reply_invalid_request_id_error(bulk_id=request.request_id)
 
     bulk_id = UUID(request.request_id)
+    if not db.route_session_to_account(session=session, bic=request.organization_bic, iban=request.organization_iban):
+        logger.error(f"bulk_id={bulk_id} could not process request as account unknown")
+        return reply_unknown_account_error(bulk_id=bulk_id)
+    execute_at = bulk_scheduler.scheduled_execution_date(execute_at=request.execute_at)
     with session.begin():
-        already_processed_bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=bulk_id)
-        if already_processed_bulk_request:
+        if _is_already_processed(session=session, bulk_id=bulk_id):
             return reply_request_already_processed_error(bulk_id=bulk_id)
 
-        if len(request.credit_transfers) > MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST:
-            return reply_too_many_transfers_error(bulk_id=bulk_id)
+        with metrics.STAGE_DURATION_SECONDS.labels("validation").time():
+            amounts, error_response = _validate_credit_transfers(
+                bulk_id=bulk_id, credit_transfers=request.credit_transfers
+            )
+            if error_response:
+                return error_response
+            converted_bulk, error_response = _to_account_currency(
+                bulk_id=bulk_id, credit_transfers=request.credit_transfers, amounts=amounts
+            )
+            if error_response:
+                return error_response
+            credit_transfers, amounts_in_cents = request.credit_transfers, converted_bulk.amounts_in_cents
+
+        with metrics.STAGE_DURATION_SECONDS.labels("account_lock_wait").time():
+            account = db.select_account_for_update(
+                session=session, bic=request.organization_bic, iban=request.organization_iban
+            )
+        if not account:
+            logger.error(f"bulk_id={bulk_id} could not process request as account unknown")
+            return reply_unknown_account_error(bulk_id=bulk_id)
+
+        if execute_at is not None:
+            bulk_scheduler.schedule_bulk(
+                session=session,
+                bulk_request_uuid=bulk_id,
+                bank_account_id=account.id,
+                execute_at=execute_at,
+                credit_transfers=credit_transfers,
+                amounts=amounts,
+                amounts_in_cents=amounts_in_cents,
+                partial_success=request.partial_success
+            )
+        else:
+            error_response = _schedule_bulk_transfer(
+                session=session,
+                bulk_id=bulk_id,
+                account=account,
+                credit_transfers=credit_transfers,
+                amounts=amounts,
+                amounts_in_cents=amounts_in_cents,
+                total_transfer_amounts_cents=sum(amounts_in_cents),
+                partial_success=request.partial_success
+            )
+            if error_response:
+                return error_response
+
+    if execute_at is not None:
+        logger.info(f"bulk_id={bulk_id} scheduled at {execute_at.isoformat()}")
+        return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=_SCHEDULED_RESPONSE.render(
+            bulk_id=str(bulk_id), message="Bulk transfer scheduled", execute_at=execute_at
+        ))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=_SUCCESS_RESPONSE.render(
+        bulk_id=str(bulk_id), message="Bulk transfer accepted"
+    ))
+
+
+def _is_already_processed(session: Session, bulk_id: UUID) -> bool:
+    """
+    Bulk request already created, or scheduled to be created at a later date.
+    """
+    return (db.find_bulk_request(session=session, bulk_request_uuid=bulk_id) is not None
+            or db.find_scheduled_bulk(session=session, request_uuid=bulk_id) is not None)
+
+
+def _validate_credit_transfers(
+        bulk_id: UUID, credit_transfers: List[adapter.CreditTransfer]
+) -> Tuple[List[int], Optional[JSONResponse]]:
+    """
+    Returns:
+        Amounts of the credit transfers in minor units of their currency (ISO 4217), and the error response
+        if the credit transfers are invalid
+    """
+    if len(credit_transfers) > MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST:
+        return [], reply_too_many_transfers_error(bulk_id=bulk_id)
+
+    try:
+        amounts = [
+            to_minor_units(amount_str=credit_transfer.amount, currency=credit_transfer.currency)
+            for credit_transfer in credit_transfers
+        ]
+    except UnsupportedCurrencyError as e:
+        logger.error(f"bulk_id={bulk_id} could not process request: {e}")
+        return [], reply_unsupported_currency_error(bulk_id=bulk_id, error_details=str(e))
+    except ValueError as e:
+        logger.error(f"bulk_id={bulk_id} could not process request: {e}")
+        return [], reply_amounts_invalid_format_error(bulk_id=bulk_id, error_details=str(e))
+
+    all_transfer_amounts_are_valid = all(amount > 0 for amount in amounts)
+    if not all_transfer_amounts_are_valid:
+        logger.error(f"bulk_id={bulk_id} could not process request as not all amounts are > 0: {amounts}")
+        return [], reply_amounts_should_be_positive_error(bulk_id=bulk_id)
+
+    # rejected upfront: an invalid account would fail at the bank call, in the middle of the bulk
+    invalid_counterparties = counterparty_validation.validate_counterparties(credit_transfers=credit_transfers)
+    if invalid_counterparties:
+        logger.error(f"bulk_id={bulk_id} could not process request as {len(invalid_counterparties)} "
+                     f"counterparties are invalid")
+        return [], reply_invalid_counterparties_error(bulk_id=bulk_id, invalid_counterparties=invalid_counterparties)
+
+    return amounts, None
+
+
+def _to_account_currency(
+        bulk_id: UUID, credit_transfers: List[adapter.CreditTransfer], amounts: List[int]
+) -> Tuple[Optional[fx_rates.ConvertedBulk], Optional[JSONResponse]]:
+    """
+    Returns:
+        Amounts in the account currency, converted against a single FX rates snapshot,
+        and the error response if a currency has no rate
+    """
+    try:
+        converted_bulk = fx_rates.to_account_currency(credit_transfers=credit_transfers, amounts=amounts)
+    except UnsupportedCurrencyError as e:
+        logger.error(f"bulk_id={bulk_id} could not process request: {e}")
+        return None, reply_unsupported_currency_error(bulk_id=bulk_id, error_details=str(e))
+    if converted_bulk.fx_rates_version is not None:
+        logger.info(f"bulk_id={bulk_id} converted with fx_rates_version={converted_bulk.fx_rates_version}")
+    return converted_bulk, None
+
+
+def _schedule_bulk_transfer(
+        session: Session,
+        bulk_id: UUID,
+        account: db.BankAccount,
+        credit_transfers: List[adapter.CreditTransfer],
+        amounts: List[int],
+        amounts_in_cents: List[int],
+        total_transfer_amounts_cents: int,
+        partial_success: bool
+) -> Optional[JSONResponse]:
+    """
+    Returns:
+        Error response if the account balance does not cover the bulk on top of its ongoing transfers
+    """
+    logger.info(f"bulk_id={bulk_id} total_transfer_amounts_cents={total_transfer_amounts_cents} "
+                f"| account balance={account.balance_cents} | ongoing transfers={account.ongoing_transfer_cents}")
+    if total_transfer_amounts_cents + account.ongoing_transfer_cents > account.balance_cents:
+        logger.error(f"bulk_id={bulk_id} could not process request as account balance is insufficient "
+                     f"for ongoing operations")
+        return reply_not_enough_funds_error(bulk_id=bulk_id)
+
+    with metrics.STAGE_DURATION_SECONDS.labels("schedule_transfers").time():
+        # the funds are reserved only if the balance still covers them (concurrent bulk requests)
+        bulk_request = bulk_request_service.schedule_transfers(
+            session=session,
+            bulk_request_uuid=str(bulk_id),
+            account=account,
+            total_transfer_amounts_cents=total_transfer_amounts_cents,
+            credit_transfers=credit_transfers,
+            amounts_in_cents=amounts_in_cents,
+            partial_success=partial_success,
+            amounts=amounts
+        )
+    if bulk_request is None:
+        logger.error(f"bulk_id={bulk_id} could not process request as account balance is insufficient "
+                     f"for ongoing operations")
+        return reply_not_enough_funds_error(bulk_id=bulk_id)
+    return None
 
-        amounts_in_cents = []
-        try:
-            amounts_in_cents = [to_cents(amount_in_euros_str=credit_transfer.amount) for credit_transfer in
-                                request.credit_transfers]
-        except ValueError as e:
-            logger.error(f"bulk_id={bulk_id} could not process request: {e}")
-            return reply_amounts_invalid_format_error(bulk_id=bulk_id, error_details=str(e))
 
-        all_transfer_amounts_are_valid = all(amount > 0 for amount in amounts_in_cents)
-        if not all_transfer_amounts_are_valid:
-            logger.error(f"bulk_id={bulk_id} could not process request as not all amounts are > 0: {amounts_in_cents}")
-            return reply_amounts_should_be_positive_error(bulk_id=bulk_id)
+@router.post(
+    "/bulk/templates",
+    status_code=status.HTTP_201_CREATED,
+    response_model=adapter.BulkTemplateSuccessResponse,
+    responses={
+        404: {"model": adapter.BulkTransferErrorResponse, "description": "Organization or Account not found"},
+        413: {"model": adapter.BulkTransferErrorResponse, "description": "Too many transfers"},
+        422: {"model": adapter.BulkTransferErrorResponse, "description": "Bulk template denied"},
+    }
+)
+def create_bulk_template(request: adapter.BulkTemplateRequest, session: Session = Depends(get_session)):
+    """
+    Store the credit transfers of a recurring bulk (e.g. a monthly payroll) as a template.
+
+    The credit transfers are validated as a bulk transfer request (amounts, counterparties) and stored
+    with their amounts in cents, so executing the template does not parse nor validate them again.
+    Error responses are the ones of the bulk transfer requests, with the template id as `bulk_id`.
+    """
+    if not _validate_request_id(request_id=request.template_id):
+        return reply_invalid_template_id_error(template_id=request.template_id)
+
+    template_uuid = UUID(request.template_id)
+    if not db.route_session_to_account(session=session, bic=request.organization_bic, iban=request.organization_iban):
+        logger.error(f"template_id={template_uuid} could not create template as account unknown")
+        return reply_unknown_account_error(bulk_id=template_uuid)
+    with session.begin():
+        if db.find_bulk_template(session=session, template_uuid=template_uuid):
+            return reply_template_already_exists_error(template_id=request.template_id)
+
+        amounts, error_response = _validate_credit_transfers(
+            bulk_id=template_uuid, credit_transfers=request.credit_transfers
+        )
+        if error_response:
+            return error_response
+        # the amounts are stored in their currency, and converted at each execution
+        converted_bulk, error_response = _to_account_currency(
+            bulk_id=template_uuid, credit_transfers=request.credit_transfers, amounts=amounts
+        )
+        if error_response:
+            return error_response
 
         account = db.select_account_for_update(
             session=session, bic=request.organization_bic, iban=request.organization_iban
         )
+        if not account:
+            logger.error(f"template_id={template_uuid} could not create template as account unknown")
+            return reply_unknown_account_error(bulk_id=template_uuid)
+
+        bulk_template = bulk_templates.create_template(
+            session=session,
+            template_uuid=template_uuid,
+            bank_account_id=account.id,
+            credit_transfers=request.credit_transfers,
+            amounts=amounts,
+            total_amount_cents=sum(converted_bulk.amounts_in_cents)
+        )
+
+    logger.info(f"template_id={template_uuid} created with {bulk_template.transfer_count} transfers")
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=_TEMPLATE_SUCCESS_RESPONSE.render(
+        template_id=str(template_uuid),
+        message="Bulk template created",
+        transfer_count=bulk_template.transfer_count,
+        total_amount_cents=bulk_template.total_amount_cents
+    ))
+
+
+@router.post(
+    "/bulk/templates/{template_id}/execute",
+    status_code=status.HTTP_201_CREATED,
+    response_model=adapter.BulkTransferSuccessResponse,
+    responses={
+        400: {"model": adapter.BulkTransferErrorResponse, "description": "Bad Request"},
+        404: {"model": adapter.BulkTransferErrorResponse, "description": "Template or Account not found"},
+        422: {"model": adapter.BulkTransferErrorResponse, "description": "Bulk transfer denied"},
+        503: {"model": adapter.BulkTransferErrorResponse, "description": "Transfers could not be queued"},
+    }
+)
+@profiling.profiled("execute_bulk_template")
+def execute_bulk_template(
+        template_id: str,
+        request: adapter.BulkTemplateExecutionRequest,
+        session: Session = Depends(get_session),
+        traceparent: Optional[str] = Header(default=None, alias=tracing.TRACEPARENT_HEADER)
+):
+    """
+    Create a bulk transfer request from a template, with a new `request_id`.
+
+    Only the overridden lines (amount, description) are validated: the other credit transfers
+    were validated when the template was created. The bulk request is then processed as any other.
+    """
+    with tracing.start_span(
+            "POST /transfers/bulk/templates/{template_id}/execute",
+            parent=tracing.TraceContext.from_traceparent(traceparent),
+            attributes={"bulk_request_uuid": request.request_id, "template_id": template_id}
+    ):
+        return _committed_response(
+            session=session, bulk_id=request.request_id,
+            response=_execute_bulk_template(template_id=template_id, request=request, session=session)
+        )
+
+
+def _execute_bulk_template(template_id: str, request: adapter.BulkTemplateExecutionRequest, session: Session):
+    if not _validate_request_id(request_id=request.request_id):
+        return reply_invalid_request_id_error(bulk_id=request.request_id)
+    if not _validate_request_id(request_id=template_id):
+        return reply_unknown_template_error(bulk_id=request.request_id, template_id=template_id)
+
+    bulk_id = UUID(request.request_id)
+    if not _route_to_template(session=session, template_uuid=UUID(template_id)):
+        return reply_unknown_template_error(bulk_id=request.request_id, template_id=template_id)
+    with session.begin():
+        if _is_already_processed(session=session, bulk_id=bulk_id):
+            return reply_request_already_processed_error(bulk_id=bulk_id)
+
+        with metrics.STAGE_DURATION_SECONDS.labels("validation").time():
+            template = bulk_templates.TEMPLATE_CACHE.get(session=session, template_uuid=UUID(template_id))
+            if template is None:
+                return reply_unknown_template_error(bulk_id=request.request_id, template_id=template_id)
+            execution, error_response = _apply_template_overrides(
+                bulk_id=bulk_id, template=template, overrides=request.overrides
+            )
+            if error_response:
+                return error_response
+
+        with metrics.STAGE_DURATION_SECONDS.labels("account_lock_wait").time():
+            account = db.select_account_for_update_by_id(session=session, bank_account_id=template.bank_account_id)
         if not account:
             logger.error(f"bulk_id={bulk_id} could not process request as account unknown")
             return reply_unknown_account_error(bulk_id=bulk_id)
 
-        total_transfer_amounts_cents = sum(amounts_in_cents)
-        logger.info(f"bulk_id={bulk_id} total_transfer_amounts_cents={total_transfer_amounts_cents} "
-                    f"| account balance={account.balance_cents} | ongoing transfers={account.ongoing_transfer_cents}")
-        if total_transfer_amounts_cents + account.ongoing_transfer_cents > account.balance_cents:
-            logger.error(f"bulk_id={bulk_id} could not process request as account balance is insufficient "
-                         f"for ongoing operations")
-            return reply_not_enough_funds_error(bulk_id=bulk_id)
-
-        bulk_request_service.schedule_transfers(
+        error_response = _schedule_bulk_transfer(
             session=session,
-            bulk_request_uuid=str(bulk_id),
+            bulk_id=bulk_id,
             account=account,
-            total_transfer_amounts_cents=total_transfer_amounts_cents,
-            credit_transfers=request.credit_transfers
+            credit_transfers=execution.credit_transfers,
+            amounts=execution.amounts,
+            amounts_in_cents=execution.amounts_in_cents,
+            total_transfer_amounts_cents=execution.total_amount_cents,
+            partial_success=request.partial_success
         )
+        if error_response:
+            return error_response
+
+    logger.info(f"bulk_id={bulk_id} created from template_id={template_id}")
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=_SUCCESS_RESPONSE.render(
+        bulk_id=str(bulk_id), message="Bulk transfer accepted"
+    ))
+
+
+def _apply_template_overrides(
+        bulk_id: UUID, template: bulk_templates.DecodedTemplate, overrides: List[adapter.TemplateLineOverride]
+) -> Tuple[Optional[bulk_templates.TemplateExecution], Optional[JSONResponse]]:
+    """
+    Returns:
+        Credit transfers of the execution of the template, and the error response if an override is invalid
+        or a currency has no rate
+    """
+    try:
+        return bulk_templates.apply_overrides(template=template, overrides=overrides), None
+    except bulk_templates.InvalidOverrideError as e:
+        logger.error(f"bulk_id={bulk_id} could not process request: {e}")
+        return None, reply_invalid_override_error(bulk_id=bulk_id, error_details=str(e))
+    except UnsupportedCurrencyError as e:
+        logger.error(f"bulk_id={bulk_id} could not process request: {e}")
+        return None, reply_unsupported_currency_error(bulk_id=bulk_id, error_details=str(e))
+
+
+def _route_to_template(session: Session, template_uuid: UUID) -> bool:
+    """
+    Route the session to the shard of the template (sharded databases only).
+    """
+    template = bulk_templates.TEMPLATE_CACHE.cached(template_uuid=template_uuid)
+    if template is not None:
+        db.route_session_to_id(session=session, row_id=template.bank_account_id)
+        return True
+    return db.route_session_to_row(
+        session=session,
+        find=lambda shard_session: db.find_bulk_template(session=shard_session, template_uuid=template_uuid)
+    )
 
-    return {"message": "Bulk transfer accepted", "bulk_id": str(bulk_id)}
+
+@router.delete(
+    "/bulk/{bulk_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=adapter.BulkTransferSuccessResponse,
+    responses={
+        404: {"model": adapter.BulkTransferErrorResponse, "description": "Bulk request not found"},
+        422: {"model": adapter.BulkTransferErrorResponse, "description": "Cancellation denied"},
+        409: {"model": adapter.BulkTransferErrorResponse, "description": "Concurrent update of the account"},
+    }
+)
+def cancel_bulk_transfer(bulk_id: str, session: Session = Depends(get_session)):
+    """
+    Cancel a bulk transfer request that is still being processed, or scheduled at a later date.
+
+    The reserved funds of the transfers not processed yet are released and their queued jobs are dropped.
+    Transfers already sent to the bank are not reverted: they are debited, even in all-or-nothing mode.
+    """
+    if not _validate_request_id(request_id=bulk_id):
+        return reply_invalid_request_id_error(bulk_id=bulk_id)
+    if not _route_to_bulk(session=session, bulk_id=bulk_id):
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+
+    bank_account_id = _find_bank_account_id(session=session, bulk_id=bulk_id)
+    if bank_account_id is None:
+        return _cancel_scheduled_bulk(session=session, bulk_id=bulk_id)
+
+    with ACCOUNT_LOCKS.lock(bank_account_id):
+        try:
+            return db.run_transaction(
+                session=session,
+                work=lambda: _cancel_bulk_transfer(session=session, bulk_id=bulk_id),
+                operation="cancel_bulk_transfer"
+            )
+        except db.ConcurrentUpdateError as e:
+            logger.error(f"bulk_id={bulk_id} could not cancel request: {e}")
+            return reply_concurrent_update_error(bulk_id=bulk_id)
+
+
+def _cancel_bulk_transfer(session: Session, bulk_id: str):
+    bulk_request = db.select_bulk_request_for_update(session=session, bulk_request_uuid=UUID(bulk_id))
+    if not bulk_request:
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+    if bulk_request.status in db.FINAL_REQUEST_STATUSES:
+        return reply_bulk_request_already_finalized_error(bulk_id=bulk_id, status=bulk_request.status)
+
+    bulk_request_service.cancel_bulk_transfer(
+        session=session, bulk_request=bulk_request, status=db.RequestStatus.CANCELLED
+    )
+    logger.info(f"bulk_id={bulk_id} cancelled by the customer")
+    return FastJSONResponse(content=_SUCCESS_RESPONSE.render(bulk_id=bulk_id, message="Bulk transfer cancelled"))
+
+
+def _cancel_scheduled_bulk(session: Session, bulk_id: str):
+    with session.begin():
+        cancelled = db.update_scheduled_bulk_status(
+            session=session,
+            request_uuid=UUID(bulk_id),
+            status=db.ScheduledBulkStatus.CANCELLED,
+            from_status=db.ScheduledBulkStatus.SCHEDULED
+        )
+    if not cancelled:
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+    logger.info(f"bulk_id={bulk_id} scheduled bulk cancelled by the customer")
+    return FastJSONResponse(
+        content=_SUCCESS_RESPONSE.render(bulk_id=bulk_id, message="Scheduled bulk transfer cancelled")
+    )
+
+
+@router.post(
+    "/bulk/{bulk_id}/retry-failed",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=adapter.BulkTransferRetrySuccessResponse,
+    responses={
+        404: {"model": adapter.BulkTransferErrorResponse, "description": "Bulk request not found"},
+        422: {"model": adapter.BulkTransferErrorResponse, "description": "Retry denied"},
+        409: {"model": adapter.BulkTransferErrorResponse, "description": "Concurrent update of the account"},
+        503: {"model": adapter.BulkTransferErrorResponse, "description": "Retried transfers could not be queued"},
+    }
+)
+def retry_failed_transfers(bulk_id: str, session: Session = Depends(get_session)):
+    """
+    Retry only the failed transfers of a finalized partial-success bulk request.
+
+    The amount of the failed transfers is reserved again and their jobs are queued with the same transfer ids,
+    the bulk request is PENDING until they are finalized.
+    """
+    if not _validate_request_id(request_id=bulk_id):
+        return reply_invalid_request_id_error(bulk_id=bulk_id)
+    if not _route_to_bulk(session=session, bulk_id=bulk_id):
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+
+    bank_account_id = _find_bank_account_id(session=session, bulk_id=bulk_id)
+    if bank_account_id is None:
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+
+    with ACCOUNT_LOCKS.lock(bank_account_id):
+        try:
+            return db.run_transaction(
+                session=session,
+                work=lambda: _retry_failed_transfers(session=session, bulk_id=bulk_id),
+                operation="retry_failed_transfers"
+            )
+        except db.ConcurrentUpdateError as e:
+            logger.error(f"bulk_id={bulk_id} could not retry failed transfers: {e}")
+            return reply_concurrent_update_error(bulk_id=bulk_id)
+        except db.AfterCommitError as e:
+            logger.error(f"bulk_id={bulk_id} could not queue the retried transfers: {e}")
+            return reply_transfers_not_queued_error(
+                bulk_id=bulk_id, error_details="The retried transfers could not be queued, they are failed again"
+            )
+
+
+def _retry_failed_transfers(session: Session, bulk_id: str):
+    bulk_request = db.select_bulk_request_for_update(session=session, bulk_request_uuid=UUID(bulk_id))
+    if not bulk_request:
+        return reply_unknown_bulk_request_error(bulk_id=bulk_id)
+    if not bulk_request.partial_success:
+        return reply_retry_not_supported_error(bulk_id=bulk_id)
+    if bulk_request.status == db.RequestStatus.CANCELLED:
+        return reply_bulk_request_already_finalized_error(bulk_id=bulk_id, status=bulk_request.status)
+    if bulk_request.status not in db.FINAL_REQUEST_STATUSES:
+        return reply_bulk_request_in_progress_error(bulk_id=bulk_id)
+
+    failed_transfers = db.list_transfers(
+        session=session, bulk_request_id=bulk_request.id, status=db.RequestStatus.FAILED
+    )
+    if not failed_transfers:
+        return reply_no_failed_transfers_error(bulk_id=bulk_id)
+
+    retried_amount_cents = bulk_request_service.retry_failed_transfers(
+        session=session, bulk_request=bulk_request, failed_transfers=failed_transfers
+    )
+    if retried_amount_cents is None:
+        logger.error(f"bulk_id={bulk_id} could not retry failed transfers as account balance is insufficient "
+                     f"for ongoing operations")
+        return reply_not_enough_funds_error(bulk_id=bulk_id)
+
+    logger.info(f"bulk_id={bulk_id} retrying {len(failed_transfers)} failed transfers "
+                f"retried_amount_cents={retried_amount_cents}")
+    return FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=_RETRY_SUCCESS_RESPONSE.render(
+        bulk_id=bulk_id,
+        message="Failed transfers retry accepted",
+        retried_transfers=len(failed_transfers),
+        retried_amount_cents=retried_amount_cents
+    ))
+
+
+@router.get("/bulk/events", response_class=StreamingResponse)
+async def stream_account_bulk_progress(bank_account_id: int):
+    """
+    Stream progress events (Server-Sent Events) of all the bulk requests of an account.
+    """
+    subscription = bulk_progress.PROGRESS_BROKER.subscribe(bank_account_id=bank_account_id)
+    return StreamingResponse(
+        bulk_progress.stream_progress_events(subscription=subscription),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/bulk/{bulk_id}/events", response_class=StreamingResponse)
+async def stream_bulk_progress(bulk_id: str):
+    """
+    Stream progress events (Server-Sent Events) of a bulk request, until it is completed or failed.
+
+    The first event is the latest known progress of the bulk request.
+    """
+    if not _validate_request_id(request_id=bulk_id):
+        return reply_invalid_request_id_error(bulk_id=bulk_id)
+
+    # subscribe before loading the snapshot to not miss an event published in between
+    subscription = bulk_progress.PROGRESS_BROKER.subscribe(bulk_request_uuid=bulk_id)
+    progress_event = await run_in_threadpool(bulk_progress.load_progress_snapshot, bulk_id)
+    if progress_event is None:
+        bulk_progress.PROGRESS_BROKER.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail=f"Bulk request {bulk_id} not found")
+
+    return StreamingResponse(
+        bulk_progress.stream_progress_events(subscription=subscription, initial_event=progress_event),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+def _route_to_bulk(session: Session, bulk_id: str) -> bool:
+    """
+    Route the session to the shard of the bulk request or scheduled bulk (sharded databases only).
+    """
+    bulk_request_uuid = UUID(bulk_id)
+    return db.route_session_to_row(session=session, find=lambda shard_session: (
+        db.find_bulk_request(session=shard_session, bulk_request_uuid=bulk_request_uuid)
+        or db.find_scheduled_bulk(session=shard_session, request_uuid=bulk_request_uuid)
+    ))
+
+
+def _find_bank_account_id(session: Session, bulk_id: str) -> Optional[int]:
+    """
+    Account of the bulk request, read before the transaction to take its account lock first.
+    """
+    with session.begin():
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=UUID(bulk_id))
+        return bulk_request.bank_account_id if bulk_request else None
+
+
+def _committed_response(session: Session, bulk_id: str, response):
+    """
+    Response of an endpoint whose transaction is committed, or an error if the transfer jobs of the bulk request
+    could not be queued once committed (the bulk request is FAILED and its funds released).
+    """
+    try:
+        db.raise_after_commit_error(session=session)
+    except db.AfterCommitError as e:
+        logger.error(f"bulk_id={bulk_id} could not queue the transfers: {e}")
+        return reply_transfers_not_queued_error(bulk_id=bulk_id)
+    return response
 
 
 def _validate_request_id(request_id) -> bool:
@@ -103,22 +721,23 @@ def _validate_request_id(request_id) -> bool:
         return False
 
 
-def _bulk_error(bulk_id: str, reason: str, error_details: str, status_code: Optional[int] = 422) -> JSONResponse:
-    return JSONResponse(
-        status_code=status_code,
-        content=adapter.BulkTransferErrorResponse(
-            bulk_id=bulk_id,
-            message="Bulk transfer denied",
-            error=adapter.ErrorDetails(reason=reason, details=error_details)
-        ).model_dump()
-    )
+def _bulk_error(
+        bulk_id: str, reason: str, error_details: Optional[str] = None, status_code: Optional[int] = 422
+) -> JSONResponse:
+    if not error_details:  # static details of the reason
+        return FastJSONResponse(status_code=status_code, content=_STATIC_ERROR_BODIES[reason].render(bulk_id))
+    return FastJSONResponse(status_code=status_code, content=_ERROR_RESPONSE.render(
+        bulk_id=bulk_id,
+        message="Bulk transfer denied",
+        error={"reason": reason, "details": error_details}
+    ))
 
 
 def reply_not_enough_funds_error(bulk_id: UUID, error_details: Optional[str] = None) -> JSONResponse:
     return _bulk_error(
         bulk_id=str(bulk_id),
         reason='insufficient-account-balance',
-        error_details=error_details if error_details else "Not enough funds"
+        error_details=error_details
     )
 
 
@@ -126,7 +745,7 @@ def reply_amounts_should_be_positive_error(bulk_id: UUID, error_details: Optiona
     return _bulk_error(
         bulk_id=str(bulk_id),
         reason='negative-or-null-amounts',
-        error_details=error_details if error_details else "All amounts should be strictly greater than zero"
+        error_details=error_details
     )
 
 
@@ -134,7 +753,31 @@ def reply_amounts_invalid_format_error(bulk_id: UUID, error_details: Optional[st
     return _bulk_error(
         bulk_id=str(bulk_id),
         reason='invalid-amount',
-        error_details=error_details if error_details else "All amounts should be numbers and not have more than 2 decimal places"
+        error_details=error_details
+    )
+
+
+def reply_unsupported_currency_error(bulk_id: UUID, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=str(bulk_id),
+        reason='unsupported-currency',
+        error_details=error_details
+    )
+
+
+def reply_invalid_counterparties_error(
+        bulk_id: UUID, invalid_counterparties: List[counterparty_validation.InvalidCounterparty]
+) -> JSONResponse:
+    error_details = "; ".join(
+        f"credit_transfers[{invalid_counterparty.index}]: {invalid_counterparty.error}"
+        for invalid_counterparty in invalid_counterparties[:MAX_REPORTED_INVALID_COUNTERPARTIES]
+    )
+    if len(invalid_counterparties) > MAX_REPORTED_INVALID_COUNTERPARTIES:
+        error_details += f" (and {len(invalid_counterparties) - MAX_REPORTED_INVALID_COUNTERPARTIES} more)"
+    return _bulk_error(
+        bulk_id=str(bulk_id),
+        reason='invalid-counterparty',
+        error_details=error_details
     )
 
 
@@ -143,18 +786,17 @@ def reply_unknown_account_error(bulk_id: UUID, error_details: Optional[str] = No
         bulk_id=str(bulk_id),
         status_code=404,
         reason='unknown-account',
-        error_details=error_details if error_details else "Your account should be active"
+        error_details=error_details
     )
 
 
 def reply_too_many_transfers_error(bulk_id: UUID, error_details: Optional[str] = None) -> JSONResponse:
-    cause = f"Too many transfers requested (max={MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST})"
-    logger.error(f"bulk_id={bulk_id} could not process request: {cause}")
+    logger.error(f"bulk_id={bulk_id} could not process request: {_STATIC_ERROR_DETAILS['too-many-transfers']}")
     return _bulk_error(
         bulk_id=str(bulk_id),
         status_code=413,
         reason='too-many-transfers',
-        error_details=error_details if error_details else cause
+        error_details=error_details
     )
 
 
@@ -163,7 +805,7 @@ def reply_invalid_request_id_error(bulk_id: str, error_details: Optional[str] =
     return _bulk_error(
         bulk_id=bulk_id,
         reason='invalid-request-id',
-        error_details=error_details if error_details else "Invalid bulk request uuid"
+        error_details=error_details
     )
 
 
@@ -172,5 +814,101 @@ def reply_request_already_processed_error(bulk_id: UUID, error_details: Optional
     return _bulk_error(
         bulk_id=str(bulk_id),
         reason='already-processed',
-        error_details=error_details if error_details else f"Request {bulk_id} already processed."
+        error_details=error_details or f"Request {bulk_id} already processed."
+    )
+
+
+def reply_unknown_bulk_request_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        status_code=404,
+        reason='unknown-bulk-request',
+        error_details=error_details or f"Bulk request {bulk_id} not found"
+    )
+
+
+def reply_retry_not_supported_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        reason='not-partial-success',
+        error_details=error_details
+    )
+
+
+def reply_bulk_request_in_progress_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        reason='bulk-request-in-progress',
+        error_details=error_details
+    )
+
+
+def reply_bulk_request_already_finalized_error(
+        bulk_id: str, status: db.RequestStatus, error_details: Optional[str] = None
+) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        reason='already-finalized',
+        error_details=error_details or f"The bulk request is already {status.value}"
+    )
+
+
+def reply_concurrent_update_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        status_code=409,
+        reason='concurrent-update',
+        error_details=error_details
+    )
+
+
+def reply_no_failed_transfers_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        reason='no-failed-transfers',
+        error_details=error_details
+    )
+
+
+def reply_invalid_template_id_error(template_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    logger.error(f"Invalid bulk template uuid: {template_id}")
+    return _bulk_error(
+        bulk_id=template_id,
+        reason='invalid-template-id',
+        error_details=error_details
+    )
+
+
+def reply_template_already_exists_error(template_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    logger.error(f"template_id={template_id} Bulk template already exists")
+    return _bulk_error(
+        bulk_id=template_id,
+        reason='template-already-exists',
+        error_details=error_details or f"Template {template_id} already exists."
+    )
+
+
+def reply_unknown_template_error(bulk_id: str, template_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        status_code=404,
+        reason='unknown-template',
+        error_details=error_details or f"Bulk template {template_id} not found"
+    )
+
+
+def reply_invalid_override_error(bulk_id: UUID, error_details: str) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=str(bulk_id),
+        reason='invalid-override',
+        error_details=error_details
+    )
+
+
+def reply_transfers_not_queued_error(bulk_id: str, error_details: Optional[str] = None) -> JSONResponse:
+    return _bulk_error(
+        bulk_id=bulk_id,
+        status_code=503,
+        reason='transfers-not-queued',
+        error_details=error_details
     )
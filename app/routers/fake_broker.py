@@ -1,58 +1,303 @@
-from collections import deque
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple, Union
 from uuid import UUID
 from fastapi import APIRouter, status, Depends, HTTPException
-from fastapi.responses import JSONResponse
 from sqlmodel import Session
 from app.models import db
-from app.services import transfer_service, bulk_request_service
+from app.services import transfer_service
 
-from app.models.job import TransferJob, BulkJob
-from app.utils.log_formatter import get_logger
+from app.models.job import (
+    TransferJob, BulkJob, ManifestJob, PurgeBulkJob, QueuedTransferJob, QueuedManifestTransfer, QueuedBulkJob
+)
+from app.utils import metrics, profiling, tracing
+from app.utils.locks import ACCOUNT_LOCKS
+from app.utils.responses import FastJSONResponse
+from app.utils.sqlite_queue import BulkRequestKey, JobLease, SqliteJobQueue
+from app.utils.log_formatter import JOB_LOG_SAMPLER, get_logger
 
 
 logger = get_logger(__name__)
 
 
-router = APIRouter()
+# job endpoints are called once per transfer: responses are rendered by orjson and returned as is
+router = APIRouter(default_response_class=FastJSONResponse)
 
 
 # Fake "topics": all jobs of same type are in the same list (FIFO).
 # With a real message broker, the different bulk requests could be processed
 # in parallel, using the bulk_request_uuid as routing scope for instance.
-TRANSFER_JOB_QUEUE = deque()
-FINALIZE_BULK_JOB_QUEUE = deque()
+# Jobs are queued in their compact representation (QueuedTransferJob, QueuedBulkJob)
+# or as references to a bulk manifest (QueuedManifestTransfer), and materialized
+# back to TransferJob/BulkJob when consumed.
+# The queues are in memory by default, or in a SQLite file shared with the `python -m app.worker` processes
+# (see configure_job_queues), whose jobs are leased and acknowledged once consumed (see _consumed_job).
+TRANSFER_JOB_QUEUE: Union[deque, SqliteJobQueue] = deque()
+FINALIZE_BULK_JOB_QUEUE: Union[deque, SqliteJobQueue] = deque()
+_IN_MEMORY_JOB_QUEUES = (TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE)
 # todo next:
 RECONCILIATION_JOB_QUEUE = deque()
 SEND_WEBHOOK_JOB_QUEUE = deque()
 
+# Tombstones of the cancelled bulk requests kept in memory: the jobs of a bulk request are queued at once
+# (at most 1000), so they are consumed long before the tombstone is evicted.
+MAX_CANCELLED_BULK_REQUESTS = 65536
+
+
+class CancelledBulkRequests:
+    """
+    Tombstones of the cancelled bulk requests: their queued transfer jobs are dropped when consumed,
+    in O(1) per job (no scan of the queues, no database access).
+
+    The finalize bulk jobs are never dropped: a transfer sent to the bank before the cancellation
+    must still be debited.
+    """
+
+    def __init__(self, max_size: int = MAX_CANCELLED_BULK_REQUESTS):
+        self._max_size = max_size
+        # bulk request uuid (bytes) -> bulk request id, and the ids for the manifest references
+        self._uuids: OrderedDict[bytes, int] = OrderedDict()
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def add(self, bulk_request_uuid: str, bulk_request_id: int):
+        with self._lock:
+            self._uuids[UUID(bulk_request_uuid).bytes] = bulk_request_id
+            self._ids.add(bulk_request_id)
+            if len(self._uuids) > self._max_size:
+                _, evicted_id = self._uuids.popitem(last=False)
+                self._ids.discard(evicted_id)
+
+    def is_cancelled(self, queued_job: Union[QueuedTransferJob, QueuedManifestTransfer]) -> bool:
+        # membership tests only: no lock on the consumers hot path
+        if isinstance(queued_job, QueuedManifestTransfer):
+            return queued_job.bulk_request_id in self._ids
+        return queued_job.uuids[16:] in self._uuids
+
+    def clear(self):
+        with self._lock:
+            self._uuids.clear()
+            self._ids.clear()
+
+    def __len__(self) -> int:
+        return len(self._uuids)
+
+
+CANCELLED_BULK_REQUESTS = CancelledBulkRequests()
+
+
+def _queued_bulk_request(queued_job: Union[QueuedTransferJob, QueuedManifestTransfer, QueuedBulkJob]) -> BulkRequestKey:
+    if isinstance(queued_job, QueuedManifestTransfer):
+        return None, queued_job.bulk_request_id
+    if isinstance(queued_job, QueuedBulkJob):
+        return queued_job.bulk_request_uuid_bytes, None
+    return queued_job.uuids[16:], None
+
+
+def configure_job_queues(job_queue_path: Optional[str]):
+    """
+    Queue the jobs in the SQLite file at `job_queue_path`, shared by the API and worker processes of the host,
+    or in memory if None.
+    """
+    global TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+    if job_queue_path is None:
+        TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE = _IN_MEMORY_JOB_QUEUES
+        return
+    TRANSFER_JOB_QUEUE = SqliteJobQueue(
+        database_path=job_queue_path, name="transfer", bulk_request_of=_queued_bulk_request
+    )
+    FINALIZE_BULK_JOB_QUEUE = SqliteJobQueue(
+        database_path=job_queue_path, name="finalize_bulk", bulk_request_of=_queued_bulk_request
+    )
+
+
+def _pop_next_job(
+        queue: Union[deque, SqliteJobQueue], drop_cancelled: bool = True
+) -> Tuple[Optional[JobLease], Any]:
+    """
+    Args:
+        drop_cancelled: Drop the jobs of the cancelled bulk requests (transfer jobs only)
+
+    Returns:
+        The lease (None for an in-memory queue, whose jobs are popped) and the first queued job not cancelled,
+        (None, None) if the queue is empty
+    """
+    dropped_jobs = 0
+    while True:
+        try:
+            lease, queued_job = queue.lease() if isinstance(queue, SqliteJobQueue) else (None, queue.popleft())
+        except IndexError:
+            lease, queued_job = None, None
+            break
+        if not drop_cancelled or not CANCELLED_BULK_REQUESTS.is_cancelled(queued_job):
+            break
+        _ack_job(queue, lease)
+        dropped_jobs += 1
+    if dropped_jobs:
+        logger.info("Dropped %d queued jobs of cancelled bulk requests", dropped_jobs)
+    return lease, queued_job
+
+
+def _ack_job(queue: Union[deque, SqliteJobQueue], lease: Optional[JobLease]) -> bool:
+    """
+    Returns:
+        False if the lease of the job expired: it may be delivered to another consumer
+    """
+    return lease is None or queue.ack(lease)
+
+
+@contextmanager
+def _consumed_job(queue: Union[deque, SqliteJobQueue], lease: Optional[JobLease], queued_job, session: Session):
+    """
+    Acknowledge a consumed job once processed (its transaction committed), or deliver it again if its processing
+    fails unexpectedly (e.g. database locked by another process): the lease of the job is released, or the job is
+    queued again in an in-memory queue (popped already, it would be lost otherwise).
+
+    A transfer job is acknowledged right before its transfer is sent to the bank, and never delivered again
+    afterwards: it could be paid twice.
+    """
+    try:
+        yield
+    except HTTPException:
+        _ack_job(queue, lease)
+        raise
+    except Exception as e:
+        if transfer_service.sent_to_bank(session=session):
+            logger.error("Consumed job failed after its transfer was sent to the bank, not delivered again "
+                         "(to reconcile): %s", e)
+            raise
+        logger.warning("Consumed job failed, delivered again: %s", e)
+        if lease is None:
+            queue.append(queued_job)
+        else:
+            queue.release(lease)
+        raise
+    if not transfer_service.sent_to_bank(session=session) and not _ack_job(queue, lease):
+        logger.warning("Consumed job %d was not leased anymore (lease expired or job purged), it may be consumed twice",
+                       lease.job_id)
+
+
+class JobLeaseExpiredError(Exception):
+    """
+    The lease of a job expired before its acknowledgement: the job is delivered to another consumer, or purged.
+    """
+
+
+def _ack_before_bank_call(lease: Optional[JobLease]) -> Optional[Callable[[], None]]:
+    if lease is None:
+        return None
+
+    def ack_transfer_job():
+        if not _ack_job(TRANSFER_JOB_QUEUE, lease):
+            raise JobLeaseExpiredError(f"Lease of transfer job {lease.job_id} expired, not sent to the bank")
+
+    return ack_transfer_job
+
+
+metrics.QUEUE_DEPTH.set_function(lambda: len(TRANSFER_JOB_QUEUE), label_value="transfer")
+metrics.QUEUE_DEPTH.set_function(lambda: len(FINALIZE_BULK_JOB_QUEUE), label_value="finalize_bulk")
+
 
 @router.post("/transfer", status_code=status.HTTP_201_CREATED)
 def enqueue_transfer_job(transfer_job: TransferJob):
-    TRANSFER_JOB_QUEUE.append(transfer_job)
-    logger.info(f"Queued transfer job {transfer_job.transfer_uuid}: {transfer_job} "
-                f"[queue:{len(TRANSFER_JOB_QUEUE)} jobs]")
-    return {
+    try:
+        TRANSFER_JOB_QUEUE.append(QueuedTransferJob.from_transfer_job(transfer_job))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid transfer job: {e}")
+    if JOB_LOG_SAMPLER.sample():
+        logger.info("Queued transfer job %s bulk_id=%s [queue:%d jobs]",
+                    transfer_job.transfer_uuid, transfer_job.bulk_request_uuid, len(TRANSFER_JOB_QUEUE))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={
         "status": "enqueued",
         "transfer_uuid": transfer_job.transfer_uuid,
         "bulk_request_uuid": transfer_job.bulk_request_uuid,
         "type": "process-transfer"
-    }
+    })
+
+
+@router.post("/transfer/manifest", status_code=status.HTTP_201_CREATED)
+def enqueue_manifest_transfer_jobs(manifest_job: ManifestJob):
+    enqueued_at = time.monotonic()
+    TRANSFER_JOB_QUEUE.extend(
+        QueuedManifestTransfer(bulk_request_id=manifest_job.bulk_request_id, index=index, enqueued_at=enqueued_at)
+        for index in range(manifest_job.transfer_count)
+    )
+    logger.info("Queued %d transfer jobs of bulk manifest %d [queue:%d jobs]",
+                manifest_job.transfer_count, manifest_job.bulk_request_id, len(TRANSFER_JOB_QUEUE))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={
+        "status": "enqueued",
+        "bulk_request_id": manifest_job.bulk_request_id,
+        "transfer_count": manifest_job.transfer_count,
+        "type": "process-transfer"
+    })
+
+
+def _materialize_transfer_job(session: Session, queued_job) -> Optional[TransferJob]:
+    if isinstance(queued_job, QueuedManifestTransfer):
+        from app.services import bulk_manifest  # bulk manifest mode only
+
+        return bulk_manifest.resolve_transfer_job(session=session, queued_transfer=queued_job)
+    return queued_job.to_transfer_job()
 
 
 @router.get("/transfer", status_code=status.HTTP_200_OK)
+@profiling.profiled("consume_transfer_job")
 def consume_transfer_job(session: Session = Depends(db.get_session)):
-    try:
-        transfer_job = TRANSFER_JOB_QUEUE.popleft()
-        logger.info(f"Consuming transfer job {transfer_job.transfer_uuid}: {transfer_job} "
-                    f"[queue: pending {len(TRANSFER_JOB_QUEUE)} jobs to be processed]")
-    except IndexError:
+    lease, queued_job = _pop_next_job(TRANSFER_JOB_QUEUE)
+    if queued_job is None:
         raise HTTPException(status_code=404, detail="No transfer job in queue")
+    with _consumed_job(TRANSFER_JOB_QUEUE, lease, queued_job, session=session):
+        return _consume_transfer_job(
+            session=session, queued_job=queued_job, before_bank_call=_ack_before_bank_call(lease)
+        )
+
 
+def _consume_transfer_job(
+        session: Session,
+        queued_job: Union[QueuedTransferJob, QueuedManifestTransfer],
+        before_bank_call: Optional[Callable[[], None]] = None
+):
+    queue_wait_seconds = time.monotonic() - queued_job.enqueued_at
+    metrics.QUEUE_WAIT_SECONDS.labels("transfer").observe(queue_wait_seconds)
+
+    db.route_session_to_id(session=session, row_id=(
+        queued_job.bulk_request_id if isinstance(queued_job, QueuedManifestTransfer) else queued_job.bank_account_id
+    ))
     with session.begin():
-        transaction = transfer_service.process(session=session, transfer_job=transfer_job)
+        transfer_job = _materialize_transfer_job(session=session, queued_job=queued_job)
+        if transfer_job is None:
+            logger.error("Bulk manifest %d not found: transfer job at index %d dropped",
+                         queued_job.bulk_request_id, queued_job.index)
+            return FastJSONResponse(
+                status_code=422, content={
+                    "status": "failed",
+                    "bulk_request_id": queued_job.bulk_request_id,
+                    "type": "process-transfer",
+                    "details": f"Bulk manifest {queued_job.bulk_request_id} not found"
+                }
+            )
+        if JOB_LOG_SAMPLER.sample():
+            logger.info("Consuming transfer job %s bulk_id=%s [queue: pending %d jobs to be processed]",
+                        transfer_job.transfer_uuid, transfer_job.bulk_request_uuid, len(TRANSFER_JOB_QUEUE))
+
+        queue_wait_span = tracing.record_span(
+            "queue_wait", parent=transfer_job.trace_context(), duration_seconds=queue_wait_seconds,
+            attributes={"queue": "transfer", "transfer_uuid": transfer_job.transfer_uuid}
+        )
+        with (
+            metrics.STAGE_DURATION_SECONDS.labels("transfer_service.process").time(),
+            tracing.start_span("process_transfer", parent=queue_wait_span.context(), attributes={
+                "transfer_uuid": transfer_job.transfer_uuid, "bulk_request_uuid": transfer_job.bulk_request_uuid
+            })
+        ):
+            transaction = transfer_service.process(
+                session=session, transfer_job=transfer_job, before_bank_call=before_bank_call
+            )
         if not transaction:
-            logger.warning(f"Processing of transfer job {transfer_job.transfer_uuid} failed or was aborted.")
-            return JSONResponse(
+            logger.warning("Processing of transfer job %s failed or was aborted.", transfer_job.transfer_uuid)
+            return FastJSONResponse(
                 status_code=422, content={
                     "status": "failed",
                     "transfer_uuid": transfer_job.transfer_uuid,
@@ -62,88 +307,160 @@ def consume_transfer_job(session: Session = Depends(db.get_session)):
                 }
             )
 
-    return {
+    return FastJSONResponse(content={
         "status": "processed",
         "transfer_id": str(transaction.transfer_uuid),
         "amount_cents": transaction.amount_cents,
         "bulk_request_uuid": transfer_job.bulk_request_uuid,
         "type": "process-transfer"
-    }
+    })
 
 
 @router.post("/bulk", status_code=status.HTTP_201_CREATED)
 def enqueue_finalize_bulk_job(bulk_job: BulkJob):
-    FINALIZE_BULK_JOB_QUEUE.append(bulk_job)
-    logger.info(f"Queued bulk job {bulk_job.bulk_request_uuid}: {bulk_job} "
-                f"[queue: {len(FINALIZE_BULK_JOB_QUEUE)} jobs]")
-    return {
+    try:
+        FINALIZE_BULK_JOB_QUEUE.append(QueuedBulkJob.from_bulk_job(bulk_job))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid bulk job: {e}")
+    if JOB_LOG_SAMPLER.sample():
+        logger.info("Queued bulk job %s success=%s [queue: %d jobs]",
+                    bulk_job.bulk_request_uuid, bulk_job.success, len(FINALIZE_BULK_JOB_QUEUE))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content={
         "status": "enqueued",
         "bulk_request_uuid": bulk_job.bulk_request_uuid,
         "type": "finalize-bulk"
-    }
+    })
+
+
+@router.post("/bulk/purge", status_code=status.HTTP_200_OK)
+def purge_bulk_jobs(purge_job: PurgeBulkJob):
+    try:
+        CANCELLED_BULK_REQUESTS.add(
+            bulk_request_uuid=purge_job.bulk_request_uuid, bulk_request_id=purge_job.bulk_request_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid purge job: {e}")
+    # the tombstones are not shared with the worker processes: the transfer jobs of a shared queue are deleted
+    if isinstance(TRANSFER_JOB_QUEUE, SqliteJobQueue):
+        TRANSFER_JOB_QUEUE.purge(
+            bulk_request_uuid=UUID(purge_job.bulk_request_uuid).bytes, bulk_request_id=purge_job.bulk_request_id
+        )
+    logger.info("Purging queued jobs of cancelled bulk_id=%s", purge_job.bulk_request_uuid)
+    return FastJSONResponse(content={
+        "status": "purged",
+        "bulk_request_uuid": purge_job.bulk_request_uuid,
+        "type": "purge-bulk"
+    })
 
 
 @router.get("/bulk", status_code=status.HTTP_200_OK)
+@profiling.profiled("consume_finalize_bulk_job")
 def consume_finalize_bulk_job(session: Session = Depends(db.get_session)):
-    try:
-        bulk_job = FINALIZE_BULK_JOB_QUEUE.popleft()
-        logger.info(f"Consuming bulk job {bulk_job.bulk_request_uuid}: {bulk_job} "
-                    f"[queue: pending {len(FINALIZE_BULK_JOB_QUEUE)} jobs to be processed]")
-    except IndexError:
+    # the outcome of a transfer already sent to the bank is applied even if its bulk request was cancelled
+    lease, queued_job = _pop_next_job(FINALIZE_BULK_JOB_QUEUE, drop_cancelled=False)
+    if queued_job is None:
         raise HTTPException(status_code=404, detail="No bulk job in queue")
+    with _consumed_job(FINALIZE_BULK_JOB_QUEUE, lease, queued_job, session=session):
+        return _consume_finalize_bulk_job(session=session, queued_job=queued_job)
 
-    with session.begin():
-        account = db.select_account_for_update_by_id(
-            session=session,bank_account_id=bulk_job.bank_account_id
-        )
-        if not account:
-            logger.warning(f"bulk_id={bulk_job.bulk_request_uuid} could not finalize: account not found")
-            raise HTTPException(
-                status_code=404,
-                detail=f"Account not found for bulk request {bulk_job.bulk_request_uuid}"
-            )
 
-        bulk_request = db.select_bulk_request_for_update(
-            session=session, bulk_request_uuid=UUID(bulk_job.bulk_request_uuid)
-        )
-        if not bulk_request:
-            logger.warning(f"bulk_id={bulk_job.bulk_request_uuid} not found in database")
-            raise HTTPException(status_code=404, detail=f"Bulk request {bulk_job.bulk_request_uuid} not found")
+def _consume_finalize_bulk_job(session: Session, queued_job: QueuedBulkJob):
+    queue_wait_seconds = time.monotonic() - queued_job.enqueued_at
+    metrics.QUEUE_WAIT_SECONDS.labels("finalize_bulk").observe(queue_wait_seconds)
+    bulk_job = queued_job.to_bulk_job()
+    db.route_session_to_id(session=session, row_id=bulk_job.bank_account_id)
+    queue_wait_span = tracing.record_span(
+        "queue_wait", parent=bulk_job.trace_context(), duration_seconds=queue_wait_seconds,
+        attributes={"queue": "finalize_bulk", "bulk_request_uuid": bulk_job.bulk_request_uuid}
+    )
+    if JOB_LOG_SAMPLER.sample():
+        logger.info("Consuming bulk job %s success=%s [queue: pending %d jobs to be processed]",
+                    bulk_job.bulk_request_uuid, bulk_job.success, len(FINALIZE_BULK_JOB_QUEUE))
 
-        if bulk_job.success:
-            final_bulk_request = bulk_request_service.finalize_bulk_transfer(
-                session=session,
-                bulk_request=bulk_request,
-                account=account,
-                single_transferred_amount_cents=bulk_job.single_transferred_amount_cents
-            )
-        else:
-            final_bulk_request = bulk_request_service.cancel_bulk_transfer(
+    if bulk_job.success:
+        # atomic progress counters (see bulk_request_service.finalize_bulk_transfer): no lock to wait for
+        with session.begin():
+            return _finalize_bulk_job(session=session, bulk_job=bulk_job, queue_wait_span=queue_wait_span)
+
+    # the cancellation of an all-or-nothing bulk request is a read-modify-write of the bulk request: serialize
+    # the jobs of a same account, and retry the transaction if another process updated it meanwhile
+    with ACCOUNT_LOCKS.lock(bulk_job.bank_account_id):
+        try:
+            return db.run_transaction(
                 session=session,
-                bulk_request=bulk_request,
-                account=account,
+                work=lambda: _finalize_bulk_job(session=session, bulk_job=bulk_job, queue_wait_span=queue_wait_span),
+                operation="finalize_bulk_job"
             )
-
-        if final_bulk_request is None:
-            logger.warning(f"Processing of bulk job {bulk_job.bulk_request_uuid} failed or was aborted.")
-            # todo next: queue reconciliation job and send ID in the response
-            return JSONResponse(
-                status_code=422, content={
+        except db.ConcurrentUpdateError as e:
+            logger.warning("bulk_id=%s could not finalize, job queued again: %s", bulk_job.bulk_request_uuid, e)
+            FINALIZE_BULK_JOB_QUEUE.append(queued_job)
+            return FastJSONResponse(
+                status_code=409, content={
                     "type": "finalize-bulk",
-                    "status": "failed",
+                    "status": "retry",
                     "bulk_request_uuid": bulk_job.bulk_request_uuid,
-                    "total_transferred_amounts_cents": bulk_request.total_amount_cents,
-                    "processed_amounts_cents": bulk_request.processed_amount_cents,
-                    "details": "Processing of bulk job failed or was aborted",
-                    "reconciliation_job_uuid": "todo"
+                    "details": str(e)
                 }
             )
 
-        return {
-            "type": "finalize-bulk",
-            "status": final_bulk_request.status,
-            "bulk_request_uuid": bulk_job.bulk_request_uuid,
-            "total_transferred_amounts_cents": bulk_request.total_amount_cents,
-            "processed_amounts_cents": bulk_request.processed_amount_cents,
-            "completed_at": final_bulk_request.completed_at.isoformat() if final_bulk_request.completed_at else None
-        }
+
+def _finalize_bulk_job(session: Session, bulk_job: BulkJob, queue_wait_span: tracing.Span):
+    # not imported with the router: a worker starts consuming the transfer jobs without the bulk request services
+    from app.services import bulk_request_service
+
+    bulk_request_uuid = UUID(bulk_job.bulk_request_uuid)
+    if bulk_job.success:
+        stage = "finalize_bulk_transfer"
+
+        def finalize():
+            return bulk_request_service.finalize_bulk_transfer(
+                session=session,
+                bulk_request_uuid=bulk_request_uuid,
+                bank_account_id=bulk_job.bank_account_id,
+                single_transferred_amount_cents=bulk_job.single_transferred_amount_cents,
+                transfer_uuid=bulk_job.transfer_uuid
+            )
+    else:
+        bulk_request = db.select_bulk_request_for_update(session=session, bulk_request_uuid=bulk_request_uuid)
+        if not bulk_request:
+            logger.warning("bulk_id=%s not found in database", bulk_job.bulk_request_uuid)
+            raise HTTPException(status_code=404, detail=f"Bulk request {bulk_job.bulk_request_uuid} not found")
+        if bulk_request.partial_success:
+            stage = "record_failed_transfer"
+
+            def finalize():
+                return bulk_request_service.record_transfer_outcome(
+                    session=session,
+                    bulk_request_uuid=bulk_request_uuid,
+                    bank_account_id=bulk_job.bank_account_id,
+                    transfer_uuid=bulk_job.transfer_uuid,
+                    amount_cents=bulk_job.single_transferred_amount_cents,
+                    success=False
+                )
+        else:
+            stage = "cancel_bulk_transfer"
+
+            def finalize():
+                return bulk_request_service.cancel_bulk_transfer(session=session, bulk_request=bulk_request)
+
+    with (
+        metrics.STAGE_DURATION_SECONDS.labels(stage).time(),
+        tracing.start_span(stage, parent=queue_wait_span.context(), attributes={
+            "bulk_request_uuid": bulk_job.bulk_request_uuid
+        })
+    ):
+        final_bulk_request = finalize()
+
+    if final_bulk_request is None:
+        logger.warning("bulk_id=%s not found in database", bulk_job.bulk_request_uuid)
+        raise HTTPException(status_code=404, detail=f"Bulk request {bulk_job.bulk_request_uuid} not found")
+
+    return FastJSONResponse(content={
+        "type": "finalize-bulk",
+        "status": final_bulk_request.status,
+        "bulk_request_uuid": bulk_job.bulk_request_uuid,
+        "total_transferred_amounts_cents": final_bulk_request.total_amount_cents,
+        "processed_amounts_cents": final_bulk_request.processed_amount_cents,
+        "failed_amounts_cents": final_bulk_request.failed_amount_cents,
+        "completed_at": final_bulk_request.completed_at.isoformat() if final_bulk_request.completed_at else None
+    })
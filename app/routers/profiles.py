@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from app.utils import profiling
+
+
+router = APIRouter()
+
+
+@router.get("")
+def list_profiles(limit: int = Query(default=50, ge=1, le=1000)):
+    """
+    Recent profile captures, most recent first (see `PROFILE_DIR`).
+
+    Send a request with the `X-Profile: 1` header to capture it: its capture id is returned in the `X-Profile-Id` header.
+    """
+    return {"items": profiling.list_captures(limit=limit)}
+
+
+@router.get("/{capture_id}")
+def get_profile(capture_id: str):
+    """
+    Summary of a capture: slowest functions and SQL statements.
+    """
+    capture = profiling.find_capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail=f"Profile capture {capture_id} not found")
+    return capture
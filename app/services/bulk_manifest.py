@@ -0,0 +1,150 @@
+import json
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.models import db
+from app.models.adapter import CreditTransfer
+from app.models.job import TransferJob, QueuedManifestTransfer
+from app.utils.tracing import TraceContext, trace_context
+
+
+MANIFEST_FORMAT_VERSION = 2
+# Decoded manifests kept in memory by the workers (a bulk holds at most 1000 transfers)
+DECODED_MANIFESTS_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class DecodedManifest:
+    bulk_request_uuid: str
+    bank_account_id: int
+    # [transfer_uuid (hex), counterparty_name, counterparty_iban, counterparty_bic, amount (minor units of currency),
+    #  currency, description, booked_amount_cents (account currency)]
+    transfers: List[list]
+    # parent of the spans of the transfer jobs
+    trace_context: Optional[TraceContext] = None
+
+    def transfer_job(self, index: int) -> TransferJob:
+        transfer_uuid_hex, name, iban, bic, amount, currency, description, booked_amount_cents = self.transfers[index]
+        # fields were validated when the bulk request was accepted
+        return TransferJob.model_construct(
+            transfer_uuid=str(UUID(hex=transfer_uuid_hex)),
+            bulk_request_uuid=self.bulk_request_uuid,
+            bank_account_id=self.bank_account_id,
+            counterparty_name=name,
+            counterparty_iban=iban,
+            counterparty_bic=bic,
+            amount_cents=amount,
+            amount_currency=currency,
+            description=description,
+            booked_amount_cents=booked_amount_cents,
+            trace_id=self.trace_context.trace_id if self.trace_context else None,
+            parent_span_id=self.trace_context.span_id if self.trace_context else None
+        )
+
+
+def pack_manifest(
+        bulk_request_uuid: str,
+        bank_account_id: int,
+        credit_transfers: List[CreditTransfer],
+        amounts: List[int],
+        amounts_in_cents: List[int],
+        transfer_uuids: List[UUID],
+        parent_trace_context: Optional[TraceContext] = None
+) -> bytes:
+    """
+    Pack the transfers of a bulk request as compact JSON arrays (no repeated keys), compressed with zlib.
+
+    Args:
+        amounts: amounts of the credit transfers in minor units of their currency (paid to the counterparties)
+        amounts_in_cents: the same amounts in cents of the account currency (booked)
+    """
+    manifest = {
+        "version": MANIFEST_FORMAT_VERSION,
+        "bulk_request_uuid": bulk_request_uuid,
+        "bank_account_id": bank_account_id,
+        "trace_id": parent_trace_context.trace_id if parent_trace_context else None,
+        "parent_span_id": parent_trace_context.span_id if parent_trace_context else None,
+        "transfers": [
+            [
+                transfer_uuid.hex, credit_transfer.counterparty_name, credit_transfer.counterparty_iban,
+                credit_transfer.counterparty_bic, amount, credit_transfer.currency, credit_transfer.description,
+                amount_cents
+            ]
+            for credit_transfer, amount, amount_cents, transfer_uuid
+            in zip(credit_transfers, amounts, amounts_in_cents, transfer_uuids)
+        ]
+    }
+    return zlib.compress(json.dumps(manifest, separators=(",", ":")).encode())
+
+
+def unpack_manifest(payload: bytes) -> DecodedManifest:
+    manifest = json.loads(zlib.decompress(payload))
+    if manifest["version"] not in (1, MANIFEST_FORMAT_VERSION):
+        raise ValueError(f"Unsupported manifest version: {manifest['version']}")
+    transfers = manifest["transfers"]
+    for transfer in transfers:  # recurring counterparties share their strings across manifests
+        for position in (1, 2, 3, 5, 6):
+            transfer[position] = sys.intern(transfer[position])
+        if manifest["version"] == 1:  # amounts in the account currency only
+            transfer.append(transfer[4])
+    return DecodedManifest(
+        bulk_request_uuid=manifest["bulk_request_uuid"],
+        bank_account_id=manifest["bank_account_id"],
+        transfers=transfers,
+        trace_context=trace_context(trace_id=manifest.get("trace_id"), span_id=manifest.get("parent_span_id"))
+    )
+
+
+class ManifestCache:
+    """
+    LRU cache of decoded manifests: the transfers of a bulk are consumed in sequence,
+    so a manifest is loaded and decompressed once for all its transfers.
+    """
+
+    def __init__(self, max_size: int = DECODED_MANIFESTS_CACHE_SIZE):
+        self._max_size = max_size
+        self._manifests: OrderedDict[int, DecodedManifest] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, bulk_request_id: int) -> Optional[DecodedManifest]:
+        with self._lock:
+            manifest = self._manifests.get(bulk_request_id)
+            if manifest is not None:
+                self._manifests.move_to_end(bulk_request_id)
+                return manifest
+
+        bulk_manifest = db.find_bulk_manifest(session=session, bulk_request_id=bulk_request_id)
+        if bulk_manifest is None:
+            return None
+        manifest = unpack_manifest(bulk_manifest.payload)
+
+        with self._lock:
+            self._manifests[bulk_request_id] = manifest
+            if len(self._manifests) > self._max_size:
+                self._manifests.popitem(last=False)
+        return manifest
+
+    def clear(self):
+        with self._lock:
+            self._manifests.clear()
+
+
+MANIFEST_CACHE = ManifestCache()
+
+
+def resolve_transfer_job(session: Session, queued_transfer: QueuedManifestTransfer) -> Optional[TransferJob]:
+    """
+    Returns:
+        TransferJob at the referenced manifest index, None if the manifest does not exist
+    """
+    manifest = MANIFEST_CACHE.get(session=session, bulk_request_id=queued_transfer.bulk_request_id)
+    if manifest is None:
+        return None
+    return manifest.transfer_job(index=queued_transfer.index)
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Set
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.models import db
+from app.models.event import BulkProgressEvent
+
+
+# Max number of distinct bulk requests buffered for a single subscriber before
+# the oldest pending event is dropped (a bulk-scoped subscriber only ever buffers one).
+MAX_PENDING_EVENTS_PER_SUBSCRIBER = 256
+# Number of bulk requests whose latest progress is kept to serve new subscribers without a DB query.
+LATEST_EVENTS_CACHE_SIZE = 4096
+
+
+class BulkProgressSubscription:
+    """
+    Bounded, coalescing buffer of progress events for one watcher.
+
+    Events are keyed by bulk request: a newer event for a bulk replaces the pending one,
+    so a slow watcher only receives the latest known progress of each bulk.
+    """
+
+    def __init__(
+            self,
+            bulk_request_uuid: Optional[str] = None,
+            bank_account_id: Optional[int] = None,
+            max_pending_events: int = MAX_PENDING_EVENTS_PER_SUBSCRIBER
+    ):
+        self.bulk_request_uuid = bulk_request_uuid
+        self.bank_account_id = bank_account_id
+        self.dropped_events = 0
+        self._max_pending_events = max_pending_events
+        self._pending: OrderedDict[str, BulkProgressEvent] = OrderedDict()
+        self._lock = threading.Lock()
+        self._notified = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+    def offer(self, progress_event: BulkProgressEvent):
+        """
+        Buffer an event, called from the publisher thread. Never blocks on the watcher.
+        """
+        with self._lock:
+            bulk_request_uuid = progress_event.bulk_request_uuid
+            if bulk_request_uuid in self._pending:
+                del self._pending[bulk_request_uuid]
+            elif len(self._pending) >= self._max_pending_events:
+                self._pending.popitem(last=False)
+                self.dropped_events += 1
+            self._pending[bulk_request_uuid] = progress_event
+            if self._notified:
+                return
+            self._notified = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:  # event loop closed: the watcher is gone
+            pass
+
+    def drain(self) -> list:
+        with self._lock:
+            progress_events = list(self._pending.values())
+            self._pending.clear()
+            self._notified = False
+            self._wakeup.clear()
+        return progress_events
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait for pending events, returns False on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class BulkProgressBroker:
+    """
+    In-process pub/sub of bulk request progress.
+
+    Publishing is O(number of interested subscribers) and never touches the database,
+    so the number of watchers does not add load on the bulk processing pipeline.
+    """
+
+    def __init__(self, latest_events_cache_size: int = LATEST_EVENTS_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers_by_bulk: Dict[str, Set[BulkProgressSubscription]] = {}
+        self._subscribers_by_account: Dict[int, Set[BulkProgressSubscription]] = {}
+        self._latest_events: OrderedDict[str, BulkProgressEvent] = OrderedDict()
+        self._latest_events_cache_size = latest_events_cache_size
+
+    def subscribe(
+            self, bulk_request_uuid: Optional[str] = None, bank_account_id: Optional[int] = None
+    ) -> BulkProgressSubscription:
+        subscription = BulkProgressSubscription(bulk_request_uuid=bulk_request_uuid, bank_account_id=bank_account_id)
+        with self._lock:
+            if bulk_request_uuid is not None:
+                self._subscribers_by_bulk.setdefault(bulk_request_uuid, set()).add(subscription)
+            else:
+                self._subscribers_by_account.setdefault(bank_account_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: BulkProgressSubscription):
+        with self._lock:
+            if subscription.bulk_request_uuid is not None:
+                subscribers = self._subscribers_by_bulk.get(subscription.bulk_request_uuid, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers_by_bulk.pop(subscription.bulk_request_uuid, None)
+            else:
+                subscribers = self._subscribers_by_account.get(subscription.bank_account_id, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers_by_account.pop(subscription.bank_account_id, None)
+
+    def publish(self, progress_event: BulkProgressEvent):
+        with self._lock:
+            self._remember(progress_event)
+            subscribers = (
+                list(self._subscribers_by_bulk.get(progress_event.bulk_request_uuid, ()))
+                + list(self._subscribers_by_account.get(progress_event.bank_account_id, ()))
+            )
+        for subscription in subscribers:
+            subscription.offer(progress_event)
+
+    def latest(self, bulk_request_uuid: str) -> Optional[BulkProgressEvent]:
+        with self._lock:
+            return self._latest_events.get(bulk_request_uuid)
+
+    def remember(self, progress_event: BulkProgressEvent):
+        with self._lock:
+            self._remember(progress_event)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return (sum(len(s) for s in self._subscribers_by_bulk.values())
+                    + sum(len(s) for s in self._subscribers_by_account.values()))
+
+    def _remember(self, progress_event: BulkProgressEvent):
+        self._latest_events[progress_event.bulk_request_uuid] = progress_event
+        self._latest_events.move_to_end(progress_event.bulk_request_uuid)
+        if len(self._latest_events) > self._latest_events_cache_size:
+            self._latest_events.popitem(last=False)
+
+
+PROGRESS_BROKER = BulkProgressBroker()
+
+
+def build_progress_event(bulk_request: db.BulkRequest) -> BulkProgressEvent:
+    return BulkProgressEvent(
+        bulk_request_uuid=str(bulk_request.request_uuid),
+        bank_account_id=bulk_request.bank_account_id,
+        status=bulk_request.status,
+        total_amount_cents=bulk_request.total_amount_cents,
+        processed_amount_cents=bulk_request.processed_amount_cents,
+        failed_amount_cents=bulk_request.failed_amount_cents,
+        completed_at=bulk_request.completed_at.isoformat() if bulk_request.completed_at else None
+    )
+
+
+def publish_after_commit(session: Session, bulk_request: db.BulkRequest):
+    """
+    Snapshot the bulk request progress now and publish it once the session transaction is committed,
+    so watchers never see progress that is rolled back afterward.
+    """
+    progress_event = build_progress_event(bulk_request=bulk_request)
+    db.call_after_commit(
+        session=session,
+        callback=lambda: PROGRESS_BROKER.publish(progress_event),
+        key=("bulk-progress", progress_event.bulk_request_uuid)
+    )
+
+
+async def stream_progress_events(
+        subscription: BulkProgressSubscription,
+        initial_event: Optional[BulkProgressEvent] = None,
+        heartbeat_interval_seconds: float = 15.0
+) -> AsyncIterator[str]:
+    """
+    Yield Server-Sent Events for a subscription until its bulk request is finalized
+    (bulk-scoped subscription) or the client disconnects.
+    """
+    try:
+        if initial_event is not None:
+            yield initial_event.to_sse()
+            if subscription.bulk_request_uuid is not None and initial_event.is_final():
+                return
+        while True:
+            if not await subscription.wait(timeout=heartbeat_interval_seconds):
+                yield ": keep-alive\n\n"
+                continue
+            for progress_event in subscription.drain():
+                yield progress_event.to_sse()
+                if subscription.bulk_request_uuid is not None and progress_event.is_final():
+                    return
+    finally:
+        PROGRESS_BROKER.unsubscribe(subscription)
+
+
+def load_progress_snapshot(bulk_request_uuid: str) -> Optional[BulkProgressEvent]:
+    """
+    Latest known progress of a bulk request: served from memory when a recent event is known,
+    otherwise loaded once from the database and cached for the next watchers.
+    """
+    progress_event = PROGRESS_BROKER.latest(bulk_request_uuid)
+    if progress_event is not None:
+        return progress_event
+
+    def find(session: Session) -> Optional[db.BulkRequest]:
+        return db.find_bulk_request(session=session, bulk_request_uuid=UUID(bulk_request_uuid))
+
+    with db.new_session() as session:
+        if not db.route_session_to_row(session=session, find=find):
+            return None
+        bulk_request = find(session)
+        if not bulk_request:
+            return None
+        progress_event = build_progress_event(bulk_request=bulk_request)
+    PROGRESS_BROKER.remember(progress_event)
+    return progress_event
@@ -5,9 +5,12 @@ from sqlmodel import Session
 
 from app.models import db
 from app.models.adapter import CreditTransfer
+from app.services import bulk_manifest, bulk_progress
 from app.services.fake_broker_client import FakeBrokerClient
-from app.models.job import build_transfer_job
-from app.utils.log_formatter import get_logger
+from app.models.job import ManifestJob, PurgeBulkJob, TransferJob, build_transfer_job
+from app.settings import get_settings
+from app.utils import metrics, tracing
+from app.utils.log_formatter import JOB_LOG_SAMPLER, get_logger
 
 
 logger = get_logger(__name__)
@@ -18,8 +21,11 @@ def schedule_transfers(
         bulk_request_uuid: str,
         account: db.BankAccount,
         total_transfer_amounts_cents: int,
-        credit_transfers: List[CreditTransfer]
-) -> db.BulkRequest:
+        credit_transfers: List[CreditTransfer],
+        amounts_in_cents: Optional[List[int]] = None,
+        partial_success: bool = False,
+        amounts: Optional[List[int]] = None
+) -> Optional[db.BulkRequest]:
     """
     Schedule all transfers in a bulk request for asynchronous processing.
 
@@ -29,100 +35,287 @@ def schedule_transfers(
     Args:
         session: Database session (must be in transaction)
         bulk_request_uuid: Unique identifier for the bulk request
-        account: Account to debit (must be locked with FOR UPDATE)
+        account: Account to debit
         total_transfer_amounts_cents: Total amount to reserve
         credit_transfers: List of individual transfers to queue
+        amounts_in_cents: Amounts of the credit transfers already converted to cents of the account currency,
+            reserved, debited and booked (converted if None)
+        partial_success: Finalize the transfers one by one instead of all or nothing
+        amounts: Amounts of the credit transfers in minor units of their currency, paid to the counterparties
+            (amounts_in_cents if None: all in the account currency)
 
     Returns:
-        Created BulkRequest record
+        Created BulkRequest record, None if the account balance does not cover the total amount
+        on top of its ongoing transfers (nothing is created)
 
     Side Effects:
         - Creates BulkRequest record with PENDING status
         - Increases account.ongoing_transfer_cents by total amount
-        - Queues TransferJob for each credit transfer
+        - In partial-success mode, creates a Transfer record with PENDING status per credit transfer
+        - Queues TransferJob for each credit transfer, or in bulk manifest mode, stores the transfers
+          once as a manifest and queues (bulk, index) references, once the transaction is committed.
+          If they cannot be queued, the bulk request is FAILED and its funds released, and the commit
+          raises db.AfterCommitError (see db.raise_after_commit_error)
     """
+    if not db.reserve_funds(session=session, bank_account_id=account.id, amount_cents=total_transfer_amounts_cents):
+        return None
     bulk_request = db.create_bulk_request(
         session=session,
         bulk_request_uuid=UUID(bulk_request_uuid),
         bank_account_id=account.id,
-        total_amounts_cents=total_transfer_amounts_cents
+        total_amounts_cents=total_transfer_amounts_cents,
+        partial_success=partial_success
     )
     session.flush()
-    db.reserve_funds(session=session, account=account, total_transfer_amounts=total_transfer_amounts_cents)
-
-    fake_broker_client = FakeBrokerClient()
-    for credit_transfer in credit_transfers:
-        response = fake_broker_client.queue_transfer_job(
-            job=build_transfer_job(
-                bulk_request_uuid=bulk_request_uuid,
-                transfer_uuid=str(uuid4()),
-                bank_account_id=account.id,
-                credit_transfer=credit_transfer
-            )
+
+    if amounts_in_cents is None:
+        amounts_in_cents = [credit_transfer.amount_to_cents() for credit_transfer in credit_transfers]
+    if amounts is None:
+        amounts = amounts_in_cents
+    transfer_uuids = [uuid4() for _ in credit_transfers]
+
+    if partial_success:
+        db.create_transfers(session=session, transfers=[
+            {
+                "transfer_uuid": transfer_uuid,
+                "bulk_request_id": bulk_request.id,
+                "status": db.RequestStatus.PENDING,
+                "attempts": 1,
+                "counterparty_name": credit_transfer.counterparty_name,
+                "counterparty_iban": credit_transfer.counterparty_iban,
+                "counterparty_bic": credit_transfer.counterparty_bic,
+                "amount_cents": amount,
+                "amount_currency": credit_transfer.currency,
+                "description": credit_transfer.description,
+                "booked_amount_cents": amount_cents
+            }
+            for credit_transfer, amount, amount_cents, transfer_uuid
+            in zip(credit_transfers, amounts, amounts_in_cents, transfer_uuids)
+        ])
+
+    if get_settings().bulk_manifest_mode:
+        _schedule_manifest_transfers(
+            session=session,
+            bulk_request=bulk_request,
+            credit_transfers=credit_transfers,
+            amounts=amounts,
+            amounts_in_cents=amounts_in_cents,
+            transfer_uuids=transfer_uuids
         )
-        logger.debug(f"Queued transfer job: {response}")
-    logger.debug("Queued all transfer jobs")
+        return bulk_request
 
+    _schedule_transfer_jobs(
+        session=session,
+        bulk_request=bulk_request,
+        bank_account_id=account.id,
+        credit_transfers=credit_transfers,
+        amounts=amounts,
+        amounts_in_cents=amounts_in_cents,
+        transfer_uuids=transfer_uuids
+    )
     return bulk_request
 
 
-def finalize_bulk_transfer(
+def _schedule_transfer_jobs(
         session: Session,
         bulk_request: db.BulkRequest,
-        account: db.BankAccount,
-        single_transferred_amount_cents: int
+        bank_account_id: int,
+        credit_transfers: List[CreditTransfer],
+        amounts: List[int],
+        amounts_in_cents: List[int],
+        transfer_uuids: List[UUID]
+):
+    """
+    Queue one TransferJob per credit transfer once the transaction is committed:
+    a worker must not process a transfer (and finalize) a bulk request that is not visible yet.
+    """
+    bulk_request_uuid, bulk_request_id = str(bulk_request.request_uuid), bulk_request.id
+
+    def queue_transfer_jobs():
+        fake_broker_client = FakeBrokerClient()
+        try:
+            for credit_transfer, amount, amount_cents, transfer_uuid in zip(
+                    credit_transfers, amounts, amounts_in_cents, transfer_uuids
+            ):
+                transfer_uuid = str(transfer_uuid)
+                with tracing.start_span("enqueue_transfer_job", attributes={"transfer_uuid": transfer_uuid}) as span:
+                    response = fake_broker_client.queue_transfer_job(
+                        job=build_transfer_job(
+                            bulk_request_uuid=bulk_request_uuid,
+                            transfer_uuid=transfer_uuid,
+                            bank_account_id=bank_account_id,
+                            credit_transfer=credit_transfer,
+                            amount_cents=amount,
+                            booked_amount_cents=amount_cents,
+                            parent_trace_context=span.context()
+                        )
+                    )
+                logger.debug("Queued transfer job: %s", response)
+        except Exception as e:
+            _fail_unqueued_bulk_request(bulk_request_uuid=bulk_request_uuid, bulk_request_id=bulk_request_id, error=e)
+            raise
+        logger.debug("Queued all transfer jobs")
+
+    db.call_after_commit(session=session, callback=queue_transfer_jobs, required=True)
+
+
+def _schedule_manifest_transfers(
+        session: Session,
+        bulk_request: db.BulkRequest,
+        credit_transfers: List[CreditTransfer],
+        amounts: List[int],
+        amounts_in_cents: List[int],
+        transfer_uuids: List[UUID]
+):
+    """
+    Store the transfers of the bulk request once and queue one lightweight reference per transfer.
+
+    References are queued after commit: a worker must not resolve a manifest that is not visible yet.
+    """
+    enqueue_span = tracing.start_span("enqueue_manifest_transfer_jobs", attributes={
+        "bulk_request_uuid": str(bulk_request.request_uuid), "transfer_count": len(credit_transfers)
+    })
+    db.create_bulk_manifest(
+        session=session,
+        bulk_request_id=bulk_request.id,
+        transfer_count=len(credit_transfers),
+        payload=bulk_manifest.pack_manifest(
+            bulk_request_uuid=str(bulk_request.request_uuid),
+            bank_account_id=bulk_request.bank_account_id,
+            credit_transfers=credit_transfers,
+            amounts=amounts,
+            amounts_in_cents=amounts_in_cents,
+            transfer_uuids=transfer_uuids,
+            parent_trace_context=enqueue_span.context()
+        )
+    )
+    manifest_job = ManifestJob(bulk_request_id=bulk_request.id, transfer_count=len(credit_transfers))
+    bulk_request_uuid = str(bulk_request.request_uuid)
+
+    def queue_manifest_transfer_jobs():
+        try:
+            with enqueue_span:
+                response = FakeBrokerClient().queue_manifest_transfer_jobs(job=manifest_job)
+        except Exception as e:
+            _fail_unqueued_bulk_request(
+                bulk_request_uuid=bulk_request_uuid, bulk_request_id=manifest_job.bulk_request_id, error=e
+            )
+            raise
+        logger.debug("Queued manifest transfer jobs: %s", response)
+
+    db.call_after_commit(session=session, callback=queue_manifest_transfer_jobs, required=True)
+
+
+def _fail_unqueued_bulk_request(bulk_request_uuid: str, bulk_request_id: int, error: Exception):
+    """
+    Compensate a committed bulk request whose transfer jobs could not be queued (all or some of them):
+    FAILED, its reserved funds released and its queued transfer jobs purged, instead of PENDING forever.
+    The jobs queued before the failure are not sent to the bank (see transfer_service.process).
+    """
+    logger.error("bulk_id=%s transfer jobs could not be queued, bulk request failed: %s", bulk_request_uuid, error)
+
+    def fail_bulk_request():
+        bulk_request = db.select_bulk_request_for_update(session=session, bulk_request_uuid=UUID(bulk_request_uuid))
+        if bulk_request:
+            cancel_bulk_transfer(session=session, bulk_request=bulk_request, status=db.RequestStatus.FAILED)
+
+    try:
+        with db.session_for_id(bulk_request_id) as session:
+            db.run_transaction(session=session, work=fail_bulk_request, operation="fail_unqueued_bulk_request")
+    except Exception as e:
+        logger.exception("bulk_id=%s could not be failed: %s", bulk_request_uuid, e)
+
+
+def finalize_bulk_transfer(
+        session: Session,
+        bulk_request_uuid: UUID,
+        bank_account_id: int,
+        single_transferred_amount_cents: int,
+        transfer_uuid: Optional[str] = None
 ) -> Optional[db.BulkRequest]:
     """
     Update bulk request progress and complete if all transfers processed.
 
     Called after each successful transfer to track progress. When the last
     transfer completes, finalizes the bulk request by updating account balance
-    and status. Uses database locking to prevent race conditions.
+    and status. The progress is added and the completion detected by a single atomic
+    statement (see db.add_bulk_request_progress), without loading nor locking the rows first.
 
     Args:
         session: Database session (must be in transaction)
-        bulk_request: Bulk request to update (must be locked with FOR UPDATE)
-        account: Account being debited (must be locked with FOR UPDATE)
+        bulk_request_uuid: Bulk request to update
+        bank_account_id: Account being debited
         single_transferred_amount_cents: Amount of this individual transfer
+        transfer_uuid: Transfer of this outcome (required for partial-success bulk requests)
 
     Returns:
-        Updated BulkRequest, None if already finalized or not found
+        Updated BulkRequest (as is if already finalized), None if not found
 
     Financial Logic:
         When last transfer completes:
         - Deducts total_amount_cents from account.balance_cents
         - Clears account.ongoing_transfer_cents
         - Sets status to COMPLETED
+        Partial-success bulk requests are debited transfer by transfer instead (see record_transfer_outcome).
+        A transfer completed after the cancellation (or failure) of its bulk request is debited on its own.
     """
-    bulk_request_uuid = bulk_request.request_uuid
-    logger.info(f"bulk_id={bulk_request_uuid} FINALIZE account_id={account.id} "
-                f"single_transferred_amount_cents={single_transferred_amount_cents}")
-
-    if not bulk_request:
-        logger.warning(f"bulk_id={bulk_request_uuid} not found in database")
-        return None
+    log_job = JOB_LOG_SAMPLER.sample()
+    if log_job:
+        logger.info("bulk_id=%s FINALIZE account_id=%s single_transferred_amount_cents=%d",
+                    bulk_request_uuid, bank_account_id, single_transferred_amount_cents)
 
-    if bulk_request.status in [db.RequestStatus.FAILED, db.RequestStatus.COMPLETED]:
-        logger.warning(f"bulk_id={bulk_request_uuid} already finalized status={bulk_request.status}")
-        return bulk_request
+    bulk_request = db.add_bulk_request_progress(
+        session=session,
+        bulk_request_uuid=bulk_request_uuid,
+        processed_amount_cents=single_transferred_amount_cents,
+        partial_success=False
+    )
+    if bulk_request is None:
+        # a transfer sent to the bank before its all-or-nothing bulk request was cancelled (or failed) is paid:
+        # debited on its own, the funds of the bulk request were released by the cancellation
+        bulk_request = db.add_cancelled_bulk_request_progress(
+            session=session,
+            bulk_request_uuid=bulk_request_uuid,
+            processed_amount_cents=single_transferred_amount_cents,
+            partial_success=False
+        )
+        if bulk_request is not None:
+            return _debit_cancelled_transfer(
+                session=session,
+                bulk_request=bulk_request,
+                bank_account_id=bank_account_id,
+                transfer_uuid=transfer_uuid,
+                amount_cents=single_transferred_amount_cents
+            )
+        # partial-success bulk request, or unknown bulk request (no transfer to update)
+        return record_transfer_outcome(
+            session=session,
+            bulk_request_uuid=bulk_request_uuid,
+            bank_account_id=bank_account_id,
+            transfer_uuid=transfer_uuid,
+            amount_cents=single_transferred_amount_cents,
+            success=True
+        )
 
-    bulk_request.processed_amount_cents += single_transferred_amount_cents
-    if bulk_request.processed_amount_cents < bulk_request.total_amount_cents:
-        session.add(bulk_request)
-        logger.info(f"bulk_id={bulk_request_uuid} status={bulk_request.status} not yet fully processed "
-                    f"(processed_amount_cents={bulk_request.processed_amount_cents}|"
-                    f"total_transferred_amounts_cents={bulk_request.total_amount_cents})")
+    if bulk_request.status != db.RequestStatus.COMPLETED:
+        bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+        if log_job:
+            logger.info("bulk_id=%s status=%s not yet fully processed "
+                        "(processed_amount_cents=%d|total_transferred_amounts_cents=%d)",
+                        bulk_request_uuid, bulk_request.status, bulk_request.processed_amount_cents,
+                        bulk_request.total_amount_cents)
         return bulk_request
 
-    account.ongoing_transfer_cents -= bulk_request.total_amount_cents
-    account.balance_cents -= bulk_request.total_amount_cents
-
-    bulk_request.status = db.RequestStatus.COMPLETED
-    bulk_request.completed_at = datetime.datetime.now(datetime.UTC)
-
-    logger.info(f"bulk_id={bulk_request_uuid} bulk_request={bulk_request} completed")
+    db.release_funds(
+        session=session,
+        bank_account_id=bank_account_id,
+        released_cents=bulk_request.total_amount_cents,
+        debited_cents=bulk_request.total_amount_cents
+    )
+    logger.info("bulk_id=%s completed total_amount_cents=%d", bulk_request_uuid, bulk_request.total_amount_cents)
 
-    session.add_all([bulk_request, account])
+    bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+    _observe_completion_after_commit(session=session, bulk_request=bulk_request)
     # todo next: queue a send webhook job
     return bulk_request
 
@@ -130,43 +323,328 @@ def finalize_bulk_transfer(
 def cancel_bulk_transfer(
         session: Session,
         bulk_request: db.BulkRequest,
-        account: db.BankAccount
+        status: db.RequestStatus = db.RequestStatus.FAILED
 ) -> Optional[db.BulkRequest]:
     """
     Cancel a bulk transfer request.
-    Called when an individual transfer has failed (all or nothing).
+    Called when an individual transfer has failed (all or nothing), or when cancelled by the customer.
 
     Args:
         session: Database session (must be in transaction)
-        bulk_request: Bulk request to cancel (must be locked with FOR UPDATE)
-        account: Account being debited
+        bulk_request: Bulk request to cancel (versioned: the commit fails if it was updated concurrently)
+        status: Final status, FAILED or CANCELLED (by the customer)
 
     Returns:
         Updated BulkRequest, None if already cancelled or not found
 
     Financial Logic:
         When bulk transfer request is cancelled:
-        - Clears account.ongoing_transfer_cents
-        - Sets status to CANCELLED
+        - Clears account.ongoing_transfer_cents (of the transfers not finalized yet for partial-success
+          bulk requests, whose pending transfers are cancelled)
+        - All or nothing: debits the transfers already completed (processed_amount_cents), paid by the bank,
+          from account.balance_cents
+        - Sets status to FAILED or CANCELLED
+
+    Side Effects:
+        - Once committed, the queued transfer jobs of the bulk request are purged from the broker
     """
     bulk_request_uuid = bulk_request.request_uuid
-    logger.info(f"bulk_id={bulk_request_uuid} CANCEL account_id={account.id} "
+    logger.info(f"bulk_id={bulk_request_uuid} CANCEL account_id={bulk_request.bank_account_id} "
                 f"total_transfer_amounts={bulk_request.total_amount_cents}")
 
     if not bulk_request:
         logger.warning(f"bulk_id={bulk_request_uuid} not found in database")
         return None
 
-    if bulk_request.status == db.RequestStatus.FAILED:
+    if bulk_request.status in db.FINAL_REQUEST_STATUSES:
         logger.info(f"bulk_id={bulk_request_uuid} already cancelled status={bulk_request.status}")
         return bulk_request
 
-    account.ongoing_transfer_cents -= bulk_request.total_amount_cents
+    if bulk_request.partial_success:
+        db.cancel_pending_transfers(session=session, bulk_request_id=bulk_request.id)
+        released_cents = (
+            bulk_request.total_amount_cents - bulk_request.processed_amount_cents - bulk_request.failed_amount_cents
+        )
+        debited_cents = 0  # debited transfer by transfer
+    else:
+        released_cents = bulk_request.total_amount_cents
+        debited_cents = bulk_request.processed_amount_cents
+    db.release_funds(
+        session=session,
+        bank_account_id=bulk_request.bank_account_id,
+        released_cents=released_cents,
+        debited_cents=debited_cents
+    )
 
-    bulk_request.status = db.RequestStatus.FAILED
+    bulk_request.status = status
     bulk_request.completed_at = datetime.datetime.now(datetime.UTC)
     logger.info(f"bulk_id={bulk_request_uuid} FINALIZE END bulk_request={bulk_request}")
 
-    session.add_all([bulk_request, account])
+    session.add(bulk_request)
+    bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+    _observe_completion_after_commit(session=session, bulk_request=bulk_request)
+    _purge_bulk_jobs_after_commit(session=session, bulk_request=bulk_request)
     # todo next: queue a send webhook job
     return bulk_request
+
+
+def _purge_bulk_jobs_after_commit(session: Session, bulk_request: db.BulkRequest):
+    """
+    Drop the pending transfer jobs of the bulk request once its cancellation is committed, instead of processing
+    (transaction, bank call, finalize job) each of them. Its finalize jobs are still consumed: they apply the
+    outcome of the transfers sent to the bank before the cancellation.
+    """
+    purge_job = PurgeBulkJob(bulk_request_uuid=str(bulk_request.request_uuid), bulk_request_id=bulk_request.id)
+
+    def purge_bulk_jobs():
+        response = FakeBrokerClient().purge_bulk_jobs(job=purge_job)
+        logger.debug("Purged bulk jobs: %s", response)
+
+    # not required: if the purge fails, the transfer jobs are consumed but not sent to the bank, as the status of
+    # their bulk request is final (see transfer_service.process)
+    db.call_after_commit(session=session, callback=purge_bulk_jobs)
+
+
+def record_transfer_outcome(
+        session: Session,
+        bulk_request_uuid: UUID,
+        bank_account_id: int,
+        transfer_uuid: Optional[str],
+        amount_cents: int,
+        success: bool
+) -> Optional[db.BulkRequest]:
+    """
+    Apply the outcome of a transfer of a partial-success bulk request, finalize the bulk request
+    once all its transfers are either completed or failed.
+
+    Args:
+        session: Database session (must be in transaction)
+        bulk_request_uuid: Partial-success bulk request
+        bank_account_id: Account being debited
+        transfer_uuid: Transfer of this outcome
+        amount_cents: Amount of the transfer in cents of the account currency
+        success: Whether the transfer succeeded
+
+    Returns:
+        Updated BulkRequest (as is if the outcome is ignored), None if the bulk request is unknown
+
+    Financial Logic:
+        The amount of each transfer is released from account.ongoing_transfer_cents, and only
+        the amounts of the completed transfers are deducted from account.balance_cents.
+        Final status: COMPLETED, PARTIALLY_COMPLETED or FAILED (no completed transfer).
+        A transfer sent to the bank before its bulk request was cancelled is still debited when it completes
+        (its amount was released by the cancellation).
+    """
+    if transfer_uuid is not None and success and db.update_transfer_status(
+            session=session,
+            transfer_uuid=UUID(transfer_uuid),
+            from_status=db.RequestStatus.CANCELLED,
+            to_status=db.RequestStatus.COMPLETED
+    ):
+        return _record_cancelled_transfer_success(
+            session=session,
+            bulk_request_uuid=bulk_request_uuid,
+            bank_account_id=bank_account_id,
+            transfer_uuid=transfer_uuid,
+            amount_cents=amount_cents
+        )
+    if transfer_uuid is None or not db.update_transfer_status(
+            session=session,
+            transfer_uuid=UUID(transfer_uuid),
+            from_status=db.RequestStatus.PENDING,
+            to_status=db.RequestStatus.COMPLETED if success else db.RequestStatus.FAILED
+    ):
+        # already applied (duplicate job), cancelled or unknown transfer: the amounts must not be counted twice
+        logger.warning("bulk_id=%s transfer_uuid=%s is not pending, outcome ignored", bulk_request_uuid, transfer_uuid)
+        return db.find_bulk_request(session=session, bulk_request_uuid=bulk_request_uuid)
+
+    bulk_request = db.add_bulk_request_progress(
+        session=session,
+        bulk_request_uuid=bulk_request_uuid,
+        processed_amount_cents=amount_cents if success else 0,
+        failed_amount_cents=0 if success else amount_cents
+    )
+    if bulk_request is None:
+        logger.error("bulk_id=%s transfer_uuid=%s pending but bulk request finalized", bulk_request_uuid, transfer_uuid)
+        return db.find_bulk_request(session=session, bulk_request_uuid=bulk_request_uuid)
+
+    db.release_funds(
+        session=session,
+        bank_account_id=bank_account_id,
+        released_cents=amount_cents,
+        debited_cents=amount_cents if success else 0
+    )
+    if bulk_request.status in db.FINAL_REQUEST_STATUSES:
+        logger.info("bulk_id=%s finalized status=%s processed_amount_cents=%d failed_amount_cents=%d",
+                    bulk_request_uuid, bulk_request.status.value, bulk_request.processed_amount_cents,
+                    bulk_request.failed_amount_cents)
+        _observe_completion_after_commit(session=session, bulk_request=bulk_request)
+
+    bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+    return bulk_request
+
+
+def _record_cancelled_transfer_success(
+        session: Session, bulk_request_uuid: UUID, bank_account_id: int, transfer_uuid: str, amount_cents: int
+) -> Optional[db.BulkRequest]:
+    bulk_request = db.add_cancelled_bulk_request_progress(
+        session=session, bulk_request_uuid=bulk_request_uuid, processed_amount_cents=amount_cents
+    )
+    if bulk_request is None:
+        logger.warning("bulk_id=%s transfer_uuid=%s completed after the cancellation of its bulk request, debited",
+                       bulk_request_uuid, transfer_uuid)
+        db.release_funds(
+            session=session, bank_account_id=bank_account_id, released_cents=0, debited_cents=amount_cents
+        )
+        return db.find_bulk_request(session=session, bulk_request_uuid=bulk_request_uuid)
+    return _debit_cancelled_transfer(
+        session=session,
+        bulk_request=bulk_request,
+        bank_account_id=bank_account_id,
+        transfer_uuid=transfer_uuid,
+        amount_cents=amount_cents
+    )
+
+
+def _debit_cancelled_transfer(
+        session: Session,
+        bulk_request: db.BulkRequest,
+        bank_account_id: int,
+        transfer_uuid: Optional[str],
+        amount_cents: int
+) -> db.BulkRequest:
+    """
+    Debit a transfer completed after the cancellation (or failure) of its bulk request, whose progress
+    is recorded already: the reserved funds were released by the cancellation, the bank paid the transfer.
+    """
+    logger.warning("bulk_id=%s transfer_uuid=%s completed after the cancellation of its bulk request, debited",
+                   bulk_request.request_uuid, transfer_uuid)
+    db.release_funds(session=session, bank_account_id=bank_account_id, released_cents=0, debited_cents=amount_cents)
+    bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+    return bulk_request
+
+
+def retry_failed_transfers(
+        session: Session,
+        bulk_request: db.BulkRequest,
+        failed_transfers: List[db.Transfer]
+) -> Optional[int]:
+    """
+    Queue again the failed transfers of a finalized partial-success bulk request.
+
+    Args:
+        session: Database session (must be in transaction)
+        bulk_request: Bulk request to retry (versioned: the commit fails if it was updated concurrently)
+        failed_transfers: FAILED transfers of the bulk request
+
+    Returns:
+        Amount (cents) of the retried transfers, None if the account balance does not cover it
+        on top of the ongoing transfers (nothing is retried)
+
+    Financial Logic:
+        - Reserves the amount of the retried transfers in account.ongoing_transfer_cents
+        - Sets the bulk request status back to PENDING until the retried transfers are finalized
+        - The retried transfers that cannot be queued once committed are failed again (their funds released),
+          and the commit raises db.AfterCommitError
+    """
+    bulk_request_uuid = str(bulk_request.request_uuid)
+    retried_amount_cents = sum(_booked_cents(transfer) for transfer in failed_transfers)
+    if not db.reserve_funds(
+            session=session, bank_account_id=bulk_request.bank_account_id, amount_cents=retried_amount_cents
+    ):
+        return None
+    db.retry_transfers(
+        session=session,
+        bulk_request_id=bulk_request.id,
+        transfer_uuids=[transfer.transfer_uuid for transfer in failed_transfers]
+    )
+
+    bulk_request.failed_amount_cents -= retried_amount_cents
+    bulk_request.status = db.RequestStatus.PENDING
+    bulk_request.completed_at = None
+    session.add(bulk_request)
+    bulk_progress.publish_after_commit(session=session, bulk_request=bulk_request)
+
+    transfer_jobs = [
+        TransferJob(
+            transfer_uuid=str(transfer.transfer_uuid),
+            bulk_request_uuid=bulk_request_uuid,
+            bank_account_id=bulk_request.bank_account_id,
+            counterparty_name=transfer.counterparty_name,
+            counterparty_iban=transfer.counterparty_iban,
+            counterparty_bic=transfer.counterparty_bic,
+            amount_cents=transfer.amount_cents,
+            amount_currency=transfer.amount_currency,
+            description=transfer.description,
+            booked_amount_cents=transfer.booked_amount_cents
+        )
+        for transfer in failed_transfers
+    ]
+
+    bulk_request_id = bulk_request.id
+
+    def queue_retried_transfer_jobs():
+        fake_broker_client = FakeBrokerClient()
+        queued_jobs = 0
+        try:
+            for transfer_job in transfer_jobs:
+                with tracing.start_span("enqueue_transfer_job", attributes={
+                    "transfer_uuid": transfer_job.transfer_uuid, "retry": True
+                }) as span:
+                    transfer_job.trace_id, transfer_job.parent_span_id = span.trace_id, span.span_id
+                    fake_broker_client.queue_transfer_job(job=transfer_job)
+                queued_jobs += 1
+        except Exception as e:
+            _fail_unqueued_transfers(
+                bulk_request_id=bulk_request_id, transfer_jobs=transfer_jobs[queued_jobs:], error=e
+            )
+            raise
+        logger.info("bulk_id=%s queued %d retried transfer jobs", bulk_request_uuid, len(transfer_jobs))
+
+    db.call_after_commit(session=session, callback=queue_retried_transfer_jobs, required=True)
+    return retried_amount_cents
+
+
+def _booked_cents(transfer: db.Transfer) -> int:
+    return transfer.amount_cents if transfer.booked_amount_cents is None else transfer.booked_amount_cents
+
+
+def _fail_unqueued_transfers(bulk_request_id: int, transfer_jobs: List[TransferJob], error: Exception):
+    """
+    Compensate the retried transfers of a partial-success bulk request that could not be queued: each one
+    is FAILED again and its reserved amount released (see record_transfer_outcome), so it can be retried later.
+    """
+    logger.error("bulk_id=%s %d retried transfer jobs could not be queued, failed again: %s",
+                 transfer_jobs[0].bulk_request_uuid, len(transfer_jobs), error)
+
+    def fail_transfers():
+        for transfer_job in transfer_jobs:
+            record_transfer_outcome(
+                session=session,
+                bulk_request_uuid=UUID(transfer_job.bulk_request_uuid),
+                bank_account_id=transfer_job.bank_account_id,
+                transfer_uuid=transfer_job.transfer_uuid,
+                amount_cents=transfer_job.booked_cents(),
+                success=False
+            )
+
+    try:
+        with db.session_for_id(bulk_request_id) as session:
+            db.run_transaction(session=session, work=fail_transfers, operation="fail_unqueued_transfers")
+    except Exception as e:
+        logger.exception("bulk_id=%s retried transfers could not be failed: %s", transfer_jobs[0].bulk_request_uuid, e)
+
+
+def _observe_completion_after_commit(session: Session, bulk_request: db.BulkRequest):
+    created_at, completed_at = bulk_request.created_at, bulk_request.completed_at
+    if created_at.tzinfo is None:  # read back from SQLite without time zone
+        created_at = created_at.replace(tzinfo=datetime.UTC)
+    if completed_at.tzinfo is None:  # returned by an atomic update
+        completed_at = completed_at.replace(tzinfo=datetime.UTC)
+    completion_seconds = (completed_at - created_at).total_seconds()
+    status = bulk_request.status.value
+
+    db.call_after_commit(
+        session=session,
+        callback=lambda: metrics.BULK_COMPLETION_SECONDS.labels(status).observe(completion_seconds)
+    )
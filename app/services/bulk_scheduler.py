@@ -0,0 +1,293 @@
+"""
+Scheduled bulk transfers (`execute_at`): the validated credit transfers are stored until their execution date,
+then released as regular bulk requests (funds reservation and transfer jobs) by the dispatcher.
+
+The dispatcher does not poll the table: it keeps the next scheduled bulks in a heap (a window over the
+`scheduled_bulks` index, refilled when half consumed), sleeps until the first one is due, and releases the due
+bulks in batches of one transaction each. Bulks scheduled by the process are pushed to the heap (and wake the
+dispatcher up) once committed.
+"""
+import datetime
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.migrations.shards import shard_of_id
+from app.models import db
+from app.models.adapter import CreditTransfer
+from app.services import bulk_request_service, bulk_templates
+from app.utils import tracing
+from app.utils.log_formatter import get_logger
+
+
+# Next scheduled bulks kept in memory: the end-of-month payrolls are released without querying the table again
+SCHEDULE_WINDOW_SIZE = 1000
+# Due bulks released per transaction
+RELEASE_BATCH_SIZE = 50
+# Upper bound of a sleep: the bulks scheduled beyond the window by another process are loaded on wake-up
+MAX_SLEEP_SECONDS = 60.0
+RETRY_DELAY_SECONDS = 1.0
+
+
+logger = get_logger(__name__)
+
+
+ScheduleKey = Tuple[datetime.datetime, int]  # (execute_at, scheduled bulk id)
+
+
+def utc_now() -> datetime.datetime:
+    """
+    Naive UTC now: SQLite stores the datetimes without their timezone.
+    """
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def to_utc(value: datetime.datetime) -> datetime.datetime:
+    """
+    Naive UTC datetime of `value` (naive datetimes are UTC already).
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.UTC).replace(tzinfo=None)
+
+
+def scheduled_execution_date(execute_at: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """
+    Naive UTC execution date of a bulk to schedule, None if it is executed right away (no or past `execute_at`).
+    """
+    if execute_at is None:
+        return None
+    execute_at = to_utc(execute_at)
+    return execute_at if execute_at > utc_now() else None  # due already
+
+
+def schedule_bulk(
+        session: Session,
+        bulk_request_uuid: UUID,
+        bank_account_id: int,
+        execute_at: datetime.datetime,
+        credit_transfers: List[CreditTransfer],
+        amounts: List[int],
+        amounts_in_cents: List[int],
+        partial_success: bool = False
+) -> db.ScheduledBulk:
+    """
+    Store validated credit transfers to be released as a bulk request at `execute_at`.
+
+    The funds are not reserved until then: the balance is checked on the execution date. The amounts are
+    converted to the account currency when scheduled (`amounts_in_cents`).
+    """
+    scheduled_bulk = db.create_scheduled_bulk(
+        session=session,
+        request_uuid=bulk_request_uuid,
+        bank_account_id=bank_account_id,
+        execute_at=to_utc(execute_at),
+        partial_success=partial_success,
+        transfer_count=len(credit_transfers),
+        total_amount_cents=sum(amounts_in_cents),
+        payload=bulk_templates.pack_template(
+            credit_transfers=credit_transfers, amounts=amounts, amounts_in_cents=amounts_in_cents
+        )
+    )
+    session.flush()
+    key = (scheduled_bulk.execute_at, scheduled_bulk.id)
+    db.call_after_commit(session=session, callback=lambda: BULK_DISPATCHER.notify(key))
+    return scheduled_bulk
+
+
+def release_scheduled_bulks(session: Session, scheduled_bulk_ids: List[int]) -> int:
+    """
+    Release due scheduled bulks as bulk requests, in one transaction.
+
+    A bulk whose account is unknown or whose balance does not cover it on top of the ongoing transfers is FAILED.
+    Each bulk is released in its own savepoint: a bulk whose release raises is FAILED, without rolling back
+    the other bulks of the batch.
+
+    Returns:
+        Number of bulk requests created
+    """
+    released = 0
+    with session.begin():
+        for scheduled_bulk in db.claim_scheduled_bulks(session=session, scheduled_bulk_ids=scheduled_bulk_ids):
+            request_uuid = scheduled_bulk.request_uuid  # read before a rollback of the savepoint expires it
+            try:
+                with db.savepoint(session=session):
+                    is_released = _release_scheduled_bulk(session=session, scheduled_bulk=scheduled_bulk)
+            except Exception as e:
+                logger.exception(f"bulk_id={request_uuid} scheduled bulk failed as its release raised: {e}")
+                is_released = False
+            if is_released:
+                released += 1
+            else:
+                db.update_scheduled_bulk_status(
+                    session=session,
+                    request_uuid=request_uuid,
+                    status=db.ScheduledBulkStatus.FAILED,
+                    from_status=db.ScheduledBulkStatus.RELEASED
+                )
+    return released
+
+
+def _release_scheduled_bulk(session: Session, scheduled_bulk: db.ScheduledBulk) -> bool:
+    bulk_id = str(scheduled_bulk.request_uuid)
+    with tracing.start_span("release_scheduled_bulk", attributes={
+        "bulk_request_uuid": bulk_id, "transfer_count": scheduled_bulk.transfer_count
+    }):
+        if db.find_bulk_request(session=session, bulk_request_uuid=scheduled_bulk.request_uuid) is not None:
+            logger.error(f"bulk_id={bulk_id} scheduled bulk failed as the request was already processed")
+            return False
+        account = db.find_account_by_id(session=session, bank_account_id=scheduled_bulk.bank_account_id)
+        if account is None:
+            logger.error(f"bulk_id={bulk_id} scheduled bulk failed as account {scheduled_bulk.bank_account_id} "
+                         f"is unknown")
+            return False
+        transfers = bulk_templates.unpack_transfers(scheduled_bulk.payload)
+        bulk_request = bulk_request_service.schedule_transfers(
+            session=session,
+            bulk_request_uuid=bulk_id,
+            account=account,
+            total_transfer_amounts_cents=scheduled_bulk.total_amount_cents,
+            credit_transfers=bulk_templates.build_credit_transfers(transfers=transfers),
+            amounts=[transfer[3] for transfer in transfers],
+            # the bulks scheduled without their converted amounts were in the account currency
+            amounts_in_cents=[transfer[6] if len(transfer) > 6 else transfer[3] for transfer in transfers],
+            partial_success=scheduled_bulk.partial_success
+        )
+    if bulk_request is None:
+        logger.error(f"bulk_id={bulk_id} scheduled bulk failed as account balance is insufficient "
+                     f"for ongoing operations")
+        return False
+    logger.info(f"bulk_id={bulk_id} scheduled bulk released ({scheduled_bulk.transfer_count} transfers, "
+                f"scheduled at {scheduled_bulk.execute_at.isoformat()})")
+    return True
+
+
+def _release(scheduled_bulk_ids: List[int]) -> int:
+    # one transaction per shard (the shard of a scheduled bulk is known from its id)
+    ids_by_shard: Dict[int, List[int]] = {}
+    for scheduled_bulk_id in scheduled_bulk_ids:
+        ids_by_shard.setdefault(shard_of_id(scheduled_bulk_id), []).append(scheduled_bulk_id)
+    released = 0
+    for ids in ids_by_shard.values():
+        with db.session_for_id(ids[0]) as session:
+            released += release_scheduled_bulks(session=session, scheduled_bulk_ids=ids)
+    return released
+
+
+def _load(after: Optional[ScheduleKey], limit: int) -> List[ScheduleKey]:
+    keys = []
+    for engine in db.shard_engines():
+        with Session(engine) as session:
+            with session.begin():
+                keys.append(db.list_next_scheduled_bulks(session=session, after=after, limit=limit))
+    return list(itertools.islice(heapq.merge(*keys), limit))
+
+
+class ScheduledBulkDispatcher:
+    """
+    Releases the scheduled bulks when due, from a heap of the next ones.
+
+    Invariant: every SCHEDULED bulk whose key (execute_at, id) is at most `_loaded_until` is in the heap,
+    the next ones are loaded when the heap is half consumed.
+    """
+
+    def __init__(
+            self,
+            release: Callable[[List[int]], int] = _release,
+            load: Callable[[Optional[ScheduleKey], int], List[ScheduleKey]] = _load,
+            clock: Callable[[], datetime.datetime] = utc_now,
+            window_size: int = SCHEDULE_WINDOW_SIZE,
+            batch_size: int = RELEASE_BATCH_SIZE
+    ):
+        self._release = release
+        self._load = load
+        self._clock = clock
+        self._window_size = window_size
+        self._batch_size = batch_size
+        self._heap: List[ScheduleKey] = []
+        self._loaded_until: Optional[ScheduleKey] = None
+        self._wakeup = threading.Condition()
+        self._notified = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self, key: ScheduleKey):
+        """
+        A bulk was scheduled (committed): pushed to the heap if within the loaded window, loaded later otherwise.
+        """
+        with self._wakeup:
+            if self._loaded_until is not None and key <= self._loaded_until:
+                heapq.heappush(self._heap, key)
+            self._notified = True
+            self._wakeup.notify()
+
+    def _refill(self):
+        if len(self._heap) >= self._window_size // 2:
+            return
+        keys = self._load(self._loaded_until, self._window_size - len(self._heap))
+        for key in keys:
+            heapq.heappush(self._heap, key)
+        if keys:
+            self._loaded_until = keys[-1]
+
+    def run_pending(self) -> Optional[float]:
+        """
+        Release the due bulks, batch by batch.
+
+        Returns:
+            Seconds until the next scheduled bulk, None if no bulk is scheduled
+        """
+        while True:
+            with self._wakeup:
+                self._refill()
+                now = self._clock()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self._batch_size:
+                    due.append(heapq.heappop(self._heap)[1])
+                if not due:
+                    return (self._heap[0][0] - now).total_seconds() if self._heap else None
+            released = self._release(due)
+            logger.info(f"Released {released}/{len(due)} due scheduled bulks")
+
+    def _run(self):
+        while True:
+            try:
+                delay = self.run_pending()
+            except Exception as e:  # e.g. database locked: due bulks are loaded again from the table
+                logger.error(f"Could not release scheduled bulks: {e}")
+                with self._wakeup:
+                    self._heap.clear()
+                    self._loaded_until = None
+                delay = RETRY_DELAY_SECONDS
+            with self._wakeup:
+                if not self._notified and not self._stopped:
+                    self._wakeup.wait(timeout=MAX_SLEEP_SECONDS if delay is None else min(delay, MAX_SLEEP_SECONDS))
+                self._notified = False
+                if self._stopped:
+                    return
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="scheduled-bulk-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        self._thread.join()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+BULK_DISPATCHER = ScheduledBulkDispatcher()
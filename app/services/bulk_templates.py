@@ -0,0 +1,237 @@
+import json
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.amounts.converters import FxRates, to_amount_str, to_minor_units
+from app.models import db
+from app.models.adapter import CreditTransfer, TemplateLineOverride
+from app.services import fx_rates
+
+
+TEMPLATE_FORMAT_VERSION = 1
+# Decoded templates kept in memory: a template is executed again and again (every month for a payroll)
+DECODED_TEMPLATES_CACHE_SIZE = 256
+
+
+class InvalidOverrideError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class DecodedTemplate:
+    template_uuid: str
+    bank_account_id: int
+    total_amount_cents: int  # in the account currency, when the template was created
+    # [counterparty_name, counterparty_iban, counterparty_bic, amount (minor units of currency), currency, description]
+    transfers: List[list]
+
+
+@dataclass(frozen=True)
+class TemplateExecution:
+    credit_transfers: List[CreditTransfer]
+    amounts: List[int]  # minor units of the currency of each credit transfer
+    # in the account currency, converted at the FX rates of the execution
+    amounts_in_cents: List[int]
+    total_amount_cents: int
+
+
+def pack_template(
+        credit_transfers: List[CreditTransfer], amounts: List[int], amounts_in_cents: Optional[List[int]] = None
+) -> bytes:
+    """
+    Pack the validated transfers of a template as compact JSON arrays with their amount in minor units of
+    their currency, compressed with zlib (same layout as the bulk manifests, without transfer ids).
+
+    The amounts converted to the account currency already (scheduled bulks) are appended to their lines.
+    """
+    template = {
+        "version": TEMPLATE_FORMAT_VERSION,
+        "transfers": [
+            [
+                credit_transfer.counterparty_name, credit_transfer.counterparty_iban, credit_transfer.counterparty_bic,
+                amount, credit_transfer.currency, credit_transfer.description
+            ]
+            for credit_transfer, amount in zip(credit_transfers, amounts)
+        ]
+    }
+    if amounts_in_cents is not None:
+        for transfer, amount_cents in zip(template["transfers"], amounts_in_cents):
+            transfer.append(amount_cents)
+    return zlib.compress(json.dumps(template, separators=(",", ":")).encode())
+
+
+def unpack_transfers(payload: bytes) -> List[list]:
+    """
+    Packed transfers of a template (or of a scheduled bulk), see `pack_template`.
+    """
+    template = json.loads(zlib.decompress(payload))
+    if template["version"] != TEMPLATE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported template version: {template['version']}")
+    return template["transfers"]
+
+
+def unpack_template(bulk_template: db.BulkTemplate) -> DecodedTemplate:
+    transfers = unpack_transfers(bulk_template.payload)
+    for transfer in transfers:  # the strings are shared by the jobs of every execution
+        for position in (0, 1, 2, 4, 5):
+            transfer[position] = sys.intern(transfer[position])
+    return DecodedTemplate(
+        template_uuid=str(bulk_template.template_uuid),
+        bank_account_id=bulk_template.bank_account_id,
+        total_amount_cents=bulk_template.total_amount_cents,
+        transfers=transfers
+    )
+
+
+class TemplateCache:
+    """
+    LRU cache of decoded templates: templates are immutable, so a template is loaded
+    and decompressed once for all its executions.
+    """
+
+    def __init__(self, max_size: int = DECODED_TEMPLATES_CACHE_SIZE):
+        self._max_size = max_size
+        self._templates: OrderedDict[UUID, DecodedTemplate] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, template_uuid: UUID) -> Optional[DecodedTemplate]:
+        with self._lock:
+            template = self._templates.get(template_uuid)
+            if template is not None:
+                self._templates.move_to_end(template_uuid)
+                return template
+
+        bulk_template = db.find_bulk_template(session=session, template_uuid=template_uuid)
+        if bulk_template is None:
+            return None
+        template = unpack_template(bulk_template)
+
+        with self._lock:
+            self._templates[template_uuid] = template
+            if len(self._templates) > self._max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def cached(self, template_uuid: UUID) -> Optional[DecodedTemplate]:
+        with self._lock:
+            return self._templates.get(template_uuid)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+TEMPLATE_CACHE = TemplateCache()
+
+
+def create_template(
+        session: Session,
+        template_uuid: UUID,
+        bank_account_id: int,
+        credit_transfers: List[CreditTransfer],
+        amounts: List[int],
+        total_amount_cents: int
+) -> db.BulkTemplate:
+    """
+    Store credit transfers already validated (amounts and counterparties) as a template.
+
+    Args:
+        amounts: amounts of the credit transfers in minor units of their currency
+        total_amount_cents: total in the account currency
+    """
+    return db.create_bulk_template(
+        session=session,
+        template_uuid=template_uuid,
+        bank_account_id=bank_account_id,
+        transfer_count=len(credit_transfers),
+        total_amount_cents=total_amount_cents,
+        payload=pack_template(credit_transfers=credit_transfers, amounts=amounts)
+    )
+
+
+def apply_overrides(
+        template: DecodedTemplate,
+        overrides: List[TemplateLineOverride],
+        fx_rates_snapshot: Optional[FxRates] = None
+) -> TemplateExecution:
+    """
+    Credit transfers of an execution of the template: only the overridden amounts are converted and validated,
+    the other lines were validated when the template was created. The lines in another currency than the account
+    one are converted at the current FX rates.
+
+    Raises:
+        InvalidOverrideError: unknown line, line overridden twice, or invalid amount
+        UnsupportedCurrencyError: no FX rate for one of the currencies
+    """
+    amounts = [transfer[3] for transfer in template.transfers]
+    descriptions = [transfer[5] for transfer in template.transfers]
+    total_amount_cents = template.total_amount_cents
+
+    overridden_indexes = set()
+    for position, override in enumerate(overrides):
+        if override.index >= len(template.transfers):
+            raise InvalidOverrideError(
+                f"overrides[{position}]: Unknown line {override.index} (template of {len(template.transfers)} transfers)"
+            )
+        if override.index in overridden_indexes:
+            raise InvalidOverrideError(f"overrides[{position}]: Line {override.index} overridden twice")
+        overridden_indexes.add(override.index)
+
+        if override.amount is not None:
+            try:
+                amount = to_minor_units(amount_str=override.amount, currency=template.transfers[override.index][4])
+            except ValueError as e:
+                raise InvalidOverrideError(f"overrides[{position}]: {e}")
+            if amount <= 0:
+                raise InvalidOverrideError(f"overrides[{position}]: Amount should be strictly greater than zero")
+            total_amount_cents += amount - amounts[override.index]
+            amounts[override.index] = amount
+        if override.description is not None:
+            descriptions[override.index] = override.description
+
+    credit_transfers = build_credit_transfers(transfers=template.transfers, amounts=amounts, descriptions=descriptions)
+    converted_bulk = fx_rates.to_account_currency(
+        credit_transfers=credit_transfers, amounts=amounts, fx_rates=fx_rates_snapshot
+    )
+    if converted_bulk.fx_rates_version is not None:  # the total of the template is in the account currency
+        total_amount_cents = sum(converted_bulk.amounts_in_cents)
+    return TemplateExecution(
+        credit_transfers=credit_transfers,
+        amounts=amounts,
+        amounts_in_cents=converted_bulk.amounts_in_cents,
+        total_amount_cents=total_amount_cents
+    )
+
+
+def build_credit_transfers(
+        transfers: List[list],
+        amounts: Optional[List[int]] = None,
+        descriptions: Optional[List[str]] = None
+) -> List[CreditTransfer]:
+    """
+    Credit transfers of packed transfers, with their packed amounts and descriptions unless given.
+    """
+    if amounts is None:
+        amounts = [transfer[3] for transfer in transfers]
+    if descriptions is None:
+        descriptions = [transfer[5] for transfer in transfers]
+    # fields were validated when the transfers were packed
+    return [
+        CreditTransfer.model_construct(
+            amount=to_amount_str(amount, currency),
+            currency=currency,
+            counterparty_name=name,
+            counterparty_bic=bic,
+            counterparty_iban=iban,
+            description=description
+        )
+        for (name, iban, bic, _, currency, _, *_), amount, description
+        in zip(transfers, amounts, descriptions)
+    ]
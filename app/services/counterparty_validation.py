@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.counterparties.validators import validate_bic, validate_iban
+from app.models.adapter import CreditTransfer
+
+
+# Counterparties validated by the process: the recipients of recurring bulks (e.g. payroll) repeat every month
+VALIDATED_COUNTERPARTIES_CACHE_SIZE = 100_000
+
+CounterpartyKey = Tuple[str, str]  # (iban, bic) as submitted
+
+
+@dataclass(frozen=True)
+class InvalidCounterparty:
+    index: int  # of the credit transfer in the bulk
+    error: str
+
+
+class CounterpartyValidationCache:
+    """
+    LRU cache of the validation result (error, None if valid) of the counterparties: the validation
+    is a pure function of the (iban, bic) pair. A bulk is looked up and stored in one lock acquisition each.
+    """
+
+    def __init__(self, max_size: int = VALIDATED_COUNTERPARTIES_CACHE_SIZE):
+        self._max_size = max_size
+        self._results: OrderedDict[CounterpartyKey, Optional[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[CounterpartyKey]) -> Dict[CounterpartyKey, Optional[str]]:
+        """
+        Returns:
+            Validation result of the cached keys (missing keys are not in the result)
+        """
+        cached_results = {}
+        with self._lock:
+            for key in keys:
+                if key in self._results:
+                    self._results.move_to_end(key)
+                    cached_results[key] = self._results[key]
+        return cached_results
+
+    def put_many(self, results: Dict[CounterpartyKey, Optional[str]]):
+        with self._lock:
+            self._results.update(results)
+            while len(self._results) > self._max_size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+COUNTERPARTY_VALIDATION_CACHE = CounterpartyValidationCache()
+
+
+def _validate_counterparty(iban: str, bic: str) -> Optional[str]:
+    try:
+        validate_iban(iban)
+        validate_bic(bic)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def validate_counterparties(
+        credit_transfers: List[CreditTransfer],
+        cache: CounterpartyValidationCache = COUNTERPARTY_VALIDATION_CACHE
+) -> List[InvalidCounterparty]:
+    """
+    Validate the IBAN (mod-97) and the BIC of the counterparties of a whole bulk in one pass:
+    each distinct counterparty is validated once, and only if it was not validated by a previous bulk.
+
+    Returns:
+        Invalid counterparties, in the order of the credit transfers (empty if all are valid)
+    """
+    keys = [
+        (credit_transfer.counterparty_iban, credit_transfer.counterparty_bic) for credit_transfer in credit_transfers
+    ]
+    distinct_keys = set(keys)
+    results = cache.get_many(distinct_keys)
+    missing_results = {
+        key: _validate_counterparty(iban=key[0], bic=key[1]) for key in distinct_keys if key not in results
+    }
+    if missing_results:
+        cache.put_many(missing_results)
+        results.update(missing_results)
+
+    return [
+        InvalidCounterparty(index=index, error=results[key])
+        for index, key in enumerate(keys)
+        if results[key] is not None
+    ]
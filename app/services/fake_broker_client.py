@@ -1,14 +1,24 @@
+from functools import lru_cache
 from typing import Type, Optional
 from pydantic import BaseModel
 
-from app.models.job import TransferJob, BulkJob
+from app.models.job import TransferJob, BulkJob, ManifestJob, PurgeBulkJob
+
+
+@lru_cache(maxsize=1)
+def _broker_test_client():
+    # The fake broker endpoints are served in-process by a worker-mode application (no public API routers),
+    # built once on first use rather than on each client instantiation.
+    from dataclasses import replace
+    from fastapi.testclient import TestClient
+    from app.factory import create_app
+    from app.settings import AppMode, get_settings
+    return TestClient(create_app(replace(get_settings(), mode=AppMode.WORKER, run_migrations_on_startup=False)))
 
 
 class FakeBrokerClient:
     def __init__(self):
-        from app.main import app
-        from fastapi.testclient import TestClient
-        self.client = TestClient(app)
+        self.client = _broker_test_client()
 
     def _post_json(self, endpoint: str, payload: dict) -> dict:
         response = self.client.post(f"/internal/jobs/{endpoint.lstrip('/')}", json=payload)
@@ -24,9 +34,15 @@ class FakeBrokerClient:
     def queue_transfer_job(self, job: TransferJob) -> dict:
         return self._post_json("/transfer", job.model_dump())
 
+    def queue_manifest_transfer_jobs(self, job: ManifestJob) -> dict:
+        return self._post_json("/transfer/manifest", job.model_dump())
+
     def queue_finalize_bulk_job(self, job: BulkJob) -> dict:
         return self._post_json("/bulk", job.model_dump())
 
+    def purge_bulk_jobs(self, job: PurgeBulkJob) -> dict:
+        return self._post_json("/bulk/purge", job.model_dump())
+
     def consume_transfer_job(self) -> Optional[TransferJob]:
         return self._get_json("/transfer", TransferJob)
 
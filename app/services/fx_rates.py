@@ -0,0 +1,92 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from app.amounts.converters import FxRates
+from app.amounts.currencies import ACCOUNT_CURRENCY
+from app.models import db
+from app.models.adapter import CreditTransfer
+from app.settings import get_settings
+
+
+@dataclass(frozen=True)
+class ConvertedBulk:
+    # amounts of the credit transfers in cents of the account currency: reserved, debited and booked
+    amounts_in_cents: List[int]
+    fx_rates_version: Optional[int]  # None if all the credit transfers are in the account currency
+
+
+class FxRateCache:
+    """
+    FX rates of the process, loaded from the `fx_rates` table: the snapshot is checked at most once per TTL,
+    with a MAX(version) query, and the rates are reloaded only if their version changed meanwhile (or if the
+    application uses another database).
+
+    Snapshots are immutable: a bulk is converted against the snapshot it got, even if the rates are
+    reloaded during its validation.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._ttl_seconds = ttl_seconds  # FX_RATES_TTL_SECONDS if None
+        self._clock = clock
+        self._rates: Optional[FxRates] = None
+        self._engine: Optional[Engine] = None  # of the rates
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def snapshot(self) -> FxRates:
+        with self._lock:  # a single check at a time: no stampede of queries when the TTL expires
+            now = self._clock()
+            engine = db.shard_engines()[0]  # reference data: read from the first shard in the sharded layout
+            if self._rates is not None and engine is self._engine and now < self._expires_at:
+                return self._rates
+            with Session(engine) as session:
+                if (self._rates is None or engine is not self._engine
+                        or db.fx_rates_version(session=session) != self._rates.version):
+                    version, rates = db.load_fx_rates(session=session)
+                    self._rates = FxRates(version=version, rates=rates)
+                    self._engine = engine
+                    self.loads += 1
+            ttl_seconds = self._ttl_seconds if self._ttl_seconds is not None else get_settings().fx_rates_ttl_seconds
+            self._expires_at = now + ttl_seconds
+            return self._rates
+
+    def clear(self):
+        with self._lock:
+            self._rates = None
+            self._engine = None
+            self._expires_at = 0.0
+
+
+FX_RATE_CACHE = FxRateCache()
+
+
+def to_account_currency(
+        credit_transfers: List[CreditTransfer],
+        amounts: Sequence[int],
+        fx_rates: Optional[FxRates] = None
+) -> ConvertedBulk:
+    """
+    Convert the amounts of a bulk (in minor units of the currency of each credit transfer) to cents of the
+    account currency, in one pass against a single rates snapshot.
+
+    The converted amounts are only reserved, debited and booked in the account currency: the credit transfers
+    keep their amount and currency, paid as is to the counterparties.
+
+    Raises:
+        UnsupportedCurrencyError: no rate for one of the currencies
+    """
+    currencies = [credit_transfer.currency for credit_transfer in credit_transfers]
+    if set(currencies) <= {ACCOUNT_CURRENCY}:  # no rate needed
+        return ConvertedBulk(amounts_in_cents=list(amounts), fx_rates_version=None)
+    if fx_rates is None:
+        fx_rates = FX_RATE_CACHE.snapshot()
+    return ConvertedBulk(
+        amounts_in_cents=fx_rates.to_account_cents(amounts=amounts, currencies=currencies),
+        fx_rates_version=fx_rates.version
+    )
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Callable, Optional
 from uuid import UUID
 
 from sqlmodel import Session
@@ -6,13 +6,18 @@ from sqlmodel import Session
 from app.models import db
 from app.services.fake_broker_client import FakeBrokerClient
 from app.models.job import TransferJob, BulkJob
-from app.utils.log_formatter import get_logger
+from app.utils import tracing
+from app.utils.log_formatter import JOB_LOG_SAMPLER, get_logger
 
 
 logger = get_logger(__name__)
 
+_SENT_TO_BANK_KEY = "sent_to_bank_transfer_uuid"
 
-def process(session: Session, transfer_job: TransferJob) -> Optional[db.Transaction]:
+
+def process(
+        session: Session, transfer_job: TransferJob, before_bank_call: Optional[Callable[[], None]] = None
+) -> Optional[db.Transaction]:
     """
     Process an individual transfer job atomically.
 
@@ -22,70 +27,116 @@ def process(session: Session, transfer_job: TransferJob) -> Optional[db.Transact
     Args:
         session: Database session for atomic operations (must be in transaction)
         transfer_job: Transfer job containing all transfer details
+        before_bank_call: Called right before the transfer is sent to the bank (e.g. acknowledge the job so it
+            is not delivered again), the transfer is not sent if it raises
 
     Returns:
-        Transaction record if successful, None if failed or already processed
+        Transaction record if successful, None if failed, already processed or its bulk request finalized
 
     Side Effects:
-        - Creates transaction record in database
+        - Creates transaction record in database (discarded if the transfer failed)
         - Calls external bank system for fund transfer
-        - Queues bulk finalization job (success or failure)
+        - Queues bulk finalization job (success or failure) once the transaction is committed
 
     Idempotency:
         Safe to retry - checks for existing transaction by transfer_uuid
     """
+    session.info.pop(_SENT_TO_BANK_KEY, None)
     account = session.get(db.BankAccount, transfer_job.bank_account_id)
     if not account:
-        logger.error(f"bulk_id={transfer_job.bulk_request_uuid} could not process request as account unknown")
+        logger.error("bulk_id=%s could not process request as account unknown", transfer_job.bulk_request_uuid)
+        return None
+
+    # the tombstones of the broker are per process, and only set once the purge after the cancellation succeeded:
+    # the status read here is the one the transaction commits against
+    bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=UUID(transfer_job.bulk_request_uuid))
+    if bulk_request is None or bulk_request.status in db.FINAL_REQUEST_STATUSES:
+        logger.warning("bulk_id=%s is %s, transfer %s not sent to the bank", transfer_job.bulk_request_uuid,
+                       bulk_request.status.value if bulk_request else "unknown", transfer_job.transfer_uuid)
         return None
 
     already_processed_transaction = db.find_transfer_transaction(
         session=session, transfer_uuid=UUID(transfer_job.transfer_uuid)
     )
     if already_processed_transaction:
-        logger.error(f"bulk_id={transfer_job.bulk_request_uuid} transaction {transfer_job.transfer_uuid} "
-                     f"already processed")
+        logger.error("bulk_id=%s transaction %s already processed",
+                     transfer_job.bulk_request_uuid, transfer_job.transfer_uuid)
         return None
 
-    logger.info(f"bulk_id={transfer_job.bulk_request_uuid} account balance={account.balance_cents} "
-                f"| ongoing transfers={account.ongoing_transfer_cents}")
+    log_job = JOB_LOG_SAMPLER.sample()
+    if log_job:
+        logger.info("bulk_id=%s account balance=%d | ongoing transfers=%d",
+                    transfer_job.bulk_request_uuid, account.balance_cents, account.ongoing_transfer_cents)
 
     transaction = db.create_transfer_transaction(session=session, transfer_job_data=transfer_job)
 
-    logger.info(f"bulk_id={transfer_job.bulk_request_uuid} transfer_uuid={transaction.transfer_uuid} "
-                f"transaction recorded amount={transaction.amount_cents}")
+    if log_job:
+        logger.info("bulk_id=%s transfer_uuid=%s transaction recorded amount=%d",
+                    transfer_job.bulk_request_uuid, transfer_job.transfer_uuid, transaction.amount_cents)
 
-    fake_broker_client = FakeBrokerClient()
-    is_remote_transfer_successful = transfer_funds(transfer_job=transfer_job)
+    if before_bank_call is not None:
+        before_bank_call()
+    # from here, the transfer may be paid even if the transaction is rolled back (see sent_to_bank)
+    session.info[_SENT_TO_BANK_KEY] = transfer_job.transfer_uuid
+    with tracing.start_span("transfer_funds", attributes={"transfer_uuid": transfer_job.transfer_uuid}):
+        is_remote_transfer_successful = transfer_funds(transfer_job=transfer_job)
     if not is_remote_transfer_successful:
-        cancel_bulk_job = BulkJob(
-            bulk_request_uuid=transfer_job.bulk_request_uuid,
-            bank_account_id=account.id,
-            single_transferred_amount_cents=transfer_job.amount_cents,
-            success=False
+        db.discard_transfer_transaction(session=session, transfer_transaction=transaction)
+        _queue_finalize_bulk_job_after_commit(
+            session=session, transfer_job=transfer_job, bank_account_id=account.id, success=False, log_job=log_job
         )
-        response = fake_broker_client.queue_finalize_bulk_job(job=cancel_bulk_job)
-        logger.debug(f"queued cancel bulk request job: {response}")
         return None
 
-    success_bulk_job = BulkJob(
-        bulk_request_uuid=transfer_job.bulk_request_uuid,
-        bank_account_id=account.id,
-        single_transferred_amount_cents=transfer_job.amount_cents,
-        success=True
+    _queue_finalize_bulk_job_after_commit(
+        session=session, transfer_job=transfer_job, bank_account_id=account.id, success=True, log_job=log_job
     )
-    response = fake_broker_client.queue_finalize_bulk_job(job=success_bulk_job)
-    logger.info(f"queued complete bulk request job: {response}")
-
     return transaction
 
 
+def sent_to_bank(session: Session) -> bool:
+    """
+    The transfer processed in the session was sent to the bank: if its transaction is rolled back afterwards,
+    processing the transfer job again would pay it twice (the idempotency check finds no transaction).
+    """
+    return _SENT_TO_BANK_KEY in session.info
+
+
+def _queue_finalize_bulk_job_after_commit(
+        session: Session, transfer_job: TransferJob, bank_account_id: int, success: bool, log_job: bool
+):
+    """
+    Queue the finalize job once the transaction of the transfer is committed: with the queue shared by the worker
+    processes, the bulk request could otherwise be finalized (and debited) before the transaction is, or even
+    if it is rolled back.
+    """
+    enqueue_span = tracing.start_span("enqueue_finalize_bulk_job", attributes={"success": success})
+
+    def queue_finalize_bulk_job():
+        with enqueue_span as span:
+            bulk_job = BulkJob(
+                bulk_request_uuid=transfer_job.bulk_request_uuid,
+                bank_account_id=bank_account_id,
+                single_transferred_amount_cents=transfer_job.booked_cents(),
+                success=success,
+                transfer_uuid=transfer_job.transfer_uuid,
+                trace_id=span.trace_id,
+                parent_span_id=span.span_id
+            )
+            response = FakeBrokerClient().queue_finalize_bulk_job(job=bulk_job)
+        if not success:
+            logger.debug("queued cancel bulk request job: %s", response)
+        elif log_job:
+            logger.info("queued complete bulk request job: %s", response)
+
+    db.call_after_commit(session=session, callback=queue_finalize_bulk_job)
+
+
 def transfer_funds(transfer_job: TransferJob) -> bool:
     # return False  # Simulate failure
-    logger.info(f"Fake transfer to external system: {transfer_job.transfer_uuid}")
+    logger.debug("Fake transfer to external system: %s", transfer_job.transfer_uuid)
     try:
         # Assume it works:
         return True
     except Exception as e:  # timeout, etc.
-        logger.error(f"Failed to transfer {transfer_job.transfer_uuid} to external system: {e}")
+        logger.error("Failed to transfer %s to external system: %s", transfer_job.transfer_uuid, e)
         return False
@@ -0,0 +1,107 @@
+import os
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+
+class AppMode(str, Enum):
+    """
+    API: public API and internal job endpoints, WORKER: internal job endpoints only.
+    """
+    API = "api"
+    WORKER = "worker"
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    mode: AppMode = AppMode.API
+    database_path: str = "./qonto_accounts.sqlite"
+    # Sharded layout (one SQLite file per group of accounts, see app.migrations.shards), database_path unused
+    shards_dir: Optional[str] = None
+    shard_count: int = 1
+    # SQLite job queue shared with the `python -m app.worker` processes, in-memory queues if None
+    job_queue_path: Optional[str] = None
+    worker_processes: int = 1
+    log_level: str = "DEBUG"
+    log_format: str = "color"  # color or json
+    log_levels: str = ""  # per logger levels, e.g. "app.routers.fake_broker=WARNING,app.services=INFO"
+    log_async: bool = True
+    job_log_sample_rate: float = 1.0
+    job_log_max_per_second: Optional[float] = None
+    run_migrations_on_startup: bool = True
+    # Store the transfers of a bulk once (manifest) and queue (bulk, index) references instead of full jobs
+    bulk_manifest_mode: bool = False
+    # Release the scheduled bulks (`execute_at`) when due, in the API process
+    scheduled_bulks_dispatcher: bool = True
+    # FX rates cached by the process, their version is checked again after this delay
+    fx_rates_ttl_seconds: float = 60.0
+    # OTLP/JSON spans file, the trace context is only propagated if None
+    trace_spans_path: Optional[str] = None
+    trace_spans_max_bytes: int = 10_000_000
+    trace_spans_backup_count: int = 5
+    # Profiles directory, profiling is disabled if None
+    profile_dir: Optional[str] = None
+    profile_sample_rate: float = 0.0
+    profile_max_captures: int = 100
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            mode=AppMode(os.environ.get("APP_MODE", cls.mode.value)),
+            database_path=os.environ.get("DATABASE_PATH", cls.database_path),
+            shards_dir=os.environ.get("SHARDS_DIR") or cls.shards_dir,
+            shard_count=_env_int("SHARD_COUNT", cls.shard_count),
+            job_queue_path=os.environ.get("JOB_QUEUE_PATH") or cls.job_queue_path,
+            worker_processes=_env_int("WORKER_PROCESSES", cls.worker_processes),
+            log_level=os.environ.get("LOG_LEVEL", cls.log_level).upper(),
+            log_format=os.environ.get("LOG_FORMAT", cls.log_format).lower(),
+            log_levels=os.environ.get("LOG_LEVELS", cls.log_levels),
+            log_async=_env_bool("LOG_ASYNC", cls.log_async),
+            job_log_sample_rate=float(os.environ.get("JOB_LOG_SAMPLE_RATE", cls.job_log_sample_rate)),
+            job_log_max_per_second=_env_float("JOB_LOG_MAX_PER_SECOND", cls.job_log_max_per_second),
+            run_migrations_on_startup=_env_bool("RUN_MIGRATIONS_ON_STARTUP", cls.run_migrations_on_startup),
+            bulk_manifest_mode=_env_bool("BULK_MANIFEST_MODE", cls.bulk_manifest_mode),
+            scheduled_bulks_dispatcher=_env_bool("SCHEDULED_BULKS_DISPATCHER", cls.scheduled_bulks_dispatcher),
+            fx_rates_ttl_seconds=float(os.environ.get("FX_RATES_TTL_SECONDS", cls.fx_rates_ttl_seconds)),
+            trace_spans_path=os.environ.get("TRACE_SPANS_PATH") or cls.trace_spans_path,
+            trace_spans_max_bytes=_env_int("TRACE_SPANS_MAX_BYTES", cls.trace_spans_max_bytes),
+            trace_spans_backup_count=_env_int("TRACE_SPANS_BACKUP_COUNT", cls.trace_spans_backup_count),
+            profile_dir=os.environ.get("PROFILE_DIR") or cls.profile_dir,
+            profile_sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", cls.profile_sample_rate)),
+            profile_max_captures=_env_int("PROFILE_MAX_CAPTURES", cls.profile_max_captures),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def configure_settings(settings: Settings):
+    """
+    Settings of the running application, set on application startup.
+    """
+    global _settings
+    _settings = settings
+
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
@@ -0,0 +1,60 @@
+"""
+In-process striped locks: serialize the updates of a same account while the other accounts proceed in parallel.
+
+SQLite ignores `SELECT ... FOR UPDATE`, so the read-modify-write of an account (and of its bulk requests)
+is protected by the lock of its stripe in-process, and by the version columns across processes
+(see `db.run_transaction`). The time spent waiting for a lock is measured, so same-account contention shows up
+in `bulk_transfer_lock_wait_seconds`.
+"""
+import threading
+import time
+from typing import Hashable
+
+from app.utils import metrics
+
+
+DEFAULT_STRIPES = 256
+
+
+class _StripeLock:
+    __slots__ = ("_lock", "_histogram")
+
+    def __init__(self, lock: threading.Lock, histogram):
+        self._lock = lock
+        self._histogram = histogram
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):  # contended: measure the wait
+            started_at = time.perf_counter()
+            self._lock.acquire()
+            self._histogram.observe(time.perf_counter() - started_at)
+        else:
+            self._histogram.observe(0.0)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+class StripedLock:
+    """
+    Fixed number of locks shared by hashing the keys: the memory does not grow with the number of keys,
+    two keys rarely share a stripe, and a key always maps to the same stripe.
+
+        with ACCOUNT_LOCKS.lock(account_id):
+            ...
+    """
+
+    def __init__(self, name: str, stripes: int = DEFAULT_STRIPES):
+        self.name = name
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._histogram = metrics.LOCK_WAIT_SECONDS.labels(name)
+
+    def lock(self, key: Hashable) -> _StripeLock:
+        """
+        Non-reentrant: a thread must not lock again a key (or a key of the same stripe) it holds.
+        """
+        return _StripeLock(self._locks[hash(key) % len(self._locks)], self._histogram)
+
+
+ACCOUNT_LOCKS = StripedLock("account")
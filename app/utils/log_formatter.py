@@ -1,10 +1,46 @@
+import atexit
+import datetime
+import itertools
+import json
 import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
 import colorlog
 
 
-def get_logger(name="app"):
-    handler = colorlog.StreamHandler()
-    handler.setFormatter(colorlog.ColoredFormatter(
+ROOT_LOGGER_NAME = "app"
+
+# Attributes of every LogRecord: the other ones are `extra` fields, output as JSON fields
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the `extra` fields of the record (e.g. bulk_id, transfer_uuid).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        log = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, datetime.UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_"):
+                log[key] = value
+        if record.exc_info:
+            log["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log, default=str)
+
+
+def _colored_formatter() -> logging.Formatter:
+    return colorlog.ColoredFormatter(
         fmt='[%(asctime)s] [%(levelname)s] [%(name)s] %(log_color)s%(message)s',
         datefmt="%Y-%m-%d %H:%M:%S",
         log_colors={
@@ -14,10 +50,135 @@ def get_logger(name="app"):
             'ERROR': 'red',
             'CRITICAL': 'bold_red',
         }
-    ))
+    )
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue the record as is: the message is formatted by the listener thread, not by the logging thread.
+    Log arguments must then be immutable values (ids, amounts, etc.), not objects modified afterward.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogSampler:
+    """
+    Sampling and rate limiting of high-volume logs (one log per job).
+
+    Keeps 1 log out of `1 / sample_rate` calls, and at most `max_per_second` logs per second:
+    the hot path calls `sample()` before logging, so dropped logs cost neither formatting nor a LogRecord.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: Optional[float] = None):
+        self.configure(sample_rate=sample_rate, max_per_second=max_per_second)
+
+    def configure(self, sample_rate: float = 1.0, max_per_second: Optional[float] = None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Invalid log sample rate: {sample_rate}")
+        self._every = round(1 / sample_rate) if sample_rate > 0 else 0
+        self._counter = itertools.count()
+        self._max_per_second = max_per_second
+        self._tokens = max_per_second or 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        if self._every == 0 or next(self._counter) % self._every:
+            return False
+        if self._max_per_second is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._max_per_second, self._tokens + (now - self._last_refill) * self._max_per_second)
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+# Sampler of the per-job logs on the job processing hot paths
+JOB_LOG_SAMPLER = LogSampler()
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+        level: str = "DEBUG",
+        log_format: str = "color",
+        logger_levels: Optional[Dict[str, str]] = None,
+        asynchronous: bool = True,
+        job_log_sample_rate: float = 1.0,
+        job_log_max_per_second: Optional[float] = None,
+        stream: Optional[TextIO] = None
+):
+    """
+    Configure the application root logger, module loggers (see `get_logger`) propagate to it.
+
+    Args:
+        level: Application log level
+        log_format: "color" (human readable) or "json" (one JSON object per line)
+        logger_levels: Levels of specific loggers, e.g. {"app.routers.fake_broker": "WARNING"}
+        asynchronous: Records are queued and written by a listener thread, off the request and job threads
+        job_log_sample_rate: Ratio of per-job logs kept on the job hot paths (1: all, 0.01: 1 out of 100)
+        job_log_max_per_second: Max per-job logs per second (no limit if None)
+        stream: Output stream (default: stderr)
+    """
+    global _listener
+    shutdown_logging()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else _colored_formatter())
+
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    for previous_handler in [h for h in root_logger.handlers if getattr(h, "_app_handler", False)]:
+        root_logger.removeHandler(previous_handler)
+    root_logger.setLevel(level)
+    root_logger.propagate = False
+
+    if asynchronous:
+        app_handler = _LazyQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(app_handler.queue, handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        app_handler = handler
+    app_handler._app_handler = True
+    root_logger.addHandler(app_handler)
+
+    for logger_name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(logger_name).setLevel(logger_level)
+
+    JOB_LOG_SAMPLER.configure(sample_rate=job_log_sample_rate, max_per_second=job_log_max_per_second)
+
+
+def shutdown_logging():
+    """
+    Stop the listener thread, after writing the queued records.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def parse_logger_levels(logger_levels: str) -> Dict[str, str]:
+    """
+    "app.routers.fake_broker=WARNING,app.services=INFO" -> {"app.routers.fake_broker": "WARNING", ...}
+    """
+    levels = {}
+    for logger_level in filter(None, (item.strip() for item in logger_levels.split(","))):
+        logger_name, _, level = logger_level.partition("=")
+        levels[logger_name.strip()] = level.strip().upper()
+    return levels
+
 
-    logger = colorlog.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    logger.propagate = False
-    return logger
+def get_logger(name=ROOT_LOGGER_NAME):
+    """
+    Cheap at import time: no handler is attached here, see `configure_logging`.
+    """
+    return logging.getLogger(name)
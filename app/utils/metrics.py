@@ -0,0 +1,240 @@
+"""
+Low-overhead in-process metrics, exposed in the Prometheus text format (see GET /metrics).
+
+Each thread records into its own shard of a metric (a plain list of counts), so the request and job
+hot paths take no lock: the shards are only summed when the metrics are scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from sub-millisecond DB statements to minutes-long bulk requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_name: Optional[str], registry: MetricsRegistry):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        registry.register(self)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines) + "\n"
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _labels(self, label_value: Optional[str], **extra_labels) -> str:
+        labels = {self.label_name: label_value} if self.label_name else {}
+        labels.update(extra_labels)
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ThreadShards:
+    """
+    One list of `size` counts per thread: only its thread updates a shard, `snapshot` sums them.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[list] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> list:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0] * self._size
+            with self._lock:  # once per thread; shards of finished threads are kept (monotonic counts)
+                self._shards.append(shard)
+            return shard
+
+    def snapshot(self) -> list:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0] * self._size
+        for shard in shards:
+            for position, value in enumerate(shard):
+                totals[position] += value
+        return totals
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_started_at")
+
+    def __init__(self, histogram: "_HistogramChild"):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started_at)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # per-bucket counts (not cumulative), +Inf bucket, then the sum of the observed values
+        self._shards = _ThreadShards(size=len(buckets) + 2)
+
+    def observe(self, value: float):
+        shard = self._shards.shard()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def time(self) -> _Timer:
+        """
+        Observe the duration (seconds) of a `with` block.
+        """
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """
+        Returns:
+            (cumulative bucket counts including +Inf, sum of the observed values)
+        """
+        totals = self._shards.snapshot()
+        cumulative_counts = []
+        count = 0
+        for bucket_count in totals[:-1]:
+            count += bucket_count
+            cumulative_counts.append(count)
+        return cumulative_counts, totals[-1]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            label_name: Optional[str] = None,
+            buckets: Sequence[float] = DEFAULT_BUCKETS,
+            registry: MetricsRegistry = REGISTRY
+    ):
+        self._bucket_bounds = tuple(sorted(buckets))
+        self._children: Dict[Optional[str], _HistogramChild] = {}
+        self._children_lock = threading.Lock()
+        super().__init__(name=name, documentation=documentation, label_name=label_name, registry=registry)
+
+    def labels(self, label_value: str) -> _HistogramChild:
+        child = self._children.get(label_value)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(label_value, _HistogramChild(self._bucket_bounds))
+        return child
+
+    def observe(self, value: float):
+        self.labels(None).observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels(None).time()
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for label_value, child in sorted(self._children.items(), key=lambda item: item[0] or ""):
+            cumulative_counts, total = child.snapshot()
+            for bound, count in zip(self._bucket_bounds + (float("inf"),), cumulative_counts):
+                samples.append(f"{self.name}_bucket{self._labels(label_value, le=_format_value(bound))} {count}")
+            samples.append(f"{self.name}_sum{self._labels(label_value)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{self._labels(label_value)} {cumulative_counts[-1]}")
+        return samples
+
+
+class Gauge(_Metric):
+    """
+    Gauge read from a callback when scraped (e.g. the length of a queue), nothing is recorded on the hot path.
+    """
+    type_name = "gauge"
+
+    def __init__(
+            self, name: str, documentation: str, label_name: Optional[str] = None, registry: MetricsRegistry = REGISTRY
+    ):
+        self._functions: Dict[Optional[str], Callable[[], float]] = {}
+        super().__init__(name=name, documentation=documentation, label_name=label_name, registry=registry)
+
+    def set_function(self, function: Callable[[], float], label_value: Optional[str] = None):
+        self._functions[label_value] = function
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._labels(label_value)} {_format_value(function())}"
+            for label_value, function in sorted(self._functions.items(), key=lambda item: item[0] or "")
+        ]
+
+
+# Bulk transfer pipeline metrics
+
+QUEUE_DEPTH = Gauge("bulk_transfer_queue_depth", "Jobs waiting in the queue.", label_name="queue")
+QUEUE_WAIT_SECONDS = Histogram(
+    "bulk_transfer_queue_wait_seconds", "Time between the enqueue and the consumption of a job.", label_name="queue"
+)
+STAGE_DURATION_SECONDS = Histogram(
+    "bulk_transfer_stage_duration_seconds", "Duration of the bulk transfer pipeline stages.", label_name="stage"
+)
+DB_TRANSACTION_DURATION_SECONDS = Histogram(
+    "bulk_transfer_db_transaction_duration_seconds",
+    "Duration of the database transactions, from begin to commit or rollback.",
+    label_name="outcome"
+)
+BULK_COMPLETION_SECONDS = Histogram(
+    "bulk_transfer_bulk_completion_seconds",
+    "Time between the creation of a bulk request and its final status.",
+    label_name="status"
+)
+LOCK_WAIT_SECONDS = Histogram(
+    "bulk_transfer_lock_wait_seconds", "Time spent waiting for an in-process striped lock.", label_name="lock"
+)
+TRANSACTION_ATTEMPTS = Histogram(
+    "bulk_transfer_transaction_attempts",
+    "Attempts of the transactions retried on optimistic concurrency conflicts.",
+    label_name="operation",
+    buckets=(1, 2, 3, 4, 5)
+)
@@ -0,0 +1,300 @@
+"""
+On-demand profiling of individual requests and job consumers.
+
+A request is captured when it has the `X-Profile: 1` header or is sampled (`PROFILE_SAMPLE_RATE`),
+and a job consumer called outside a request is captured when sampled. A capture holds the cProfile
+stats of the endpoints decorated with `profiled` (run in the threadpool) and the timings of the SQL
+statements executed meanwhile, and is dumped to the profiles directory as:
+- `<capture_id>.pstats`: profile stats (`python -m pstats`, snakeviz, etc.)
+- `<capture_id>.json`: summary (duration, slowest functions and SQL statements)
+"""
+import contextvars
+import cProfile
+import datetime
+import functools
+import json
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Monitoring endpoints are never captured
+EXCLUDED_PATH_PREFIXES = ("/internal/profiles", "/metrics")
+TOP_FUNCTIONS = 25
+TOP_SQL_STATEMENTS = 25
+
+_thread_state = threading.local()
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    profile_dir: Path
+    sample_rate: float = 0.0
+    max_captures: int = 100
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+class ProfileCapture:
+    def __init__(self, name: str):
+        started_at = datetime.datetime.now(datetime.UTC)
+        self.capture_id = f"{started_at:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.started_at = started_at
+        self._started_at_perf_counter = time.perf_counter()
+        self._profiles: List[cProfile.Profile] = []
+        # statement -> [count, total seconds, max seconds]
+        self._statements: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        """
+        Profile the current thread for the duration of the `with` block (no-op if already profiled).
+        """
+        if getattr(_thread_state, "profiling", False):  # a thread has a single profile hook
+            yield
+            return
+        profiler = cProfile.Profile()
+        _thread_state.profiling = True
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _thread_state.profiling = False
+            with self._lock:
+                self._profiles.append(profiler)
+
+    def record_statement(self, statement: str, duration_seconds: float):
+        with self._lock:
+            timing = self._statements.setdefault(statement, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += duration_seconds
+            timing[2] = max(timing[2], duration_seconds)
+
+    def dump(self, profile_dir: Path) -> dict:
+        duration_seconds = time.perf_counter() - self._started_at_perf_counter
+        with self._lock:
+            profiles = list(self._profiles)
+            statements = dict(self._statements)
+
+        summary = {
+            "capture_id": self.capture_id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration_seconds * 1000, 3),
+            "profile_file": None,
+            "sql": {
+                "count": sum(timing[0] for timing in statements.values()),
+                "total_ms": round(sum(timing[1] for timing in statements.values()) * 1000, 3),
+                "statements": [
+                    {
+                        "statement": statement,
+                        "count": count,
+                        "total_ms": round(total * 1000, 3),
+                        "max_ms": round(longest * 1000, 3)
+                    }
+                    for statement, (count, total, longest) in sorted(
+                        statements.items(), key=lambda item: item[1][1], reverse=True
+                    )[:TOP_SQL_STATEMENTS]
+                ]
+            },
+            "top_functions": []
+        }
+
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profiler in profiles[1:]:
+                stats.add(profiler)
+            profile_file = profile_dir / f"{self.capture_id}.pstats"
+            stats.dump_stats(profile_file)
+            summary["profile_file"] = profile_file.name
+            summary["top_functions"] = _top_functions(stats)
+
+        (profile_dir / f"{self.capture_id}.json").write_text(json.dumps(summary, indent=2))
+        return summary
+
+
+def _top_functions(stats: pstats.Stats) -> List[dict]:
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            "function": f"{filename}:{line}({function_name})",
+            "calls": calls,
+            "own_ms": round(own_time * 1000, 3),
+            "cumulative_ms": round(cumulative_time * 1000, 3)
+        }
+        for (filename, line, function_name), (_, calls, own_time, cumulative_time, _) in functions
+    ]
+
+
+_config: Optional[ProfilingConfig] = None
+# None: not in a request (e.g. job consumer called in-process), False: request not profiled
+_current_capture: contextvars.ContextVar[Union[ProfileCapture, bool, None]] = contextvars.ContextVar(
+    "current_profile_capture", default=None
+)
+
+
+def configure_profiling(profile_dir: Optional[str], sample_rate: float = 0.0, max_captures: int = 100):
+    """
+    Enable the profiling hooks, disabled if `profile_dir` is None.
+    """
+    global _config
+    if not 0 <= sample_rate <= 1:
+        raise ValueError(f"Invalid profile sample rate: {sample_rate}")
+    _config = ProfilingConfig(
+        profile_dir=Path(profile_dir), sample_rate=sample_rate, max_captures=max_captures
+    ) if profile_dir else None
+
+
+def is_capturing() -> bool:
+    return isinstance(_current_capture.get(), ProfileCapture)
+
+
+def record_sql_statement(statement: str, duration_seconds: float):
+    capture = _current_capture.get()
+    if isinstance(capture, ProfileCapture):
+        capture.record_statement(statement=statement, duration_seconds=duration_seconds)
+
+
+@contextmanager
+def capture_profile(name: str, config: ProfilingConfig) -> Iterator[ProfileCapture]:
+    """
+    Capture the `with` block and dump it to the profiles directory.
+    """
+    capture = ProfileCapture(name=name)
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
+        capture.dump(config.profile_dir)
+        _prune_captures(config)
+
+
+def profiled(name: str) -> Callable:
+    """
+    Profile the decorated (sync) endpoint when its request is captured, or when sampled if called outside
+    a request (job consumers called in-process).
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            config = _config
+            if config is None:
+                return function(*args, **kwargs)
+            capture = _current_capture.get()
+            if capture is None:
+                if not config.sample():
+                    return function(*args, **kwargs)
+                with capture_profile(name=name, config=config) as capture, capture.profile():
+                    return function(*args, **kwargs)
+            if capture is False:
+                return function(*args, **kwargs)
+            with capture.profile():
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfilingMiddleware:
+    """
+    Capture the requests with the `X-Profile: 1` header or sampled, and return the `X-Profile-Id` header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        config = _config
+        if scope["type"] != "http" or config is None or scope["path"].startswith(EXCLUDED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER, b"").lower() not in (b"1", b"true") and not config.sample():
+            token = _current_capture.set(False)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_capture.reset(token)
+            return
+
+        capture = ProfileCapture(name=f"{scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(PROFILE_ID_HEADER, capture.capture_id.encode())]
+            await send(message)
+
+        token = _current_capture.set(capture)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _current_capture.reset(token)
+            await run_in_threadpool(capture.dump, config.profile_dir)
+            await run_in_threadpool(_prune_captures, config)
+
+
+def _prune_captures(config: ProfilingConfig):
+    summaries = sorted(config.profile_dir.glob("*.json"), reverse=True)  # capture ids start with a timestamp
+    for summary in summaries[config.max_captures:]:
+        summary.unlink(missing_ok=True)
+        summary.with_suffix(".pstats").unlink(missing_ok=True)
+
+
+def list_captures(limit: int = 50) -> List[dict]:
+    """
+    Most recent captures first (without their functions and SQL statements details).
+    """
+    captures = []
+    for summary_file in _summary_files()[:limit]:
+        summary = _read_summary(summary_file)
+        if summary is not None:
+            captures.append({
+                "capture_id": summary["capture_id"],
+                "name": summary["name"],
+                "started_at": summary["started_at"],
+                "duration_ms": summary["duration_ms"],
+                "sql_count": summary["sql"]["count"],
+                "sql_total_ms": summary["sql"]["total_ms"],
+                "profile_file": summary["profile_file"]
+            })
+    return captures
+
+
+def find_capture(capture_id: str) -> Optional[dict]:
+    return next((
+        _read_summary(summary_file) for summary_file in _summary_files() if summary_file.stem == capture_id
+    ), None)
+
+
+def _summary_files() -> List[Path]:
+    config = _config
+    if config is None or not config.profile_dir.exists():
+        return []
+    return sorted(config.profile_dir.glob("*.json"), reverse=True)  # capture ids start with a timestamp
+
+
+def _read_summary(summary_file: Path) -> Optional[dict]:
+    try:
+        return json.loads(summary_file.read_text())
+    except (OSError, ValueError):  # pruned or being written meanwhile
+        return None
@@ -0,0 +1,185 @@
+"""
+Decoding of compressed (gzip, zstd) and binary (MessagePack) request bodies, with size limits
+enforced while the body is received and decompressed (decompression bombs are rejected early).
+"""
+import zlib
+from typing import Any, Iterable, List, Type, TypeVar
+
+import msgpack
+import zstandard
+from fastapi import Request
+from pydantic import BaseModel
+
+
+# A bulk of 1000 transfers is ~300 KiB of JSON
+MAX_ENCODED_BODY_BYTES = 2 * 2**20
+MAX_DECODED_BODY_BYTES = 4 * 2**20
+# zstd blocks decode up to 128 KiB from a few bytes: the input is fed in slices to bound each step
+ZSTD_INPUT_SLICE_BYTES = 512
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class RequestBodyError(ValueError):
+    status_code = 400
+
+
+class UnsupportedBodyEncodingError(RequestBodyError):
+    status_code = 415
+
+
+class RequestBodyTooLargeError(RequestBodyError):
+    status_code = 413
+
+
+class BodyDecoder:
+    """
+    Identity decoder: collects the body chunks up to `max_decoded_bytes`.
+    """
+
+    def __init__(self, max_decoded_bytes: int = MAX_DECODED_BODY_BYTES):
+        self._max_decoded_bytes = max_decoded_bytes
+        self._decoded_bytes = 0
+        self._chunks: List[bytes] = []
+
+    def _append(self, decoded: bytes):
+        self._decoded_bytes += len(decoded)
+        if self._decoded_bytes > self._max_decoded_bytes:
+            raise RequestBodyTooLargeError(f"Decoded body larger than {self._max_decoded_bytes} bytes")
+        self._chunks.append(decoded)
+
+    def feed(self, chunk: bytes):
+        self._append(chunk)
+
+    def finish(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+class GzipBodyDecoder(BodyDecoder):
+    def __init__(self, max_decoded_bytes: int = MAX_DECODED_BODY_BYTES):
+        super().__init__(max_decoded_bytes)
+        self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def feed(self, chunk: bytes):
+        # never inflate more than the remaining allowance (+1 byte to detect the overflow)
+        try:
+            decoded = self._decompressor.decompress(chunk, self._max_decoded_bytes - self._decoded_bytes + 1)
+        except zlib.error as e:
+            raise RequestBodyError(f"Invalid gzip body: {e}")
+        if self._decompressor.unconsumed_tail:
+            raise RequestBodyTooLargeError(f"Decoded body larger than {self._max_decoded_bytes} bytes")
+        self._append(decoded)
+
+    def finish(self) -> bytes:
+        if not self._decompressor.eof:
+            raise RequestBodyError("Invalid gzip body: truncated")
+        return super().finish()
+
+
+class ZstdBodyDecoder(BodyDecoder):
+    def __init__(self, max_decoded_bytes: int = MAX_DECODED_BODY_BYTES):
+        super().__init__(max_decoded_bytes)
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, chunk: bytes):
+        try:
+            for start in range(0, len(chunk), ZSTD_INPUT_SLICE_BYTES):
+                self._append(self._decompressor.decompress(chunk[start:start + ZSTD_INPUT_SLICE_BYTES]))
+        except zstandard.ZstdError as e:
+            raise RequestBodyError(f"Invalid zstd body: {e}")
+
+    def finish(self) -> bytes:
+        if not self._decompressor.eof:
+            raise RequestBodyError("Invalid zstd body: truncated")
+        return super().finish()
+
+
+_DECODERS = {
+    "": BodyDecoder,
+    "identity": BodyDecoder,
+    "gzip": GzipBodyDecoder,
+    "x-gzip": GzipBodyDecoder,
+    "zstd": ZstdBodyDecoder,
+}
+
+
+def body_decoder(content_encoding: str, max_decoded_bytes: int = MAX_DECODED_BODY_BYTES) -> BodyDecoder:
+    """
+    Raises:
+        UnsupportedBodyEncodingError: unknown or stacked `Content-Encoding`
+    """
+    decoder_class = _DECODERS.get(content_encoding.strip().lower())
+    if decoder_class is None:
+        raise UnsupportedBodyEncodingError(
+            f"Unsupported Content-Encoding: {content_encoding} (supported: gzip, zstd)"
+        )
+    return decoder_class(max_decoded_bytes)
+
+
+def decode_body(
+        chunks: Iterable[bytes],
+        content_encoding: str = "",
+        max_encoded_bytes: int = MAX_ENCODED_BODY_BYTES,
+        max_decoded_bytes: int = MAX_DECODED_BODY_BYTES
+) -> bytes:
+    decoder = body_decoder(content_encoding=content_encoding, max_decoded_bytes=max_decoded_bytes)
+    encoded_bytes = 0
+    for chunk in chunks:
+        encoded_bytes += len(chunk)
+        if encoded_bytes > max_encoded_bytes:
+            raise RequestBodyTooLargeError(f"Body larger than {max_encoded_bytes} bytes")
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+async def read_body(
+        request: Request,
+        max_encoded_bytes: int = MAX_ENCODED_BODY_BYTES,
+        max_decoded_bytes: int = MAX_DECODED_BODY_BYTES
+) -> bytes:
+    """
+    Receive and decode the request body chunk by chunk (the encoded body is never buffered as a whole).
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_encoded_bytes:
+        raise RequestBodyTooLargeError(f"Body larger than {max_encoded_bytes} bytes")
+
+    decoder = body_decoder(
+        content_encoding=request.headers.get("content-encoding", ""), max_decoded_bytes=max_decoded_bytes
+    )
+    encoded_bytes = 0
+    async for chunk in request.stream():
+        encoded_bytes += len(chunk)
+        if encoded_bytes > max_encoded_bytes:
+            raise RequestBodyTooLargeError(f"Body larger than {max_encoded_bytes} bytes")
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+def _unpack_msgpack(body: bytes) -> Any:
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.UnpackException) as e:  # ExtraData and FormatError are ValueError
+        raise RequestBodyError(f"Invalid MessagePack body: {e}")
+
+
+def validate_body(model: Type[M], body: bytes, content_type: str = JSON_MEDIA_TYPE) -> M:
+    """
+    Validate a decoded body as `model`: JSON is parsed and validated in one pass by Pydantic
+    (no intermediate dict), MessagePack is unpacked then validated.
+
+    Raises:
+        UnsupportedBodyEncodingError: unsupported `Content-Type`
+        pydantic.ValidationError: invalid JSON or fields
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return model.model_validate(_unpack_msgpack(body))
+    if media_type in ("", JSON_MEDIA_TYPE) or media_type.endswith("+json"):
+        return model.model_validate_json(body)
+    raise UnsupportedBodyEncodingError(
+        f"Unsupported Content-Type: {content_type} (supported: {JSON_MEDIA_TYPE}, {MSGPACK_MEDIA_TYPES[0]})"
+    )
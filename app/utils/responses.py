@@ -0,0 +1,59 @@
+from typing import Any, Tuple, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson (UUID, datetime and Enum values are serialized natively).
+
+    Returned directly by an endpoint, it also skips the `jsonable_encoder` pass FastAPI applies to returned dicts.
+    Its content can also be a body rendered already (bytes, see `ResponseShape`), sent as is.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+class ResponseShape:
+    """
+    Serializer of the bodies of a response model, compiled once from its fields: a body is rendered by orjson
+    with the keys in the order of the model fields (the bytes the `response_model` of the endpoint would send),
+    without the validation and serialization passes of FastAPI on each response.
+
+    The values are trusted: they are built by the endpoint, not by the client.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model  # still the `response_model` of the endpoints, for the OpenAPI schema
+        self.fields: Tuple[str, ...] = tuple(model.model_fields)
+        self._field_set = frozenset(self.fields)
+
+    def render(self, **values: Any) -> bytes:
+        """
+        Raises:
+            ValueError: the values are not the fields of the model
+        """
+        if values.keys() != self._field_set:
+            raise ValueError(f"{self.model.__name__} fields are {list(self.fields)}, got {list(values)}")
+        return orjson.dumps({field: values[field] for field in self.fields})
+
+
+class StaticBody:
+    """
+    Body of a response shape whose values are all static but the first field (e.g. the error of a reason for any
+    bulk id), rendered once: only the value of the first field is serialized for each response.
+    """
+
+    def __init__(self, shape: ResponseShape, **static_values: Any):
+        first_field = shape.fields[0]
+        rendered_body = shape.render(**{first_field: "", **static_values})
+        self._head = b'{' + orjson.dumps(first_field) + b':'
+        self._tail = rendered_body[len(self._head) + len(b'""'):]
+
+    def render(self, value: str) -> bytes:
+        return self._head + orjson.dumps(value) + self._tail
@@ -0,0 +1,212 @@
+"""
+Job queue stored in a SQLite table: a stand-in of a message broker shared by the processes of a host
+(the API processes queue the jobs, the `python -m app.worker` processes consume them).
+
+The jobs are queued in their compact representation (see app.models.job), pickled: the queue is local and
+written by the application only. Their `enqueued_at` (time.monotonic) is comparable across the processes of a host.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+
+# Wait for the write lock held by another process instead of failing right away
+BUSY_TIMEOUT_SECONDS = 30.0
+# A leased job not acknowledged within this delay (e.g. its worker process died) is delivered again
+LEASE_SECONDS = 60.0
+
+# (bulk request uuid bytes, bulk request id) of a job, to purge the jobs of a cancelled bulk request
+BulkRequestKey = Tuple[Optional[bytes], Optional[int]]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queued_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    bulk_request_uuid BLOB,
+    bulk_request_id INTEGER,
+    payload BLOB NOT NULL,
+    leased_until REAL
+);
+CREATE INDEX IF NOT EXISTS queued_jobs_queue_id_idx ON queued_jobs (queue, id);
+CREATE INDEX IF NOT EXISTS queued_jobs_bulk_request_uuid_idx ON queued_jobs (bulk_request_uuid);
+CREATE INDEX IF NOT EXISTS queued_jobs_bulk_request_id_idx ON queued_jobs (bulk_request_id);
+"""
+
+
+class JobLease(NamedTuple):
+    """
+    Lease of a job: `leased_until` tells apart the successive leases of a job delivered again.
+    """
+    job_id: int
+    leased_until: float
+
+
+class SqliteJobQueue:
+    """
+    FIFO queue of jobs with the `deque` methods used by the fake broker (append, extend, popleft, clear, len).
+
+    Several queues (e.g. "transfer" and "finalize_bulk") share the `queued_jobs` table of the database file.
+    A consumer leases a job (single UPDATE ... RETURNING statement: a job is leased by one process at a time) and
+    acknowledges it once processed, or releases it on error: a job whose worker process dies before acknowledging
+    it is delivered again once its lease expires.
+    """
+
+    def __init__(
+            self,
+            database_path: str,
+            name: str,
+            bulk_request_of: Callable[[Any], BulkRequestKey],
+            lease_seconds: float = LEASE_SECONDS
+    ):
+        self.database_path = database_path
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self._bulk_request_of = bulk_request_of
+        self._local = threading.local()  # one connection per thread
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")  # consumers do not wait for the producers' commits
+        connection.executescript(_SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(queued_jobs)")}
+        if "leased_until" not in columns:  # queue file of a previous version
+            try:
+                connection.execute("ALTER TABLE queued_jobs ADD COLUMN leased_until REAL")
+            except sqlite3.OperationalError:  # added by another process meanwhile
+                pass
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # autocommit: each statement is its own transaction
+            connection = sqlite3.connect(self.database_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _row(self, job: Any) -> tuple:
+        bulk_request_uuid, bulk_request_id = self._bulk_request_of(job)
+        return self.name, bulk_request_uuid, bulk_request_id, pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def append(self, job: Any):
+        self._connection().execute(
+            "INSERT INTO queued_jobs (queue, bulk_request_uuid, bulk_request_id, payload) VALUES (?, ?, ?, ?)",
+            self._row(job)
+        )
+
+    def extend(self, jobs: Iterable[Any]):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO queued_jobs (queue, bulk_request_uuid, bulk_request_id, payload) VALUES (?, ?, ?, ?)",
+                (self._row(job) for job in jobs)
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def popleft(self) -> Any:
+        """
+        Pop the first job not leased, without lease (the job is lost if not processed).
+
+        Raises:
+            IndexError: if the queue is empty
+        """
+        row = self._connection().execute(
+            "DELETE FROM queued_jobs WHERE id = (SELECT id FROM queued_jobs WHERE queue = ? "
+            "AND (leased_until IS NULL OR leased_until <= ?) ORDER BY id LIMIT 1) RETURNING payload",
+            (self.name, time.time())
+        ).fetchone()
+        if row is None:
+            raise IndexError("pop from an empty queue")
+        return pickle.loads(row[0])
+
+    def lease(self) -> Tuple[JobLease, Any]:
+        """
+        Lease the first job not leased, or whose lease expired, for `lease_seconds`.
+
+        Raises:
+            IndexError: if the queue is empty
+        """
+        now = time.time()  # leases are compared across the processes of the host, and survive restarts
+        leased_until = now + self.lease_seconds
+        row = self._connection().execute(
+            "UPDATE queued_jobs SET leased_until = ? WHERE id = (SELECT id FROM queued_jobs WHERE queue = ? "
+            "AND (leased_until IS NULL OR leased_until <= ?) ORDER BY id LIMIT 1) RETURNING id, payload",
+            (leased_until, self.name, now)
+        ).fetchone()
+        if row is None:
+            raise IndexError("lease from an empty queue")
+        return JobLease(job_id=row[0], leased_until=leased_until), pickle.loads(row[1])
+
+    def ack(self, lease: JobLease) -> bool:
+        """
+        Delete a leased job once processed.
+
+        Returns:
+            False if the job was not leased anymore: its lease expired (it may be delivered again) or it was purged
+        """
+        return self._connection().execute(
+            "DELETE FROM queued_jobs WHERE id = ? AND leased_until = ?", lease
+        ).rowcount == 1
+
+    def release(self, lease: JobLease) -> bool:
+        """
+        Deliver a leased job again right away (its processing failed).
+
+        Returns:
+            False if the job was not leased anymore
+        """
+        return self._connection().execute(
+            "UPDATE queued_jobs SET leased_until = NULL WHERE id = ? AND leased_until = ?", lease
+        ).rowcount == 1
+
+    def purge(self, bulk_request_uuid: bytes, bulk_request_id: int) -> int:
+        """
+        Delete the queued jobs of a bulk request (by uuid, or by id for the bulk manifest references).
+
+        Returns:
+            Number of deleted jobs
+        """
+        return self._connection().execute(
+            "DELETE FROM queued_jobs WHERE queue = ? AND (bulk_request_uuid = ? OR bulk_request_id = ?)",
+            (self.name, bulk_request_uuid, bulk_request_id)
+        ).rowcount
+
+    def clear(self):
+        self._connection().execute("DELETE FROM queued_jobs WHERE queue = ?", (self.name,))
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __len__(self) -> int:
+        """
+        Number of queued jobs, leased ones included (not acknowledged yet).
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM queued_jobs WHERE queue = ?", (self.name,)
+        ).fetchone()[0]
+
+    def __bool__(self) -> bool:
+        """
+        A job can be leased (the jobs leased by other consumers are not counted).
+        """
+        return self._connection().execute(
+            "SELECT EXISTS (SELECT 1 FROM queued_jobs WHERE queue = ? AND (leased_until IS NULL OR leased_until <= ?))",
+            (self.name, time.time())
+        ).fetchone()[0] == 1
+
+    def __iter__(self) -> Iterator[Any]:
+        rows = self._connection().execute(
+            "SELECT payload FROM queued_jobs WHERE queue = ? ORDER BY id", (self.name,)
+        ).fetchall()
+        return (pickle.loads(payload) for payload, in rows)
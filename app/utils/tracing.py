@@ -0,0 +1,243 @@
+"""
+Lightweight tracing of the bulk transfer pipeline stages.
+
+A bulk request fans out into transfer jobs and bulk jobs: their trace context (trace id and parent span id)
+is propagated in TransferJob and BulkJob, so all the spans of a bulk request share the same trace.
+Finished spans are written by a background thread to a rotating file, one OTLP/JSON
+`ExportTraceServiceRequest` per line (the OpenTelemetry collector file exporter format),
+to reconstruct the critical path of slow bulks offline.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+SERVICE_NAME = "bulk-transfer-api"
+TRACEPARENT_HEADER = "traceparent"
+
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# OTLP span kinds and status codes
+_SPAN_KIND_INTERNAL = 1
+_STATUS_CODE_OK = 1
+_STATUS_CODE_ERROR = 2
+
+
+@dataclass(frozen=True)
+class TraceContext:
+    trace_id: str  # 32 hex chars
+    span_id: str  # 16 hex chars
+
+    @classmethod
+    def from_traceparent(cls, traceparent: Optional[str]) -> Optional["TraceContext"]:
+        """
+        W3C `traceparent` header (e.g. "00-<trace_id>-<span_id>-01"), None if missing or invalid.
+        """
+        match = _TRACEPARENT_PATTERN.match(traceparent.strip().lower()) if traceparent else None
+        if not match or int(match.group(1), 16) == 0 or int(match.group(2), 16) == 0:
+            return None
+        return cls(trace_id=match.group(1), span_id=match.group(2))
+
+    def to_bytes(self) -> bytes:
+        """
+        24 raw bytes, to keep the context of queued jobs compact.
+        """
+        return bytes.fromhex(self.trace_id + self.span_id)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TraceContext":
+        return cls(trace_id=data[:16].hex(), span_id=data[16:].hex())
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def trace_context(trace_id: Optional[str], span_id: Optional[str]) -> Optional[TraceContext]:
+    """
+    Trace context of the (trace_id, parent_span_id) fields of a job, None if the job has none.
+    """
+    if not trace_id or not span_id:
+        return None
+    return TraceContext(trace_id=trace_id, span_id=span_id)
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id", "start_time_unix_nano", "end_time_unix_nano",
+        "attributes", "error"
+    )
+
+    def __init__(
+            self, name: str, parent: Optional[TraceContext], start_time_unix_nano: int,
+            attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_time_unix_nano = start_time_unix_nano
+        self.end_time_unix_nano: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def context(self) -> TraceContext:
+        return TraceContext(trace_id=self.trace_id, span_id=self.span_id)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_time_unix_nano),
+            "endTimeUnixNano": str(self.end_time_unix_nano),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_CODE_ERROR, "message": self.error} if self.error else {"code": _STATUS_CODE_OK}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_request(span: Span) -> dict:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": [span.to_otlp()]}]
+        }]
+    }
+
+
+class _OtlpJsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(to_otlp_request(record.span), separators=(",", ":"))
+
+
+class SpanRecorder:
+    """
+    Write the finished spans from a background thread to a rotating file (OTLP/JSON lines).
+    """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        self._handler.setFormatter(_OtlpJsonFormatter())
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+        self._listener.start()
+
+    def record(self, span: Span):
+        self._queue.put_nowait(logging.makeLogRecord({"span": span}))
+
+    def close(self):
+        """
+        Write the queued spans and close the file.
+        """
+        self._listener.stop()
+        self._handler.close()
+
+
+_recorder: Optional[SpanRecorder] = None
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def configure_tracing(spans_path: Optional[str], max_bytes: int = 10_000_000, backup_count: int = 5):
+    """
+    Record the finished spans to `spans_path` (rotated at `max_bytes`), or only propagate the trace context if None.
+    """
+    global _recorder
+    shutdown_tracing()
+    if spans_path:
+        _recorder = SpanRecorder(path=spans_path, max_bytes=max_bytes, backup_count=backup_count)
+
+
+def shutdown_tracing():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def current_trace_context() -> Optional[TraceContext]:
+    span = _current_span.get()
+    return span.context() if span else None
+
+
+def _finish(span: Span):
+    if _recorder is not None:
+        _recorder.record(span)
+
+
+class start_span:
+    """
+    Time a `with` block as a span, child of `parent` or by default of the current span (new trace if none).
+
+        with start_span("transfer_funds", attributes={"transfer_uuid": ...}) as span:
+            ...
+    """
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, name: str, parent: Optional[TraceContext] = None, attributes: Optional[Dict[str, Any]] = None):
+        self._span = Span(
+            name=name,
+            parent=parent or current_trace_context(),
+            start_time_unix_nano=time.time_ns(),
+            attributes=attributes
+        )
+
+    def context(self) -> TraceContext:
+        """
+        Context of the span, to propagate before entering it (e.g. the span of a deferred operation).
+        """
+        return self._span.context()
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_span.reset(self._token)
+        self._span.end_time_unix_nano = time.time_ns()
+        if exc_type is not None:
+            self._span.error = f"{exc_type.__name__}: {exc_value}"
+        _finish(self._span)
+
+
+def record_span(
+        name: str, parent: Optional[TraceContext], duration_seconds: float, attributes: Optional[Dict[str, Any]] = None
+) -> Span:
+    """
+    Record a span ending now that was not timed by a `with` block (e.g. the time spent by a job in queue).
+    """
+    end_time_unix_nano = time.time_ns()
+    span = Span(
+        name=name,
+        parent=parent,
+        start_time_unix_nano=end_time_unix_nano - int(duration_seconds * 1e9),
+        attributes=attributes
+    )
+    span.end_time_unix_nano = end_time_unix_nano
+    _finish(span)
+    return span
@@ -0,0 +1,214 @@
+"""
+Standalone job consumers: the transfer and finalize bulk job consumers run in N processes against the SQLite job
+queue shared with the API processes (JOB_QUEUE_PATH), so transfer processing is not capped by the GIL of one process.
+
+The supervisor applies the pending migrations once, starts the worker processes and restarts the ones that exit.
+The workers are stopped by SIGTERM: each one finishes its current job first.
+Every worker consumes both queues: the bulk progress is an atomic UPDATE ... RETURNING statement, and the jobs are
+leased, so the jobs of a worker that dies are delivered again once their lease expires (see SqliteJobQueue).
+
+Usage:
+    JOB_QUEUE_PATH=./jobs.sqlite python -m app.worker [--processes 4]
+"""
+import argparse
+import dataclasses
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing.process import BaseProcess
+from multiprocessing.synchronize import Event as ProcessEvent
+from typing import Any, Callable, List, Optional
+
+from app.settings import AppMode, Settings, get_settings
+from app.utils.log_formatter import configure_logging, get_logger
+
+
+logger = get_logger("app.worker")  # not __name__: also run as __main__
+
+
+# Polling interval of a worker when both queues are empty
+IDLE_POLL_SECONDS = 0.01
+# Supervision interval, and minimum delay between two starts of a worker (crash loop)
+SUPERVISE_INTERVAL_SECONDS = 0.5
+RESTART_DELAY_SECONDS = 1.0
+# Grace period of the workers to finish their current job when stopped, before being terminated
+STOP_TIMEOUT_SECONDS = 10.0
+
+
+def consume_jobs(stop_event: threading.Event, idle_poll_seconds: float = IDLE_POLL_SECONDS) -> int:
+    """
+    Consume the jobs of the queues until `stop_event` is set.
+
+    Returns:
+        Number of consumed jobs
+    """
+    from app.routers import fake_broker
+
+    consumed = 0
+    while not stop_event.is_set():
+        has_consumed = _consume(fake_broker.consume_transfer_job, queue=lambda: fake_broker.TRANSFER_JOB_QUEUE)
+        has_consumed |= _consume(
+            fake_broker.consume_finalize_bulk_job, queue=lambda: fake_broker.FINALIZE_BULK_JOB_QUEUE
+        )
+        if has_consumed:
+            consumed += 1
+        else:
+            stop_event.wait(idle_poll_seconds)
+    return consumed
+
+
+def _consume(consumer: Callable[..., Any], queue: Callable[[], Any]) -> bool:
+    """
+    Returns:
+        False if the queue is empty, or if the job failed unexpectedly (the worker backs off before the next one)
+    """
+    from fastapi import HTTPException
+    from app.models import db
+
+    with db.new_session() as session:
+        try:
+            consumer(session=session)
+        except HTTPException as e:
+            if e.status_code == 404 and not queue():
+                return False
+            logger.warning("Job failed: %s", e.detail)
+        except Exception as e:  # e.g. database locked: the job is delivered again by the consumer endpoint
+            logger.exception("Job failed, retried later: %s", e)
+            return False
+    return True
+
+
+def run_worker_process(settings: Settings, index: int, ready: ProcessEvent):
+    """
+    Entry point of a worker process, stopped by SIGTERM.
+    """
+    # not a multiprocessing.Event shared with the supervisor: setting one blocks forever once a process waiting
+    # on it has been killed
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # stopped by the supervisor
+    from app.factory import configure_process, shutdown_process
+
+    configure_process(settings=settings)
+    ready.set()
+    try:
+        consumed = consume_jobs(stop_event=stop_event)
+        logger.info("Worker %d stopped after %d jobs", index, consumed)
+    finally:
+        shutdown_process()
+
+
+class WorkerSupervisor:
+    """
+    Starts the worker processes and restarts the ones that exit, until stopped.
+    """
+
+    def __init__(self, settings: Settings, processes: int, restart_delay_seconds: float = RESTART_DELAY_SECONDS):
+        if settings.job_queue_path is None:
+            raise ValueError("Worker processes need a shared job queue (JOB_QUEUE_PATH)")
+        # migrations are applied once, by the supervisor
+        self._settings = dataclasses.replace(settings, mode=AppMode.WORKER, run_migrations_on_startup=False)
+        self._restart_delay_seconds = restart_delay_seconds
+        self._context = multiprocessing.get_context("spawn")  # no inherited threads (logging, dispatcher)
+        self._stop_event = threading.Event()
+        self._processes: List[Optional[BaseProcess]] = [None] * processes
+        self._ready: List[ProcessEvent] = [self._context.Event() for _ in range(processes)]
+        self._started_at: List[float] = [0.0] * processes
+        self.restarts = 0
+
+    def _start_worker(self, index: int):
+        self._ready[index] = self._context.Event()
+        process = self._context.Process(
+            target=run_worker_process,
+            args=(self._settings, index, self._ready[index]),
+            name=f"worker-{index}"
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    def start(self):
+        for index in range(len(self._processes)):
+            self._start_worker(index)
+        logger.info("Started %d worker processes", len(self._processes))
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Returns:
+            True if all the workers are configured and consuming jobs within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        return all(ready.wait(max(0.0, deadline - time.monotonic())) for ready in self._ready)
+
+    def supervise(self) -> int:
+        """
+        Restart the workers that exited (at most once per restart delay each).
+
+        Returns:
+            Number of restarted workers
+        """
+        restarted = 0
+        for index, process in enumerate(self._processes):
+            if self._stop_event.is_set() or process is None or process.is_alive():
+                continue
+            if time.monotonic() - self._started_at[index] < self._restart_delay_seconds:
+                continue
+            logger.warning("Worker %d exited with code %s, restarting it", index, process.exitcode)
+            self._start_worker(index)
+            restarted += 1
+        self.restarts += restarted
+        return restarted
+
+    def run(self):
+        """
+        Start the workers and supervise them until stopped (SIGTERM, SIGINT).
+        """
+        self.start()
+        try:
+            while not self._stop_event.wait(SUPERVISE_INTERVAL_SECONDS):
+                self.supervise()
+        finally:
+            self.stop()
+
+    def request_stop(self):
+        self._stop_event.set()
+
+    def stop(self, timeout: float = STOP_TIMEOUT_SECONDS):
+        self._stop_event.set()
+        processes = [process for process in self._processes if process is not None]
+        for process in processes:
+            process.terminate()  # SIGTERM: the worker finishes its current job
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, killing it", process.name)
+                process.kill()
+                process.join()
+
+    def pids(self) -> List[Optional[int]]:
+        return [process.pid if process is not None else None for process in self._processes]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description=__doc__.strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: WORKER_PROCESSES)")
+    args = parser.parse_args(argv)
+    settings = get_settings()
+    configure_logging(level=settings.log_level, log_format=settings.log_format, asynchronous=False)
+
+    if settings.run_migrations_on_startup:
+        from app.factory import run_migrations
+        run_migrations(settings=settings)
+    supervisor = WorkerSupervisor(settings=settings, processes=args.processes or settings.worker_processes)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.request_stop())
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        logger.info("Stopping the workers")
+
+
+if __name__ == "__main__":
+    main()
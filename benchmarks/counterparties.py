@@ -0,0 +1,149 @@
+"""
+Storage benchmark of the transactions: counterparty inlined in each row (before migration 007)
+versus a reference to the counterparties dictionary table.
+
+Usage:
+    python -m benchmarks.counterparties [--transactions 1000000] [--counterparties 500] [--batch-size 1000] \
+        [--output results.json]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from sqlalchemy import MetaData, Table, create_engine, insert
+from sqlmodel import Session
+
+from app.migrations.simple_runner import MIGRATIONS_DIR, run_all_migrations
+from app.models import db
+
+
+COUNTERPARTIES_MIGRATION = "007_add_counterparties_table.sql"
+
+
+def _transactions(count: int, counterparties: int) -> Iterator[dict]:
+    # monthly payroll of the same employees: the counterparties repeat, the transfers do not
+    # (uuids stored as the ORM stores them: 32 hex digits)
+    bulk_request_uuid = uuid.uuid4().hex
+    for index in range(count):
+        counterparty = index % counterparties
+        if counterparty == 0:
+            bulk_request_uuid = uuid.uuid4().hex
+        yield {
+            "transfer_uuid": uuid.uuid4().hex,
+            "bulk_request_uuid": bulk_request_uuid,
+            "counterparty_name": f"Employee {counterparty} of ACME Corp.",
+            "counterparty_iban": f"FR76300060000112345678{counterparty:05d}",
+            "counterparty_bic": "BNPAFRPPXXX",
+            "amount_cents": -(250000 + counterparty),
+            "amount_currency": "EUR",
+            "bank_account_id": 1,
+            "description": f"Salary {index // counterparties}",
+        }
+
+
+def _batches(rows: Iterator[dict], batch_size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _database_size(database_path: Path) -> int:
+    return sum(path.stat().st_size for path in database_path.parent.glob(f"{database_path.name}*"))
+
+
+def measure_inline_layout(directory: Path, transactions: int, counterparties: int, batch_size: int) -> dict:
+    """
+    Schema before the counterparties table: migrations up to 006.
+    """
+    migrations_dir = directory / "inline_migrations"
+    migrations_dir.mkdir()
+    for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if migration.name < COUNTERPARTIES_MIGRATION:
+            shutil.copy(migration, migrations_dir)
+    database_path = directory / "inline.sqlite"
+    run_all_migrations(database_path=str(database_path), migrations_dir=migrations_dir)
+
+    engine = create_engine(f"sqlite:///{database_path}")
+    table = Table("transactions", MetaData(), autoload_with=engine)
+    started_at = time.perf_counter()
+    for batch in _batches(_transactions(transactions, counterparties), batch_size):
+        with engine.begin() as connection:
+            connection.execute(insert(table), batch)
+    elapsed_seconds = time.perf_counter() - started_at
+    engine.dispose()
+    return {"bytes": _database_size(database_path), "elapsed_seconds": elapsed_seconds}
+
+
+def measure_dictionary_layout(directory: Path, transactions: int, counterparties: int, batch_size: int) -> dict:
+    """
+    Current schema: the counterparty of each transaction is interned through `db.intern_counterparty`.
+    """
+    database_path = directory / "dictionary.sqlite"
+    run_all_migrations(database_path=str(database_path))
+    previous_database_path = db.DATABASE_PATH
+    engine = db.configure_engine(database_path=str(database_path))
+    table = Table("transactions", MetaData(), autoload_with=engine)
+    try:
+        started_at = time.perf_counter()
+        for batch in _batches(_transactions(transactions, counterparties), batch_size):
+            with Session(engine) as session, session.begin():
+                rows = []
+                for row in batch:
+                    row["counterparty_id"] = db.intern_counterparty(
+                        session=session,
+                        name=row.pop("counterparty_name"),
+                        iban=row.pop("counterparty_iban"),
+                        bic=row.pop("counterparty_bic")
+                    )
+                    rows.append(row)
+                session.connection().execute(insert(table), rows)
+        elapsed_seconds = time.perf_counter() - started_at
+    finally:
+        db.configure_engine(database_path=previous_database_path)
+    return {"bytes": _database_size(database_path), "elapsed_seconds": elapsed_seconds}
+
+
+def run(transactions: int, counterparties: int, batch_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        inline = measure_inline_layout(Path(directory), transactions, counterparties, batch_size)
+        dictionary = measure_dictionary_layout(Path(directory), transactions, counterparties, batch_size)
+    return {
+        "transactions": transactions,
+        "counterparties": counterparties,
+        "inline_bytes": inline["bytes"],
+        "dictionary_bytes": dictionary["bytes"],
+        "size_ratio": round(inline["bytes"] / dictionary["bytes"], 2),
+        "inline_transactions_per_second": round(transactions / inline["elapsed_seconds"]),
+        "dictionary_transactions_per_second": round(transactions / dictionary["elapsed_seconds"]),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.counterparties")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--counterparties", type=int, default=500, help="distinct payroll recipients")
+    parser.add_argument("--batch-size", type=int, default=1000, help="transactions per database transaction")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    result = run(args.transactions, args.counterparties, args.batch_size)
+    print(f"{result['transactions']} transactions: "
+          f"inline {result['inline_bytes'] / 2**20:.1f} MiB ({result['inline_transactions_per_second']}/s) | "
+          f"dictionary {result['dictionary_bytes'] / 2**20:.1f} MiB "
+          f"({result['dictionary_transactions_per_second']}/s) | x{result['size_ratio']:.2f} smaller")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Conversion of the amounts of a mixed-currency bulk to the account currency, per bulk:
+- "rate lookup per line": each amount is converted with a rate queried from the `fx_rates` table,
+- "cached rates, Decimal per line": rates of a snapshot, Decimal product and rounding per amount,
+- "one pass": `FxRates.to_account_cents`, one rate lookup per distinct currency and integer arithmetic per amount.
+
+Usage:
+    python -m benchmarks.fx_conversion [--transfers 1000] [--currencies EUR USD GBP CHF JPY] [--repeat 50] \
+        [--output results.json]
+"""
+import argparse
+import decimal
+import itertools
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.amounts.currencies import ACCOUNT_CURRENCY, minor_units
+from app.models import db
+from app.services.fx_rates import FX_RATE_CACHE
+
+from benchmarks.pipeline import temporary_database
+
+
+# in minor units of the currency of each credit transfer
+AMOUNTS = (123456, 250000, 98765, 310010)
+
+
+def _median_ms(convert: Callable[[], List[int]], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        convert()
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations) * 1000
+
+
+def _decimal_to_account_cents(amount: int, currency: str, rate: decimal.Decimal) -> int:
+    amount_in_currency = decimal.Decimal(amount).scaleb(-minor_units(currency))
+    converted_amount = (amount_in_currency * rate).quantize(decimal.Decimal("0.01"), rounding=decimal.ROUND_HALF_UP)
+    return int(converted_amount.scaleb(minor_units(ACCOUNT_CURRENCY)))
+
+
+def measure_conversions(transfers: int, currencies: List[str], repeat: int) -> List[dict]:
+    line_currencies = list(itertools.islice(itertools.cycle(currencies), transfers))
+    amounts = list(itertools.islice(itertools.cycle(AMOUNTS), transfers))
+    with temporary_database():
+        fx_rates = FX_RATE_CACHE.snapshot()
+        rates = dict(fx_rates.rates, **{ACCOUNT_CURRENCY: decimal.Decimal(1)})
+
+        def lookup_per_line() -> List[int]:
+            with Session(db.engine) as session:
+                def rate_of(currency: str) -> decimal.Decimal:
+                    if currency == ACCOUNT_CURRENCY:
+                        return decimal.Decimal(1)
+                    return decimal.Decimal(session.execute(
+                        text("SELECT rate FROM fx_rates WHERE currency = :currency"), {"currency": currency}
+                    ).scalar_one())
+
+                return [
+                    _decimal_to_account_cents(amount, currency, rate=rate_of(currency))
+                    for amount, currency in zip(amounts, line_currencies)
+                ]
+
+        def decimal_per_line() -> List[int]:
+            return [
+                _decimal_to_account_cents(amount, currency, rate=rates[currency])
+                for amount, currency in zip(amounts, line_currencies)
+            ]
+
+        def one_pass() -> List[int]:
+            return fx_rates.to_account_cents(amounts=amounts, currencies=line_currencies)
+
+        conversions = {
+            "rate lookup per line": lookup_per_line,
+            "cached rates, Decimal per line": decimal_per_line,
+            "one pass": one_pass,
+        }
+        expected_amounts = one_pass()
+        results = []
+        for name, convert in conversions.items():
+            assert convert() == expected_amounts, name
+            results.append({
+                "conversion": name,
+                "transfers": transfers,
+                "ms_per_bulk": round(_median_ms(convert, repeat), 3),
+            })
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fx_conversion")
+    parser.add_argument("--transfers", type=int, default=1000, help="credit transfers per bulk")
+    parser.add_argument("--currencies", nargs="+", default=["EUR", "USD", "GBP", "CHF", "JPY"],
+                        help="currencies of the credit transfers, in turn (with a rate in the fx_rates table)")
+    parser.add_argument("--repeat", type=int, default=50, help="conversions per method (median reported)")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = measure_conversions(args.transfers, args.currencies, args.repeat)
+    for result in results:
+        print(f"{result['conversion']:<32} {result['ms_per_bulk']:>8.3f} ms/bulk of {result['transfers']} transfers")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
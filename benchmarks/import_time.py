@@ -0,0 +1,134 @@
+"""
+Import-time benchmark of the application entry points, based on `python -X importtime`.
+
+The budget of an entry point is its recorded baseline plus a margin: update the baseline when an import is
+added on purpose.
+
+Usage:
+    python -m benchmarks.import_time [--runs 3] [--output results.json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$")
+
+# Budget over the baseline: catches a heavy import added on an entry point, the fastest of a few runs
+# absorbs the machine noise
+BUDGET_MARGIN = 1.25
+
+
+@dataclass(frozen=True)
+class EntryPoint:
+    name: str
+    statement: str
+    baseline_ms: float  # median of 5 runs of this benchmark
+
+    @property
+    def budget_ms(self) -> float:
+        return self.baseline_ms * BUDGET_MARGIN
+
+
+ENTRY_POINTS = [
+    EntryPoint(
+        name="worker-app",
+        statement="from app.factory import create_app; from app.settings import AppMode, Settings; "
+                  "create_app(Settings(mode=AppMode.WORKER))",
+        baseline_ms=840,
+    ),
+    EntryPoint(
+        name="api-app",
+        statement="import app.main",
+        baseline_ms=850,
+    ),
+    EntryPoint(
+        name="worker-cli",
+        statement="import app.worker",
+        baseline_ms=90,
+    ),
+    EntryPoint(
+        name="migrations-cli",
+        statement="import app.migrations.simple_runner",
+        baseline_ms=80,
+    ),
+]
+
+
+@dataclass
+class ImportTimeResult:
+    name: str
+    total_ms: float
+    budget_ms: float
+    modules: List[str]
+    slowest_top_level_imports_ms: Dict[str, float]
+
+    @property
+    def within_budget(self) -> bool:
+        return self.total_ms <= self.budget_ms
+
+
+def measure_import_time(entry_point: EntryPoint, runs: int = 1) -> ImportTimeResult:
+    """
+    Run the entry point statement in a fresh interpreter and parse the `-X importtime` report.
+
+    Args:
+        runs: Number of runs, the fastest one is kept
+    """
+    return min((_measure_once(entry_point) for _ in range(runs)), key=lambda result: result.total_ms)
+
+
+def _measure_once(entry_point: EntryPoint) -> ImportTimeResult:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", entry_point.statement],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    top_level_imports_us = {}
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, module = int(match.group(2)), match.group(3), match.group(4)
+        modules.append(module)
+        if len(indent) == 1:  # imported by the entry point statement itself
+            top_level_imports_us[module] = cumulative_us
+    slowest = sorted(top_level_imports_us.items(), key=lambda item: item[1], reverse=True)[:10]
+    return ImportTimeResult(
+        name=entry_point.name,
+        total_ms=sum(top_level_imports_us.values()) / 1000,
+        budget_ms=entry_point.budget_ms,
+        modules=modules,
+        slowest_top_level_imports_ms={module: us / 1000 for module, us in slowest},
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_time")
+    parser.add_argument("--runs", type=int, default=3, help="runs per entry point, the fastest one is kept")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = [measure_import_time(entry_point, runs=args.runs) for entry_point in ENTRY_POINTS]
+    for result in results:
+        print(f"{result.name}: {result.total_ms:.1f} ms (budget {result.budget_ms:.0f} ms)"
+              f"{'' if result.within_budget else ' OVER BUDGET'}")
+        for module, duration_ms in result.slowest_top_level_imports_ms.items():
+            print(f"    {module}: {duration_ms:.1f} ms")
+    if args.output:
+        Path(args.output).write_text(json.dumps(
+            [{**asdict(result), "modules": len(result.modules), "within_budget": result.within_budget}
+             for result in results], indent=2
+        ))
+    sys.exit(0 if all(result.within_budget for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
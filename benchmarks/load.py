@@ -0,0 +1,280 @@
+"""
+End-to-end load benchmark: bulk requests are submitted to the API while job consumers process them, in-process.
+
+For each scenario (bulk size, number of accounts, concurrency), reports the accept latency (POST /transfers/bulk)
+p50/p99, the processed transfers per second, the time from submission to COMPLETED and the peak RSS.
+Each scenario runs in its own process, so the peak RSS of a scenario does not include the previous ones.
+
+Usage:
+    python -m benchmarks.load [--bulk-sizes 10 100 1000] [--accounts 1 4] [--concurrency 1 4] [--bulks 20]
+                              [--manifest-mode] [--output results.json] [--baseline previous_results.json]
+"""
+import argparse
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Finalize job consumers: a finalize job is 1 or 2 atomic statements, a single consumer keeps up
+FINALIZE_CONSUMERS = 1
+# Polling interval of the consumers when a queue is empty
+IDLE_POLL_SECONDS = 0.001
+
+
+@dataclasses.dataclass(frozen=True)
+class Scenario:
+    bulk_size: int
+    accounts: int
+    concurrency: int  # submitting clients and transfer job consumers
+    bulks: int
+    manifest_mode: bool = False
+
+
+def percentile(values: List[float], rank: float) -> Optional[float]:
+    """
+    Nearest-rank percentile (e.g. rank=99), None if no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(rank / 100 * len(ordered)) - 1)]
+
+
+def _summary_ms(seconds: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        name: round(value * 1000, 2) if value is not None else None
+        for name, value in (
+            ("p50", percentile(seconds, 50)), ("p99", percentile(seconds, 99)), ("max", max(seconds, default=None))
+        )
+    }
+
+
+def _peak_rss_mb() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    """
+    Run a scenario in the current process.
+    """
+    from app.main import app
+    from fastapi.testclient import TestClient
+    from benchmarks.pipeline import temporary_database
+
+    _configure(scenario)
+    with temporary_database():
+        run = _ScenarioRun(scenario=scenario, client=TestClient(app))
+        elapsed_seconds = run.run(payloads=_bulk_payloads(scenario))
+    return _report(scenario=scenario, run=run, elapsed_seconds=elapsed_seconds)
+
+
+def _configure(scenario: Scenario):
+    from app.settings import configure_settings, get_settings
+    from app.utils.log_formatter import configure_logging
+
+    configure_logging(level="WARNING", asynchronous=False)
+    configure_settings(dataclasses.replace(get_settings(), bulk_manifest_mode=scenario.manifest_mode))
+
+
+def _bulk_payloads(scenario: Scenario) -> List[dict]:
+    """
+    Payloads of the bulk requests of the scenario, spread over its seeded accounts (generated before the measure).
+    """
+    from benchmarks.pipeline import seed_accounts, bulk_payload
+
+    accounts = seed_accounts(count=scenario.accounts)
+    return [
+        bulk_payload(bic=bic, iban=iban, transfer_count=scenario.bulk_size)
+        for (bic, iban), _ in zip(itertools.cycle(accounts), range(scenario.bulks))
+    ]
+
+
+class _ScenarioRun:
+    """
+    Submitting clients, transfer job consumers and finalize job consumers of a scenario, and their measures.
+    """
+
+    def __init__(self, scenario: Scenario, client):
+        self.scenario = scenario
+        self.client = client
+        self.accept_latencies: List[float] = []
+        self.submitted_at: Dict[str, float] = {}
+        self.completed_at: Dict[str, float] = {}
+        self.failed_jobs: List[str] = []
+        self._submissions_done = threading.Event()
+        self._transfer_consumers_done = threading.Event()
+
+    def run(self, payloads: List[dict]) -> float:
+        """
+        Returns:
+            Elapsed seconds from the first submission to the last finalize job
+        """
+        concurrency = self.scenario.concurrency
+        started_at = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2 * concurrency + FINALIZE_CONSUMERS) as pool:
+            transfer_consumers = [pool.submit(self._consume_transfers) for _ in range(concurrency)]
+            bulk_consumers = [pool.submit(self._consume_bulks) for _ in range(FINALIZE_CONSUMERS)]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as clients:
+                for future in [clients.submit(self._submit, payload) for payload in payloads]:
+                    future.result()
+            self._submissions_done.set()
+            for future in transfer_consumers:
+                future.result()
+            self._transfer_consumers_done.set()
+            for future in bulk_consumers:
+                future.result()
+        return time.perf_counter() - started_at
+
+    def _submit(self, payload: dict):
+        started_at = time.perf_counter()
+        response = self.client.post("/transfers/bulk", json=payload)
+        accepted_at = time.perf_counter()
+        response.raise_for_status()
+        self.submitted_at[payload["request_id"]] = started_at
+        self.accept_latencies.append(accepted_at - started_at)
+
+    def _consume(self, consumer: Callable[[], Any]) -> Any:
+        from fastapi import HTTPException
+
+        try:
+            result = consumer()
+        except HTTPException as e:
+            self.failed_jobs.append(str(e.detail))
+            return False
+        if result is not None and not isinstance(result, dict):  # error response
+            self.failed_jobs.append(result.body.decode())
+        return result
+
+    def _consume_transfers(self):
+        from benchmarks.pipeline import consume_transfer_job
+
+        while True:
+            if self._consume(consume_transfer_job) is None:
+                if self._submissions_done.is_set():
+                    return
+                time.sleep(IDLE_POLL_SECONDS)
+
+    def _consume_bulks(self):
+        from benchmarks.pipeline import consume_bulk_job
+
+        while len(self.completed_at) < self.scenario.bulks:
+            result = self._consume(consume_bulk_job)
+            if result is None:
+                if self._transfer_consumers_done.is_set():
+                    return
+                time.sleep(IDLE_POLL_SECONDS)
+            elif isinstance(result, dict) and result["status"] in ("COMPLETED", "FAILED"):
+                self.completed_at.setdefault(result["bulk_request_uuid"], time.perf_counter())
+
+
+def _report(scenario: Scenario, run: _ScenarioRun, elapsed_seconds: float) -> dict:
+    return {
+        **dataclasses.asdict(scenario),
+        "completed_bulks": len(run.completed_at),
+        "failed_jobs": len(run.failed_jobs),
+        "accept_latency_ms": _summary_ms(run.accept_latencies),
+        "transfers_per_second": round(scenario.bulks * scenario.bulk_size / elapsed_seconds, 1),
+        "time_to_completed_ms": _summary_ms([
+            run.completed_at[bulk_id] - run.submitted_at[bulk_id]
+            for bulk_id in run.completed_at if bulk_id in run.submitted_at
+        ]),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_scenario_in_subprocess(scenario: Scenario) -> dict:
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(run_scenario, scenario).result()
+
+
+def compare(results: List[dict], baseline: List[dict]) -> List[str]:
+    """
+    Relative change of the throughput and the p99 latencies against the same scenarios of a previous run.
+    """
+    scenario_fields = [field.name for field in dataclasses.fields(Scenario)]
+    baseline_by_scenario = {tuple(result[name] for name in scenario_fields): result for result in baseline}
+    lines = []
+    for result in results:
+        previous = baseline_by_scenario.get(tuple(result[name] for name in scenario_fields))
+        if previous is None:
+            continue
+        changes = [
+            f"{metric}: {_change(previous_value, value)}"
+            for metric, previous_value, value in (
+                ("transfers/s", previous["transfers_per_second"], result["transfers_per_second"]),
+                ("accept p99", previous["accept_latency_ms"]["p99"], result["accept_latency_ms"]["p99"]),
+                ("completed p99", previous["time_to_completed_ms"]["p99"], result["time_to_completed_ms"]["p99"]),
+                ("peak RSS", previous["peak_rss_mb"], result["peak_rss_mb"]),
+            )
+        ]
+        lines.append(f"{_scenario_name(result)}: " + ", ".join(changes))
+    return lines
+
+
+def _change(previous_value: Optional[float], value: Optional[float]) -> str:
+    if not previous_value or value is None:
+        return "n/a"
+    return f"{(value - previous_value) / previous_value:+.1%}"
+
+
+def _scenario_name(result: dict) -> str:
+    return (f"bulk_size={result['bulk_size']} accounts={result['accounts']} concurrency={result['concurrency']}"
+            f"{' manifest' if result['manifest_mode'] else ''}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--bulk-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--bulks", type=int, default=20, help="bulk requests per scenario")
+    parser.add_argument("--manifest-mode", action="store_true", help="queue bulk manifest references")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    parser.add_argument("--baseline", default=None, help="JSON results file of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    results = []
+    for bulk_size, accounts, concurrency in itertools.product(args.bulk_sizes, args.accounts, args.concurrency):
+        scenario = Scenario(
+            bulk_size=bulk_size, accounts=accounts, concurrency=concurrency, bulks=args.bulks,
+            manifest_mode=args.manifest_mode
+        )
+        result = run_scenario_in_subprocess(scenario)
+        results.append(result)
+        print(f"{_scenario_name(result)}: accept p50={result['accept_latency_ms']['p50']}ms "
+              f"p99={result['accept_latency_ms']['p99']}ms | {result['transfers_per_second']} transfers/s | "
+              f"completed p50={result['time_to_completed_ms']['p50']}ms p99={result['time_to_completed_ms']['p99']}ms"
+              f" | peak RSS={result['peak_rss_mb']}MB | {result['completed_bulks']}/{scenario.bulks} completed"
+              f" | {result['failed_jobs']} failed jobs")
+
+    if args.baseline:
+        for line in compare(results, json.loads(Path(args.baseline).read_text())["scenarios"]):
+            print(line)
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "sqlite": sqlite3.sqlite_version,
+            },
+            "scenarios": results
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
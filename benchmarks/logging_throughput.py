@@ -0,0 +1,67 @@
+"""
+Jobs/second of the transfer pipeline with logging off versus on (synchronous, asynchronous, sampled).
+
+Usage:
+    python -m benchmarks.logging_throughput [--transfers 2000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, TextIO
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.log_formatter import configure_logging, shutdown_logging
+from benchmarks.pipeline import temporary_database, seed_accounts, submit_bulk, drain_queues
+
+
+SCENARIOS = {
+    "off": dict(level="CRITICAL", asynchronous=False),
+    "sync-color": dict(level="DEBUG", log_format="color", asynchronous=False),
+    "sync-json": dict(level="DEBUG", log_format="json", asynchronous=False),
+    "async-json": dict(level="DEBUG", log_format="json", asynchronous=True),
+    "async-json-sampled-1%": dict(level="DEBUG", log_format="json", asynchronous=True, job_log_sample_rate=0.01),
+}
+
+
+def run_scenario(transfers: int, logging_options: dict, stream: TextIO) -> float:
+    """
+    Returns:
+        Processed transfer jobs per second
+    """
+    configure_logging(stream=stream, **logging_options)
+    with temporary_database():
+        client = TestClient(app)
+        (bic, iban), = seed_accounts(count=1)
+        for bulk_size in [1000] * (transfers // 1000) + ([transfers % 1000] if transfers % 1000 else []):
+            submit_bulk(client=client, bic=bic, iban=iban, transfer_count=bulk_size)
+
+        started_at = time.perf_counter()
+        processed_transfers = drain_queues()
+        elapsed_seconds = time.perf_counter() - started_at
+        shutdown_logging()  # flush the queued records within the measure
+    return processed_transfers / elapsed_seconds
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.logging_throughput")
+    parser.add_argument("--transfers", type=int, default=2000)
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        for name, logging_options in SCENARIOS.items():
+            jobs_per_second = run_scenario(transfers=args.transfers, logging_options=logging_options, stream=devnull)
+            results[name] = round(jobs_per_second, 1)
+            print(f"{name}: {results[name]} jobs/s")
+    configure_logging(asynchronous=False)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"transfers": args.transfers, "jobs_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
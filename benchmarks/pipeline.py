@@ -0,0 +1,139 @@
+"""
+Helpers to drive the bulk transfer pipeline in-process against a temporary SQLite database (or sharded layout).
+"""
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.migrations.shards import migrate_shards
+from app.migrations.simple_runner import run_all_migrations
+from app.models import db
+from app.routers import fake_broker
+
+from tests.faker import stub_bulk_transfer_payload, stub_credit_transfer
+
+
+@contextmanager
+def temporary_database() -> Iterator[str]:
+    """
+    Migrated database in a temporary directory, used by the application engine in the context.
+    """
+    previous_database_path = db.DATABASE_PATH
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = str(Path(directory) / "benchmark.sqlite")
+        run_all_migrations(database_path=database_path)
+        db.configure_engine(database_path=database_path)
+        try:
+            yield database_path
+        finally:
+            db.configure_engine(database_path=previous_database_path)
+            fake_broker.TRANSFER_JOB_QUEUE.clear()
+            fake_broker.FINALIZE_BULK_JOB_QUEUE.clear()
+            fake_broker.CANCELLED_BULK_REQUESTS.clear()
+
+
+@contextmanager
+def temporary_shards(shard_count: int) -> Iterator[str]:
+    """
+    Migrated sharded layout in a temporary directory, used by the application in the context.
+    """
+    previous_database_path = db.DATABASE_PATH
+    with tempfile.TemporaryDirectory() as shards_dir:
+        migrate_shards(shards_dir=shards_dir, shard_count=shard_count)
+        db.configure_shards(shards_dir=shards_dir, shard_count=shard_count)
+        try:
+            yield shards_dir
+        finally:
+            db.configure_engine(database_path=previous_database_path)
+            fake_broker.TRANSFER_JOB_QUEUE.clear()
+            fake_broker.FINALIZE_BULK_JOB_QUEUE.clear()
+            fake_broker.CANCELLED_BULK_REQUESTS.clear()
+
+
+def seed_accounts(count: int, balance_cents: int = 10**12) -> List[Tuple[str, str]]:
+    """
+    Returns:
+        (bic, iban) of the created accounts
+    """
+    accounts = [(f"BENCHFRPP{i:03d}", f"FR76300060000100000000{i:05d}") for i in range(count)]
+    if db.is_sharded():  # each account on the shard placed from its (bic, iban)
+        for i, (bic, iban) in enumerate(accounts):
+            db.create_account(organization_name=f"Organization {i}", bic=bic, iban=iban, balance_cents=balance_cents)
+        return accounts
+    with Session(db.engine) as session:
+        session.add_all(
+            db.BankAccount(organization_name=f"Organization {i}", bic=bic, iban=iban, balance_cents=balance_cents)
+            for i, (bic, iban) in enumerate(accounts)
+        )
+        session.commit()
+    return accounts
+
+
+def bulk_payload(bic: str, iban: str, transfer_count: int) -> dict:
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="12.34") for _ in range(transfer_count)],
+        verbose=False
+    )
+    payload["organization_bic"] = bic
+    payload["organization_iban"] = iban
+    return payload
+
+
+def submit_bulk(client: TestClient, bic: str, iban: str, transfer_count: int) -> dict:
+    response = client.post("/transfers/bulk", json=bulk_payload(bic=bic, iban=iban, transfer_count=transfer_count))
+    response.raise_for_status()
+    return response.json()
+
+
+def _content(result: Any) -> Any:
+    # the job endpoints return their JSON responses directly (see app.utils.responses)
+    return orjson.loads(result.body) if isinstance(result, Response) else result
+
+
+def consume_transfer_job() -> Optional[Any]:
+    """
+    Returns:
+        Result of the consumer endpoint, None when the queue is empty
+    """
+    with db.new_session() as session:
+        try:
+            return _content(fake_broker.consume_transfer_job(session=session))
+        except HTTPException as e:
+            if e.status_code == 404 and not fake_broker.TRANSFER_JOB_QUEUE:
+                return None
+            raise
+
+
+def consume_bulk_job() -> Optional[Any]:
+    """
+    Returns:
+        Result of the consumer endpoint, None when the queue is empty
+    """
+    with db.new_session() as session:
+        try:
+            return _content(fake_broker.consume_finalize_bulk_job(session=session))
+        except HTTPException as e:
+            if e.status_code == 404 and not fake_broker.FINALIZE_BULK_JOB_QUEUE:
+                return None
+            raise
+
+
+def drain_queues() -> int:
+    """
+    Process all the queued transfer and bulk jobs in the current thread.
+
+    Returns:
+        Number of processed transfer jobs
+    """
+    transfers = 0
+    while consume_transfer_job() is not None:
+        transfers += 1
+    while consume_bulk_job() is not None:
+        pass
+    return transfers
@@ -0,0 +1,79 @@
+"""
+Memory benchmark of the transfer job queue: Pydantic TransferJob versus compact QueuedTransferJob entries.
+
+Usage:
+    python -m benchmarks.queue_memory [--sizes 10000 100000] [--counterparties 500] [--output results.json]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from app.models.job import TransferJob, QueuedTransferJob
+
+
+def _parsed_transfer_job(index: int, bulk_request_uuid: str, counterparties: int) -> TransferJob:
+    # build new string objects for each job, as parsing a JSON request body does
+    counterparty = index % counterparties
+    return TransferJob(
+        transfer_uuid=str(uuid.uuid4()),
+        bulk_request_uuid="".join(bulk_request_uuid),
+        bank_account_id=1,
+        counterparty_name=f"Employee {counterparty}",
+        counterparty_iban=f"FR76300060000112345678{counterparty:05d}",
+        counterparty_bic="".join("BNPAFRPPXXX"),
+        amount_cents=250000 + counterparty,
+        amount_currency="".join("EUR"),
+        description=f"Salary payment for June 2024 - employee {counterparty}"
+    )
+
+
+def measure_queue_memory(size: int, counterparties: int, to_entry: Callable[[TransferJob], object]) -> int:
+    """
+    Memory (bytes) retained by a queue of `size` jobs.
+    """
+    bulk_request_uuid = str(uuid.uuid4())
+    gc.collect()
+    tracemalloc.start()
+    queue = deque()
+    for index in range(size):
+        queue.append(to_entry(_parsed_transfer_job(index, bulk_request_uuid, counterparties)))
+    gc.collect()
+    retained_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue
+    return retained_bytes
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.queue_memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--counterparties", type=int, default=500, help="distinct payroll recipients")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        pydantic_bytes = measure_queue_memory(size, args.counterparties, lambda job: job)
+        compact_bytes = measure_queue_memory(size, args.counterparties, QueuedTransferJob.from_transfer_job)
+        results.append({
+            "queued_jobs": size,
+            "pydantic_bytes": pydantic_bytes,
+            "compact_bytes": compact_bytes,
+            "pydantic_bytes_per_job": round(pydantic_bytes / size),
+            "compact_bytes_per_job": round(compact_bytes / size),
+            "ratio": round(pydantic_bytes / compact_bytes, 2),
+        })
+        print(f"{size} jobs: pydantic {pydantic_bytes / 2**20:.1f} MiB ({pydantic_bytes // size} B/job) | "
+              f"compact {compact_bytes / 2**20:.1f} MiB ({compact_bytes // size} B/job) | "
+              f"x{pydantic_bytes / compact_bytes:.1f}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
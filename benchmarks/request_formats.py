@@ -0,0 +1,94 @@
+"""
+Request body formats of a bulk transfer request: bytes on the wire and decoding + validation time per bulk,
+for JSON and MessagePack bodies, uncompressed or compressed with gzip or zstd.
+
+Usage:
+    python -m benchmarks.request_formats [--transfers 1000] [--repeat 50] [--output results.json]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import msgpack
+import zstandard
+
+from app.models.adapter import BulkTransferRequest
+from app.utils import request_body
+
+from benchmarks.pipeline import bulk_payload
+
+
+# Starlette receives the body in chunks of at most 64 KiB
+CHUNK_BYTES = 65536
+
+ENCODERS = {
+    "": lambda body: body,
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+    "zstd": lambda body: zstandard.ZstdCompressor(level=3).compress(body),
+}
+SERIALIZERS = {
+    request_body.JSON_MEDIA_TYPE: lambda payload: json.dumps(payload).encode(),
+    request_body.MSGPACK_MEDIA_TYPES[0]: msgpack.packb,
+}
+
+
+def _chunks(body: bytes) -> List[bytes]:
+    return [body[start:start + CHUNK_BYTES] for start in range(0, len(body), CHUNK_BYTES)]
+
+
+def _median_ms(parse: Callable[[], BulkTransferRequest], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        parse()
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations) * 1000
+
+
+def measure_formats(transfers: int, repeat: int) -> List[dict]:
+    payload = bulk_payload(bic="OIVUSCLQXXX", iban="FR10474608000002006107XXXXX", transfer_count=transfers)
+    json_body = SERIALIZERS[request_body.JSON_MEDIA_TYPE](payload)
+    results = [{
+        # parsing of the endpoint before the request body decoding: JSON to dict, then validation of the dict
+        "format": "json (dict validation)",
+        "bytes": len(json_body),
+        "parse_ms": round(_median_ms(lambda: BulkTransferRequest(**json.loads(json_body)), repeat), 3),
+    }]
+    for content_type, serialize in SERIALIZERS.items():
+        for content_encoding, encode in ENCODERS.items():
+            chunks = _chunks(encode(serialize(payload)))
+
+            def parse():
+                body = request_body.decode_body(chunks=chunks, content_encoding=content_encoding)
+                return request_body.validate_body(model=BulkTransferRequest, body=body, content_type=content_type)
+
+            assert len(parse().credit_transfers) == transfers
+            name = "json" if content_type == request_body.JSON_MEDIA_TYPE else "msgpack"
+            results.append({
+                "format": f"{name}+{content_encoding}" if content_encoding else name,
+                "bytes": sum(len(chunk) for chunk in chunks),
+                "parse_ms": round(_median_ms(parse, repeat), 3),
+            })
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.request_formats")
+    parser.add_argument("--transfers", type=int, default=1000, help="credit transfers per bulk")
+    parser.add_argument("--repeat", type=int, default=50, help="parses per format (median reported)")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = measure_formats(args.transfers, args.repeat)
+    for result in results:
+        print(f"{result['format']:<24} {result['bytes']:>9} bytes | {result['parse_ms']:>7.2f} ms/bulk")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
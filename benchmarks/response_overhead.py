@@ -0,0 +1,145 @@
+"""
+Response overhead of the ingest and job endpoints:
+- per response: building the body of a success or error response of POST /transfers/bulk the former way (a dict
+  validated and serialized through the `response_model` by FastAPI, or a Pydantic error model `model_dump()`ed,
+  rendered by `JSONResponse`) against the precompiled serializers of app.utils.responses,
+- per request: latency of POST /transfers/bulk (accepted and rejected) and of /internal/jobs/* requests
+  through the whole application (routing, body decoding, endpoint and response).
+
+Usage:
+    python -m benchmarks.response_overhead [--repeat 2000] [--requests 200] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import adapter
+from app.routers import bulk_transfers
+from app.utils.responses import FastJSONResponse, ResponseShape
+
+from benchmarks.pipeline import bulk_payload, seed_accounts, temporary_database
+
+
+def _median_us(durations: List[float]) -> float:
+    return statistics.median(durations) * 10**6
+
+
+def _bulk_route() -> APIRoute:
+    return next(
+        route for route in bulk_transfers.router.routes
+        if isinstance(route, APIRoute) and route.path == "/bulk" and "POST" in route.methods
+    )
+
+
+def measure_serialization(repeat: int) -> List[dict]:
+    """
+    Returns:
+        Median µs to build each response body, the former way and with the precompiled serializers
+    """
+    response_field = _bulk_route().response_field
+    bulk_id = str(uuid.uuid4())
+    content = {"message": "Bulk transfer accepted", "bulk_id": bulk_id}
+    success_response = ResponseShape(adapter.BulkTransferSuccessResponse)  # as in app.routers.bulk_transfers
+
+    async def validated_success() -> bytes:
+        serialized_content = await serialize_response(field=response_field, response_content=content)
+        return JSONResponse(status_code=201, content=serialized_content).body
+
+    def dumped_error() -> bytes:
+        return JSONResponse(status_code=422, content=adapter.BulkTransferErrorResponse(
+            bulk_id=bulk_id,
+            message="Bulk transfer denied",
+            error=adapter.ErrorDetails(reason="insufficient-account-balance", details="Not enough funds")
+        ).model_dump()).body
+
+    def cases() -> dict:
+        return {
+            "success: response_model + JSONResponse": validated_success,
+            "success: precompiled serializer": lambda: FastJSONResponse(
+                status_code=201, content=success_response.render(bulk_id=bulk_id, message="Bulk transfer accepted")
+            ).body,
+            "error: model_dump + JSONResponse": dumped_error,
+            "error: cached static body": lambda: bulk_transfers.reply_not_enough_funds_error(bulk_id=bulk_id).body,
+            "error: precompiled serializer": lambda: bulk_transfers.reply_not_enough_funds_error(
+                bulk_id=bulk_id, error_details="Not enough funds"
+            ).body,
+        }
+
+    async def run() -> List[dict]:
+        results = []
+        for name, build in cases().items():
+            durations = []
+            for _ in range(repeat):
+                started_at = time.perf_counter()
+                body = build()
+                if asyncio.iscoroutine(body):
+                    body = await body
+                durations.append(time.perf_counter() - started_at)
+            results.append({"response": name, "bytes": len(body), "us_per_response": round(_median_us(durations), 2)})
+        return results
+
+    return asyncio.run(run())
+
+
+def _time_requests(send: Callable[[int], object], requests: int) -> float:
+    durations = []
+    for i in range(requests):
+        started_at = time.perf_counter()
+        send(i)
+        durations.append(time.perf_counter() - started_at)
+    return _median_us(durations)
+
+
+def measure_requests(requests: int) -> List[dict]:
+    """
+    Returns:
+        Median µs per request of the ingest and job endpoints
+    """
+    with temporary_database():
+        client = TestClient(app)
+        (bic, iban), = seed_accounts(count=1)
+        payloads = [bulk_payload(bic=bic, iban=iban, transfer_count=1) for _ in range(requests)]
+        rejected_payload = dict(payloads[0], request_id="not-a-uuid")
+        scenarios = {  # polls of the empty queues first: the accepted bulks queue jobs
+            "GET /internal/jobs/transfer (empty queue)": lambda i: client.get("/internal/jobs/transfer"),
+            "GET /internal/jobs/bulk (empty queue)": lambda i: client.get("/internal/jobs/bulk"),
+            "POST /transfers/bulk (accepted)": lambda i: client.post("/transfers/bulk", json=payloads[i]),
+            "POST /transfers/bulk (rejected)": lambda i: client.post("/transfers/bulk", json=rejected_payload),
+            "POST /internal/jobs/bulk/purge": lambda i: client.post("/internal/jobs/bulk/purge", json={
+                "bulk_request_uuid": payloads[i]["request_id"], "bulk_request_id": i
+            }),
+        }
+        results = []
+        for name, send in scenarios.items():
+            results.append({"request": name, "us_per_request": round(_time_requests(send, requests), 1)})
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.response_overhead")
+    parser.add_argument("--repeat", type=int, default=2000, help="bodies built per response (median reported)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint (median reported)")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = {"serialization": measure_serialization(args.repeat), "requests": measure_requests(args.requests)}
+    for result in results["serialization"]:
+        print(f"{result['response']:<42} {result['us_per_response']:>8.2f} µs/response ({result['bytes']} bytes)")
+    for result in results["requests"]:
+        print(f"{result['request']:<42} {result['us_per_request']:>8.1f} µs/request")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
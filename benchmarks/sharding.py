@@ -0,0 +1,94 @@
+"""
+Aggregate write throughput of the sharded layout (see app.migrations.shards): concurrent clients submit bulk
+requests for distinct accounts, then concurrent consumers process the transfer jobs, with 1, 4 and 16 shards.
+
+With a single SQLite file, every write transaction (bulk acceptance, transfer processing) takes the same database
+lock; with shards, only the accounts of a same shard do.
+
+Usage:
+    python -m benchmarks.sharding [--shards 1 4 16] [--accounts 16] [--concurrency 16] [--bulks 64] \
+        [--bulk-size 100] [--output results.json]
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.log_formatter import configure_logging
+
+from benchmarks.pipeline import bulk_payload, consume_bulk_job, consume_transfer_job, seed_accounts, temporary_shards
+
+
+def measure_shards(shard_count: int, accounts: int, concurrency: int, bulks: int, bulk_size: int) -> dict:
+    with temporary_shards(shard_count=shard_count):
+        client = TestClient(app)
+        # payloads are generated before the measure
+        payloads = [
+            bulk_payload(bic=bic, iban=iban, transfer_count=bulk_size)
+            for (bic, iban), _ in zip(itertools.cycle(seed_accounts(count=accounts)), range(bulks))
+        ]
+
+        def submit(payload: dict):
+            client.post("/transfers/bulk", json=payload).raise_for_status()
+
+        def consume_transfers() -> int:
+            transfers = 0
+            while consume_transfer_job() is not None:
+                transfers += 1
+            return transfers
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started_at = time.perf_counter()
+            list(pool.map(submit, payloads))
+            submit_seconds = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            transfers = sum(future.result() for future in [pool.submit(consume_transfers) for _ in range(concurrency)])
+            process_seconds = time.perf_counter() - started_at
+        while consume_bulk_job() is not None:
+            pass
+
+    assert transfers == bulks * bulk_size
+    return {
+        "shards": shard_count,
+        "bulks_per_second": round(bulks / submit_seconds, 1),
+        "accepted_transfers_per_second": round(transfers / submit_seconds),
+        "processed_transfers_per_second": round(transfers / process_seconds),
+    }
+
+
+def run(shard_counts: List[int], accounts: int, concurrency: int, bulks: int, bulk_size: int) -> List[dict]:
+    return [
+        measure_shards(shard_count, accounts=accounts, concurrency=concurrency, bulks=bulks, bulk_size=bulk_size)
+        for shard_count in shard_counts
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.sharding")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16], help="shard counts")
+    parser.add_argument("--accounts", type=int, default=16, help="accounts, spread over the shards")
+    parser.add_argument("--concurrency", type=int, default=16, help="submitting clients and job consumers")
+    parser.add_argument("--bulks", type=int, default=64)
+    parser.add_argument("--bulk-size", type=int, default=100, help="credit transfers per bulk")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+    configure_logging(level="WARNING", asynchronous=False)
+
+    results = run(args.shards, args.accounts, args.concurrency, args.bulks, args.bulk_size)
+    for result in results:
+        print(f"{result['shards']:>3} shard(s): {result['bulks_per_second']:>8.1f} bulks/s | "
+              f"{result['accepted_transfers_per_second']:>7} accepted transfers/s | "
+              f"{result['processed_transfers_per_second']:>6} processed transfers/s")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
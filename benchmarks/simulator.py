@@ -0,0 +1,309 @@
+"""
+Discrete-event simulation of the bulk transfer pipeline, for capacity planning.
+
+Bulk requests arrive following an arrival pattern and are processed by the real API, services and in-process
+queues, but time is virtual: workers are busy for a simulated duration (bank latency distribution, processing
+overhead) and the simulation jumps from event to event without sleeping. Hours of simulated backlog
+are then answered in the time of the real processing of the jobs.
+
+Usage:
+    python -m benchmarks.simulator [--bulks 50] [--bulk-size 100] [--arrival poisson] [--arrival-rate 0.5]
+                                   [--transfer-workers 4 8 16] [--bank-latency-p50-ms 200]
+                                   [--bank-latency-p99-ms 2000] [--bank-failure-rate 0.0] [--output results.json]
+"""
+import argparse
+import dataclasses
+import heapq
+import itertools
+import json
+import math
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from benchmarks.load import percentile
+
+
+ARRIVAL_PATTERNS = ("poisson", "uniform", "burst")
+# z-score of the 99th percentile of the standard normal distribution
+_Z_99 = 2.326
+
+
+@dataclasses.dataclass(frozen=True)
+class SimulationConfig:
+    bulks: int = 50
+    bulk_size: int = 100
+    accounts: int = 1
+    # poisson: exponential inter-arrival times, uniform: fixed inter-arrival time, burst: all bulks at t=0
+    arrival: str = "poisson"
+    arrival_rate_per_second: float = 0.5
+    transfer_workers: int = 4
+    finalize_workers: int = 1
+    # log-normal bank latency distribution
+    bank_latency_p50_ms: float = 200.0
+    bank_latency_p99_ms: float = 2000.0
+    bank_failure_rate: float = 0.0
+    transfer_overhead_ms: float = 5.0
+    finalize_latency_ms: float = 2.0
+    backlog_sample_interval_seconds: float = 1.0
+    seed: int = 42
+
+    def __post_init__(self):
+        if self.arrival not in ARRIVAL_PATTERNS:
+            raise ValueError(f"Unknown arrival pattern: {self.arrival}")
+        if self.bank_latency_p99_ms < self.bank_latency_p50_ms:
+            raise ValueError("bank_latency_p99_ms must be >= bank_latency_p50_ms")
+
+
+class VirtualClock:
+    """
+    Event queue ordered by virtual time: `run` calls the events in order, jumping from one to the next.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._events = []
+        self._sequence = itertools.count()  # FIFO order of simultaneous events
+
+    def schedule(self, delay_seconds: float, callback: Callable[[], None]):
+        heapq.heappush(self._events, (self.now + delay_seconds, next(self._sequence), callback))
+
+    def run(self):
+        while self._events:
+            self.now, _, callback = heapq.heappop(self._events)
+            callback()
+
+
+class SimulatedBank:
+    """
+    Replaces the fake bank call of `transfer_service`: log-normal latency and random failures.
+    """
+
+    def __init__(self, config: SimulationConfig, rng: random.Random):
+        self._rng = rng
+        self._failure_rate = config.bank_failure_rate
+        self._mu = math.log(config.bank_latency_p50_ms / 1000)
+        self._sigma = math.log(config.bank_latency_p99_ms / config.bank_latency_p50_ms) / _Z_99
+
+    def latency_seconds(self) -> float:
+        return self._rng.lognormvariate(self._mu, self._sigma)
+
+    def transfer_funds(self, transfer_job) -> bool:
+        return self._rng.random() >= self._failure_rate
+
+
+@contextmanager
+def _simulated_bank(bank: SimulatedBank) -> Iterator[None]:
+    from app.services import transfer_service
+
+    real_transfer_funds = transfer_service.transfer_funds
+    transfer_service.transfer_funds = bank.transfer_funds
+    try:
+        yield
+    finally:
+        transfer_service.transfer_funds = real_transfer_funds
+
+
+class Simulation:
+    def __init__(self, config: SimulationConfig):
+        self.config = config
+        self.clock = VirtualClock()
+        self._rng = random.Random(config.seed)
+        self.bank = SimulatedBank(config=config, rng=self._rng)
+        self._idle_transfer_workers = config.transfer_workers
+        self._idle_finalize_workers = config.finalize_workers
+        # jobs taken by a busy worker, consumed from the real queue when the worker is done
+        self._reserved_transfer_jobs = 0
+        self._reserved_finalize_jobs = 0
+        self._busy_seconds = 0.0
+        self._last_job_done_at = 0.0
+        self._pending_arrivals = config.bulks
+        self.arrived_at: Dict[str, float] = {}
+        self.final_statuses: Dict[str, str] = {}
+        self.completed_at: Dict[str, float] = {}
+        self.backlog: List[List[float]] = []
+        self.processed_transfers = 0
+
+    def run(self) -> dict:
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+        from app.routers import fake_broker
+        from app.utils.log_formatter import configure_logging
+        from benchmarks.pipeline import temporary_database, seed_accounts, bulk_payload
+
+        configure_logging(level="ERROR", asynchronous=False)  # failed bulks log warnings
+        started_at = time.perf_counter()
+        with temporary_database(), _simulated_bank(self.bank):
+            self._fake_broker = fake_broker
+            self._client = TestClient(app)
+            accounts = seed_accounts(count=self.config.accounts)
+            payloads = [
+                bulk_payload(bic=bic, iban=iban, transfer_count=self.config.bulk_size)
+                for (bic, iban), _ in zip(itertools.cycle(accounts), range(self.config.bulks))
+            ]
+            for arrival_time, payload in zip(self._arrival_times(), payloads):
+                self.clock.schedule(arrival_time, lambda payload=payload: self._on_bulk_arrival(payload))
+            self.clock.schedule(0, self._on_backlog_sample)
+            self.clock.run()
+        return self._results(wall_seconds=time.perf_counter() - started_at)
+
+    def _arrival_times(self) -> List[float]:
+        if self.config.arrival == "burst":
+            return [0.0] * self.config.bulks
+        if self.config.arrival == "uniform":
+            return [index / self.config.arrival_rate_per_second for index in range(self.config.bulks)]
+        arrival_times, arrival_time = [], 0.0
+        for _ in range(self.config.bulks):
+            arrival_times.append(arrival_time)
+            arrival_time += self._rng.expovariate(self.config.arrival_rate_per_second)
+        return arrival_times
+
+    def _on_bulk_arrival(self, payload: dict):
+        response = self._client.post("/transfers/bulk", json=payload)
+        response.raise_for_status()
+        self._pending_arrivals -= 1
+        self.arrived_at[payload["request_id"]] = self.clock.now
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        Idle workers take the available jobs for a simulated duration.
+        """
+        queue_depth = len(self._fake_broker.TRANSFER_JOB_QUEUE)
+        while self._idle_transfer_workers and queue_depth > self._reserved_transfer_jobs:
+            self._idle_transfer_workers -= 1
+            self._reserved_transfer_jobs += 1
+            duration = self.config.transfer_overhead_ms / 1000 + self.bank.latency_seconds()
+            self._busy_seconds += duration
+            self.clock.schedule(duration, self._on_transfer_job_done)
+
+        queue_depth = len(self._fake_broker.FINALIZE_BULK_JOB_QUEUE)
+        while self._idle_finalize_workers and queue_depth > self._reserved_finalize_jobs:
+            self._idle_finalize_workers -= 1
+            self._reserved_finalize_jobs += 1
+            self.clock.schedule(self.config.finalize_latency_ms / 1000, self._on_finalize_job_done)
+
+    def _on_transfer_job_done(self):
+        from benchmarks.pipeline import consume_transfer_job
+
+        if consume_transfer_job() is not None:  # queues the finalize job, None if only cancelled jobs were left
+            self.processed_transfers += 1
+        self._last_job_done_at = self.clock.now
+        self._reserved_transfer_jobs -= 1
+        self._idle_transfer_workers += 1
+        self._dispatch()
+
+    def _on_finalize_job_done(self):
+        from benchmarks.pipeline import consume_bulk_job
+
+        result = consume_bulk_job()
+        if isinstance(result, dict) and result["status"] in ("COMPLETED", "FAILED"):
+            bulk_request_uuid = result["bulk_request_uuid"]
+            self.completed_at.setdefault(bulk_request_uuid, self.clock.now)
+            self.final_statuses.setdefault(bulk_request_uuid, result["status"])
+        self._last_job_done_at = self.clock.now
+        self._reserved_finalize_jobs -= 1
+        self._idle_finalize_workers += 1
+        self._dispatch()
+
+    def _has_work(self) -> bool:
+        return bool(
+            self._pending_arrivals or self._fake_broker.TRANSFER_JOB_QUEUE or self._fake_broker.FINALIZE_BULK_JOB_QUEUE
+        )
+
+    def _on_backlog_sample(self):
+        self.backlog.append([
+            round(self.clock.now, 3),
+            len(self._fake_broker.TRANSFER_JOB_QUEUE),
+            len(self._fake_broker.FINALIZE_BULK_JOB_QUEUE)
+        ])
+        if self._has_work():
+            self.clock.schedule(self.config.backlog_sample_interval_seconds, self._on_backlog_sample)
+
+    def _results(self, wall_seconds: float) -> dict:
+        makespan_seconds = self._last_job_done_at
+        completion_seconds = [
+            self.completed_at[bulk_id] - self.arrived_at[bulk_id] for bulk_id in self.completed_at
+        ]
+        statuses = list(self.final_statuses.values())
+        return {
+            "config": dataclasses.asdict(self.config),
+            "simulated_seconds": round(makespan_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "processed_transfers": self.processed_transfers,
+            "transfers_per_second": round(self.processed_transfers / makespan_seconds, 2) if makespan_seconds else None,
+            "completed_bulks": statuses.count("COMPLETED"),
+            "failed_bulks": statuses.count("FAILED"),
+            "completion_seconds": {
+                name: round(value, 3) if value is not None else None
+                for name, value in (
+                    ("p50", percentile(completion_seconds, 50)),
+                    ("p90", percentile(completion_seconds, 90)),
+                    ("p99", percentile(completion_seconds, 99)),
+                    ("max", max(completion_seconds, default=None)),
+                )
+            },
+            "transfer_workers_utilization": round(
+                self._busy_seconds / (self.config.transfer_workers * makespan_seconds), 3
+            ) if makespan_seconds else None,
+            "max_transfer_backlog": max((sample[1] for sample in self.backlog), default=0),
+            # [virtual time (s), transfer jobs queued, finalize jobs queued]
+            "backlog": self.backlog,
+        }
+
+
+def simulate(config: SimulationConfig) -> dict:
+    return Simulation(config).run()
+
+
+def main(argv: Optional[List[str]] = None):
+    defaults = SimulationConfig()
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.simulator")
+    parser.add_argument("--bulks", type=int, default=defaults.bulks)
+    parser.add_argument("--bulk-size", type=int, default=defaults.bulk_size)
+    parser.add_argument("--accounts", type=int, default=defaults.accounts)
+    parser.add_argument("--arrival", choices=ARRIVAL_PATTERNS, default=defaults.arrival)
+    parser.add_argument("--arrival-rate", type=float, default=defaults.arrival_rate_per_second, help="bulks/second")
+    parser.add_argument("--transfer-workers", type=int, nargs="+", default=[defaults.transfer_workers])
+    parser.add_argument("--finalize-workers", type=int, default=defaults.finalize_workers)
+    parser.add_argument("--bank-latency-p50-ms", type=float, default=defaults.bank_latency_p50_ms)
+    parser.add_argument("--bank-latency-p99-ms", type=float, default=defaults.bank_latency_p99_ms)
+    parser.add_argument("--bank-failure-rate", type=float, default=defaults.bank_failure_rate)
+    parser.add_argument("--transfer-overhead-ms", type=float, default=defaults.transfer_overhead_ms)
+    parser.add_argument("--finalize-latency-ms", type=float, default=defaults.finalize_latency_ms)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for transfer_workers in args.transfer_workers:
+        result = simulate(SimulationConfig(
+            bulks=args.bulks,
+            bulk_size=args.bulk_size,
+            accounts=args.accounts,
+            arrival=args.arrival,
+            arrival_rate_per_second=args.arrival_rate,
+            transfer_workers=transfer_workers,
+            finalize_workers=args.finalize_workers,
+            bank_latency_p50_ms=args.bank_latency_p50_ms,
+            bank_latency_p99_ms=args.bank_latency_p99_ms,
+            bank_failure_rate=args.bank_failure_rate,
+            transfer_overhead_ms=args.transfer_overhead_ms,
+            finalize_latency_ms=args.finalize_latency_ms,
+            seed=args.seed
+        ))
+        results.append(result)
+        print(f"transfer_workers={transfer_workers}: {result['transfers_per_second']} transfers/s simulated | "
+              f"completion p50={result['completion_seconds']['p50']}s p99={result['completion_seconds']['p99']}s | "
+              f"max backlog={result['max_transfer_backlog']} | "
+              f"utilization={result['transfer_workers_utilization']} | "
+              f"{result['simulated_seconds']}s simulated in {result['wall_seconds']}s")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
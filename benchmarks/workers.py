@@ -0,0 +1,127 @@
+"""
+Scaling of the `python -m app.worker` processes: bulk requests are submitted to the shared SQLite job queue,
+then consumed by 1 to 8 worker processes, on a single database or on shards (see app.migrations.shards).
+
+Reports the transfers processed per second, from the time all the workers are ready until every bulk request
+is final (transfer jobs and finalize bulk jobs consumed).
+
+Usage:
+    python -m benchmarks.workers [--processes 1 2 4 8] [--bulks 40] [--bulk-size 100] [--accounts 8] \
+        [--shards 0] [--output results.json]
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.main import app
+from app.models import db
+from app.routers import fake_broker
+from app.settings import get_settings
+from app.utils.log_formatter import configure_logging
+from app.worker import WorkerSupervisor
+
+from benchmarks.pipeline import seed_accounts, submit_bulk, temporary_database, temporary_shards
+
+
+POLL_SECONDS = 0.05
+
+
+def _pending_bulks() -> int:
+    pending = 0
+    for engine in db.shard_engines():
+        with Session(engine) as session:
+            pending += session.exec(
+                select(func.count()).select_from(db.BulkRequest).where(
+                    db.BulkRequest.status.not_in(db.FINAL_REQUEST_STATUSES)
+                )
+            ).one()
+    return pending
+
+
+def measure_processes(
+        processes: int, bulks: int, bulk_size: int, accounts: int, shards: int = 0, timeout: float = 600.0
+) -> dict:
+    storage = temporary_shards(shard_count=shards) if shards else temporary_database()
+    with storage as path, tempfile.TemporaryDirectory() as queue_dir:
+        settings = dataclasses.replace(
+            get_settings(),
+            database_path=path if not shards else get_settings().database_path,
+            shards_dir=path if shards else None,
+            shard_count=max(shards, 1),
+            job_queue_path=str(Path(queue_dir) / "jobs.sqlite"),
+            log_level="WARNING",
+            log_async=False,
+            job_log_sample_rate=0.0,  # no COUNT(*) of the queue per job
+            run_migrations_on_startup=False,
+        )
+        fake_broker.configure_job_queues(job_queue_path=settings.job_queue_path)
+        try:
+            # the bulks are queued before the workers start
+            client = TestClient(app)
+            for (bic, iban), _ in zip(itertools.cycle(seed_accounts(count=accounts)), range(bulks)):
+                submit_bulk(client=client, bic=bic, iban=iban, transfer_count=bulk_size)
+
+            supervisor = WorkerSupervisor(settings=settings, processes=processes)
+            supervisor.start()
+            try:
+                if not supervisor.wait_ready(timeout=timeout):
+                    raise RuntimeError(f"Workers not ready within {timeout} s")
+                transfers = len(fake_broker.TRANSFER_JOB_QUEUE)  # a few may be consumed while the others start
+                started_at = time.perf_counter()
+                while _pending_bulks():
+                    if time.perf_counter() - started_at > timeout:
+                        raise RuntimeError(f"Bulk requests not final within {timeout} s")
+                    time.sleep(POLL_SECONDS)
+                elapsed_seconds = time.perf_counter() - started_at
+            finally:
+                supervisor.stop()
+        finally:
+            fake_broker.configure_job_queues(job_queue_path=None)
+    return {
+        "processes": processes,
+        "shards": shards,
+        "transfers": transfers,
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "transfers_per_second": round(transfers / elapsed_seconds),
+        "restarts": supervisor.restarts,
+    }
+
+
+def run(process_counts: List[int], bulks: int, bulk_size: int, accounts: int, shards: int = 0) -> List[dict]:
+    return [
+        measure_processes(processes, bulks=bulks, bulk_size=bulk_size, accounts=accounts, shards=shards)
+        for processes in process_counts
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.workers")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8], help="worker process counts")
+    parser.add_argument("--bulks", type=int, default=40)
+    parser.add_argument("--bulk-size", type=int, default=100, help="credit transfers per bulk")
+    parser.add_argument("--accounts", type=int, default=8, help="accounts the bulks are spread over")
+    parser.add_argument("--shards", type=int, default=0, help="shard count, single database if 0")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+    configure_logging(level="WARNING", asynchronous=False)
+
+    results = run(args.processes, args.bulks, args.bulk_size, args.accounts, args.shards)
+    for result in results:
+        print(f"{result['processes']} process(es), {result['shards'] or 1} database(s): "
+              f"{result['transfers_per_second']:>6} transfers/s ({result['transfers']} transfers "
+              f"in {result['elapsed_seconds']:.2f} s, {result['restarts']} restarts)")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import dataclasses
+
+import pytest
+
+from app.migrations.simple_runner import run_all_migrations
+from app.models import db
+from app.routers.fake_broker import CANCELLED_BULK_REQUESTS
+from app.settings import configure_settings, get_settings
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Migrated SQLite database in a temporary directory, used by the application engine for the test.
+    """
+    previous_database_path = db.DATABASE_PATH
+    database_path = str(tmp_path / "test_accounts.sqlite")
+    run_all_migrations(database_path=database_path)
+    db.configure_engine(database_path=database_path)
+    yield database_path
+    db.configure_engine(database_path=previous_database_path)
+    CANCELLED_BULK_REQUESTS.clear()  # tombstones of the bulk requests of the test database
+
+
+@pytest.fixture
+def settings():
+    """
+    Override application settings for the test: `settings(bulk_manifest_mode=True)`.
+    """
+    previous_settings = get_settings()
+
+    def override(**changes):
+        configure_settings(dataclasses.replace(previous_settings, **changes))
+        return get_settings()
+
+    yield override
+    configure_settings(previous_settings)
@@ -15,7 +15,7 @@ def stub_credit_transfer(
         "currency": "EUR",
         "counterparty_name": "Bip Bip",
         "counterparty_bic": "CRLYFRPPTOU",
-        "counterparty_iban": "EE383680981021245685",
+        "counterparty_iban": "EE303680981021245685",
         "description": description if description else "Wonderland/4410"
     }
     if key_to_remove is not None:
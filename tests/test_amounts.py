@@ -1,6 +1,9 @@
+import decimal
+
 import pytest
 
-from app.amounts.converters import to_cents
+from app.amounts.converters import FxRates, to_amount_str, to_cents, to_minor_units
+from app.amounts.currencies import UnsupportedCurrencyError
 
 
 @pytest.mark.parametrize("amount_euros, expected_amount_cents", [
@@ -24,3 +27,44 @@ def test_to_cents__when_invalid_amount__should_raise_value_error(
 ):
     with pytest.raises(ValueError):
         to_cents(amount_in_euros_str=amount_euros)
+
+
+@pytest.mark.parametrize("amount, currency, expected_amount", [
+    ("10.05", "EUR", 1005),
+    ("1000", "JPY", 1000),
+    ("1.234", "KWD", 1234),
+    ("0.0001", "CLF", 1),
+])
+def test_to_minor_units__should_use_iso_4217_decimal_places_of_currency(
+        amount: str, currency: str, expected_amount: int
+):
+    assert to_minor_units(amount_str=amount, currency=currency) == expected_amount
+    assert to_amount_str(amount_minor=expected_amount, currency=currency) == str(decimal.Decimal(amount))
+
+
+@pytest.mark.parametrize("assert_message, amount, currency, expected_error", [
+    ("when decimal places in currency without minor unit", "1000.5", "JPY", ValueError),
+    ("when not a number", "Infinity", "USD", ValueError),
+    ("when unknown currency", "10", "XYZ", UnsupportedCurrencyError),
+])
+def test_to_minor_units__when_invalid__should_raise(assert_message: str, amount: str, currency: str, expected_error):
+    with pytest.raises(expected_error):
+        to_minor_units(amount_str=amount, currency=currency)
+
+
+def test_fx_rates_to_account_cents__should_convert_each_amount_rounded_half_up():
+    fx_rates = FxRates(version=1, rates={"USD": decimal.Decimal("0.86"), "JPY": decimal.Decimal("0.0057")})
+
+    amounts = fx_rates.to_account_cents(
+        amounts=[1000, 125, 1000, 1050, 88], currencies=["EUR", "USD", "USD", "JPY", "JPY"]
+    )
+
+    # 1.25 USD = 1.075 EUR, 1050 JPY = 5.985 EUR, 88 JPY = 0.5016 EUR
+    assert amounts == [1000, 108, 860, 599, 50]
+
+
+def test_fx_rates_to_account_cents__when_no_rate__should_raise():
+    fx_rates = FxRates(version=1, rates={"USD": decimal.Decimal("0.86")})
+
+    with pytest.raises(UnsupportedCurrencyError, match="GBP"):
+        fx_rates.to_account_cents(amounts=[100, 100], currencies=["USD", "GBP"])
@@ -0,0 +1,125 @@
+import threading
+import uuid
+
+from sqlmodel import Session
+
+from app.models import db
+
+
+ACCOUNT_ID = 1  # seeded by the migrations
+
+
+def _create_bulk_request(total_amount_cents: int, partial_success: bool = False) -> uuid.UUID:
+    bulk_request_uuid = uuid.uuid4()
+    with Session(db.engine) as session, session.begin():
+        db.create_bulk_request(
+            session=session,
+            bulk_request_uuid=bulk_request_uuid,
+            bank_account_id=ACCOUNT_ID,
+            total_amounts_cents=total_amount_cents,
+            partial_success=partial_success
+        )
+    return bulk_request_uuid
+
+
+def _load_account() -> db.BankAccount:
+    with Session(db.engine) as session:
+        return db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+
+
+def test_reserve_funds__when_balance_not_enough__should_not_reserve(database):
+    account = _load_account()
+
+    with Session(db.engine) as session, session.begin():
+        reserved = db.reserve_funds(
+            session=session, bank_account_id=ACCOUNT_ID, amount_cents=account.balance_cents + 1
+        )
+        assert not reserved
+        assert db.reserve_funds(session=session, bank_account_id=ACCOUNT_ID, amount_cents=account.balance_cents)
+
+    updated_account = _load_account()
+    assert updated_account.ongoing_transfer_cents == account.balance_cents
+    assert updated_account.version == account.version + 1
+
+
+def test_release_funds__should_release_and_debit_in_one_statement(database):
+    account = _load_account()
+
+    with Session(db.engine) as session, session.begin():
+        db.reserve_funds(session=session, bank_account_id=ACCOUNT_ID, amount_cents=300)
+        assert db.release_funds(session=session, bank_account_id=ACCOUNT_ID, released_cents=300, debited_cents=200)
+        assert not db.release_funds(session=session, bank_account_id=404, released_cents=300)
+
+    updated_account = _load_account()
+    assert updated_account.ongoing_transfer_cents == 0
+    assert updated_account.balance_cents == account.balance_cents - 200
+
+
+def test_add_bulk_request_progress__should_finalize_in_the_same_statement(database):
+    bulk_request_uuid = _create_bulk_request(total_amount_cents=300)
+
+    progress = []
+    with Session(db.engine) as session, session.begin():
+        for _ in range(4):
+            bulk_request = db.add_bulk_request_progress(
+                session=session, bulk_request_uuid=bulk_request_uuid, processed_amount_cents=100
+            )
+            progress.append(
+                (bulk_request.status, bulk_request.processed_amount_cents, bulk_request.version,
+                 bulk_request.completed_at is not None) if bulk_request else None
+            )
+
+    assert progress == [
+        (db.RequestStatus.PENDING, 100, 2, False),
+        (db.RequestStatus.PENDING, 200, 3, False),
+        (db.RequestStatus.COMPLETED, 300, 4, True),
+        None  # already finalized
+    ]
+
+
+def test_add_bulk_request_progress__should_set_final_status_of_partial_success(database):
+    partially_completed_uuid = _create_bulk_request(total_amount_cents=200, partial_success=True)
+    failed_uuid = _create_bulk_request(total_amount_cents=100, partial_success=True)
+
+    with Session(db.engine) as session, session.begin():
+        assert db.add_bulk_request_progress(
+            session=session, bulk_request_uuid=partially_completed_uuid, processed_amount_cents=100,
+            partial_success=False
+        ) is None
+        db.add_bulk_request_progress(
+            session=session, bulk_request_uuid=partially_completed_uuid, processed_amount_cents=100
+        )
+        partially_completed = db.add_bulk_request_progress(
+            session=session, bulk_request_uuid=partially_completed_uuid, failed_amount_cents=100
+        )
+        failed = db.add_bulk_request_progress(
+            session=session, bulk_request_uuid=failed_uuid, failed_amount_cents=100
+        )
+
+        assert partially_completed.status == db.RequestStatus.PARTIALLY_COMPLETED
+        assert failed.status == db.RequestStatus.FAILED
+
+
+def test_add_bulk_request_progress__when_concurrent_outcomes__should_finalize_once(database):
+    transfer_count = 20
+    bulk_request_uuid = _create_bulk_request(total_amount_cents=transfer_count * 100)
+    final_statuses = []
+
+    def add_outcome():
+        with Session(db.engine) as session, session.begin():
+            bulk_request = db.add_bulk_request_progress(
+                session=session, bulk_request_uuid=bulk_request_uuid, processed_amount_cents=100
+            )
+            if bulk_request.status in db.FINAL_REQUEST_STATUSES:
+                final_statuses.append(bulk_request.status)
+
+    threads = [threading.Thread(target=add_outcome) for _ in range(transfer_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert final_statuses == [db.RequestStatus.COMPLETED]
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=bulk_request_uuid)
+        assert bulk_request.processed_amount_cents == transfer_count * 100
@@ -0,0 +1,60 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.models.adapter import CreditTransfer
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services.bulk_manifest import pack_manifest, unpack_manifest, MANIFEST_CACHE
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+
+def test_unpack_manifest__should_restore_packed_transfers():
+    credit_transfers = [CreditTransfer(**stub_credit_transfer(amount_in_euros=str(i))) for i in (1, 2)]
+    transfer_uuids = [uuid.uuid4(), uuid.uuid4()]
+    bulk_request_uuid = str(uuid.uuid4())
+
+    manifest = unpack_manifest(pack_manifest(
+        bulk_request_uuid=bulk_request_uuid, bank_account_id=1, credit_transfers=credit_transfers,
+        amounts=[100, 200], amounts_in_cents=[100, 200], transfer_uuids=transfer_uuids
+    ))
+
+    transfer_job = manifest.transfer_job(index=1)
+    assert transfer_job.transfer_uuid == str(transfer_uuids[1])
+    assert transfer_job.bulk_request_uuid == bulk_request_uuid
+    assert transfer_job.amount_cents == 200
+    assert transfer_job.counterparty_iban == credit_transfers[1].counterparty_iban
+
+
+def test_transfers_bulk__when_bulk_manifest_mode__should_queue_references_and_complete(database, settings):
+    settings(bulk_manifest_mode=True)
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="10.5") for _ in range(3)], verbose=False
+    )
+
+    response = client.post("/transfers/bulk", json=payload)
+    assert response.status_code == 201
+    assert len(TRANSFER_JOB_QUEUE) == 3
+    assert {type(job).__name__ for job in TRANSFER_JOB_QUEUE} == {"QueuedManifestTransfer"}
+
+    for _ in range(3):
+        assert client.get("/internal/jobs/transfer").status_code == 200
+    for _ in range(3):
+        assert client.get("/internal/jobs/bulk").status_code == 200
+
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(payload["request_id"]))
+        assert bulk_request.status == db.RequestStatus.COMPLETED
+        assert bulk_request.processed_amount_cents == 3150
+        account = db.find_account_by_id(session=session, bank_account_id=1)
+        assert account.ongoing_transfer_cents == 0
+        assert account.balance_cents == 10000000 - 3150
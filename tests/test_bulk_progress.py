@@ -0,0 +1,73 @@
+import asyncio
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.event import BulkProgressEvent
+from app.services.bulk_progress import BulkProgressBroker, PROGRESS_BROKER
+
+
+client = TestClient(app)
+
+
+def _progress_event(bulk_request_uuid: str, processed_amount_cents: int, status: str = "PENDING",
+                    bank_account_id: int = 1) -> BulkProgressEvent:
+    return BulkProgressEvent(
+        bulk_request_uuid=bulk_request_uuid,
+        bank_account_id=bank_account_id,
+        status=status,
+        total_amount_cents=300,
+        processed_amount_cents=processed_amount_cents
+    )
+
+
+def test_subscription__when_several_events_for_same_bulk__should_coalesce_to_latest():
+    async def scenario():
+        broker = BulkProgressBroker()
+        bulk_id = str(uuid.uuid4())
+        subscription = broker.subscribe(bulk_request_uuid=bulk_id)
+        for processed_amount_cents in (100, 200, 300):
+            broker.publish(_progress_event(bulk_id, processed_amount_cents))
+        assert await subscription.wait(timeout=1)
+        return subscription.drain()
+
+    progress_events = asyncio.run(scenario())
+    assert [e.processed_amount_cents for e in progress_events] == [300]
+
+
+def test_subscription__when_buffer_full__should_drop_oldest_bulk_event():
+    async def scenario():
+        broker = BulkProgressBroker()
+        subscription = broker.subscribe(bank_account_id=1)
+        subscription._max_pending_events = 2
+        bulk_ids = [str(uuid.uuid4()) for _ in range(3)]
+        for bulk_id in bulk_ids:
+            broker.publish(_progress_event(bulk_id, 100))
+        broker.publish(_progress_event(str(uuid.uuid4()), 100, bank_account_id=2))  # other account
+        return bulk_ids, subscription, subscription.drain()
+
+    bulk_ids, subscription, progress_events = asyncio.run(scenario())
+    assert [e.bulk_request_uuid for e in progress_events] == bulk_ids[1:]
+    assert subscription.dropped_events == 1
+
+
+def test_stream_bulk_progress__when_bulk_already_finalized__should_stream_final_event_and_close():
+    bulk_id = str(uuid.uuid4())
+    PROGRESS_BROKER.remember(_progress_event(bulk_id, 300, status="COMPLETED"))
+
+    with client.stream("GET", f"/transfers/bulk/{bulk_id}/events") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    data_lines = [line for line in body.splitlines() if line.startswith("data: ")]
+    assert len(data_lines) == 1
+    assert json.loads(data_lines[0][len("data: "):])["status"] == "COMPLETED"
+    assert PROGRESS_BROKER.subscriber_count() == 0
+
+
+def test_stream_bulk_progress__when_invalid_bulk_id__should_return_422():
+    response = client.get("/transfers/bulk/not-a-uuid/events")
+    assert response.status_code == 422
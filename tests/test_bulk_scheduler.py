@@ -0,0 +1,208 @@
+import datetime
+import threading
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services import bulk_request_service, bulk_scheduler
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.services.bulk_scheduler import ScheduledBulkDispatcher
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations, balance of 100000 EUR
+NOW = datetime.datetime(2026, 10, 31, 8, 0)
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+@pytest.fixture
+def clock():
+    now = [NOW]
+    mockito.when(bulk_scheduler).utc_now().thenAnswer(lambda: now[0])
+    return now
+
+
+def _schedule(execute_at: str, amounts_in_euros=("10", "20.5")):
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros=amount) for amount in amounts_in_euros], verbose=False
+    )
+    payload["execute_at"] = execute_at
+    return client.post("/transfers/bulk", json=payload)
+
+
+def _dispatcher(**kwargs) -> ScheduledBulkDispatcher:
+    return ScheduledBulkDispatcher(clock=bulk_scheduler.utc_now, **kwargs)
+
+
+def _scheduled_bulk(bulk_id: str) -> db.ScheduledBulk:
+    with Session(db.engine) as session:
+        return db.find_scheduled_bulk(session=session, request_uuid=uuid.UUID(bulk_id))
+
+
+def _ongoing_transfer_cents() -> int:
+    with Session(db.engine) as session:
+        return db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).ongoing_transfer_cents
+
+
+def test_transfers_bulk__when_execute_at_in_future__should_store_bulk_without_reserving_funds(database, clock):
+    response = _schedule(execute_at="2026-10-31T12:00:00+02:00")
+
+    assert response.status_code == 201
+    bulk_id = response.json()["bulk_id"]
+    assert response.json() == {
+        "message": "Bulk transfer scheduled", "bulk_id": bulk_id, "execute_at": "2026-10-31T10:00:00"
+    }
+    scheduled_bulk = _scheduled_bulk(bulk_id)
+    assert (scheduled_bulk.status, scheduled_bulk.total_amount_cents) == (db.ScheduledBulkStatus.SCHEDULED, 3050)
+    assert not TRANSFER_JOB_QUEUE
+    assert _ongoing_transfer_cents() == 0
+
+
+def test_transfers_bulk__when_request_id_already_scheduled__should_return_422(database, clock):
+    payload = stub_bulk_transfer_payload(credit_transfers=[stub_credit_transfer()], verbose=False)
+    payload["execute_at"] = "2026-11-30T08:00:00Z"
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+
+    del payload["execute_at"]
+    response = client.post("/transfers/bulk", json=payload)
+
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "already-processed"
+    assert not TRANSFER_JOB_QUEUE
+
+
+def test_transfers_bulk__when_execute_at_past__should_execute_right_away(database, clock):
+    response = _schedule(execute_at="2026-10-31T07:59:00Z")
+
+    assert response.status_code == 201
+    assert response.json()["message"] == "Bulk transfer accepted"
+    assert [job.amount_cents for job in TRANSFER_JOB_QUEUE] == [1000, 2050]
+
+
+def test_dispatcher__should_release_due_bulks_in_execution_order(database, clock):
+    late_bulk_id = _schedule(execute_at="2026-10-31T11:00:00Z", amounts_in_euros=("3",)).json()["bulk_id"]
+    first_bulk_id = _schedule(execute_at="2026-10-31T09:00:00Z", amounts_in_euros=("1",)).json()["bulk_id"]
+    second_bulk_id = _schedule(execute_at="2026-10-31T10:00:00Z", amounts_in_euros=("2",)).json()["bulk_id"]
+    dispatcher = _dispatcher(window_size=2, batch_size=1)
+
+    assert dispatcher.run_pending() == 3600.0
+    assert not TRANSFER_JOB_QUEUE
+
+    clock[0] = datetime.datetime(2026, 10, 31, 10, 30)
+    assert dispatcher.run_pending() == 1800.0
+
+    assert [job.bulk_request_uuid for job in TRANSFER_JOB_QUEUE] == [first_bulk_id, second_bulk_id]
+    assert _ongoing_transfer_cents() == 300
+    assert _scheduled_bulk(first_bulk_id).status == db.ScheduledBulkStatus.RELEASED
+    assert _scheduled_bulk(late_bulk_id).status == db.ScheduledBulkStatus.SCHEDULED
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(second_bulk_id))
+        assert bulk_request.total_amount_cents == 200
+
+    clock[0] = datetime.datetime(2026, 11, 1)
+    assert dispatcher.run_pending() is None
+    assert len(TRANSFER_JOB_QUEUE) == 3
+
+
+def test_dispatcher__when_balance_insufficient_on_execution_date__should_fail_bulk(database, clock):
+    bulk_id = _schedule(execute_at="2026-10-31T09:00:00Z", amounts_in_euros=("100000.01",)).json()["bulk_id"]
+    clock[0] = datetime.datetime(2026, 10, 31, 9, 0)
+
+    assert _dispatcher().run_pending() is None
+
+    assert _scheduled_bulk(bulk_id).status == db.ScheduledBulkStatus.FAILED
+    assert not TRANSFER_JOB_QUEUE
+    assert _ongoing_transfer_cents() == 0
+
+
+def test_dispatcher__when_release_of_bulk_raises__should_fail_it_and_release_other_bulks(database, clock):
+    bulk_id = _schedule(execute_at="2026-10-31T09:00:00Z", amounts_in_euros=("20",)).json()["bulk_id"]
+    failing_bulk_id = _schedule(execute_at="2026-10-31T09:00:00Z", amounts_in_euros=("10",)).json()["bulk_id"]
+    schedule_transfers = bulk_request_service.schedule_transfers
+
+    def schedule_transfers_then_raise(**kwargs):
+        bulk_request = schedule_transfers(**kwargs)  # funds reserved and jobs registered, then rolled back
+        if kwargs["bulk_request_uuid"] == failing_bulk_id:
+            raise RuntimeError("release failed")
+        return bulk_request
+
+    mockito.when(bulk_request_service).schedule_transfers(**mockito.KWARGS).thenAnswer(schedule_transfers_then_raise)
+    clock[0] = datetime.datetime(2026, 10, 31, 9, 0)
+
+    assert _dispatcher().run_pending() is None
+
+    assert _scheduled_bulk(failing_bulk_id).status == db.ScheduledBulkStatus.FAILED
+    assert _scheduled_bulk(bulk_id).status == db.ScheduledBulkStatus.RELEASED
+    assert [job.bulk_request_uuid for job in TRANSFER_JOB_QUEUE] == [bulk_id]
+    assert _ongoing_transfer_cents() == 2000
+    with Session(db.engine) as session:
+        assert db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(failing_bulk_id)) is None
+
+
+def test_cancel_bulk_transfer__when_scheduled__should_not_release_it(database, clock):
+    bulk_id = _schedule(execute_at="2026-10-31T09:00:00Z").json()["bulk_id"]
+    dispatcher = _dispatcher()
+    dispatcher.run_pending()  # loaded in the heap
+
+    response = client.delete(f"/transfers/bulk/{bulk_id}")
+    clock[0] = datetime.datetime(2026, 10, 31, 9, 0)
+    dispatcher.run_pending()
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Scheduled bulk transfer cancelled"
+    assert _scheduled_bulk(bulk_id).status == db.ScheduledBulkStatus.CANCELLED
+    assert not TRANSFER_JOB_QUEUE
+    assert client.delete(f"/transfers/bulk/{bulk_id}").status_code == 404
+
+
+def test_dispatcher__when_notified_of_bulk_within_window__should_push_it_without_loading():
+    loads = []
+
+    def load(after, limit):
+        loads.append(after)
+        return [(NOW + datetime.timedelta(hours=2), 1), (NOW + datetime.timedelta(hours=3), 2)]
+
+    dispatcher = ScheduledBulkDispatcher(release=lambda ids: len(ids), load=load, clock=lambda: NOW, window_size=4)
+    assert dispatcher.run_pending() == 7200.0
+
+    dispatcher.notify((NOW + datetime.timedelta(hours=1), 3))
+
+    assert dispatcher.run_pending() == 3600.0
+    assert len(dispatcher) == 3
+    assert loads == [None]
+
+
+def test_dispatcher__when_started__should_wake_up_on_notify():
+    released = threading.Event()
+    keys = []
+    dispatcher = ScheduledBulkDispatcher(
+        release=lambda ids: released.set() or len(ids),
+        load=lambda after, limit: [key for key in keys if after is None or key > after],
+        clock=lambda: NOW
+    )
+    dispatcher.start()
+    try:
+        keys.append((NOW, 1))
+        dispatcher.notify((NOW, 1))
+        assert released.wait(timeout=5)
+    finally:
+        dispatcher.stop()
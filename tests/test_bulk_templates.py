@@ -0,0 +1,170 @@
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import KWARGS
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.models.adapter import TemplateLineOverride
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services import bulk_templates, counterparty_validation
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.services.bulk_templates import TEMPLATE_CACHE, InvalidOverrideError, apply_overrides
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    TEMPLATE_CACHE.clear()
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def _template_payload(credit_transfers) -> dict:
+    payload = stub_bulk_transfer_payload(credit_transfers=credit_transfers, verbose=False)
+    payload["template_id"] = payload.pop("request_id")
+    return payload
+
+
+def _create_template(amounts_in_euros=("10", "20.5", "30")) -> str:
+    payload = _template_payload([stub_credit_transfer(amount_in_euros=amount) for amount in amounts_in_euros])
+    response = client.post("/transfers/bulk/templates", json=payload)
+    assert response.status_code == 201
+    return response.json()["template_id"]
+
+
+def _execute(template_id: str, overrides=None, request_id=None):
+    payload = {"request_id": request_id or str(uuid.uuid4()), "overrides": overrides or []}
+    return client.post(f"/transfers/bulk/templates/{template_id}/execute", json=payload)
+
+
+def _decoded_template() -> bulk_templates.DecodedTemplate:
+    return bulk_templates.DecodedTemplate(
+        template_uuid=str(uuid.uuid4()),
+        bank_account_id=ACCOUNT_ID,
+        total_amount_cents=3000,
+        transfers=[
+            ["Bip Bip", "EE303680981021245685", "CRLYFRPPTOU", 1000, "EUR", "Salary of June"],
+            ["Road Runner", "EE303680981021245685", "CRLYFRPPTOU", 2000, "EUR", "Salary of June"],
+        ]
+    )
+
+
+def test_create_bulk_template__should_store_validated_transfers_once(database):
+    payload = _template_payload([stub_credit_transfer(amount_in_euros="10"), stub_credit_transfer("20.5")])
+
+    response = client.post("/transfers/bulk/templates", json=payload)
+    duplicate_response = client.post("/transfers/bulk/templates", json=payload)
+
+    assert response.status_code == 201
+    assert response.json() == {
+        "message": "Bulk template created",
+        "template_id": payload["template_id"],
+        "transfer_count": 2,
+        "total_amount_cents": 3050
+    }
+    assert duplicate_response.status_code == 422
+    assert duplicate_response.json()["error"]["reason"] == "template-already-exists"
+
+
+def test_create_bulk_template__when_invalid_counterparty__should_return_422(database):
+    credit_transfer = stub_credit_transfer()
+    credit_transfer["counterparty_iban"] = "FR7630006000011234567890188"
+
+    response = client.post("/transfers/bulk/templates", json=_template_payload([credit_transfer]))
+
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "invalid-counterparty"
+
+
+def test_execute_bulk_template__should_queue_transfers_without_validating_them_again(database):
+    template_id = _create_template()
+    mockito.spy2(counterparty_validation.validate_counterparties)
+
+    response = _execute(template_id=template_id)
+    other_response = _execute(template_id=template_id)
+
+    assert (response.status_code, other_response.status_code) == (201, 201)
+    mockito.verify(counterparty_validation, times=0).validate_counterparties(**KWARGS)
+    assert [job.amount_cents for job in list(TRANSFER_JOB_QUEUE)[:3]] == [1000, 2050, 3000]
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(response.json()["bulk_id"]))
+        assert bulk_request.total_amount_cents == 6050
+        assert db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).ongoing_transfer_cents == 12100
+
+
+def test_execute_bulk_template__should_apply_overrides(database):
+    template_id = _create_template()
+
+    response = _execute(template_id=template_id, overrides=[
+        {"index": 1, "amount": "25"}, {"index": 2, "description": "Salary of July + bonus"}
+    ])
+
+    assert response.status_code == 201
+    jobs = list(TRANSFER_JOB_QUEUE)
+    assert [job.amount_cents for job in jobs] == [1000, 2500, 3000]
+    assert jobs[2].description == "Salary of July + bonus"
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(response.json()["bulk_id"]))
+        assert bulk_request.total_amount_cents == 6500
+
+
+@pytest.mark.parametrize("assert_message, template_id, overrides, expected_status, expected_reason", [
+    ("when unknown template", str(uuid.uuid4()), [], 404, "unknown-template"),
+    ("when invalid template id", "payroll", [], 404, "unknown-template"),
+    ("when unknown line", None, [{"index": 3, "amount": "1"}], 422, "invalid-override"),
+    ("when negative amount", None, [{"index": 0, "amount": "-1"}], 422, "invalid-override"),
+])
+def test_execute_bulk_template__when_invalid__should_deny(
+        database, assert_message, template_id, overrides, expected_status, expected_reason
+):
+    template_id = template_id or _create_template()
+
+    response = _execute(template_id=template_id, overrides=overrides)
+
+    assert response.status_code == expected_status, assert_message
+    assert response.json()["error"]["reason"] == expected_reason, assert_message
+    assert not TRANSFER_JOB_QUEUE
+
+
+def test_execute_bulk_template__when_request_id_already_processed__should_return_422(database):
+    template_id = _create_template()
+    request_id = str(uuid.uuid4())
+
+    assert _execute(template_id=template_id, request_id=request_id).status_code == 201
+    response = _execute(template_id=template_id, request_id=request_id)
+
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "already-processed"
+
+
+def test_apply_overrides__when_line_overridden_twice__should_raise():
+    overrides = [TemplateLineOverride(index=0, amount="5"), TemplateLineOverride(index=0, amount="6")]
+
+    with pytest.raises(InvalidOverrideError, match="overridden twice"):
+        apply_overrides(template=_decoded_template(), overrides=overrides)
+
+
+def test_apply_overrides__should_not_modify_template():
+    template = _decoded_template()
+
+    execution = apply_overrides(template=template, overrides=[TemplateLineOverride(index=0, amount="5.25")])
+
+    assert execution.amounts_in_cents == [525, 2000]
+    assert execution.total_amount_cents == 2525
+    assert execution.credit_transfers[0].amount == "5.25"
+    assert template.transfers[0][3] == 1000
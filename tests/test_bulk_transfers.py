@@ -5,11 +5,14 @@ import pytest
 
 from fastapi.testclient import TestClient
 from mockito import when, KWARGS, mock
+from sqlmodel import Session
 
 from app.services import bulk_request_service
 from app.main import app
 from app.models import db
+from app.models.adapter import CreditTransfer
 from app.routers.bulk_transfers import MAX_NUMBER_OF_TRANSFERS_PER_BULK_REQUEST
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE
 
 from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload, load_sample_payload
 
@@ -28,6 +31,7 @@ def when_account_valid(request):
 @pytest.fixture
 def when_bulk_request_not_already_processed(request):
     when(db).find_bulk_request(**KWARGS).thenReturn(None)
+    when(db).find_scheduled_bulk(**KWARGS).thenReturn(None)
 
 
 @pytest.fixture(autouse=True)
@@ -51,7 +55,7 @@ def when_unknown_bank_account(request):
 
 @pytest.fixture
 def when_process_request_successfully(request):
-    when(db).reserve_funds(**KWARGS)
+    when(db).reserve_funds(**KWARGS).thenReturn(True)
     when(db).create_bulk_request(**KWARGS).thenReturn(mock({'request_uuid': uuid.uuid4()}))
     when(db).create_transfer_transaction(**KWARGS).thenReturn(mock({
         "id": 1,
@@ -138,7 +142,7 @@ def test_transfers_bulk__when_invalid_payload_model__should_return_422(assert_me
                         "currency": "EUR",
                         "counterparty_name": "Wile E Coyote",
                         "counterparty_bic": "ZDRPLBQI",
-                        "counterparty_iban": "DE9935420810036209081725212",
+                        "counterparty_iban": "DE89370400440532013000",
                         "description": "//TeslaMotors/Invoice/12"
                     }
                 ]
@@ -261,3 +265,19 @@ def test_transfers_bulk__when_unknown_organization__should_return_404(
     response = client.post(url="/transfers/bulk", json=stub_bulk_transfer_payload())
     print(f"response={response.json()}")
     assert response.status_code == 404
+
+
+def test_schedule_transfers__should_queue_transfer_jobs_once_committed(database):
+    TRANSFER_JOB_QUEUE.clear()
+    credit_transfers = [CreditTransfer(**stub_credit_transfer(amount_in_euros="1")) for _ in range(2)]
+
+    with Session(db.engine) as session, session.begin():
+        account = db.find_account_by_id(session=session, bank_account_id=1)
+        bulk_request_service.schedule_transfers(
+            session=session, bulk_request_uuid=str(uuid.uuid4()), account=account, total_transfer_amounts_cents=200,
+            credit_transfers=credit_transfers, amounts_in_cents=[100, 100]
+        )
+        assert len(TRANSFER_JOB_QUEUE) == 0  # a worker must not see jobs of an uncommitted bulk request
+
+    assert len(TRANSFER_JOB_QUEUE) == 2
+    TRANSFER_JOB_QUEUE.clear()
@@ -0,0 +1,196 @@
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.models.job import QueuedManifestTransfer
+from app.routers.fake_broker import (
+    TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE, CANCELLED_BULK_REQUESTS, CancelledBulkRequests
+)
+from app.services import transfer_service
+from app.services.bulk_manifest import MANIFEST_CACHE
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations
+INITIAL_BALANCE_CENTS = 10000000
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def _submit_bulk(transfer_count: int, partial_success: bool = False) -> str:
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="10") for _ in range(transfer_count)], verbose=False
+    )
+    payload["partial_success"] = partial_success
+    response = client.post("/transfers/bulk", json=payload)
+    assert response.status_code == 201
+    return response.json()["bulk_id"]
+
+
+def _load(bulk_id: str):
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(bulk_id))
+        account = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        transactions = db.list_transactions(
+            session=session, bank_account_id=ACCOUNT_ID, bulk_request_uuid=uuid.UUID(bulk_id)
+        )
+        return bulk_request, account, transactions
+
+
+@pytest.mark.parametrize("manifest_mode", [False, True])
+def test_cancel_bulk_transfer__should_release_funds_and_drop_queued_jobs(database, settings, manifest_mode):
+    settings(bulk_manifest_mode=manifest_mode)
+    bulk_id = _submit_bulk(transfer_count=3)
+
+    response = client.delete(f"/transfers/bulk/{bulk_id}")
+
+    assert response.status_code == 200
+    assert response.json() == {"bulk_id": bulk_id, "message": "Bulk transfer cancelled"}
+    assert len(TRANSFER_JOB_QUEUE) == 3
+    assert client.get("/internal/jobs/transfer").status_code == 404  # all the queued jobs are dropped
+    assert len(TRANSFER_JOB_QUEUE) == 0
+    bulk_request, account, transactions = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.CANCELLED
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS
+    assert transactions == []
+
+
+def test_cancel_bulk_transfer__when_transfer_failed__should_drop_other_transfer_jobs(database):
+    bulk_id = _submit_bulk(transfer_count=3)
+    other_bulk_id = _submit_bulk(transfer_count=1)
+    when(transfer_service).transfer_funds(**KWARGS).thenReturn(False)
+
+    client.get("/internal/jobs/transfer")
+    assert client.get("/internal/jobs/bulk").json()["status"] == "FAILED"
+    mockito.unstub()
+    response = client.get("/internal/jobs/transfer")
+
+    assert response.status_code == 200
+    assert response.json()["bulk_request_uuid"] == other_bulk_id  # jobs of the failed bulk were dropped
+    assert len(TRANSFER_JOB_QUEUE) == 0
+    bulk_request, account, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.FAILED
+
+
+def test_cancel_bulk_transfer__when_partial_success__should_release_funds_of_pending_transfers(database):
+    bulk_id = _submit_bulk(transfer_count=3, partial_success=True)
+    client.get("/internal/jobs/transfer")
+    client.get("/internal/jobs/bulk")
+
+    response = client.delete(f"/transfers/bulk/{bulk_id}")
+
+    assert response.status_code == 200
+    bulk_request, account, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.CANCELLED
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 1000  # the completed transfer is debited
+    with Session(db.engine) as session:
+        assert len(db.list_transfers(
+            session=session, bulk_request_id=bulk_request.id, status=db.RequestStatus.CANCELLED
+        )) == 2
+    assert client.post(f"/transfers/bulk/{bulk_id}/retry-failed").status_code == 422
+
+
+def test_cancel_bulk_transfer__when_partial_success_transfer_in_flight__should_debit_it_once_finalized(database):
+    bulk_id = _submit_bulk(transfer_count=3, partial_success=True)
+    assert client.get("/internal/jobs/transfer").status_code == 200  # sent to the bank, not finalized yet
+
+    assert client.delete(f"/transfers/bulk/{bulk_id}").status_code == 200
+    response = client.get("/internal/jobs/bulk")
+
+    assert response.status_code == 200
+    assert client.get("/internal/jobs/transfer").status_code == 404  # the other transfer jobs are dropped
+    bulk_request, account, transactions = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.CANCELLED
+    assert bulk_request.processed_amount_cents == 1000
+    assert len(transactions) == 1
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 1000
+    assert account.ongoing_transfer_cents == 0
+
+
+def test_cancel_bulk_transfer__when_all_or_nothing_transfers_sent__should_debit_completed_and_in_flight_ones(
+        database
+):
+    bulk_id = _submit_bulk(transfer_count=3)
+    client.get("/internal/jobs/transfer")
+    client.get("/internal/jobs/bulk")  # completed
+    client.get("/internal/jobs/transfer")  # sent to the bank, not finalized yet
+
+    response = client.delete(f"/transfers/bulk/{bulk_id}")
+    bulk_request, account, _ = _load(bulk_id)
+    assert response.status_code == 200
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 1000
+    assert account.ongoing_transfer_cents == 0
+
+    assert client.get("/internal/jobs/bulk").status_code == 200
+    assert client.get("/internal/jobs/transfer").status_code == 404  # the last transfer job is dropped
+    bulk_request, account, transactions = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.CANCELLED
+    assert bulk_request.processed_amount_cents == 2000
+    assert len(transactions) == 2
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 2000
+    assert account.ongoing_transfer_cents == 0
+
+
+def test_consume_transfer_job__when_bulk_cancelled_without_tombstone__should_not_send_transfer(database):
+    bulk_id = _submit_bulk(transfer_count=2)
+    assert client.delete(f"/transfers/bulk/{bulk_id}").status_code == 200
+    CANCELLED_BULK_REQUESTS.clear()  # purge failed, or cancelled through another process
+    transfer_funds_calls = []
+    when(transfer_service).transfer_funds(**KWARGS).thenAnswer(lambda **kwargs: transfer_funds_calls.append(kwargs))
+
+    response = client.get("/internal/jobs/transfer")
+
+    assert response.status_code == 422
+    assert transfer_funds_calls == []
+    assert len(FINALIZE_BULK_JOB_QUEUE) == 0
+    _, account, transactions = _load(bulk_id)
+    assert transactions == []
+    assert account.balance_cents == INITIAL_BALANCE_CENTS
+
+
+def test_cancel_bulk_transfer__when_already_finalized__should_return_422(database):
+    bulk_id = _submit_bulk(transfer_count=1)
+    client.get("/internal/jobs/transfer")
+    client.get("/internal/jobs/bulk")
+
+    response = client.delete(f"/transfers/bulk/{bulk_id}")
+
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "already-finalized"
+
+
+def test_cancel_bulk_transfer__when_unknown_bulk__should_return_404(database):
+    response = client.delete(f"/transfers/bulk/{uuid.uuid4()}")
+
+    assert response.status_code == 404
+    assert response.json()["error"]["reason"] == "unknown-bulk-request"
+
+
+def test_cancelled_bulk_requests__should_evict_oldest_tombstones():
+    tombstones = CancelledBulkRequests(max_size=1)
+    tombstones.add(bulk_request_uuid=str(uuid.uuid4()), bulk_request_id=1)
+    tombstones.add(bulk_request_uuid=str(uuid.uuid4()), bulk_request_id=2)
+
+    assert len(tombstones) == 1
+    assert not tombstones.is_cancelled(QueuedManifestTransfer(bulk_request_id=1, index=0))
+    assert tombstones.is_cancelled(QueuedManifestTransfer(bulk_request_id=2, index=0))
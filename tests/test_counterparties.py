@@ -0,0 +1,116 @@
+import shutil
+import sqlite3
+import uuid
+
+from sqlmodel import Session
+
+from app.migrations.simple_runner import MIGRATIONS_DIR, run_all_migrations
+from app.models import db
+from app.models.job import TransferJob
+from benchmarks.counterparties import COUNTERPARTIES_MIGRATION, run
+
+
+ACCOUNT_ID = 1  # seeded by the migrations
+
+
+def _transfer_job(counterparty_name: str = "Bip Bip") -> TransferJob:
+    return TransferJob(
+        transfer_uuid=str(uuid.uuid4()),
+        bulk_request_uuid=str(uuid.uuid4()),
+        bank_account_id=ACCOUNT_ID,
+        counterparty_name=counterparty_name,
+        counterparty_iban="EE303680981021245685",
+        counterparty_bic="CRLYFRPPTOU",
+        amount_cents=1450,
+        amount_currency="EUR",
+        description="Wonderland/4410"
+    )
+
+
+def _count_counterparties() -> int:
+    with Session(db.engine) as session:
+        return session.connection().exec_driver_sql("SELECT count(*) FROM counterparties").scalar()
+
+
+def test_create_transfer_transaction__when_known_counterparty__should_reference_same_row(database):
+    counterparties = _count_counterparties()
+
+    with Session(db.engine) as session, session.begin():
+        first = db.create_transfer_transaction(session=session, transfer_job_data=_transfer_job())
+        second = db.create_transfer_transaction(session=session, transfer_job_data=_transfer_job())
+        other = db.create_transfer_transaction(session=session, transfer_job_data=_transfer_job("Road Runner"))
+        counterparty_ids = (first.counterparty_id, second.counterparty_id, other.counterparty_id)
+
+    assert counterparty_ids[0] == counterparty_ids[1] != counterparty_ids[2]
+    assert _count_counterparties() == counterparties + 2
+    with Session(db.engine) as session:
+        transactions = db.list_transactions(session=session, bank_account_id=ACCOUNT_ID)
+        assert [(t.counterparty.name, t.counterparty.iban) for t in transactions[-3:]] == [
+            ("Bip Bip", "EE303680981021245685"), ("Bip Bip", "EE303680981021245685"),
+            ("Road Runner", "EE303680981021245685")
+        ]
+
+
+def test_intern_counterparty__should_cache_id_once_committed(database):
+    key = ("Bip Bip", "EE303680981021245685", "CRLYFRPPTOU")
+
+    with Session(db.engine) as session, session.begin():
+        counterparty_id = db.intern_counterparty(session, *key)
+        assert db.COUNTERPARTY_IDS.get(key) is None  # the transaction may still be rolled back
+
+    assert db.COUNTERPARTY_IDS.get(key) == counterparty_id
+
+
+def test_intern_counterparty__when_rolled_back__should_not_cache_id(database):
+    key = ("Road Runner", "EE303680981021245685", "CRLYFRPPTOU")
+
+    with Session(db.engine) as session:
+        db.intern_counterparty(session, *key)
+        session.rollback()
+
+    assert db.COUNTERPARTY_IDS.get(key) is None
+    assert _count_counterparties() == 2  # seeded
+
+
+def test_counterparties_migration__should_move_inline_counterparties_to_dictionary(tmp_path):
+    migrations_dir = tmp_path / "migrations"
+    migrations_dir.mkdir()
+    for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if migration.name < COUNTERPARTIES_MIGRATION:
+            shutil.copy(migration, migrations_dir)
+    database_path = str(tmp_path / "test.sqlite")
+    run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+    with sqlite3.connect(database_path) as conn:
+        conn.executemany(
+            "INSERT INTO transactions (transfer_uuid, counterparty_name, counterparty_iban, counterparty_bic, "
+            "amount_cents, amount_currency, bank_account_id, description) VALUES (?, ?, ?, ?, ?, 'EUR', 1, ?)",
+            [(str(uuid.uuid4()), "Bip Bip", "EE303680981021245685", "CRLYFRPPTOU", -100, f"Salary {month}")
+             for month in range(3)]
+        )
+
+    shutil.copy(MIGRATIONS_DIR / COUNTERPARTIES_MIGRATION, migrations_dir)
+    run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+
+    with sqlite3.connect(database_path) as conn:
+        rows = conn.execute(
+            "SELECT transactions.id, name, iban, description FROM transactions "
+            "JOIN counterparties ON counterparties.id = counterparty_id ORDER BY transactions.id"
+        ).fetchall()
+        counterparties = conn.execute("SELECT name, iban FROM counterparties ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == [1, 2, 3, 4, 5]  # ids kept
+    assert rows[2:] == [
+        (3, "Bip Bip", "EE303680981021245685", "Salary 0"),
+        (4, "Bip Bip", "EE303680981021245685", "Salary 1"),
+        (5, "Bip Bip", "EE303680981021245685", "Salary 2"),
+    ]
+    assert counterparties == [("ACME Corp. Main Account", "EE382200221020145685"),
+                              ("Bip Bip", "EE383680981021245685"),
+                              ("Bip Bip", "EE303680981021245685")]
+
+
+def test_counterparties_benchmark__should_store_transactions_in_less_space():
+    result = run(transactions=2000, counterparties=10, batch_size=500)
+
+    assert result["dictionary_bytes"] < result["inline_bytes"]
+    assert result["inline_transactions_per_second"] > 0
+    assert result["dictionary_transactions_per_second"] > 0
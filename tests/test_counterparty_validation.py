@@ -0,0 +1,121 @@
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+
+from app.counterparties.validators import validate_bic, validate_iban
+from app.main import app
+from app.models import db
+from app.models.adapter import CreditTransfer
+from app.services import counterparty_validation
+from app.services.counterparty_validation import CounterpartyValidationCache, validate_counterparties
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def unstub_between_tests():
+    yield
+    mockito.unstub()
+
+
+def _credit_transfer(iban: str, bic: str = "CRLYFRPPTOU") -> CreditTransfer:
+    credit_transfer = stub_credit_transfer()
+    credit_transfer.update(counterparty_iban=iban, counterparty_bic=bic)
+    return CreditTransfer(**credit_transfer)
+
+
+@pytest.mark.parametrize("iban", [
+    "FR7630006000011234567890189",
+    "fr76 3000 6000 0112 3456 7890 189",
+    "DE89370400440532013000",
+    "GB82WEST12345698765432",
+    "NL24ABNA5055036109",
+])
+def test_validate_iban__when_valid_iban__should_not_raise(iban: str):
+    validate_iban(iban)
+
+
+@pytest.mark.parametrize("assert_message, iban", [
+    ("when wrong check digits", "FR7630006000011234567890188"),
+    ("when wrong length for the country", "DE8937040044053201300"),
+    ("when unknown country", "ZZ7630006000011234567890189"),
+    ("when invalid characters", "FR76-3000-6000-0112-3456-7890-189"),
+])
+def test_validate_iban__when_invalid_iban__should_raise_value_error(assert_message: str, iban: str):
+    with pytest.raises(ValueError):
+        validate_iban(iban)
+
+
+@pytest.mark.parametrize("bic, valid", [
+    ("BNPAFRPP", True),
+    ("BNPAFRPPXXX", True),
+    ("bnpafrpp", True),
+    ("BNPAFRP", False),
+    ("BNPAFRPPXX", False),
+    ("1NPAFRPP", False),
+])
+def test_validate_bic__should_check_format(bic: str, valid: bool):
+    if valid:
+        validate_bic(bic)
+    else:
+        with pytest.raises(ValueError):
+            validate_bic(bic)
+
+
+def test_validate_counterparties__should_report_invalid_counterparties_in_order():
+    credit_transfers = [
+        _credit_transfer(iban="FR7630006000011234567890189"),
+        _credit_transfer(iban="FR7630006000011234567890188"),
+        _credit_transfer(iban="FR7630006000011234567890189", bic="BNP"),
+    ]
+
+    invalid_counterparties = validate_counterparties(
+        credit_transfers=credit_transfers, cache=CounterpartyValidationCache()
+    )
+
+    assert [invalid_counterparty.index for invalid_counterparty in invalid_counterparties] == [1, 2]
+    assert "check digits" in invalid_counterparties[0].error
+    assert "BIC" in invalid_counterparties[1].error
+
+
+def test_validate_counterparties__should_validate_each_counterparty_once_across_bulks():
+    cache = CounterpartyValidationCache(max_size=2)
+    payroll = [_credit_transfer(iban="FR7630006000011234567890189") for _ in range(100)]
+    mockito.spy2(counterparty_validation._validate_counterparty)
+
+    validate_counterparties(credit_transfers=payroll, cache=cache)
+    validate_counterparties(credit_transfers=payroll, cache=cache)
+
+    mockito.verify(counterparty_validation, times=1)._validate_counterparty(**KWARGS)
+    assert len(cache) == 1
+
+
+def test_counterparty_validation_cache__should_evict_least_recently_used():
+    cache = CounterpartyValidationCache(max_size=2)
+    cache.put_many({("iban-1", "bic"): None, ("iban-2", "bic"): None})
+    cache.get_many([("iban-1", "bic")])
+    cache.put_many({("iban-3", "bic"): "invalid"})
+
+    assert cache.get_many([("iban-1", "bic"), ("iban-2", "bic"), ("iban-3", "bic")]) == {
+        ("iban-1", "bic"): None, ("iban-3", "bic"): "invalid"
+    }
+
+
+def test_transfers_bulk__when_invalid_counterparty__should_return_422_before_reserving_funds():
+    when(db).find_bulk_request(**KWARGS).thenReturn(None)
+    when(db).find_scheduled_bulk(**KWARGS).thenReturn(None)
+    credit_transfer = stub_credit_transfer()
+    credit_transfer["counterparty_iban"] = "FR7630006000011234567890188"
+    payload = stub_bulk_transfer_payload(credit_transfers=[stub_credit_transfer(), credit_transfer])
+
+    response = client.post(url="/transfers/bulk", json=payload)
+
+    assert response.status_code == 422
+    assert response.json()["error"] == {
+        "reason": "invalid-counterparty",
+        "details": "credit_transfers[1]: Invalid IBAN check digits: FR7630006000011234567890188"
+    }
@@ -0,0 +1,196 @@
+import decimal
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services import bulk_scheduler, transfer_service
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.services.bulk_templates import TEMPLATE_CACHE
+from app.services.fx_rates import FX_RATE_CACHE, FxRateCache
+
+from benchmarks.fx_conversion import measure_conversions
+from benchmarks.pipeline import drain_queues
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()
+    TEMPLATE_CACHE.clear()
+    FX_RATE_CACHE.clear()
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def _credit_transfer(amount: str, currency: str) -> dict:
+    credit_transfer = stub_credit_transfer(amount_in_euros=amount)
+    credit_transfer["currency"] = currency
+    return credit_transfer
+
+
+def _update_fx_rates(**rates: str) -> int:
+    with Session(db.engine) as session, session.begin():
+        return db.update_fx_rates(session=session, rates={
+            currency: decimal.Decimal(rate) for currency, rate in rates.items()
+        })
+
+
+def test_fx_rate_cache__should_reload_rates_only_when_ttl_expired_and_version_changed(database):
+    now = [0.0]
+    cache = FxRateCache(ttl_seconds=60, clock=lambda: now[0])
+    first_snapshot = cache.snapshot()
+
+    assert (first_snapshot.version, first_snapshot.rates["USD"]) == (1, decimal.Decimal("0.86"))
+    assert _update_fx_rates(USD="0.9") == 2
+    assert cache.snapshot() is first_snapshot  # within the TTL
+
+    now[0] = 61.0
+    second_snapshot = cache.snapshot()
+    now[0] = 122.0
+
+    assert (second_snapshot.version, second_snapshot.rates["USD"]) == (2, decimal.Decimal("0.9"))
+    assert cache.snapshot() is second_snapshot  # version unchanged
+    assert cache.loads == 2
+
+
+def _balance_cents() -> int:
+    with Session(db.engine) as session:
+        return db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).balance_cents
+
+
+def test_transfers_bulk__when_mixed_currencies__should_reserve_and_book_amounts_in_account_currency(database):
+    payload = stub_bulk_transfer_payload(credit_transfers=[
+        _credit_transfer("100", "USD"), _credit_transfer("1000", "JPY"), _credit_transfer("10", "EUR")
+    ], verbose=False)
+    initial_balance_cents = _balance_cents()
+
+    response = client.post("/transfers/bulk", json=payload)
+
+    assert response.status_code == 201, response.text
+    # the counterparties are paid in the currency of the credit transfers
+    assert [(job.amount_cents, job.amount_currency, job.booked_amount_cents) for job in TRANSFER_JOB_QUEUE] == [
+        (10000, "USD", 8600), (1000, "JPY", 570), (1000, "EUR", 1000)
+    ]
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(payload["request_id"]))
+        assert bulk_request.total_amount_cents == 10170
+    assert drain_queues() == 3
+    assert _balance_cents() == initial_balance_cents - 10170
+    with Session(db.engine) as session:
+        transactions = db.list_transactions(
+            session=session, bank_account_id=ACCOUNT_ID, bulk_request_uuid=uuid.UUID(payload["request_id"])
+        )
+    assert sorted((transaction.amount_cents, transaction.amount_currency) for transaction in transactions) == [
+        (-8600, "EUR"), (-1000, "EUR"), (-570, "EUR")
+    ]
+
+
+def test_partial_success__when_other_currency__should_retry_in_currency_and_release_booked_amount(
+        database, settings
+):
+    settings(bulk_manifest_mode=True)
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[_credit_transfer("100", "USD"), _credit_transfer("10", "EUR")], verbose=False
+    )
+    payload["partial_success"] = True
+    initial_balance_cents = _balance_cents()
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    when(transfer_service).transfer_funds(**KWARGS).thenReturn(False, True)
+    drain_queues()
+    mockito.unstub()
+
+    response = client.post(f"/transfers/bulk/{payload['request_id']}/retry-failed")
+
+    assert response.status_code == 202, response.text
+    assert response.json()["retried_amount_cents"] == 8600
+    [retried_job] = [queued_job.to_transfer_job() for queued_job in TRANSFER_JOB_QUEUE]
+    assert (retried_job.amount_cents, retried_job.amount_currency, retried_job.booked_amount_cents) == (
+        10000, "USD", 8600
+    )
+    drain_queues()
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(payload["request_id"]))
+        account = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        assert (bulk_request.status, bulk_request.processed_amount_cents) == (db.RequestStatus.COMPLETED, 9600)
+        assert (account.balance_cents, account.ongoing_transfer_cents) == (initial_balance_cents - 9600, 0)
+
+
+@pytest.mark.parametrize("assert_message, currency", [
+    ("when not an ISO 4217 currency", "XYZ"),
+    ("when no FX rate", "SEK"),
+])
+def test_transfers_bulk__when_unsupported_currency__should_return_422(database, assert_message, currency):
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[_credit_transfer("10", "EUR"), _credit_transfer("10", currency)], verbose=False
+    )
+
+    response = client.post("/transfers/bulk", json=payload)
+
+    assert response.status_code == 422, assert_message
+    assert response.json()["error"]["reason"] == "unsupported-currency", assert_message
+    assert currency in response.json()["error"]["details"], assert_message
+    assert not TRANSFER_JOB_QUEUE
+
+
+def test_execute_bulk_template__when_other_currency__should_convert_at_rates_of_execution(database, settings):
+    settings(fx_rates_ttl_seconds=0.0)
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[_credit_transfer("100", "USD"), _credit_transfer("10", "EUR")], verbose=False
+    )
+    payload["template_id"] = payload.pop("request_id")
+    response = client.post("/transfers/bulk/templates", json=payload)
+    assert response.status_code == 201, response.text
+    assert response.json()["total_amount_cents"] == 9600
+
+    _update_fx_rates(USD="0.9")
+    response = client.post(
+        f"/transfers/bulk/templates/{payload['template_id']}/execute",
+        json={"request_id": str(uuid.uuid4()), "overrides": [{"index": 0, "amount": "200.50"}]}
+    )
+
+    assert response.status_code == 201, response.text
+    assert [(job.amount_cents, job.booked_amount_cents) for job in TRANSFER_JOB_QUEUE] == [(20050, 18045), (1000, 1000)]
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(response.json()["bulk_id"]))
+        assert bulk_request.total_amount_cents == 19045
+
+
+def test_fx_conversion_benchmark__should_convert_same_amounts_with_every_method():
+    results = measure_conversions(transfers=10, currencies=["EUR", "USD", "JPY"], repeat=1)
+
+    assert [result["conversion"] for result in results] == [
+        "rate lookup per line", "cached rates, Decimal per line", "one pass"
+    ]
+
+
+def test_scheduled_bulk__when_other_currency__should_release_amounts_converted_when_scheduled(database, settings):
+    settings(fx_rates_ttl_seconds=0.0)
+    payload = stub_bulk_transfer_payload(credit_transfers=[_credit_transfer("100", "USD")], verbose=False)
+    payload["execute_at"] = "2026-11-30T08:00:00Z"
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    _update_fx_rates(USD="0.9")
+
+    with Session(db.engine) as session:
+        scheduled_bulk_id = db.find_scheduled_bulk(session=session, request_uuid=uuid.UUID(payload["request_id"])).id
+    with Session(db.engine) as session:
+        assert bulk_scheduler.release_scheduled_bulks(session=session, scheduled_bulk_ids=[scheduled_bulk_id]) == 1
+
+    assert [(job.amount_cents, job.amount_currency, job.booked_amount_cents) for job in TRANSFER_JOB_QUEUE] == [
+        (10000, "USD", 8600)
+    ]
@@ -0,0 +1,41 @@
+import pytest
+
+from benchmarks.import_time import ENTRY_POINTS, measure_import_time
+
+
+PUBLIC_API_ROUTERS = ["app.routers.bulk_transfers", "app.routers.accounts"]
+# imported by the worker on its first finalize bulk job or bulk manifest transfer job only
+LAZY_WORKER_SERVICES = ["app.services.bulk_request_service", "app.services.bulk_manifest", "app.services.bulk_progress"]
+
+
+@pytest.mark.parametrize("entry_point", ENTRY_POINTS, ids=[entry_point.name for entry_point in ENTRY_POINTS])
+def test_import_time__should_be_within_budget(entry_point):
+    result = measure_import_time(entry_point, runs=3)
+    assert result.within_budget, (f"{entry_point.name} imports in {result.total_ms:.0f} ms "
+                                  f"(budget {entry_point.budget_ms:.0f} ms): {result.slowest_top_level_imports_ms}")
+
+
+def test_worker_app__should_not_import_public_api_routers():
+    worker_entry_point = next(entry_point for entry_point in ENTRY_POINTS if entry_point.name == "worker-app")
+    modules = measure_import_time(worker_entry_point).modules
+    assert "app.routers.fake_broker" in modules
+    assert not [router for router in PUBLIC_API_ROUTERS if router in modules]
+
+
+def test_worker_app__should_import_bulk_request_services_lazily():
+    worker_entry_point = next(entry_point for entry_point in ENTRY_POINTS if entry_point.name == "worker-app")
+    modules = measure_import_time(worker_entry_point).modules
+    assert "app.services.transfer_service" in modules
+    assert not [service for service in LAZY_WORKER_SERVICES if service in modules]
+
+
+def test_migrations_cli__should_not_import_database_engine():
+    cli_entry_point = next(entry_point for entry_point in ENTRY_POINTS if entry_point.name == "migrations-cli")
+    assert "sqlalchemy" not in measure_import_time(cli_entry_point).modules
+
+
+def test_worker_cli__should_not_import_application_before_starting_workers():
+    cli_entry_point = next(entry_point for entry_point in ENTRY_POINTS if entry_point.name == "worker-cli")
+    modules = measure_import_time(cli_entry_point).modules
+    assert "sqlalchemy" not in modules
+    assert "app.routers.fake_broker" not in modules
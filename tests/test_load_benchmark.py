@@ -0,0 +1,33 @@
+from benchmarks.load import Scenario, compare, percentile, run_scenario
+
+
+def test_percentile__should_use_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3
+    assert percentile([], 50) is None
+
+
+def test_run_scenario__should_complete_all_bulks(settings):
+    result = run_scenario(Scenario(bulk_size=3, accounts=2, concurrency=2, bulks=4))
+
+    assert result["completed_bulks"] == 4
+    assert result["failed_jobs"] == 0
+    assert result["transfers_per_second"] > 0
+    assert result["accept_latency_ms"]["p50"] <= result["accept_latency_ms"]["p99"]
+    assert result["time_to_completed_ms"]["p99"] > 0
+    assert result["peak_rss_mb"] > 0
+
+
+def test_compare__should_report_relative_changes_of_same_scenarios():
+    scenario = {"bulk_size": 10, "accounts": 1, "concurrency": 1, "bulks": 5, "manifest_mode": False}
+    baseline = [{**scenario, "transfers_per_second": 100.0, "accept_latency_ms": {"p99": 10.0},
+                 "time_to_completed_ms": {"p99": 200.0}, "peak_rss_mb": 70.0}]
+    results = [{**scenario, "transfers_per_second": 80.0, "accept_latency_ms": {"p99": 12.0},
+                "time_to_completed_ms": {"p99": 200.0}, "peak_rss_mb": 70.0}]
+
+    lines = compare(results, baseline)
+
+    assert lines == ["bulk_size=10 accounts=1 concurrency=1: transfers/s: -20.0%, accept p99: +20.0%, "
+                     "completed p99: +0.0%, peak RSS: +0.0%"]
@@ -0,0 +1,157 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.utils.locks import StripedLock
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations
+
+
+def _reserve(session: Session, account: db.BankAccount, amount_cents: int):
+    """ORM read-modify-write of the account, checked against its version."""
+    account.ongoing_transfer_cents += amount_cents
+    session.add(account)
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    yield
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def test_striped_lock__when_same_key__should_wait_for_holder():
+    locks = StripedLock("test", stripes=4)
+    holder_ready, release_holder = threading.Event(), threading.Event()
+    events = []
+
+    def hold():
+        with locks.lock(42):
+            holder_ready.set()
+            release_holder.wait()
+            events.append("holder released")
+
+    def wait():
+        with locks.lock(42):
+            events.append("waiter acquired")
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holder_ready.wait()
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    waiter.join(timeout=0.05)
+    assert waiter.is_alive()
+    release_holder.set()
+    holder.join()
+    waiter.join()
+
+    assert events == ["holder released", "waiter acquired"]
+
+
+def test_striped_lock__when_other_stripe__should_not_wait():
+    locks = StripedLock("test", stripes=4)
+    acquired = threading.Event()
+
+    def acquire_other_key():
+        with locks.lock(2):
+            acquired.set()
+
+    with locks.lock(1):
+        thread = threading.Thread(target=acquire_other_key)
+        thread.start()
+        assert acquired.wait(timeout=1)
+        thread.join()
+
+
+def test_account_update__should_increment_version(database):
+    with Session(db.engine) as session, session.begin():
+        account = db.select_account_for_update_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        version = account.version
+        _reserve(session=session, account=account, amount_cents=100)
+
+    with Session(db.engine) as session:
+        assert db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).version == version + 1
+
+
+def test_account_update__when_updated_concurrently__should_raise_stale_data_error(database):
+    with Session(db.engine) as session, Session(db.engine) as other_session:
+        account = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        other_account = db.find_account_by_id(session=other_session, bank_account_id=ACCOUNT_ID)
+        _reserve(session=other_session, account=other_account, amount_cents=100)
+        other_session.commit()
+
+        _reserve(session=session, account=account, amount_cents=200)
+        with pytest.raises(StaleDataError):
+            session.commit()
+
+    with Session(db.engine) as session:
+        assert db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).ongoing_transfer_cents == 100
+
+
+def test_run_transaction__when_concurrent_update__should_retry_from_fresh_read(database):
+    attempts = []
+
+    def reserve():
+        account = db.select_account_for_update_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        if not attempts:  # another process updates the account between the read and the write
+            with Session(db.engine) as other_session, other_session.begin():
+                other_account = db.find_account_by_id(session=other_session, bank_account_id=ACCOUNT_ID)
+                _reserve(session=other_session, account=other_account, amount_cents=100)
+        attempts.append(account.ongoing_transfer_cents)
+        _reserve(session=session, account=account, amount_cents=200)
+        return account.ongoing_transfer_cents
+
+    with Session(db.engine) as session:
+        result = db.run_transaction(session=session, work=reserve, operation="test")
+
+    assert attempts == [0, 100]
+    assert result == 300
+
+
+def test_run_transaction__when_always_conflicting__should_raise_concurrent_update_error(database):
+    def conflict():
+        raise StaleDataError("version mismatch")
+
+    with Session(db.engine) as session, pytest.raises(db.ConcurrentUpdateError):
+        db.run_transaction(session=session, work=conflict, operation="test", max_attempts=2)
+
+
+def test_create_bulk_transfer__when_concurrent_requests_on_same_account__should_not_overdraw(database):
+    with Session(db.engine) as session:
+        balance_cents = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID).balance_cents
+    amount_in_euros = str(balance_cents // 100 // 3)  # only 3 bulks fit in the balance
+    responses = []
+
+    def submit():
+        payload = stub_bulk_transfer_payload(
+            credit_transfers=[stub_credit_transfer(amount_in_euros=amount_in_euros)], verbose=False
+        )
+        responses.append(client.post("/transfers/bulk", json=payload).status_code)
+
+    threads = [threading.Thread(target=submit) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(responses) == [201, 201, 201, 422, 422, 422]
+    with Session(db.engine) as session:
+        account = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        assert account.ongoing_transfer_cents == 3 * int(amount_in_euros) * 100
+        assert account.version == 4
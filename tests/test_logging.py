@@ -0,0 +1,51 @@
+import io
+import json
+import logging
+
+from app.utils.log_formatter import JsonFormatter, LogSampler, configure_logging, parse_logger_levels, shutdown_logging
+
+
+def test_json_formatter__should_output_extra_fields():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "bulk_id=%s processed", ("b-1",), None)
+    record.transfer_uuid = "t-1"
+
+    log = json.loads(JsonFormatter().format(record))
+
+    assert log["level"] == "INFO"
+    assert log["logger"] == "app.test"
+    assert log["message"] == "bulk_id=b-1 processed"
+    assert log["transfer_uuid"] == "t-1"
+
+
+def test_log_sampler__should_keep_one_log_out_of_sample_rate():
+    sampler = LogSampler(sample_rate=0.1)
+    assert sum(sampler.sample() for _ in range(1000)) == 100
+
+
+def test_log_sampler__when_rate_limited__should_not_exceed_max_per_second():
+    sampler = LogSampler(max_per_second=5)
+    assert sum(sampler.sample() for _ in range(1000)) <= 6
+
+
+def test_log_sampler__when_sample_rate_zero__should_drop_all_logs():
+    sampler = LogSampler(sample_rate=0)
+    assert not any(sampler.sample() for _ in range(10))
+
+
+def test_configure_logging__when_asynchronous__should_write_records_on_shutdown():
+    stream = io.StringIO()
+    configure_logging(level="INFO", log_format="json", asynchronous=True, stream=stream)
+    try:
+        logging.getLogger("app.test").info("bulk_id=%s accepted", "b-1")
+        logging.getLogger("app.test").debug("filtered out")
+        shutdown_logging()
+        assert [json.loads(line)["message"] for line in stream.getvalue().splitlines()] == ["bulk_id=b-1 accepted"]
+    finally:
+        configure_logging(asynchronous=False)
+
+
+def test_parse_logger_levels():
+    assert parse_logger_levels(" app.routers.fake_broker=warning, app.services=INFO,") == {
+        "app.routers.fake_broker": "WARNING",
+        "app.services": "INFO",
+    }
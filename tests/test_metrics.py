@@ -0,0 +1,90 @@
+import re
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.utils.metrics import Gauge, Histogram, MetricsRegistry
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+
+def _sample(body: str, sample_name: str) -> float:
+    match = re.search(rf"^{re.escape(sample_name)} (\S+)$", body, re.MULTILINE)
+    assert match, f"{sample_name} not found"
+    return float(match.group(1))
+
+
+def test_histogram__should_render_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = Histogram("test_duration_seconds", "Test.", label_name="stage", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 0.5, 2.0):
+        histogram.labels("validation").observe(value)
+
+    body = registry.render()
+
+    assert "# TYPE test_duration_seconds histogram" in body
+    assert _sample(body, 'test_duration_seconds_bucket{stage="validation",le="0.1"}') == 1
+    assert _sample(body, 'test_duration_seconds_bucket{stage="validation",le="1.0"}') == 3
+    assert _sample(body, 'test_duration_seconds_bucket{stage="validation",le="+Inf"}') == 4
+    assert _sample(body, 'test_duration_seconds_sum{stage="validation"}') == 3.05
+    assert _sample(body, 'test_duration_seconds_count{stage="validation"}') == 4
+
+
+def test_histogram__when_observed_from_several_threads__should_sum_thread_shards():
+    registry = MetricsRegistry()
+    histogram = Histogram("test_wait_seconds", "Test.", registry=registry)
+
+    def observe():
+        for _ in range(1000):
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=observe) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _sample(registry.render(), "test_wait_seconds_count") == 8000
+
+
+def test_gauge__should_read_function_when_rendered():
+    registry = MetricsRegistry()
+    queue = [1, 2]
+    Gauge("test_queue_depth", "Test.", label_name="queue", registry=registry).set_function(
+        queue.__len__, label_value="transfer"
+    )
+    queue.append(3)
+
+    assert _sample(registry.render(), 'test_queue_depth{queue="transfer"}') == 3
+
+
+def test_metrics__after_bulk_completed__should_expose_pipeline_metrics(database):
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="10") for _ in range(2)], verbose=False
+    )
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    assert _sample(client.get("/metrics").text, 'bulk_transfer_queue_depth{queue="transfer"}') == 2
+
+    for _ in range(2):
+        assert client.get("/internal/jobs/transfer").status_code == 200
+    for _ in range(2):
+        assert client.get("/internal/jobs/bulk").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert _sample(body, 'bulk_transfer_queue_depth{queue="transfer"}') == 0
+    for stage in ("validation", "account_lock_wait", "schedule_transfers", "transfer_service.process",
+                  "finalize_bulk_transfer"):
+        assert _sample(body, f'bulk_transfer_stage_duration_seconds_count{{stage="{stage}"}}') > 0
+    assert _sample(body, 'bulk_transfer_queue_wait_seconds_count{queue="transfer"}') > 0
+    assert _sample(body, 'bulk_transfer_db_transaction_duration_seconds_count{outcome="commit"}') > 0
+    assert _sample(body, 'bulk_transfer_bulk_completion_seconds_count{status="COMPLETED"}') > 0
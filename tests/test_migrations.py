@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.migrations.simple_runner import run_all_migrations, pending_migrations, split_statements, MigrationError
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    directory = tmp_path / "migrations"
+    directory.mkdir()
+    (directory / "001_create_accounts.sql").write_text(
+        "CREATE TABLE accounts (id INTEGER PRIMARY KEY, name TEXT NOT NULL); -- accounts\n"
+        "INSERT INTO accounts (name) VALUES ('ACME; Corp');\n"
+    )
+    return directory
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / "test.sqlite")
+
+
+def test_split_statements__should_split_on_complete_statements_only():
+    assert split_statements("CREATE TABLE a (x TEXT);\n-- comment\nINSERT INTO a VALUES ('b;c');\n") == [
+        "CREATE TABLE a (x TEXT);", "-- comment\nINSERT INTO a VALUES ('b;c');"
+    ]
+
+
+def test_run_all_migrations__when_run_twice__should_apply_pending_migrations_once(migrations_dir, database_path):
+    assert [m.version for m in run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)] == [
+        "001"
+    ]
+    assert run_all_migrations(database_path=database_path, migrations_dir=migrations_dir) == []
+
+    (migrations_dir / "002_add_balance.sql").write_text("ALTER TABLE accounts ADD COLUMN balance INTEGER;")
+    assert [m.version for m in pending_migrations(database_path=database_path, migrations_dir=migrations_dir)] == [
+        "002"
+    ]
+    assert [m.version for m in run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)] == [
+        "002"
+    ]
+
+    with sqlite3.connect(database_path) as conn:
+        assert conn.execute("SELECT count(*) FROM accounts").fetchone()[0] == 1  # data kept
+        assert conn.execute("SELECT count(*) FROM schema_migrations").fetchone()[0] == 2
+
+
+def test_run_all_migrations__when_migration_fails__should_rollback_all_pending_migrations(
+        migrations_dir, database_path
+):
+    (migrations_dir / "002_broken.sql").write_text("ALTER TABLE unknown_table ADD COLUMN x INTEGER;")
+
+    with pytest.raises(sqlite3.OperationalError):
+        run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+
+    with sqlite3.connect(database_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'accounts'").fetchone() is None
+
+
+def test_run_all_migrations__when_applied_migration_modified__should_raise(migrations_dir, database_path):
+    run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+    (migrations_dir / "001_create_accounts.sql").write_text("DROP TABLE accounts;")
+
+    with pytest.raises(MigrationError):
+        run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+
+
+def test_run_all_migrations__when_concurrent_workers__should_apply_migrations_once(migrations_dir, database_path):
+    results = []
+    workers = [
+        threading.Thread(target=lambda: results.append(
+            run_all_migrations(database_path=database_path, migrations_dir=migrations_dir)
+        ))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(len(applied) for applied in results) == [0, 0, 0, 1]
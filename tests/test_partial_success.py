@@ -0,0 +1,190 @@
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.models.job import BulkJob
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services import transfer_service
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.services.fake_broker_client import FakeBrokerClient
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+ACCOUNT_ID = 1  # seeded by the migrations
+INITIAL_BALANCE_CENTS = 10000000
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def _submit_bulk(transfer_count: int, partial_success: bool = True) -> str:
+    payload = stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="10") for _ in range(transfer_count)], verbose=False
+    )
+    payload["partial_success"] = partial_success
+    response = client.post("/transfers/bulk", json=payload)
+    assert response.status_code == 201
+    return response.json()["bulk_id"]
+
+
+def _process_all_jobs():
+    while TRANSFER_JOB_QUEUE:
+        client.get("/internal/jobs/transfer")
+    while FINALIZE_BULK_JOB_QUEUE:
+        client.get("/internal/jobs/bulk")
+
+
+def _load(bulk_id: str):
+    with Session(db.engine) as session:
+        bulk_request = db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(bulk_id))
+        account = db.find_account_by_id(session=session, bank_account_id=ACCOUNT_ID)
+        transfers = {
+            status: db.list_transfers(session=session, bulk_request_id=bulk_request.id, status=status)
+            for status in db.RequestStatus
+        }
+        transactions = db.list_transactions(
+            session=session, bank_account_id=ACCOUNT_ID, bulk_request_uuid=uuid.UUID(bulk_id)
+        )
+        return bulk_request, account, transfers, transactions
+
+
+@pytest.mark.parametrize("manifest_mode", [False, True])
+def test_partial_success__should_complete_other_transfers_and_retry_only_failed_ones(
+        database, settings, manifest_mode
+):
+    settings(bulk_manifest_mode=manifest_mode)
+    bulk_id = _submit_bulk(transfer_count=3)
+    when(transfer_service).transfer_funds(**KWARGS).thenReturn(True, False, True)
+    _process_all_jobs()
+
+    bulk_request, account, transfers, transactions = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.PARTIALLY_COMPLETED
+    assert (bulk_request.processed_amount_cents, bulk_request.failed_amount_cents) == (2000, 1000)
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 2000
+    assert len(transfers[db.RequestStatus.COMPLETED]) == 2
+    [failed_transfer] = transfers[db.RequestStatus.FAILED]
+    assert len(transactions) == 2  # no transaction for the failed transfer
+
+    response = client.post(f"/transfers/bulk/{bulk_id}/retry-failed")
+    assert response.status_code == 202
+    assert response.json() == {
+        "bulk_id": bulk_id,
+        "message": "Failed transfers retry accepted",
+        "retried_transfers": 1,
+        "retried_amount_cents": 1000
+    }
+    assert len(TRANSFER_JOB_QUEUE) == 1
+    bulk_request, account, _, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.PENDING
+    assert account.ongoing_transfer_cents == 1000
+
+    response = client.post(f"/transfers/bulk/{bulk_id}/retry-failed")
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "bulk-request-in-progress"
+
+    mockito.unstub()
+    _process_all_jobs()
+
+    bulk_request, account, transfers, transactions = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.COMPLETED
+    assert (bulk_request.processed_amount_cents, bulk_request.failed_amount_cents) == (3000, 0)
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 3000
+    [retried_transfer] = [
+        transfer for transfer in transfers[db.RequestStatus.COMPLETED]
+        if transfer.transfer_uuid == failed_transfer.transfer_uuid
+    ]
+    assert retried_transfer.attempts == 2
+    assert len(transactions) == 3
+
+
+def test_partial_success__when_all_transfers_failed__should_fail_bulk(database):
+    bulk_id = _submit_bulk(transfer_count=2)
+    when(transfer_service).transfer_funds(**KWARGS).thenReturn(False)
+    _process_all_jobs()
+
+    bulk_request, account, transfers, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.FAILED
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS
+    assert len(transfers[db.RequestStatus.FAILED]) == 2
+
+
+def test_partial_success__when_duplicate_outcome__should_count_transfer_once(database):
+    bulk_id = _submit_bulk(transfer_count=2)
+    client.get("/internal/jobs/transfer")
+    duplicate_job = FINALIZE_BULK_JOB_QUEUE[0].to_bulk_job()
+    client.post("/internal/jobs/bulk", json=BulkJob.model_dump(duplicate_job))
+    _process_all_jobs()
+
+    bulk_request, account, transfers, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.COMPLETED
+    assert bulk_request.processed_amount_cents == 2000
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 2000
+
+
+def test_retry_failed_transfers__when_all_or_nothing_bulk__should_return_422(database):
+    bulk_id = _submit_bulk(transfer_count=1, partial_success=False)
+    _process_all_jobs()
+
+    response = client.post(f"/transfers/bulk/{bulk_id}/retry-failed")
+
+    assert response.status_code == 422
+    assert response.json()["error"]["reason"] == "not-partial-success"
+
+
+def test_retry_failed_transfers__when_unknown_bulk__should_return_404(database):
+    response = client.post(f"/transfers/bulk/{uuid.uuid4()}/retry-failed")
+
+    assert response.status_code == 404
+    assert response.json()["error"]["reason"] == "unknown-bulk-request"
+
+
+def test_create_bulk_transfer__when_transfer_jobs_not_queued__should_fail_bulk_and_release_funds(database):
+    when(FakeBrokerClient).queue_transfer_job(**KWARGS).thenRaise(ConnectionError("broker unavailable"))
+    payload = stub_bulk_transfer_payload(credit_transfers=[stub_credit_transfer(amount_in_euros="10")], verbose=False)
+
+    response = client.post("/transfers/bulk", json=payload)
+
+    assert response.status_code == 503
+    assert response.json()["error"]["reason"] == "transfers-not-queued"
+    bulk_request, account, transfers, _ = _load(payload["request_id"])
+    assert bulk_request.status == db.RequestStatus.FAILED
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS
+    assert not TRANSFER_JOB_QUEUE
+
+
+def test_retry_failed_transfers__when_transfer_jobs_not_queued__should_fail_transfers_again(database):
+    bulk_id = _submit_bulk(transfer_count=2)
+    when(transfer_service).transfer_funds(**KWARGS).thenReturn(True, False)
+    _process_all_jobs()
+    when(FakeBrokerClient).queue_transfer_job(**KWARGS).thenRaise(ConnectionError("broker unavailable"))
+
+    response = client.post(f"/transfers/bulk/{bulk_id}/retry-failed")
+
+    assert response.status_code == 503
+    assert response.json()["error"]["reason"] == "transfers-not-queued"
+    bulk_request, account, transfers, _ = _load(bulk_id)
+    assert bulk_request.status == db.RequestStatus.PARTIALLY_COMPLETED
+    assert account.ongoing_transfer_cents == 0
+    assert account.balance_cents == INITIAL_BALANCE_CENTS - 1000
+    assert len(transfers[db.RequestStatus.FAILED]) == 1
@@ -0,0 +1,69 @@
+import pstats
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.routers import fake_broker
+from app.utils.profiling import configure_profiling
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    profile_dir = tmp_path / "profiles"
+    configure_profiling(profile_dir=str(profile_dir))
+    yield profile_dir
+    configure_profiling(profile_dir=None)
+
+
+def test_transfers_bulk__when_profile_header__should_capture_profile_and_sql_timings(database, profile_dir):
+    fake_broker.TRANSFER_JOB_QUEUE.clear()
+    payload = stub_bulk_transfer_payload(credit_transfers=[stub_credit_transfer()], verbose=False)
+
+    response = client.post("/transfers/bulk", json=payload, headers={"X-Profile": "1"})
+    assert response.status_code == 201
+    capture_id = response.headers["x-profile-id"]
+    fake_broker.TRANSFER_JOB_QUEUE.clear()
+
+    captures = client.get("/internal/profiles").json()["items"]
+    assert [capture["capture_id"] for capture in captures] == [capture_id]
+    assert captures[0]["name"] == "POST /transfers/bulk"
+    assert captures[0]["sql_count"] > 0
+
+    capture = client.get(f"/internal/profiles/{capture_id}").json()
+    assert any("bulk_requests" in statement["statement"] for statement in capture["sql"]["statements"])
+    assert any("create_bulk_transfer" in function["function"] for function in capture["top_functions"])
+    assert pstats.Stats(str(profile_dir / capture["profile_file"])).total_calls > 0
+
+
+def test_request__when_not_triggered__should_not_capture(profile_dir):
+    fake_broker.TRANSFER_JOB_QUEUE.clear()
+    response = client.get("/internal/jobs/transfer")
+    assert response.status_code == 404
+    assert "x-profile-id" not in response.headers
+    assert client.get("/internal/profiles").json()["items"] == []
+
+
+def test_job_consumer__when_sampled_outside_request__should_capture(profile_dir):
+    configure_profiling(profile_dir=str(profile_dir), sample_rate=1.0, max_captures=2)
+    fake_broker.FINALIZE_BULK_JOB_QUEUE.clear()
+
+    for _ in range(3):
+        with Session(db.engine) as session, pytest.raises(HTTPException):
+            fake_broker.consume_finalize_bulk_job(session=session)  # empty queue
+
+    captures = client.get("/internal/profiles").json()["items"]
+    assert [capture["name"] for capture in captures] == ["consume_finalize_bulk_job"] * 2  # pruned to max captures
+    assert len(list(profile_dir.glob("*.pstats"))) == 2
+
+
+def test_get_profile__when_unknown_capture__should_return_404(profile_dir):
+    assert client.get("/internal/profiles/unknown").status_code == 404
@@ -0,0 +1,48 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.job import TransferJob, BulkJob, QueuedTransferJob, QueuedBulkJob
+from benchmarks.queue_memory import measure_queue_memory
+
+
+client = TestClient(app)
+
+
+def _transfer_job(transfer_uuid: str = None) -> TransferJob:
+    return TransferJob(
+        transfer_uuid=transfer_uuid or str(uuid.uuid4()),
+        bulk_request_uuid=str(uuid.uuid4()),
+        bank_account_id=1,
+        counterparty_name="Bip Bip",
+        counterparty_iban="EE303680981021245685",
+        counterparty_bic="CRLYFRPPTOU",
+        amount_cents=1450,
+        amount_currency="EUR",
+        description="Wonderland/4410"
+    )
+
+
+def test_queued_transfer_job__should_materialize_to_same_transfer_job():
+    transfer_job = _transfer_job()
+    assert QueuedTransferJob.from_transfer_job(transfer_job).to_transfer_job() == transfer_job
+
+
+def test_queued_bulk_job__should_materialize_to_same_bulk_job():
+    bulk_job = BulkJob(
+        bulk_request_uuid=str(uuid.uuid4()), bank_account_id=1, single_transferred_amount_cents=1450, success=True,
+        transfer_uuid=str(uuid.uuid4())
+    )
+    assert QueuedBulkJob.from_bulk_job(bulk_job).to_bulk_job() == bulk_job
+
+
+def test_queued_transfer_job__should_use_less_memory_than_pydantic_job():
+    pydantic_bytes = measure_queue_memory(size=2000, counterparties=50, to_entry=lambda job: job)
+    compact_bytes = measure_queue_memory(size=2000, counterparties=50, to_entry=QueuedTransferJob.from_transfer_job)
+    assert compact_bytes * 3 < pydantic_bytes
+
+
+def test_enqueue_transfer_job__when_invalid_transfer_uuid__should_return_422():
+    response = client.post("/internal/jobs/transfer", json=_transfer_job(transfer_uuid="not-a-uuid").model_dump())
+    assert response.status_code == 422
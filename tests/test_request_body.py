@@ -0,0 +1,147 @@
+import gzip
+import json
+import uuid
+
+import msgpack
+import mockito
+import orjson
+import pytest
+import zstandard
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.adapter import BulkTransferRequest
+from app.models.job import PurgeBulkJob
+from app.routers import fake_broker
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.utils.request_body import (
+    RequestBodyError, RequestBodyTooLargeError, UnsupportedBodyEncodingError, decode_body, validate_body
+)
+
+from benchmarks.request_formats import measure_formats
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()  # bulk request ids are reused across test databases
+    yield
+    mockito.unstub()
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+def _payload() -> dict:
+    return stub_bulk_transfer_payload(
+        credit_transfers=[stub_credit_transfer(amount_in_euros="10"), stub_credit_transfer(amount_in_euros="20.5")],
+        verbose=False
+    )
+
+
+@pytest.mark.parametrize("content_type, content_encoding, serialize, encode", [
+    ("application/json", "gzip", lambda p: json.dumps(p).encode(), gzip.compress),
+    ("application/json", "zstd", lambda p: json.dumps(p).encode(), zstandard.ZstdCompressor().compress),
+    ("application/msgpack", "identity", msgpack.packb, lambda body: body),
+    ("application/x-msgpack", "gzip", msgpack.packb, gzip.compress),
+])
+def test_transfers_bulk__when_encoded_body__should_return_201(
+        database, content_type, content_encoding, serialize, encode
+):
+    response = client.post(
+        url="/transfers/bulk",
+        content=encode(serialize(_payload())),
+        headers={"Content-Type": content_type, "Content-Encoding": content_encoding}
+    )
+
+    assert response.status_code == 201, response.text
+    assert [job.amount_cents for job in TRANSFER_JOB_QUEUE] == [1000, 2050]
+
+
+@pytest.mark.parametrize("assert_message, headers, body, expected_status", [
+    ("when unsupported encoding", {"Content-Encoding": "br"}, b"{}", 415),
+    ("when unsupported type", {"Content-Type": "text/csv"}, b"a,b", 415),
+    ("when truncated gzip", {"Content-Encoding": "gzip"}, gzip.compress(b'{"request_id": "1"}')[:-8], 400),
+    ("when invalid msgpack", {"Content-Type": "application/msgpack"}, b"\xc1", 400),
+    ("when invalid JSON", {"Content-Type": "application/json"}, b'{"request_id": ', 422),
+])
+def test_transfers_bulk__when_invalid_body__should_deny(assert_message, headers, body, expected_status):
+    response = client.post(url="/transfers/bulk", content=body, headers=headers)
+
+    assert response.status_code == expected_status, assert_message
+
+
+def test_transfers_bulk__when_invalid_msgpack_fields__should_return_422_with_location():
+    payload = _payload()
+    del payload["credit_transfers"][1]["amount"]
+
+    response = client.post(
+        url="/transfers/bulk", content=msgpack.packb(payload), headers={"Content-Type": "application/msgpack"}
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "credit_transfers", 1, "amount"]
+
+
+@pytest.mark.parametrize("content_encoding, encode", [
+    ("gzip", gzip.compress),
+    ("zstd", zstandard.ZstdCompressor().compress),
+])
+def test_decode_body__when_decompression_bomb__should_stop_at_decoded_limit(content_encoding, encode):
+    bomb = encode(b"0" * 2**20)
+    assert len(bomb) < 2**12
+
+    with pytest.raises(RequestBodyTooLargeError):
+        decode_body(chunks=[bomb], content_encoding=content_encoding, max_decoded_bytes=2**16)
+
+
+@pytest.mark.parametrize("content_encoding, encode", [
+    ("gzip", gzip.compress),
+    ("zstd", zstandard.ZstdCompressor().compress),
+])
+def test_decode_body__when_truncated__should_raise(content_encoding, encode):
+    with pytest.raises(RequestBodyError, match="truncated"):
+        decode_body(chunks=[encode(b"0" * 2**10)[:-4]], content_encoding=content_encoding)
+
+
+def test_decode_body__when_chunked__should_enforce_encoded_limit():
+    with pytest.raises(RequestBodyTooLargeError):
+        decode_body(chunks=[b"0" * 10, b"0" * 10], max_encoded_bytes=15)
+
+
+def test_validate_body__when_stacked_or_unknown_types__should_raise():
+    with pytest.raises(UnsupportedBodyEncodingError):
+        decode_body(chunks=[b""], content_encoding="gzip, zstd")
+    with pytest.raises(UnsupportedBodyEncodingError):
+        validate_body(model=BulkTransferRequest, body=b"", content_type="application/xml")
+
+
+def test_fake_broker__should_render_job_responses_with_orjson():
+    transfer_uuid = str(uuid.uuid4())
+
+    response = client.post(url="/internal/jobs/transfer", json={
+        "transfer_uuid": transfer_uuid, "bulk_request_uuid": str(uuid.uuid4()), "bank_account_id": 1,
+        "counterparty_name": "Bip Bip", "counterparty_iban": "EE303680981021245685",
+        "counterparty_bic": "CRLYFRPPTOU", "amount_cents": 100, "amount_currency": "EUR",
+        "description": "Salary of June",
+    })
+
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+    assert orjson.loads(response.content)["transfer_uuid"] == transfer_uuid
+    purge_response = fake_broker.purge_bulk_jobs(PurgeBulkJob(bulk_request_uuid=str(uuid.uuid4()), bulk_request_id=0))
+    assert orjson.loads(purge_response.body)["status"] == "purged"
+
+
+def test_request_formats_benchmark__should_report_every_format():
+    results = measure_formats(transfers=10, repeat=1)
+
+    assert [result["format"] for result in results] == [
+        "json (dict validation)", "json", "json+gzip", "json+zstd", "msgpack", "msgpack+gzip", "msgpack+zstd"
+    ]
+    assert all(result["bytes"] > 0 for result in results)
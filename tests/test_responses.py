@@ -0,0 +1,75 @@
+import datetime
+import uuid
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import adapter
+from app.routers import bulk_transfers
+from app.utils.responses import ResponseShape
+
+from benchmarks.response_overhead import measure_serialization
+
+
+client = TestClient(app)
+
+BULK_ID = str(uuid.uuid4())
+
+
+@pytest.mark.parametrize("model, values", [
+    (adapter.BulkTransferSuccessResponse, {"message": "Bulk transfer accepted", "bulk_id": BULK_ID}),
+    (adapter.BulkTransferScheduledResponse, {
+        "message": "Bulk transfer scheduled", "bulk_id": BULK_ID, "execute_at": datetime.datetime(2026, 11, 30, 8)
+    }),
+    (adapter.BulkTransferRetrySuccessResponse, {
+        "message": "Failed transfers retry accepted", "bulk_id": BULK_ID, "retried_transfers": 2,
+        "retried_amount_cents": 2468
+    }),
+])
+def test_response_shape__should_render_body_of_response_model(model, values):
+    assert ResponseShape(model).render(**values) == JSONResponse(content=model(**values).model_dump(mode="json")).body
+
+
+def test_response_shape__when_other_fields__should_raise_value_error():
+    with pytest.raises(ValueError):
+        ResponseShape(adapter.BulkTransferSuccessResponse).render(bulk_id=BULK_ID)
+
+
+@pytest.mark.parametrize("assert_message, error_details", [
+    ("when static details of the reason", None),
+    ("when details given", "Not enough funds for 3 transfers"),
+])
+def test_bulk_error__should_render_error_response_body(assert_message, error_details):
+    response = bulk_transfers.reply_not_enough_funds_error(bulk_id=uuid.UUID(BULK_ID), error_details=error_details)
+
+    assert response.body == JSONResponse(content=adapter.BulkTransferErrorResponse(
+        bulk_id=BULK_ID,
+        message="Bulk transfer denied",
+        error=adapter.ErrorDetails(reason="insufficient-account-balance", details=error_details or "Not enough funds")
+    ).model_dump()).body, assert_message
+
+
+def test_openapi__should_still_document_response_models():
+    responses = client.get("/openapi.json").json()["paths"]["/transfers/bulk"]["post"]["responses"]
+
+    assert {
+        schema["$ref"] for schema in responses["201"]["content"]["application/json"]["schema"]["anyOf"]
+    } == {
+        "#/components/schemas/BulkTransferScheduledResponse", "#/components/schemas/BulkTransferSuccessResponse"
+    }
+    assert responses["422"]["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/BulkTransferErrorResponse"
+    }
+
+
+def test_response_overhead_benchmark__should_render_same_bodies_both_ways():
+    results = measure_serialization(repeat=1)
+
+    assert [result["response"] for result in results] == [
+        "success: response_model + JSONResponse", "success: precompiled serializer",
+        "error: model_dump + JSONResponse", "error: cached static body", "error: precompiled serializer"
+    ]
+    assert len({result["bytes"] for result in results[:2]}) == 1
+    assert len({result["bytes"] for result in results[2:]}) == 1
@@ -0,0 +1,146 @@
+import datetime
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.main import app
+from app.migrations import shards
+from app.models import db
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE, CANCELLED_BULK_REQUESTS
+from app.services import bulk_scheduler
+from app.services.bulk_manifest import MANIFEST_CACHE
+
+from benchmarks.pipeline import bulk_payload, drain_queues
+from benchmarks.sharding import run
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+SHARD_COUNT = 3
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()
+    yield
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    CANCELLED_BULK_REQUESTS.clear()
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    """
+    Migrated sharded layout in a temporary directory, used by the application for the test.
+    """
+    previous_database_path = db.DATABASE_PATH
+    shards_dir = str(tmp_path / "shards")
+    shards.migrate_shards(shards_dir=shards_dir, shard_count=SHARD_COUNT)
+    db.configure_shards(shards_dir=shards_dir, shard_count=SHARD_COUNT)
+    yield shards_dir
+    db.configure_engine(database_path=previous_database_path)
+
+
+def _create_account_on_shard(shard_id: int) -> db.BankAccount:
+    for i in range(1000):
+        bic, iban = "BNPAFRPPXXX", f"FR76300060000100000000{i:05d}"
+        if shards.place_account(bic=bic, iban=iban, shard_count=SHARD_COUNT) == shard_id:
+            return db.create_account(organization_name=f"Org {i}", bic=bic, iban=iban, balance_cents=10**9)
+    raise AssertionError(f"No IBAN placed on shard {shard_id}")
+
+
+def _bulk_request(bulk_id: str, row_id: int) -> db.BulkRequest:
+    with db.session_for_id(row_id) as session:
+        return db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(bulk_id))
+
+
+def test_migrate_shards__should_reserve_id_ranges_and_register_seed_account_on_first_shard(sharded):
+    shards.migrate_shards(shards_dir=sharded, shard_count=SHARD_COUNT)  # idempotent
+
+    account = _create_account_on_shard(2)
+
+    assert shards.shard_of_id(account.id) == 2
+    assert account.id == (2 << shards.SHARD_ID_SHIFT) + 1
+    with db.new_session() as session:
+        assert db.route_session_to_account(session=session, bic=account.bic, iban=account.iban)
+        assert db.session_shard_id(session) == 2
+    with db.new_session() as session:
+        assert db.route_session_to_account(session=session, bic="OIVUSCLQXXX", iban="FR10474608000002006107XXXXX")
+        assert db.session_shard_id(session) == 0
+        assert not db.route_session_to_account(session=session, bic="UNKNOWNXXXX", iban="FR7630006000010000000099999")
+
+
+def test_migrate_shards__should_keep_seed_rows_on_first_shard_only(sharded):
+    for shard_id in range(SHARD_COUNT):
+        with db.session_for_id(shard_id << shards.SHARD_ID_SHIFT) as session:
+            seeded = [
+                len(session.exec(select(table)).all()) for table in (db.BankAccount, db.Transaction, db.Counterparty)
+            ]
+        assert seeded == ([1, 2, 2] if shard_id == 0 else [0, 0, 0])
+
+
+def test_transfers_bulk__when_sharded__should_write_bulk_and_transactions_to_shard_of_account(sharded):
+    account = _create_account_on_shard(1)
+    payload = bulk_payload(bic=account.bic, iban=account.iban, transfer_count=3)
+
+    response = client.post("/transfers/bulk", json=payload)
+    assert response.status_code == 201, response.text
+    assert drain_queues() == 3
+
+    bulk_request = _bulk_request(payload["request_id"], row_id=account.id)
+    assert bulk_request.status == db.RequestStatus.COMPLETED
+    assert shards.shard_of_id(bulk_request.id) == 1
+    assert _bulk_request(payload["request_id"], row_id=0) is None
+    assert len(client.get(f"/accounts/{account.id}/transactions").json()["items"]) == 3
+
+
+def test_transfers_bulk__when_account_not_in_directory__should_return_404(sharded):
+    payload = stub_bulk_transfer_payload(credit_transfers=[stub_credit_transfer()], verbose=False)
+    payload["organization_iban"] = "FR7630006000010000000099999"
+
+    response = client.post("/transfers/bulk", json=payload)
+
+    assert response.status_code == 404
+    assert response.json()["error"]["reason"] == "unknown-account"
+
+
+def test_cancel_bulk_transfer__when_sharded__should_find_bulk_on_its_shard(sharded):
+    account = _create_account_on_shard(2)
+    payload = bulk_payload(bic=account.bic, iban=account.iban, transfer_count=2)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+
+    response = client.delete(f"/transfers/bulk/{payload['request_id']}")
+
+    assert response.status_code == 200
+    assert _bulk_request(payload["request_id"], row_id=account.id).status == db.RequestStatus.CANCELLED
+    assert client.delete(f"/transfers/bulk/{uuid.uuid4()}").status_code == 404
+
+
+def test_dispatcher__when_sharded__should_release_scheduled_bulks_of_every_shard(sharded):
+    accounts = [_create_account_on_shard(2), _create_account_on_shard(1)]
+    bulk_ids = []
+    for hour, account in zip((9, 10), accounts):
+        payload = bulk_payload(bic=account.bic, iban=account.iban, transfer_count=1)
+        payload["execute_at"] = f"2026-10-31T{hour:02d}:00:00Z"
+        assert client.post("/transfers/bulk", json=payload).status_code == 201
+        bulk_ids.append(payload["request_id"])
+
+    dispatcher = bulk_scheduler.ScheduledBulkDispatcher(clock=lambda: datetime.datetime(2026, 11, 1))
+
+    assert dispatcher.run_pending() is None
+    assert [job.bulk_request_uuid for job in TRANSFER_JOB_QUEUE] == bulk_ids
+    assert drain_queues() == 2
+    for bulk_id, account in zip(bulk_ids, accounts):
+        assert _bulk_request(bulk_id, row_id=account.id).status == db.RequestStatus.COMPLETED
+
+
+def test_sharding_benchmark__should_report_every_shard_count():
+    results = run(shard_counts=[1, 2], accounts=2, concurrency=2, bulks=2, bulk_size=2)
+
+    assert [result["shards"] for result in results] == [1, 2]
+    assert all(result["processed_transfers_per_second"] > 0 for result in results)
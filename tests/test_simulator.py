@@ -0,0 +1,49 @@
+from benchmarks.simulator import SimulationConfig, VirtualClock, simulate
+from app.services import transfer_service
+
+
+def test_virtual_clock__should_run_events_in_time_order():
+    clock = VirtualClock()
+    calls = []
+    clock.schedule(2.0, lambda: calls.append(("b", clock.now)))
+    clock.schedule(1.0, lambda: clock.schedule(0.5, lambda: calls.append(("c", clock.now))))
+    clock.schedule(2.0, lambda: calls.append(("d", clock.now)))
+
+    clock.run()
+
+    assert calls == [("c", 1.5), ("b", 2.0), ("d", 2.0)]
+
+
+def test_simulate__should_complete_all_bulks_in_virtual_time(settings):
+    result = simulate(SimulationConfig(
+        bulks=4, bulk_size=5, arrival="burst", transfer_workers=2,
+        bank_latency_p50_ms=1000, bank_latency_p99_ms=1000, transfer_overhead_ms=0
+    ))
+
+    assert result["completed_bulks"] == 4
+    assert result["failed_bulks"] == 0
+    assert result["processed_transfers"] == 20
+    # 20 transfers of 1s each on 2 workers
+    assert 10.0 <= result["simulated_seconds"] <= 10.1
+    assert result["wall_seconds"] < result["simulated_seconds"]
+    assert result["transfer_workers_utilization"] > 0.99
+    assert result["max_transfer_backlog"] == 20
+    assert result["backlog"][0] == [0.0, 20, 0]
+    assert result["completion_seconds"]["p50"] <= result["completion_seconds"]["max"]
+    assert transfer_service.transfer_funds.__module__ == transfer_service.__name__  # bank restored
+
+
+def test_simulate__should_fail_bulks_when_bank_transfers_fail(settings):
+    result = simulate(SimulationConfig(bulks=2, bulk_size=3, bank_failure_rate=1.0))
+
+    assert result["completed_bulks"] == 0
+    assert result["failed_bulks"] == 2
+
+
+def test_simulate__should_be_reproducible_with_seed(settings):
+    config = SimulationConfig(bulks=3, bulk_size=4, arrival="poisson", seed=7)
+
+    first, second = simulate(config), simulate(config)
+
+    assert first["simulated_seconds"] == second["simulated_seconds"]
+    assert first["backlog"] == second["backlog"]
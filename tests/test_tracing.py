@@ -0,0 +1,117 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.job import BulkJob, QueuedBulkJob
+from app.routers.fake_broker import TRANSFER_JOB_QUEUE, FINALIZE_BULK_JOB_QUEUE
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.utils.tracing import TraceContext, configure_tracing, shutdown_tracing, start_span
+
+from tests.faker import stub_credit_transfer, stub_bulk_transfer_payload
+
+
+client = TestClient(app)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+
+def _read_spans(spans_path) -> list:
+    return [
+        span
+        for line in spans_path.read_text().splitlines()
+        for resource_spans in json.loads(line)["resourceSpans"]
+        for scope_spans in resource_spans["scopeSpans"]
+        for span in scope_spans["spans"]
+    ]
+
+
+def test_trace_context_from_traceparent():
+    assert TraceContext.from_traceparent(f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01") == TraceContext(
+        trace_id=TRACE_ID, span_id=PARENT_SPAN_ID
+    )
+    assert TraceContext.from_traceparent(f"00-{'0' * 32}-{PARENT_SPAN_ID}-01") is None
+    assert TraceContext.from_traceparent("not-a-traceparent") is None
+    assert TraceContext.from_traceparent(None) is None
+
+
+def test_start_span__when_nested__should_be_child_of_current_span(tmp_path):
+    spans_path = tmp_path / "spans.jsonl"
+    configure_tracing(spans_path=str(spans_path))
+    try:
+        with start_span("parent") as parent:
+            with start_span("child", attributes={"transfer_count": 2}):
+                pass
+        with pytest.raises(ValueError):
+            with start_span("failed"):
+                raise ValueError("bank timeout")
+    finally:
+        shutdown_tracing()
+
+    child, parent_span, failed = _read_spans(spans_path)
+    assert child["parentSpanId"] == parent.span_id
+    assert child["traceId"] == parent.trace_id
+    assert child["attributes"] == [{"key": "transfer_count", "value": {"intValue": "2"}}]
+    assert "parentSpanId" not in parent_span
+    assert failed["traceId"] != parent.trace_id
+    assert failed["status"] == {"code": 2, "message": "ValueError: bank timeout"}
+
+
+def test_queued_bulk_job__should_keep_trace_context():
+    bulk_job = BulkJob(
+        bulk_request_uuid=str(uuid.uuid4()), bank_account_id=1, single_transferred_amount_cents=100, success=True,
+        trace_id=TRACE_ID, parent_span_id=PARENT_SPAN_ID
+    )
+    assert QueuedBulkJob.from_bulk_job(bulk_job).to_bulk_job() == bulk_job
+
+
+@pytest.mark.parametrize("bulk_manifest_mode", [False, True])
+def test_transfers_bulk__should_record_spans_of_all_stages_in_request_trace(
+        database, settings, tmp_path, bulk_manifest_mode
+):
+    settings(bulk_manifest_mode=bulk_manifest_mode)
+    TRANSFER_JOB_QUEUE.clear()
+    FINALIZE_BULK_JOB_QUEUE.clear()
+    MANIFEST_CACHE.clear()
+    spans_path = tmp_path / "spans.jsonl"
+    configure_tracing(spans_path=str(spans_path))
+    try:
+        payload = stub_bulk_transfer_payload(
+            credit_transfers=[stub_credit_transfer(amount_in_euros="10") for _ in range(2)], verbose=False
+        )
+        response = client.post(
+            "/transfers/bulk", json=payload, headers={"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"}
+        )
+        assert response.status_code == 201
+        for _ in range(2):
+            assert client.get("/internal/jobs/transfer").status_code == 200
+        for _ in range(2):
+            assert client.get("/internal/jobs/bulk").status_code == 200
+    finally:
+        shutdown_tracing()
+
+    spans = _read_spans(spans_path)
+    assert {span["traceId"] for span in spans} == {TRACE_ID}
+    spans_by_id = {span["spanId"]: span for span in spans}
+
+    def ancestors(span) -> list:
+        names = []
+        while span.get("parentSpanId") in spans_by_id:
+            span = spans_by_id[span["parentSpanId"]]
+            names.append(span["name"])
+        return names
+
+    enqueue_stage = "enqueue_manifest_transfer_jobs" if bulk_manifest_mode else "enqueue_transfer_job"
+    finalize_spans = [span for span in spans if span["name"] == "finalize_bulk_transfer"]
+    assert len(finalize_spans) == 2
+    assert ancestors(finalize_spans[0]) == [
+        "queue_wait", "enqueue_finalize_bulk_job", "process_transfer", "queue_wait", enqueue_stage,
+        "POST /transfers/bulk"
+    ]
+    assert spans_by_id[next(
+        span["spanId"] for span in spans if span["name"] == "POST /transfers/bulk"
+    )]["parentSpanId"] == PARENT_SPAN_ID
+    assert len([span for span in spans if span["name"] == "transfer_funds"]) == 2
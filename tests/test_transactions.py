@@ -0,0 +1,78 @@
+import json
+import uuid
+
+import mockito
+import pytest
+
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+
+from app.main import app
+from app.models import db
+
+
+client = TestClient(app)
+
+
+def _transaction(transaction_id: int) -> db.Transaction:
+    return db.Transaction(
+        id=transaction_id, transfer_uuid=uuid.uuid4(), bulk_request_uuid=uuid.uuid4(),
+        counterparty=db.Counterparty(id=2, name="Bip Bip", iban="EE303680981021245685", bic="CRLYFRPPTOU"),
+        amount_cents=-1450, amount_currency="EUR", bank_account_id=1, description="Wonderland/4410"
+    )
+
+
+@pytest.fixture(autouse=True)
+def unstub_between_tests():
+    yield
+    mockito.unstub()
+
+
+@pytest.fixture
+def when_account_valid(request):
+    when(db).find_account_by_id(**KWARGS).thenReturn(
+        db.BankAccount(id=1, iban="123", bic="456", organization_name="Test Org",
+                       balance_cents=90000000, ongoing_transfer_cents=0)
+    )
+
+
+def test_list_transactions__when_more_transactions_than_limit__should_return_next_cursor(when_account_valid):
+    when(db).list_transactions(**KWARGS).thenReturn([_transaction(i) for i in (3, 4, 5)])
+
+    response = client.get("/accounts/1/transactions", params={"after_id": 2, "limit": 2})
+
+    assert response.status_code == 200
+    response_dict = response.json()
+    assert [item["id"] for item in response_dict["items"]] == [3, 4]
+    assert response_dict["next_cursor"] == 4
+    mockito.verify(db).list_transactions(
+        session=mockito.ANY, bank_account_id=1, after_id=2, limit=3, bulk_request_uuid=None
+    )
+
+
+def test_list_transactions__when_last_page__should_return_null_cursor(when_account_valid):
+    when(db).list_transactions(**KWARGS).thenReturn([_transaction(3)])
+
+    response = client.get("/accounts/1/transactions", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+
+def test_list_transactions__when_unknown_account__should_return_404():
+    when(db).find_account_by_id(**KWARGS).thenReturn(None)
+    response = client.get("/accounts/42/transactions")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("export_format, expected_lines", [("csv", 4), ("ndjson", 3)])
+def test_export_transactions__should_stream_all_chunks(when_account_valid, export_format, expected_lines):
+    when(db).iter_transactions(**KWARGS).thenReturn(iter([[_transaction(1), _transaction(2)], [_transaction(3)]]))
+
+    response = client.get("/accounts/1/transactions/export", params={"format": export_format})
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == expected_lines
+    if export_format == "ndjson":
+        assert json.loads(lines[-1])["id"] == 3
@@ -0,0 +1,261 @@
+import dataclasses
+import os
+import signal
+import threading
+import time
+import uuid
+
+import mockito
+import pytest
+from fastapi.testclient import TestClient
+from mockito import when, KWARGS
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app.main import app
+from app.models import db
+from app.models.job import QueuedManifestTransfer
+from app.routers import fake_broker
+from app.services import transfer_service
+from app.services.bulk_manifest import MANIFEST_CACHE
+from app.settings import get_settings
+from app.utils.sqlite_queue import JobLease, SqliteJobQueue
+from app.worker import WorkerSupervisor, consume_jobs
+
+from benchmarks.pipeline import bulk_payload, drain_queues
+from benchmarks.workers import run
+
+
+client = TestClient(app)
+
+BIC, IBAN = "OIVUSCLQXXX", "FR10474608000002006107XXXXX"  # seeded by the migrations
+
+
+@pytest.fixture(autouse=True)
+def empty_queues():
+    MANIFEST_CACHE.clear()
+    yield
+    mockito.unstub()
+    fake_broker.configure_job_queues(job_queue_path=None)
+    fake_broker.TRANSFER_JOB_QUEUE.clear()
+    fake_broker.FINALIZE_BULK_JOB_QUEUE.clear()
+
+
+@pytest.fixture
+def job_queue_path(tmp_path) -> str:
+    path = str(tmp_path / "jobs.sqlite")
+    fake_broker.configure_job_queues(job_queue_path=path)
+    return path
+
+
+def _bulk_status(bulk_id: str) -> db.RequestStatus:
+    with Session(db.engine) as session:
+        return db.find_bulk_request(session=session, bulk_request_uuid=uuid.UUID(bulk_id)).status
+
+
+def _manifest_bulk_request(queued_job: QueuedManifestTransfer):
+    return None, queued_job.bulk_request_id
+
+
+def _wait_for(condition, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.05)
+
+
+def test_sqlite_job_queue__should_pop_jobs_once_in_fifo_order_across_instances(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    producer = SqliteJobQueue(database_path=path, name="transfer", bulk_request_of=_manifest_bulk_request)
+    consumer = SqliteJobQueue(database_path=path, name="transfer", bulk_request_of=_manifest_bulk_request)
+    other_queue = SqliteJobQueue(database_path=path, name="other", bulk_request_of=_manifest_bulk_request)
+
+    producer.append(QueuedManifestTransfer(bulk_request_id=1, index=0))
+    producer.extend(QueuedManifestTransfer(bulk_request_id=2, index=index) for index in range(3))
+
+    assert (len(consumer), bool(other_queue)) == (4, False)
+    assert [(job.bulk_request_id, job.index) for job in consumer] == [(1, 0), (2, 0), (2, 1), (2, 2)]
+    assert consumer.purge(bulk_request_uuid=b"", bulk_request_id=2) == 3
+    assert consumer.popleft().bulk_request_id == 1
+    with pytest.raises(IndexError):
+        producer.popleft()
+
+
+def test_sqlite_job_queue__should_deliver_leased_jobs_again_once_released_or_expired(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    consumer = SqliteJobQueue(database_path=path, name="transfer", bulk_request_of=_manifest_bulk_request)
+    dead_consumer = SqliteJobQueue(
+        database_path=path, name="transfer", bulk_request_of=_manifest_bulk_request, lease_seconds=0.0
+    )
+    consumer.extend(QueuedManifestTransfer(bulk_request_id=1, index=index) for index in range(2))
+
+    lease, job = consumer.lease()
+    assert (job.index, len(consumer)) == (0, 2)  # leased, not acknowledged yet
+    assert consumer.release(lease)
+    assert consumer.lease()[1].index == 0
+    assert dead_consumer.lease()[1].index == 1
+
+    expired_lease, job = consumer.lease()  # the lease of the dead consumer expired
+    assert job.index == 1
+    assert not dead_consumer.ack(JobLease(job_id=expired_lease.job_id, leased_until=0.0))
+    assert consumer.ack(expired_lease)
+    assert len(consumer) == 1
+
+
+def test_consume_transfer_job__when_lease_expired__should_not_send_transfer(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=1)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    fake_broker.TRANSFER_JOB_QUEUE.lease_seconds = 0.0  # e.g. worker stalled: the job is leased by another one
+    expired_lease, _ = fake_broker.TRANSFER_JOB_QUEUE.lease()
+    fake_broker.TRANSFER_JOB_QUEUE.lease()
+    mockito.spy2(transfer_service.transfer_funds)
+
+    with pytest.raises(fake_broker.JobLeaseExpiredError):
+        fake_broker._ack_before_bank_call(expired_lease)()
+
+    mockito.verify(transfer_service, times=0).transfer_funds(**KWARGS)
+
+
+def test_consume_jobs__when_worker_died_before_ack__should_process_job_once_lease_expired(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=1)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    dead_worker_queue = SqliteJobQueue(
+        database_path=job_queue_path, name="transfer", bulk_request_of=_manifest_bulk_request, lease_seconds=0.2
+    )
+    dead_worker_queue.lease()
+    assert drain_queues() == 0  # leased by the dead worker
+
+    time.sleep(0.2)
+
+    assert drain_queues() == 1
+    assert _bulk_status(payload["request_id"]) == db.RequestStatus.COMPLETED
+    assert len(fake_broker.TRANSFER_JOB_QUEUE) == len(fake_broker.FINALIZE_BULK_JOB_QUEUE) == 0
+
+
+def test_transfers_bulk__when_shared_job_queue__should_process_jobs_from_queue_file(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=3)
+
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+
+    assert isinstance(fake_broker.TRANSFER_JOB_QUEUE, SqliteJobQueue)
+    shared_queue = SqliteJobQueue(database_path=job_queue_path, name="transfer", bulk_request_of=_manifest_bulk_request)
+    assert len(shared_queue) == 3
+    assert drain_queues() == 3
+    assert _bulk_status(payload["request_id"]) == db.RequestStatus.COMPLETED
+
+
+def test_cancel_bulk_transfer__when_shared_job_queue__should_delete_queued_jobs(database, job_queue_path, settings):
+    settings(bulk_manifest_mode=True)
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=5)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    assert len(fake_broker.TRANSFER_JOB_QUEUE) == 5
+
+    assert client.delete(f"/transfers/bulk/{payload['request_id']}").status_code == 200
+
+    assert not fake_broker.TRANSFER_JOB_QUEUE
+
+
+def test_process_transfer__should_queue_finalize_job_only_once_committed(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=2)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    transfer_jobs = [fake_broker.TRANSFER_JOB_QUEUE.popleft().to_transfer_job() for _ in range(2)]
+
+    with Session(db.engine) as session:
+        with pytest.raises(RuntimeError), session.begin():
+            assert transfer_service.process(session=session, transfer_job=transfer_jobs[0])
+            raise RuntimeError("rolled back")
+        assert not fake_broker.FINALIZE_BULK_JOB_QUEUE
+
+        with session.begin():
+            assert transfer_service.process(session=session, transfer_job=transfer_jobs[1])
+            assert not fake_broker.FINALIZE_BULK_JOB_QUEUE  # visible to the worker processes once committed
+        assert len(fake_broker.FINALIZE_BULK_JOB_QUEUE) == 1
+
+
+def test_consume_jobs__when_job_fails_unexpectedly__should_queue_it_again(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=1)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    stop_event = threading.Event()
+
+    def fail_and_stop(**kwargs):
+        stop_event.set()
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    when(transfer_service).process(**KWARGS).thenAnswer(fail_and_stop)
+
+    assert consume_jobs(stop_event, idle_poll_seconds=0.0) == 0
+
+    assert len(fake_broker.TRANSFER_JOB_QUEUE) == 1
+    mockito.unstub()
+    assert drain_queues() == 1
+    assert _bulk_status(payload["request_id"]) == db.RequestStatus.COMPLETED
+
+
+def test_consume_jobs__when_job_fails_after_bank_call__should_not_queue_it_again(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=1)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    stop_event = threading.Event()
+
+    def fail_and_stop(**kwargs):  # e.g. the commit of the transaction fails
+        stop_event.set()
+        raise OperationalError("COMMIT", {}, Exception("database is locked"))
+
+    mockito.spy2(transfer_service.transfer_funds)
+    when(transfer_service)._queue_finalize_bulk_job_after_commit(**KWARGS).thenAnswer(fail_and_stop)
+
+    assert consume_jobs(stop_event, idle_poll_seconds=0.0) == 0
+
+    mockito.verify(transfer_service, times=1).transfer_funds(**KWARGS)
+    assert len(fake_broker.TRANSFER_JOB_QUEUE) == 0  # the transfer may be paid: not sent to the bank again
+
+
+def test_consume_jobs__should_process_transfer_and_finalize_jobs_until_stopped(database, job_queue_path):
+    payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=2)
+    assert client.post("/transfers/bulk", json=payload).status_code == 201
+    stop_event = threading.Event()
+    consumer = threading.Thread(target=consume_jobs, args=(stop_event,))
+    consumer.start()
+
+    try:
+        _wait_for(lambda: _bulk_status(payload["request_id"]) == db.RequestStatus.COMPLETED, timeout=10)
+    finally:
+        stop_event.set()
+        consumer.join()
+
+
+def test_worker_supervisor__when_no_shared_job_queue__should_raise():
+    with pytest.raises(ValueError):
+        WorkerSupervisor(settings=dataclasses.replace(get_settings(), job_queue_path=None), processes=1)
+
+
+def test_worker_supervisor__should_restart_exited_workers_and_process_jobs(database, job_queue_path):
+    supervisor = WorkerSupervisor(
+        settings=dataclasses.replace(
+            get_settings(), database_path=database, job_queue_path=job_queue_path, log_level="WARNING",
+            log_async=False
+        ),
+        processes=2,
+        restart_delay_seconds=0.0
+    )
+    supervisor.start()
+    try:
+        assert supervisor.wait_ready(timeout=60)
+        killed_pid = supervisor.pids()[1]
+        os.kill(killed_pid, signal.SIGKILL)
+        _wait_for(lambda: supervisor.supervise() == 1)
+        assert supervisor.pids()[1] != killed_pid
+        assert supervisor.wait_ready(timeout=60)
+
+        payload = bulk_payload(bic=BIC, iban=IBAN, transfer_count=4)
+        assert client.post("/transfers/bulk", json=payload).status_code == 201
+        _wait_for(lambda: _bulk_status(payload["request_id"]) == db.RequestStatus.COMPLETED)
+    finally:
+        supervisor.stop()
+    assert supervisor.restarts == 1
+
+
+def test_workers_benchmark__should_report_every_process_count():
+    results = run(process_counts=[1], bulks=1, bulk_size=2, accounts=1)
+
+    assert [(result["processes"], result["restarts"]) for result in results] == [(1, 0)]
+    assert results[0]["transfers_per_second"] > 0